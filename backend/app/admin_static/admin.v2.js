@@ -76,6 +76,34 @@
         });
       });
     }
+
+    // ===== Broadcasts page: live progress for active jobs =====
+    var pollRows = document.querySelectorAll('[data-broadcast-poll]');
+    if (pollRows.length && window.fetch) {
+      var refresh = function () {
+        document.querySelectorAll('[data-broadcast-poll]').forEach(function (row) {
+          fetch(row.getAttribute('data-broadcast-poll'), { credentials: 'same-origin' })
+            .then(function (r) { return r.ok ? r.json() : null; })
+            .then(function (p) {
+              if (!p) return;
+              var set = function (field, value) {
+                var cell = row.querySelector('[data-field="' + field + '"]');
+                if (cell) cell.textContent = value;
+              };
+              set('status', p.status);
+              set('sent', p.sent + ' / ' + p.total);
+              set('failed', p.failed);
+              set('remaining', p.remaining);
+              set('per_second', p.per_second + ' msg/s');
+              if (p.status !== 'pending' && p.status !== 'running') {
+                row.removeAttribute('data-broadcast-poll');
+              }
+            })
+            .catch(function () {});
+        });
+      };
+      window.setInterval(refresh, 3000);
+    }
   });
 })();
 
@@ -1,7 +1,10 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
 import os
 
+from app.utils.db_metrics import InstrumentedQueuePool, instrument_engine
+from app.utils.metrics import register_stats
+
 # Путь к базе данных относительно папки backend
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -10,17 +13,184 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 # - Fallback to local SQLite in backend/ directory
 DATABASE_URL = os.getenv("DATABASE_URL") or f"sqlite:///{os.path.join(BASE_DIR, 'db.sqlite3')}"
 
-connect_args = {}
-if DATABASE_URL.startswith("sqlite"):
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+def engine_options(url: str) -> dict:
+    """
+    create_engine() kwargs for a server database (Postgres), from env:
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT (s), DB_POOL_RECYCLE (s),
+    DB_POOL_PRE_PING (1/0) and DB_STATEMENT_TIMEOUT_MS (0 = no limit).
+    """
+    options = {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": _env_int("DB_POOL_SIZE", 5),
+        "max_overflow": _env_int("DB_MAX_OVERFLOW", 10),
+        "pool_timeout": _env_float("DB_POOL_TIMEOUT", 30.0),
+        # Recycle before server/proxy idle timeouts close connections under us
+        "pool_recycle": _env_int("DB_POOL_RECYCLE", 1800),
+        "pool_pre_ping": (os.getenv("DB_POOL_PRE_PING") or "1").strip().lower() not in ("0", "false", "no"),
+    }
+    statement_timeout_ms = _env_int("DB_STATEMENT_TIMEOUT_MS", 0)
+    if url.startswith("postgresql") and statement_timeout_ms > 0:
+        options["connect_args"] = {"options": f"-c statement_timeout={statement_timeout_ms}"}
+    return options
+
+
+def _is_file_sqlite(url: str) -> bool:
+    return url.startswith("sqlite") and ":memory:" not in url and url.rstrip("/") not in ("sqlite:", "sqlite:/", "sqlite://")
+
+
+def sqlite_pragmas(*, read_only: bool = False) -> list[str]:
+    """
+    Production profile (SQLITE_PROFILE=production, default), applied to every connection:
+    WAL lets readers run alongside the single writer, synchronous=NORMAL is durable
+    enough with WAL (no fsync per commit), mmap/cache cut syscalls on reads.
+    """
+    pragmas = [
+        f"PRAGMA busy_timeout = {int(float(os.getenv('SQLITE_BUSY_TIMEOUT', '10')) * 1000)}",
+        "PRAGMA foreign_keys = ON",
+        "PRAGMA synchronous = NORMAL",
+        f"PRAGMA mmap_size = {_env_int('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)}",
+        # Negative = KiB
+        f"PRAGMA cache_size = -{_env_int('SQLITE_CACHE_KB', 64000)}",
+        "PRAGMA temp_store = MEMORY",
+    ]
+    if read_only:
+        pragmas.append("PRAGMA query_only = ON")
+    else:
+        # Persistent in the file; after busy_timeout so concurrent first connects wait for the switch
+        pragmas.insert(1, "PRAGMA journal_mode = WAL")
+    return pragmas
+
+
+def _install_pragmas(engine, *, read_only: bool) -> None:
+    pragmas = sqlite_pragmas(read_only=read_only)
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, _record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+
+def build_engines(url: str, *, profile: str = "production", read_pool_size: int = 4):
+    """
+    (writer, reader). reader is None unless this is a file SQLite database with the
+    production profile and read_pool_size > 0: then reads go to a pool of query_only
+    connections and all writes go through a single writer connection per process.
+    """
+    if not url.startswith("sqlite"):
+        return create_engine(url, **engine_options(url)), None
+
     # Avoid long blocking on "database is locked" and improve stability on low-end VPS.
-    # SQLite is safe with a single app worker (see docker-compose.prod.yml).
     connect_args = {"check_same_thread": False, "timeout": float(os.getenv("SQLITE_BUSY_TIMEOUT", "10"))}
+    if profile != "production" or not _is_file_sqlite(url):
+        poolclass = InstrumentedQueuePool if _is_file_sqlite(url) else None
+        return create_engine(url, connect_args=connect_args, poolclass=poolclass), None
 
-engine = create_engine(
+    # One writer connection per process: writers queue in the pool instead of
+    # spinning on SQLite's file lock (other processes still wait on busy_timeout)
+    writer = create_engine(
+        url,
+        connect_args=connect_args,
+        poolclass=InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=float(os.getenv("SQLITE_WRITER_WAIT_SECONDS", "30")),
+    )
+    _install_pragmas(writer, read_only=False)
+    if read_pool_size <= 0:
+        return writer, None
+    reader = create_engine(
+        url,
+        connect_args=connect_args,
+        poolclass=InstrumentedQueuePool,
+        pool_size=read_pool_size,
+        max_overflow=read_pool_size,
+    )
+    _install_pragmas(reader, read_only=True)
+    return writer, reader
+
+
+def _is_plain_read(clause) -> bool:
+    if getattr(clause, "is_select", False):
+        return getattr(clause, "_for_update_arg", None) is None
+    # text("SELECT ..."): read; any other raw SQL may write
+    text_sql = getattr(clause, "text", None)
+    return isinstance(text_sql, str) and text_sql.lstrip().upper().startswith("SELECT")
+
+
+class RoutingSession(Session):
+    """
+    Sends plain SELECTs to the reader engine and everything else (flushes, DML,
+    SELECT ... FOR UPDATE, text(), explicit .connection()) to the writer. Once a
+    transaction has touched the writer it stays there until commit/rollback, so
+    it reads its own uncommitted writes.
+    """
+
+    reader = None
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        writer = super().get_bind(mapper=mapper, clause=clause, **kw)
+        if self.reader is None or self.info.get("use_writer"):
+            return writer
+        if not self._flushing and clause is not None and _is_plain_read(clause):
+            return self.reader
+        self.info["use_writer"] = True
+        return writer
+
+
+@event.listens_for(RoutingSession, "after_transaction_end")
+def _release_writer(session, transaction):
+    if transaction.parent is None:
+        session.info.pop("use_writer", None)
+
+
+def make_session_factory(writer, reader=None) -> sessionmaker:
+    if reader is None:
+        return sessionmaker(autocommit=False, autoflush=False, bind=writer)
+    session_class = type("ReadRoutingSession", (RoutingSession,), {"reader": reader})
+    return sessionmaker(class_=session_class, autocommit=False, autoflush=False, bind=writer)
+
+
+# SQLITE_PROFILE=production: WAL + pragmas + read/write split; "basic" keeps the old single engine
+engine, read_engine = build_engines(
     DATABASE_URL,
-    connect_args=connect_args
+    profile=(os.getenv("SQLITE_PROFILE") or "production").strip().lower(),
+    read_pool_size=_env_int("SQLITE_READ_POOL_SIZE", 4),
 )
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = make_session_factory(engine, read_engine)
+
+_slow_ms = _env_float("DB_SLOW_QUERY_MS", 500.0)
+_pool_stats = {"primary": (engine, instrument_engine(engine, slow_ms=_slow_ms))}
+if read_engine is not None:
+    _pool_stats["reader"] = (read_engine, instrument_engine(read_engine, slow_ms=_slow_ms))
+register_stats("db", lambda: {name: stats.snapshot(eng.pool) for name, (eng, stats) in _pool_stats.items()})
+
+
+def get_db():
+    """FastAPI dependency: one session per request, closed afterwards."""
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
 
 Base = declarative_base()
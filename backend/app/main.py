@@ -1,5 +1,6 @@
 import os
 import logging
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -10,14 +11,62 @@ from starlette.middleware.trustedhost import TrustedHostMiddleware
 from starlette.requests import Request
 from starlette.responses import Response
 
-from app.routers import users, bookings, webinars, admins, posts, payments, webinar_materials, reminders, referrals, nowpayments, admin_panel, product_payments, me, debug
-
-from app.database import engine, Base
-from app.models import User, Booking, Webinar, Admin, Post, Payment, WebinarMaterial, ReferralInvite
-
-Base.metadata.create_all(bind=engine)
-
-app = FastAPI(title="Crypto Analytics API")
+from app.routers import users, bookings, webinars, admins, posts, payments, webinar_materials, reminders, referrals, nowpayments, admin_panel, product_payments, me, debug, market
+
+from app.database import SessionLocal
+import app.models  # noqa: F401 - register every mapper before the first query
+from app.migrations import check_schema, upgrade
+from app.services.broadcast_service import start_broadcast_worker, stop_broadcast_worker
+from app.services.ledger_reconciliation import start_ledger_reconciler, stop_ledger_reconciler
+from app.services.market_data import start_market_poller, stop_market_poller
+from app.services.nowpayments_ipn_service import start_ipn_applier, stop_ipn_applier
+from app.services.reminder_service import backfill_reminder_schedule, start_reminder_scheduler, stop_reminder_scheduler
+from app.utils.compression import CompressionMiddleware, configured_encodings
+
+def _check_schema() -> None:
+    # Migrations run before the workers start (python -m app.migrations upgrade);
+    # here only the version check. DB_AUTO_MIGRATE=1 (dev) applies them in-process.
+    if os.getenv("DB_AUTO_MIGRATE") == "1":
+        upgrade()
+    check_schema()
+
+
+def _backfill_reminders() -> None:
+    # Webinars/bookings created before reminder_schedule existed
+    db = SessionLocal()
+    try:
+        backfill_reminder_schedule(db)
+    except Exception:
+        logging.getLogger("app").exception("reminder schedule backfill failed")
+    finally:
+        db.close()
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    _check_schema()
+    # Background workers live inside the API process (each one can be disabled via env)
+    _backfill_reminders()
+    start_broadcast_worker()
+    start_reminder_scheduler()
+    start_ipn_applier()
+    start_market_poller()
+    start_ledger_reconciler()
+    try:
+        yield
+    finally:
+        stop_ledger_reconciler()
+        stop_market_poller()
+        stop_ipn_applier()
+        stop_reminder_scheduler()
+        stop_broadcast_worker()
+
+
+# The app keeps FastAPI's default response class on purpose: with it, routes that have a
+# response_model serialize straight to bytes in Pydantic's core; validate + orjson is no
+# faster (benchmarks/bench_serialization.py). orjson (app/utils/fast_json.py) is used
+# where that path does not apply: trusted_json() and routers of plain dicts.
+app = FastAPI(title="Crypto Analytics API", lifespan=lifespan)
 
 _root_logger = logging.getLogger()
 if not _root_logger.handlers:
@@ -86,6 +135,16 @@ app.add_middleware(
 app.add_middleware(TrustedHostMiddleware, allowed_hosts=_get_allowed_hosts())
 
 
+# Сжатие ответов в приложении (zstd/gzip) — только без сжимающего прокси, см. API_COMPRESSION
+_compression = configured_encodings()
+if _compression:
+    app.add_middleware(
+        CompressionMiddleware,
+        encodings=_compression,
+        minimum_size=int(os.getenv("API_COMPRESSION_MIN_BYTES") or 1024),
+    )
+
+
 @app.middleware("http")
 async def add_security_headers(request: Request, call_next):
     resp: Response = await call_next(request)
@@ -114,6 +173,7 @@ app.include_router(admin_panel.router)
 app.include_router(product_payments.router)
 app.include_router(me.router)
 app.include_router(debug.router)
+app.include_router(market.router)
 
 # Static assets for backend admin panel
 _admin_static_dir = os.path.join(os.path.dirname(__file__), "admin_static")
@@ -0,0 +1,44 @@
+"""
+Schema migrations: `python -m app.migrations upgrade` applies pending steps,
+web workers only call check_schema() at boot. See runner.py for the rules.
+"""
+from __future__ import annotations
+
+from typing import Optional
+
+from sqlalchemy.engine import Engine
+
+from app.migrations.runner import Migration, MigrationContext, SchemaOutOfDate, current_version
+from app.migrations import runner
+from app.migrations.versions import MIGRATIONS
+
+__all__ = [
+    "MIGRATIONS",
+    "Migration",
+    "MigrationContext",
+    "SchemaOutOfDate",
+    "check_schema",
+    "current_version",
+    "head_version",
+    "upgrade",
+]
+
+
+def _engine(engine: Optional[Engine]) -> Engine:
+    if engine is not None:
+        return engine
+    from app.database import engine as app_engine
+
+    return app_engine
+
+
+def head_version() -> int:
+    return MIGRATIONS[-1].version
+
+
+def check_schema(engine: Optional[Engine] = None) -> int:
+    return runner.check_schema(_engine(engine), MIGRATIONS)
+
+
+def upgrade(engine: Optional[Engine] = None, *, target: Optional[int] = None) -> list[int]:
+    return runner.upgrade(_engine(engine), MIGRATIONS, target=target)
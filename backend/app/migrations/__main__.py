@@ -0,0 +1,42 @@
+"""
+Run (from backend/):
+  python -m app.migrations upgrade [--target N]   apply pending migrations
+  python -m app.migrations status                 list migrations and whether they are applied
+  python -m app.migrations current                print the database schema version
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import sys
+
+from app.database import engine
+from app.migrations import MIGRATIONS, current_version, head_version, runner, upgrade
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.migrations")
+    sub = parser.add_subparsers(dest="command", required=True)
+    up = sub.add_parser("upgrade", help="apply pending migrations")
+    up.add_argument("--target", type=int, default=None, help="stop after this version")
+    sub.add_parser("status", help="list migrations")
+    sub.add_parser("current", help="print the database schema version")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+
+    if args.command == "upgrade":
+        applied = upgrade(engine, target=args.target)
+        print(f"[migrations] applied: {applied or 'nothing'}; version {current_version(engine)}")
+    elif args.command == "status":
+        for migration, applied in runner.status(engine, MIGRATIONS):
+            mark = "x" if applied else " "
+            mode = "" if migration.transactional else " (non-transactional)"
+            print(f"[{mark}] {migration.version:4d} {migration.name}{mode}")
+    else:
+        print(f"{current_version(engine)} (head {head_version()})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,344 @@
+"""
+Versioned schema migrations.
+
+Each Migration has an increasing integer version; applied versions are
+recorded in the schema_version table, so every step runs exactly once per
+database. Steps run in order from the CLI (python -m app.migrations upgrade),
+never from web workers: a worker only reads max(version) at boot.
+
+transactional=True steps run in one transaction together with their
+schema_version row (on SQLite via BEGIN IMMEDIATE, since pysqlite does not
+wrap DDL in its implicit transactions). transactional=False steps run on an
+autocommit connection: that is what CREATE INDEX CONCURRENTLY needs on
+Postgres and what the SQLite table rebuild needs to switch foreign keys off.
+Such steps must be idempotent, because a crash can leave them half done.
+"""
+from __future__ import annotations
+
+import logging
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable, Iterator, Optional, Sequence
+
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, String, Table, inspect, literal, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+logger = logging.getLogger("migrations")
+
+schema_version = Table(
+    "schema_version",
+    MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("name", String(200), nullable=False),
+    Column("applied_at", DateTime(timezone=True), nullable=False),
+)
+
+# pg_advisory_lock key: one migration run per database at a time
+_PG_LOCK_KEY = 0x6D696772  # "migr"
+
+
+class SchemaOutOfDate(RuntimeError):
+    """The database is behind the code; run `python -m app.migrations upgrade`."""
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    upgrade: Callable[["MigrationContext"], None]
+    transactional: bool = True
+
+
+class MigrationContext:
+    """What a migration step gets: the connection plus idempotent DDL helpers."""
+
+    def __init__(self, conn: Connection, *, transactional: bool):
+        self.conn = conn
+        self.transactional = transactional
+        self.dialect = conn.dialect.name
+
+    @property
+    def is_postgres(self) -> bool:
+        return self.dialect == "postgresql"
+
+    @property
+    def is_sqlite(self) -> bool:
+        return self.dialect == "sqlite"
+
+    def quote(self, name: str) -> str:
+        return self.conn.dialect.identifier_preparer.quote(name)
+
+    def execute(self, statement, params=None):
+        if isinstance(statement, str):
+            statement = text(statement)
+        return self.conn.execute(statement, params or {})
+
+    def _ddl(self, sql: str):
+        # Compiled DDL goes to the driver as is (no bind parameter parsing)
+        return self.conn.exec_driver_sql(sql)
+
+    # --- introspection (fresh inspector each time: the schema changes under us) ---
+
+    def has_table(self, name: str) -> bool:
+        return inspect(self.conn).has_table(name)
+
+    def has_column(self, table: str, column: str) -> bool:
+        return any(c["name"] == column for c in inspect(self.conn).get_columns(table))
+
+    def has_index(self, table: str, name: str) -> bool:
+        return any(ix["name"] == name for ix in inspect(self.conn).get_indexes(table))
+
+    # --- DDL helpers ---
+
+    def create_table(self, table: Table) -> None:
+        """CREATE TABLE with its indexes, if the table is missing."""
+        if self.has_table(table.name):
+            return
+        logger.info("create table %s", table.name)
+        table.create(self.conn)
+
+    def add_column(self, table: Table, column: Column) -> None:
+        if self.has_column(table.name, column.name):
+            return
+        logger.info("add column %s.%s", table.name, column.name)
+        self._ddl(f"ALTER TABLE {self.quote(table.name)} ADD COLUMN {self._column_sql(column)}")
+
+    def _column_sql(self, column: Column) -> str:
+        default = None
+        if column.server_default is not None:
+            default = str(column.server_default.arg)
+        elif column.default is not None and column.default.is_scalar:
+            # Existing rows need a value for NOT NULL: use the model's scalar default
+            default = str(
+                literal(column.default.arg, column.type).compile(
+                    dialect=self.conn.dialect, compile_kwargs={"literal_binds": True}
+                )
+            )
+        not_null = not column.nullable and not column.primary_key
+        if not_null and default is None:
+            logger.warning("%s.%s added as NULL: no default to fill existing rows", column.table.name, column.name)
+            not_null = False
+        parts = [self.quote(column.name), column.type.compile(dialect=self.conn.dialect)]
+        parts.append("NOT NULL" if not_null else "NULL")
+        if default is not None:
+            parts.append(f"DEFAULT {default}")
+        return " ".join(parts)
+
+    def create_index(self, index: Index, *, best_effort: bool = False) -> None:
+        """
+        Create the index if missing. On Postgres outside a transaction this is
+        CREATE INDEX CONCURRENTLY (no write lock on the table); an INVALID
+        leftover from an interrupted concurrent build is dropped and rebuilt.
+        best_effort: log and skip on failure (e.g. a UNIQUE index over old duplicates).
+        """
+        table = index.table.name
+        concurrently = self.is_postgres and not self.transactional
+        if concurrently and self._pg_index_invalid(index.name):
+            logger.warning("drop invalid index %s", index.name)
+            self._ddl(f"DROP INDEX CONCURRENTLY IF EXISTS {self.quote(index.name)}")
+        if self.has_index(table, index.name):
+            return
+        ddl = str(CreateIndex(index).compile(dialect=self.conn.dialect))
+        if concurrently:
+            ddl = ddl.replace(" INDEX ", " INDEX CONCURRENTLY ", 1)
+        logger.info("create index %s.%s%s", table, index.name, " (concurrently)" if concurrently else "")
+        if not best_effort:
+            self._ddl(ddl)
+            return
+        savepoint = self.transactional
+        if savepoint:
+            self._ddl("SAVEPOINT create_index")
+        try:
+            self._ddl(ddl)
+        except DBAPIError as exc:
+            if savepoint:
+                self._ddl("ROLLBACK TO SAVEPOINT create_index")
+            logger.warning("index %s not created: %s", index.name, exc.orig)
+        if savepoint:
+            self._ddl("RELEASE SAVEPOINT create_index")
+
+    def drop_index(self, table: str, name: str) -> None:
+        if not self.has_table(table) or not self.has_index(table, name):
+            return
+        concurrently = " CONCURRENTLY" if self.is_postgres and not self.transactional else ""
+        logger.info("drop index %s.%s", table, name)
+        self._ddl(f"DROP INDEX{concurrently} IF EXISTS {self.quote(name)}")
+
+    def analyze(self, table: str) -> None:
+        """Refresh planner statistics after new indexes (SQLite keeps none until ANALYZE)."""
+        self._ddl(f"ANALYZE {self.quote(table)}")
+
+    def _pg_index_invalid(self, name: str) -> bool:
+        row = self.execute(
+            "SELECT NOT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name",
+            {"name": name},
+        ).first()
+        return bool(row and row[0])
+
+    def rebuild_table(self, table: Table, *, batch_size: int = 5000) -> None:
+        """
+        SQLite table rebuild (for changes ALTER TABLE cannot do: types, constraints):
+        create the new definition under a temporary name, copy rows over in rowid
+        batches, drop the old table, rename, recreate indexes. Columns present in
+        both definitions are copied. Runs in one BEGIN IMMEDIATE transaction with
+        foreign keys off, then checks them; needs Migration(transactional=False).
+        """
+        if not self.is_sqlite:
+            raise RuntimeError("rebuild_table is SQLite-only; use ALTER TABLE on other databases")
+        if self.transactional:
+            raise RuntimeError("rebuild_table needs a Migration(transactional=False)")
+
+        old_columns = {c["name"] for c in inspect(self.conn).get_columns(table.name)}
+        columns = ", ".join(self.quote(c.name) for c in table.columns if c.name in old_columns)
+        src, dst = self.quote(table.name), self.quote(f"_rebuild_{table.name}")
+        # Same definition under the temporary name; references to other tables stay as they are
+        create_sql = str(CreateTable(table).compile(dialect=self.conn.dialect))
+        create_sql = create_sql.replace(f"CREATE TABLE {src} (", f"CREATE TABLE {dst} (", 1)
+
+        self._ddl("PRAGMA foreign_keys = OFF")
+        try:
+            self._ddl("BEGIN IMMEDIATE")
+            try:
+                self._ddl(f"DROP TABLE IF EXISTS {dst}")
+                self._ddl(create_sql)
+                last, copied = 0, 0
+                while True:
+                    upper = self.execute(
+                        f"SELECT max(rowid), count(*) FROM (SELECT rowid FROM {src} WHERE rowid > :last "
+                        f"ORDER BY rowid LIMIT :n)",
+                        {"last": last, "n": batch_size},
+                    ).one()
+                    if not upper[1]:
+                        break
+                    self.execute(
+                        f"INSERT INTO {dst} ({columns}) SELECT {columns} FROM {src} "
+                        f"WHERE rowid > :last AND rowid <= :upper ORDER BY rowid",
+                        {"last": last, "upper": upper[0]},
+                    )
+                    last, copied = upper[0], copied + upper[1]
+                    logger.info("rebuild %s: %d rows copied", table.name, copied)
+                self._ddl(f"DROP TABLE {src}")
+                self._ddl(f"ALTER TABLE {dst} RENAME TO {src}")
+                for index in table.indexes:
+                    self._ddl(str(CreateIndex(index).compile(dialect=self.conn.dialect)))
+                problems = self._ddl(f"PRAGMA foreign_key_check({src})").all()
+                if problems:
+                    raise RuntimeError(f"rebuild of {table.name} breaks foreign keys: {problems[:5]}")
+                self._ddl("COMMIT")
+            except BaseException:
+                self._ddl("ROLLBACK")
+                raise
+        finally:
+            self._ddl("PRAGMA foreign_keys = ON")
+
+
+def _validate(migrations: Sequence[Migration]) -> None:
+    versions = [m.version for m in migrations]
+    if versions != sorted(set(versions)) or (versions and versions[0] < 1):
+        raise ValueError(f"migration versions must be unique, positive and increasing: {versions}")
+
+
+def current_version(engine: Engine) -> int:
+    """max(schema_version.version), 0 for a database that has never been migrated."""
+    with engine.connect() as conn:
+        try:
+            return int(conn.execute(select(schema_version.c.version).order_by(schema_version.c.version.desc()).limit(1)).scalar() or 0)
+        except DBAPIError:
+            # No schema_version table yet
+            conn.rollback()
+            return 0
+
+
+def check_schema(engine: Engine, migrations: Sequence[Migration]) -> int:
+    """The worker boot check: one query, raises SchemaOutOfDate if steps are pending."""
+    version = current_version(engine)
+    head = migrations[-1].version if migrations else 0
+    if version < head:
+        raise SchemaOutOfDate(
+            f"database schema is at version {version}, code expects {head}: run `python -m app.migrations upgrade`"
+        )
+    if version > head:
+        # Rolling deploy: the database was migrated by newer code
+        logger.warning("database schema version %d is ahead of code (%d)", version, head)
+    return version
+
+
+@contextmanager
+def _migration_lock(engine: Engine) -> Iterator[None]:
+    if engine.dialect.name != "postgresql":
+        # SQLite: steps take the write lock (BEGIN IMMEDIATE) and re-check their version inside it
+        yield
+        return
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": _PG_LOCK_KEY})
+        try:
+            yield
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _PG_LOCK_KEY})
+
+
+@contextmanager
+def _transaction(conn: Connection) -> Iterator[None]:
+    if conn.dialect.name == "sqlite":
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            conn.exec_driver_sql("ROLLBACK")
+            raise
+        conn.exec_driver_sql("COMMIT")
+    else:
+        with conn.begin():
+            yield
+
+
+def _applied(conn: Connection) -> set[int]:
+    return set(conn.execute(select(schema_version.c.version)).scalars())
+
+
+def _record(conn: Connection, migration: Migration) -> None:
+    conn.execute(
+        schema_version.insert().values(
+            version=migration.version, name=migration.name, applied_at=datetime.now(timezone.utc)
+        )
+    )
+
+
+def upgrade(engine: Engine, migrations: Sequence[Migration], *, target: Optional[int] = None) -> list[int]:
+    """Apply pending migrations up to `target` (default: all). Returns the versions applied."""
+    _validate(migrations)
+    done: list[int] = []
+    with _migration_lock(engine):
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            schema_version.create(conn, checkfirst=True)
+            for migration in migrations:
+                if target is not None and migration.version > target:
+                    break
+                if migration.version in _applied(conn):
+                    continue
+                logger.info("apply %d %s", migration.version, migration.name)
+                if migration.transactional:
+                    if conn.dialect.name == "sqlite":
+                        with _transaction(conn):
+                            if migration.version in _applied(conn):  # another process got there first
+                                continue
+                            migration.upgrade(MigrationContext(conn, transactional=True))
+                            _record(conn, migration)
+                    else:
+                        with engine.connect() as tx_conn, _transaction(tx_conn):
+                            migration.upgrade(MigrationContext(tx_conn, transactional=True))
+                            _record(tx_conn, migration)
+                else:
+                    migration.upgrade(MigrationContext(conn, transactional=False))
+                    _record(conn, migration)
+                done.append(migration.version)
+    return done
+
+
+def status(engine: Engine, migrations: Sequence[Migration]) -> list[tuple[Migration, bool]]:
+    with engine.connect() as conn:
+        applied = _applied(conn) if inspect(conn).has_table(schema_version.name) else set()
+    return [(m, m.version in applied) for m in migrations]
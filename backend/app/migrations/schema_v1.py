@@ -0,0 +1,357 @@
+"""
+Frozen schema of migration 1 (baseline): the tables, columns and indexes the
+models defined when the versioned migrations started. It is deliberately a
+copy, not the models: editing a model must not change what version 1 means.
+Never edit this file; later steps declare their own objects in versions.py.
+"""
+from __future__ import annotations
+
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    Text,
+    UniqueConstraint,
+    func,
+)
+
+metadata = MetaData()
+
+Table(
+    "users",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("telegram_id", Integer),
+    Column("username", String),
+    Column("first_name", String),
+    Column("last_name", String),
+    Column("photo_url", String),
+    Column("referral_code", String),
+    Column("referred_by_telegram_id", Integer),
+    Column("is_blocked", Boolean, nullable=False, default=False),
+    Column("created_at", DateTime(timezone=True)),
+    Index("ix_users_telegram_id", "telegram_id", unique=True),
+    Index("ix_users_referral_code", "referral_code", unique=True),
+    Index("ix_users_created_at", "created_at"),
+)
+
+Table(
+    "admins",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("telegram_id", Integer, nullable=False),
+    Column("role", String, nullable=False),
+    Index("ix_admins_telegram_id", "telegram_id", unique=True),
+)
+
+Table(
+    "admin_panel_users",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("username", String(120), nullable=False),
+    Column("password_hash", String(500), nullable=False),
+    Column("role", String(80), nullable=False, default="developer"),
+    Column("scopes", String(500)),
+    Column("is_active", Boolean, nullable=False, default=True),
+    Column("session_version", Integer, nullable=False, default=0),
+    Column("created_at", DateTime(timezone=True), nullable=False, server_default=func.now()),
+    Column("updated_at", DateTime(timezone=True), nullable=False, server_default=func.now()),
+    Index("ix_admin_panel_users_id", "id"),
+    Index("ix_admin_panel_users_username", "username", unique=True),
+)
+
+Table(
+    "webinars",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("title", String, nullable=False),
+    Column("date", String, nullable=False),
+    Column("time", String, nullable=False),
+    Column("duration", String),
+    Column("speaker", String),
+    Column("status", String, default="upcoming"),
+    Column("description", Text),
+    Column("price_usd", Float, default=0.0),
+    Column("price_eur", Float, default=0.0),
+    Column("meeting_link", String),
+    Column("meeting_platform", String),
+    Column("recording_link", String),
+)
+
+Table(
+    "webinar_materials",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("webinar_id", Integer, ForeignKey("webinars.id"), nullable=False),
+    Column("title", String, nullable=False),
+    Column("description", Text),
+    Column("file_url", String),
+    Column("file_type", String),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+Table(
+    "bookings",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer, ForeignKey("users.id")),
+    Column("webinar_id", Integer, ForeignKey("webinars.id")),
+    Column("type", String),
+    Column("date", String),
+    Column("time", String),
+    Column("status", String, default="pending"),
+    Column("topic", String),
+    Column("message", Text),
+    Column("admin_response", Text),
+    Column("admin_id", Integer, ForeignKey("users.id")),
+    Column("payment_status", String, default="unpaid"),
+    Column("amount", Float),
+    Column("payment_id", String),
+    Column("payment_date", DateTime(timezone=True)),
+    Column("reminder_sent_24h", Integer, default=0),
+    Column("reminder_sent_1h", Integer, default=0),
+    Column("reminder_sent_10m", Integer, default=0),
+    Column("attended", Integer, default=0),
+    Column("created_at", DateTime(timezone=True)),
+    Index("ix_bookings_created_at", "created_at"),
+)
+
+Table(
+    "payments",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("booking_id", Integer, ForeignKey("bookings.id"), nullable=False),
+    Column("user_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("webinar_id", Integer, ForeignKey("webinars.id")),
+    Column("amount", Float, nullable=False),
+    Column("currency", String, default="USD"),
+    Column("payment_method", String),
+    Column("payment_provider", String),
+    Column("transaction_id", String),
+    Column("status", String, default="pending"),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+    Column("completed_at", DateTime(timezone=True)),
+    Column("payment_metadata", Text),
+)
+
+Table(
+    "posts",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("title", String, nullable=False),
+    Column("content", Text, nullable=False),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+    Column("updated_at", DateTime(timezone=True)),
+)
+
+Table(
+    "referral_invites",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("referrer_telegram_id", Integer, nullable=False),
+    Column("referred_telegram_id", Integer),
+    Column("referred_username", String),
+    Column("referred_first_name", String),
+    Column("referred_last_name", String),
+    Column("created_at", DateTime),
+    Index("ix_referral_invites_referrer_telegram_id", "referrer_telegram_id"),
+    Index("ix_referral_invites_referred_telegram_id", "referred_telegram_id"),
+)
+
+Table(
+    "nowpayments_payments",
+    metadata,
+    Column("payment_id", String, primary_key=True),
+    Column("order_id", String),
+    Column("price_amount", Float),
+    Column("price_currency", String),
+    Column("pay_amount", Float),
+    Column("pay_currency", String),
+    Column("status", String),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+    Column("updated_at", DateTime(timezone=True)),
+    Column("expires_at", DateTime(timezone=True)),
+    Column("raw_create_response", Text),
+    Column("raw_last_status_response", Text),
+    Column("raw_last_ipn", Text),
+    Index("ix_nowpayments_payments_order_id", "order_id"),
+    Index("ix_nowpayments_payments_status", "status"),
+)
+
+Table(
+    "nowpayments_ipn_events",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("received_at", DateTime(timezone=True), server_default=func.now()),
+    Column("payment_id", String),
+    Column("payment_status", String),
+    Column("order_id", String),
+    Column("signature_valid", Boolean, nullable=False, default=False),
+    Column("signature_header", String),
+    Column("payload_json", Text),
+    Column("apply_status", String(16)),
+    Column("applied_at", DateTime(timezone=True)),
+    Column("apply_error", Text),
+    Index("ix_nowpayments_ipn_events_payment_id", "payment_id"),
+    Index("ix_nowpayments_ipn_events_payment_status", "payment_status"),
+    Index("ix_nowpayments_ipn_events_order_id", "order_id"),
+    Index("ix_nowpayments_ipn_events_apply_status", "apply_status"),
+)
+
+Table(
+    "product_purchases",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("order_id", String(120), nullable=False),
+    Column("amount_usd", Float, nullable=False),
+    Column("price_currency", String(16), nullable=False, default="usd"),
+    Column("pay_currency", String(32), nullable=False, default="usdttrc20"),
+    Column("status", String(32), nullable=False, default="pending"),
+    Column("nowpayments_payment_id", String(64)),
+    Column("pay_address", String(255)),
+    Column("pay_amount", Float),
+    Column("raw_create_response", Text),
+    Column("raw_last_ipn", Text),
+    Column("created_at", DateTime(timezone=True), nullable=False, server_default=func.now()),
+    Column("updated_at", DateTime(timezone=True), nullable=False, server_default=func.now()),
+    UniqueConstraint("nowpayments_payment_id", name="uq_product_purchases_nowpayments_payment_id"),
+    Index("ix_product_purchases_user_id", "user_id"),
+    Index("ix_product_purchases_order_id", "order_id", unique=True),
+    Index("ix_product_purchases_nowpayments_payment_id", "nowpayments_payment_id"),
+)
+
+Table(
+    "user_entitlements",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("code", String(120), nullable=False),
+    Column("created_at", DateTime(timezone=True), nullable=False, server_default=func.now()),
+    UniqueConstraint("user_id", "code", name="uq_user_entitlements_user_code"),
+    Index("ix_user_entitlements_user_id", "user_id"),
+    Index("ix_user_entitlements_code", "code"),
+)
+
+Table(
+    "user_balances",
+    metadata,
+    Column("user_id", Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+    Column("balance_cents", BigInteger, nullable=False, default=0),
+    Column("updated_at", DateTime(timezone=True), nullable=False, server_default=func.now()),
+    Index("ix_user_balances_balance", "balance_cents", "user_id"),
+)
+
+Table(
+    "balance_requests",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+    Column("tx_ref", Text, nullable=False),
+    Column("status", String(20), nullable=False, default="pending"),
+    Column("admin_comment", Text),
+    Column("created_at", DateTime(timezone=True), nullable=False, server_default=func.now()),
+    Column("reviewed_at", DateTime(timezone=True)),
+    Column("reviewed_by_admin_id", Integer, ForeignKey("admin_panel_users.id", ondelete="SET NULL")),
+    Index("ix_balance_requests_id", "id"),
+    Index("ix_balance_requests_user_id", "user_id"),
+)
+
+Table(
+    "balance_ledger",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+    Column("type", String(50), nullable=False),
+    Column("delta_cents", BigInteger, nullable=False),
+    Column("balance_after_cents", BigInteger, nullable=False),
+    Column("comment", Text),
+    Column("ref_request_id", Integer, ForeignKey("balance_requests.id", ondelete="SET NULL")),
+    Column("admin_id", Integer, ForeignKey("admin_panel_users.id", ondelete="SET NULL")),
+    Column("created_at", DateTime(timezone=True), nullable=False, server_default=func.now()),
+    Column("idempotency_key", String(128)),
+    Index("ix_balance_ledger_id", "id"),
+    Index("ix_balance_ledger_user_id", "user_id"),
+    Index("ix_balance_ledger_user_id_id", "user_id", "id"),
+    Index("ix_balance_ledger_idempotency_key", "idempotency_key", unique=True),
+)
+
+Table(
+    "balance_ledger_snapshots",
+    metadata,
+    Column("user_id", Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+    Column("opening_cents", BigInteger, nullable=False, default=0),
+    Column("ledger_sum_cents", BigInteger, nullable=False, default=0),
+    Column("last_balance_after_cents", BigInteger, nullable=False, default=0),
+    Column("last_ledger_id", Integer, nullable=False, default=0),
+    Column("entries", Integer, nullable=False, default=0),
+    Column("chain_breaks", Integer, nullable=False, default=0),
+    Column("drift_cents", BigInteger, nullable=False, default=0),
+    Column("updated_at", DateTime(timezone=True), nullable=False, server_default=func.now()),
+)
+
+Table(
+    "ledger_checkpoints",
+    metadata,
+    Column("name", String(64), primary_key=True),
+    Column("last_ledger_id", Integer, nullable=False, default=0),
+    Column("updated_at", DateTime(timezone=True), nullable=False, server_default=func.now()),
+)
+
+Table(
+    "broadcast_jobs",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("kind", String(32), nullable=False),
+    Column("ref_id", Integer),
+    Column("text", Text, nullable=False),
+    Column("status", String(20), nullable=False, default="pending"),
+    Column("total", Integer, nullable=False, default=0),
+    Column("sent", Integer, nullable=False, default=0),
+    Column("failed", Integer, nullable=False, default=0),
+    Column("last_user_id", Integer, nullable=False, default=0),
+    Column("locked_by", String(64)),
+    Column("heartbeat_at", DateTime(timezone=True)),
+    Column("error", Text),
+    Column("created_at", DateTime(timezone=True), nullable=False, server_default=func.now()),
+    Column("started_at", DateTime(timezone=True)),
+    Column("finished_at", DateTime(timezone=True)),
+    Index("ix_broadcast_jobs_id", "id"),
+    Index("ix_broadcast_jobs_status", "status"),
+)
+
+Table(
+    "reminder_schedule",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("booking_id", Integer, ForeignKey("bookings.id"), nullable=False),
+    Column("webinar_id", Integer, ForeignKey("webinars.id"), nullable=False),
+    Column("user_id", Integer, ForeignKey("users.id")),
+    Column("kind", String(8), nullable=False),
+    Column("due_at", DateTime(timezone=True), nullable=False),
+    Column("expires_at", DateTime(timezone=True), nullable=False),
+    Column("status", String(16), nullable=False, default="pending"),
+    Column("claimed_by", String(64)),
+    Column("sent_at", DateTime(timezone=True)),
+    Column("created_at", DateTime(timezone=True), nullable=False, server_default=func.now()),
+    UniqueConstraint("booking_id", "kind", name="uq_reminder_schedule_booking_kind"),
+    Index("ix_reminder_schedule_id", "id"),
+    Index("ix_reminder_schedule_webinar_id", "webinar_id"),
+    Index("ix_reminder_schedule_status_due", "status", "due_at"),
+)
+
+Table(
+    "worker_leases",
+    metadata,
+    Column("name", String(64), primary_key=True),
+    Column("holder", String(64)),
+    Column("expires_at", DateTime(timezone=True)),
+)
@@ -0,0 +1,194 @@
+"""
+The ordered list of schema migrations. Append new steps at the end with the
+next version number; never edit or renumber a step that has shipped.
+
+Steps never read the models (Base.metadata): step 1 builds the frozen schema
+in schema_v1.py and every later step declares the tables, columns and indexes
+it adds, on stub tables in a MetaData of its own. So what a version means does
+not change when a model does; tests/test_migrations.py checks that the steps
+together still produce exactly the models' schema.
+"""
+from __future__ import annotations
+
+import logging
+
+from sqlalchemy import Column, DateTime, Float, Index, Integer, MetaData, String, Table, Text, bindparam, text
+
+from app.migrations import schema_v1
+from app.migrations.runner import Migration, MigrationContext
+from app.utils.webinar_time import webinar_start_utc
+
+logger = logging.getLogger("migrations")
+
+
+def _baseline(ctx: MigrationContext) -> None:
+    # Brings any database to the frozen v1 schema: a fresh one gets every
+    # table, one built by the old create_all + migrate_*.py scripts gets the
+    # missing tables, columns and indexes (what db_migrate.py used to do on each run).
+    for table in schema_v1.metadata.sorted_tables:
+        if not ctx.has_table(table.name):
+            ctx.create_table(table)
+            continue
+        for column in table.columns:
+            ctx.add_column(table, column)
+        for index in table.indexes:
+            # UNIQUE indexes can fail on old duplicate rows: keep going, as db_migrate did
+            ctx.create_index(index, best_effort=True)
+
+
+# Step 2: hot-filter index pack. Stub tables carry only the indexed columns:
+# CREATE INDEX needs nothing else, and the stubs are never created.
+_pack = MetaData()
+_bookings = Table(
+    "bookings", _pack, *(Column(name) for name in ("id", "user_id", "webinar_id", "type", "status", "payment_id"))
+)
+_payments = Table("payments", _pack, *(Column(name) for name in ("booking_id", "user_id", "transaction_id")))
+_referral_invites = Table("referral_invites", _pack, Column("referrer_telegram_id"), Column("referred_telegram_id"))
+
+_INDEX_PACK = (
+    Index("ix_bookings_user_id_id", _bookings.c.user_id, _bookings.c.id),
+    Index(
+        "ix_bookings_webinar_id_status",
+        _bookings.c.webinar_id,
+        _bookings.c.status,
+        sqlite_where=text("webinar_id IS NOT NULL"),
+        postgresql_where=text("webinar_id IS NOT NULL"),
+    ),
+    Index("ix_bookings_type_id", _bookings.c.type, _bookings.c.id),
+    Index("ix_bookings_type_status_id", _bookings.c.type, _bookings.c.status, _bookings.c.id),
+    Index(
+        "ix_bookings_payment_id",
+        _bookings.c.payment_id,
+        sqlite_where=text("payment_id IS NOT NULL"),
+        postgresql_where=text("payment_id IS NOT NULL"),
+    ),
+    Index("ix_payments_booking_id", _payments.c.booking_id),
+    Index("ix_payments_user_id", _payments.c.user_id),
+    Index(
+        "ix_payments_transaction_id",
+        _payments.c.transaction_id,
+        sqlite_where=text("transaction_id IS NOT NULL"),
+        postgresql_where=text("transaction_id IS NOT NULL"),
+    ),
+    Index("ix_webinars_status", Table("webinars", _pack, Column("status")).c.status),
+    Index("ix_webinar_materials_webinar_id", Table("webinar_materials", _pack, Column("webinar_id")).c.webinar_id),
+    Index("ix_posts_created_at", Table("posts", _pack, Column("created_at")).c.created_at),
+    Index(
+        "ix_referral_invites_referrer_referred",
+        _referral_invites.c.referrer_telegram_id,
+        _referral_invites.c.referred_telegram_id,
+    ),
+)
+
+
+def _index_pack(ctx: MigrationContext) -> None:
+    # Non-transactional: CREATE INDEX CONCURRENTLY on Postgres, no write lock on the tables
+    for index in _INDEX_PACK:
+        ctx.create_index(index)
+    # Prefix of the new composite index
+    ctx.drop_index("referral_invites", "ix_referral_invites_referrer_telegram_id")
+    for table_name in sorted({index.table.name for index in _INDEX_PACK}):
+        ctx.analyze(table_name)
+
+
+# Step 3: typed webinar start
+_webinars_v3 = Table("webinars", MetaData(), Column("starts_at", DateTime(timezone=True), nullable=True))
+_webinars_starts_at_index = Index("ix_webinars_starts_at", _webinars_v3.c.starts_at)
+
+
+def _webinar_starts_at(ctx: MigrationContext, batch_size: int = 500) -> None:
+    # Typed start timestamp: parse the legacy date/time strings once, here,
+    # instead of on every reminder tick / /reminders/upcoming call
+    webinars = _webinars_v3
+    ctx.add_column(webinars, webinars.c.starts_at)
+    ctx.create_index(_webinars_starts_at_index)
+
+    update = text("UPDATE webinars SET starts_at = :starts_at WHERE id = :id").bindparams(
+        bindparam("starts_at", type_=webinars.c.starts_at.type)
+    )
+    unparsed: list[int] = []
+    last_id = 0
+    while True:
+        rows = ctx.execute(
+            "SELECT id, date, time FROM webinars WHERE starts_at IS NULL AND id > :last_id ORDER BY id LIMIT :limit",
+            {"last_id": last_id, "limit": batch_size},
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        values = []
+        for row in rows:
+            starts_at = webinar_start_utc(row.date, row.time)
+            if starts_at is None:
+                unparsed.append(row.id)
+            else:
+                values.append({"id": row.id, "starts_at": starts_at})
+        if values:
+            ctx.execute(update, values)
+    if unparsed:
+        # Left NULL: such webinars are neither upcoming nor past until an admin fixes date/time
+        logger.warning("webinars with unparsable date/time, starts_at left NULL: ids=%s", unparsed)
+    ctx.analyze("webinars")
+
+
+# Step 4: per-table change counters
+_table_versions_v4 = Table(
+    "table_versions",
+    MetaData(),
+    Column("table_name", String(64), primary_key=True),
+    Column("version", Integer, nullable=False, default=0),
+)
+
+
+def _table_versions(ctx: MigrationContext) -> None:
+    # Per-table change counters behind the feed cache / ETags (app/services/feed_cache.py).
+    # Rows are seeded so that concurrent first writes only ever UPDATE.
+    ctx.create_table(_table_versions_v4)
+    for table_name in ("posts", "webinars"):
+        ctx.execute(
+            "INSERT INTO table_versions (table_name, version) SELECT :name, 1 "
+            "WHERE NOT EXISTS (SELECT 1 FROM table_versions WHERE table_name = :name)",
+            {"name": table_name},
+        )
+
+
+# Step 5: IPN apply retries
+_ipn_events_v5 = Table(
+    "nowpayments_ipn_events",
+    MetaData(),
+    Column("apply_attempts", Integer, nullable=False, default=0, server_default="0"),
+    Column("next_attempt_at", DateTime(timezone=True), nullable=True),
+)
+
+
+def _ipn_apply_retries(ctx: MigrationContext) -> None:
+    # Events the old applier parked as "error" were never looked at again: queue them once more
+    for column in _ipn_events_v5.columns:
+        ctx.add_column(_ipn_events_v5, column)
+    ctx.execute("UPDATE nowpayments_ipn_events SET apply_status = 'queued', apply_attempts = 0 WHERE apply_status = 'error'")
+
+
+_market_snapshots_v6 = Table(
+    "market_snapshots",
+    MetaData(),
+    Column("name", String(32), primary_key=True),
+    Column("version", Integer, nullable=False),
+    Column("etag", String(64), nullable=False),
+    Column("body", Text, nullable=False),
+    Column("updated_at", Float, nullable=False),
+)
+
+
+def _market_snapshots(ctx: MigrationContext) -> None:
+    # One poller per deployment (worker lease); the other API workers read its snapshot from here
+    ctx.create_table(_market_snapshots_v6)
+
+
+MIGRATIONS: list[Migration] = [
+    Migration(1, "baseline", _baseline),
+    Migration(2, "hot filter index pack", _index_pack, transactional=False),
+    Migration(3, "webinar starts_at", _webinar_starts_at),
+    Migration(4, "table versions for feed caches", _table_versions),
+    Migration(5, "ipn apply retries", _ipn_apply_retries),
+    Migration(6, "shared market snapshot", _market_snapshots),
+]
@@ -14,6 +14,13 @@ from app.models.product_purchase import ProductPurchase
 from app.models.user_balance import UserBalance
 from app.models.balance_request import BalanceRequest
 from app.models.balance_ledger import BalanceLedger
+from app.models.broadcast_job import BroadcastJob
+from app.models.reminder_schedule import ReminderSchedule
+from app.models.worker_lease import WorkerLease
+from app.models.ledger_snapshot import LedgerSnapshot
+from app.models.ledger_checkpoint import LedgerCheckpoint
+from app.models.table_version import TableVersion
+from app.models.market_snapshot import MarketSnapshotRow
 
 __all__ = [
     "User",
@@ -32,5 +39,12 @@ __all__ = [
     "UserBalance",
     "BalanceRequest",
     "BalanceLedger",
+    "BroadcastJob",
+    "ReminderSchedule",
+    "WorkerLease",
+    "LedgerSnapshot",
+    "LedgerCheckpoint",
+    "TableVersion",
+    "MarketSnapshotRow",
 ]
 
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Integer, String, Text, func
+from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Index, Integer, String, Text, func
 
 from app.database import Base
 
@@ -18,3 +18,10 @@ class BalanceLedger(Base):
     ref_request_id = Column(Integer, ForeignKey("balance_requests.id", ondelete="SET NULL"), nullable=True)
     admin_id = Column(Integer, ForeignKey("admin_panel_users.id", ondelete="SET NULL"), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    # Set for operations that must apply once (request approvals, admin form submits)
+    idempotency_key = Column(String(128), nullable=True, unique=True, index=True)
+
+    __table_args__ = (
+        # Keyset pages of one user's history: WHERE user_id = ? AND id < ? ORDER BY id DESC
+        Index("ix_balance_ledger_user_id_id", "user_id", "id"),
+    )
@@ -1,4 +1,6 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Text, Float, DateTime
+from datetime import datetime, timezone
+
+from sqlalchemy import Column, Integer, String, ForeignKey, Text, Float, DateTime, Index, text
 from sqlalchemy.sql import func
 from app.database import Base
 
@@ -23,4 +25,28 @@ class Booking(Base):
     reminder_sent_24h = Column(Integer, default=0)  # Отправлено напоминание за 24ч
     reminder_sent_1h = Column(Integer, default=0)  # Отправлено напоминание за 1ч
     reminder_sent_10m = Column(Integer, default=0)  # Отправлено напоминание за 10м
-    attended = Column(Integer, default=0)  # Посетил ли вебинар (0 - нет, 1 - да)
\ No newline at end of file
+    attended = Column(Integer, default=0)  # Посетил ли вебинар (0 - нет, 1 - да)
+    created_at = Column(DateTime(timezone=True), nullable=True, index=True, default=lambda: datetime.now(timezone.utc))  # Когда создана (NULL у старых записей)
+
+    __table_args__ = (
+        # Записи пользователя и тикеты по пользователю: WHERE user_id = ? ORDER BY id
+        Index("ix_bookings_user_id_id", "user_id", "id"),
+        # Записи вебинара (напоминания, счётчики, удаление вебинара); у консультаций webinar_id пустой
+        Index(
+            "ix_bookings_webinar_id_status",
+            "webinar_id",
+            "status",
+            sqlite_where=text("webinar_id IS NOT NULL"),
+            postgresql_where=text("webinar_id IS NOT NULL"),
+        ),
+        # Списки тикетов: WHERE type = ? [AND status = ?] ORDER BY id, страницы по курсору id
+        Index("ix_bookings_type_id", "type", "id"),
+        Index("ix_bookings_type_status_id", "type", "status", "id"),
+        # Поиск записи по платежу из IPN
+        Index(
+            "ix_bookings_payment_id",
+            "payment_id",
+            sqlite_where=text("payment_id IS NOT NULL"),
+            postgresql_where=text("payment_id IS NOT NULL"),
+        ),
+    )
\ No newline at end of file
@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+from sqlalchemy import Column, DateTime, Integer, String, Text, func
+
+from app.database import Base
+
+
+# Statuses: pending -> running -> done | failed
+class BroadcastJob(Base):
+    __tablename__ = "broadcast_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    # What triggered the broadcast: "post" / "webinar"
+    kind = Column(String(32), nullable=False)
+    ref_id = Column(Integer, nullable=True)
+
+    text = Column(Text, nullable=False)
+    status = Column(String(20), nullable=False, default="pending", index=True)
+
+    # Progress counters (total is a snapshot of recipients at enqueue time)
+    total = Column(Integer, nullable=False, default=0)
+    sent = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+
+    # Keyset cursor over users.id: the job resumes from here after a restart
+    last_user_id = Column(Integer, nullable=False, default=0)
+
+    # Worker lease (a stale heartbeat lets another worker pick the job up)
+    locked_by = Column(String(64), nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
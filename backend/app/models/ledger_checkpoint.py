@@ -0,0 +1,14 @@
+from __future__ import annotations
+
+from sqlalchemy import Column, DateTime, Integer, String, func
+
+from app.database import Base
+
+
+# Named position in an append-only stream (last processed id), e.g. the ledger reconciliation job
+class LedgerCheckpoint(Base):
+    __tablename__ = "ledger_checkpoints"
+
+    name = Column(String(64), primary_key=True)
+    last_ledger_id = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Integer, func
+
+from app.database import Base
+
+
+# Per-user running totals of balance_ledger, maintained incrementally by the reconciliation job
+class LedgerSnapshot(Base):
+    __tablename__ = "balance_ledger_snapshots"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    # Balance before the user's first ledger entry (balances that predate the ledger)
+    opening_cents = Column(BigInteger, nullable=False, default=0)
+    # opening + sum(delta_cents) up to last_ledger_id: what user_balances must hold
+    ledger_sum_cents = Column(BigInteger, nullable=False, default=0)
+    last_balance_after_cents = Column(BigInteger, nullable=False, default=0)
+    last_ledger_id = Column(Integer, nullable=False, default=0)
+    entries = Column(Integer, nullable=False, default=0)
+    # Entries whose balance_after_cents != previous balance_after + delta
+    chain_breaks = Column(Integer, nullable=False, default=0)
+    # user_balances - ledger_sum at the last check (0 = consistent)
+    drift_cents = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
@@ -0,0 +1,18 @@
+from __future__ import annotations
+
+from sqlalchemy import Column, Float, Integer, String, Text
+
+from app.database import Base
+
+
+# The market poller's latest snapshot, shared between API workers: the lease holder
+# writes it after every change, the other workers serve it as is (same body and ETag)
+class MarketSnapshotRow(Base):
+    __tablename__ = "market_snapshots"
+
+    name = Column(String(32), primary_key=True)
+    version = Column(Integer, nullable=False)
+    etag = Column(String(64), nullable=False)
+    body = Column(Text, nullable=False)
+    # Unix time of the poll that produced it (MarketSnapshot.updated_at)
+    updated_at = Column(Float, nullable=False)
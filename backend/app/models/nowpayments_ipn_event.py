@@ -19,3 +19,13 @@ class NowPaymentsIpnEvent(Base):
 
     payload_json = Column(Text, nullable=True)
 
+    # Applier pipeline: the webhook stores "queued", the applier sets the outcome
+    # (applied / duplicate / ignored / dead). NULL = stored before the pipeline existed.
+    apply_status = Column(String(16), nullable=True, index=True)
+    applied_at = Column(DateTime(timezone=True), nullable=True)
+    apply_error = Column(Text, nullable=True)
+    # A failed apply stays "queued" until next_attempt_at (exponential backoff);
+    # after NOWPAYMENTS_IPN_MAX_ATTEMPTS it is "dead" until replayed (replay_ipn_events.py)
+    apply_attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    next_attempt_at = Column(DateTime(timezone=True), nullable=True)
+
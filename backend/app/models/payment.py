@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Index, text
 from sqlalchemy.sql import func
 from app.database import Base
 
@@ -18,3 +18,15 @@ class Payment(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     completed_at = Column(DateTime(timezone=True), nullable=True)
     payment_metadata = Column(Text, nullable=True)  # Дополнительные данные в JSON формате (metadata зарезервировано в SQLAlchemy)
+
+    __table_args__ = (
+        Index("ix_payments_booking_id", "booking_id"),
+        Index("ix_payments_user_id", "user_id"),
+        # IPN ищет платёж по transaction_id; NULL у платежей без провайдера
+        Index(
+            "ix_payments_transaction_id",
+            "transaction_id",
+            sqlite_where=text("transaction_id IS NOT NULL"),
+            postgresql_where=text("transaction_id IS NOT NULL"),
+        ),
+    )
@@ -1,6 +1,7 @@
 from sqlalchemy import Column, Integer, String, Text, DateTime
 from sqlalchemy.sql import func
 from app.database import Base
+from app.models.table_version import track_table_version
 
 class Post(Base):
     __tablename__ = "posts"
@@ -8,5 +9,8 @@ class Post(Base):
     id = Column(Integer, primary_key=True)
     title = Column(String, nullable=False)
     content = Column(Text, nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)  # Лента: ORDER BY created_at DESC
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+
+track_table_version(Post)
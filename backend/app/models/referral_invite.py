@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String, DateTime, Index
 from app.database import Base
 
 
@@ -7,9 +7,14 @@ class ReferralInvite(Base):
     __tablename__ = "referral_invites"
 
     id = Column(Integer, primary_key=True)
-    referrer_telegram_id = Column(Integer, index=True, nullable=False)
+    referrer_telegram_id = Column(Integer, nullable=False)
     referred_telegram_id = Column(Integer, index=True, nullable=True)
     referred_username = Column(String, nullable=True)
     referred_first_name = Column(String, nullable=True)
     referred_last_name = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # Проверка дубля (referrer, referred) и список приглашённых по referrer (префикс индекса)
+        Index("ix_referral_invites_referrer_referred", "referrer_telegram_id", "referred_telegram_id"),
+    )
@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, UniqueConstraint, func
+
+from app.database import Base
+
+
+# One row per (booking, reminder kind). Statuses: pending -> sending -> sent | skipped | failed | expired
+class ReminderSchedule(Base):
+    __tablename__ = "reminder_schedule"
+    __table_args__ = (
+        UniqueConstraint("booking_id", "kind", name="uq_reminder_schedule_booking_kind"),
+        # The tick is a single range scan over this index
+        Index("ix_reminder_schedule_status_due", "status", "due_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    booking_id = Column(Integer, ForeignKey("bookings.id"), nullable=False)
+    webinar_id = Column(Integer, ForeignKey("webinars.id"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+
+    # "12h" / "2h" / "15m"
+    kind = Column(String(8), nullable=False)
+
+    # Send window in UTC: not before due_at, not after expires_at
+    due_at = Column(DateTime(timezone=True), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+    status = Column(String(16), nullable=False, default="pending")
+    # Tick token that claimed the row (several backends may tick at once)
+    claimed_by = Column(String(64), nullable=True)
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+from sqlalchemy import Column, Integer, String, event, text
+
+from app.database import Base
+
+
+# Change counter per table: bumped in the same transaction as every ORM insert/update/delete
+# of a tracked model; feed caches and ETags are keyed on it (see app/services/feed_cache.py)
+class TableVersion(Base):
+    __tablename__ = "table_versions"
+
+    table_name = Column(String(64), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+def bump_table_version(connection, table_name: str) -> None:
+    result = connection.execute(
+        text("UPDATE table_versions SET version = version + 1 WHERE table_name = :name"), {"name": table_name}
+    )
+    if not result.rowcount:
+        connection.execute(text("INSERT INTO table_versions (table_name, version) VALUES (:name, 1)"), {"name": table_name})
+
+
+def track_table_version(model) -> None:
+    """Bump table_versions[model table] on every flushed insert/update/delete of `model`."""
+    table_name = model.__table__.name
+
+    def _bump(mapper, connection, target) -> None:
+        bump_table_version(connection, table_name)
+
+    for name in ("after_insert", "after_update", "after_delete"):
+        event.listen(model, name, _bump)
@@ -1,4 +1,6 @@
-from sqlalchemy import Column, Integer, String, Boolean
+from datetime import datetime, timezone
+
+from sqlalchemy import Column, Integer, String, Boolean, DateTime
 from app.database import Base
 
 class User(Base):
@@ -12,4 +14,6 @@ class User(Base):
     photo_url = Column(String, nullable=True)
     referral_code = Column(String, unique=True, index=True, nullable=True)
     referred_by_telegram_id = Column(Integer, nullable=True)
-    is_blocked = Column(Boolean, default=False, nullable=False)
\ No newline at end of file
+    is_blocked = Column(Boolean, default=False, nullable=False)
+    # Python-side default: the column is added to existing databases by the baseline migration (old rows stay NULL)
+    created_at = Column(DateTime(timezone=True), nullable=True, index=True, default=lambda: datetime.now(timezone.utc))
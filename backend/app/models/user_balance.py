@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Integer, func
+from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Index, Integer, func
 
 from app.database import Base
 
@@ -11,3 +11,8 @@ class UserBalance(Base):
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
     balance_cents = Column(BigInteger, nullable=False, default=0)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+    __table_args__ = (
+        # Balance range filters / sorting in the admin users list
+        Index("ix_user_balances_balance", "balance_cents", "user_id"),
+    )
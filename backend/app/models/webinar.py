@@ -1,5 +1,11 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Float
+import logging
+
+from sqlalchemy import Column, Integer, String, Text, DateTime, Float, event
 from app.database import Base
+from app.models.table_version import track_table_version
+from app.utils.webinar_time import webinar_start_utc
+
+logger = logging.getLogger("webinars")
 
 class Webinar(Base):
     __tablename__ = "webinars"
@@ -10,11 +16,23 @@ class Webinar(Base):
     time = Column(String, nullable=False)  # Время в формате HH:MM
     duration = Column(String)  # Продолжительность, например "2 часа"
     speaker = Column(String)  # Имя спикера
-    status = Column(String, default="upcoming")  # upcoming, completed, cancelled
+    status = Column(String, default="upcoming", index=True)  # upcoming, completed, cancelled
     description = Column(Text)  # Описание вебинара
     price_usd = Column(Float, default=0.0)  # Цена вебинара в долларах
     price_eur = Column(Float, default=0.0)  # Цена вебинара в евро
     meeting_link = Column(String, nullable=True)  # Ссылка на видеовстречу
     meeting_platform = Column(String, nullable=True)  # Платформа (Zoom, Google Meet, Jitsi, YouTube, etc.)
     recording_link = Column(String, nullable=True)  # Ссылка на запись вебинара
+    # Начало в UTC из date + time (пересчитывается при каждом сохранении); NULL, если формат не распознан
+    starts_at = Column(DateTime(timezone=True), nullable=True, index=True)
+
+
+@event.listens_for(Webinar, "before_insert")
+@event.listens_for(Webinar, "before_update")
+def _sync_starts_at(mapper, connection, target: Webinar) -> None:
+    target.starts_at = webinar_start_utc(target.date, target.time)
+    if target.starts_at is None:
+        logger.warning("webinar date/time not parsed id=%s date=%r time=%r", target.id, target.date, target.time)
+
 
+track_table_version(Webinar)
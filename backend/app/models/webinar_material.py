@@ -6,7 +6,7 @@ class WebinarMaterial(Base):
     __tablename__ = "webinar_materials"
 
     id = Column(Integer, primary_key=True)
-    webinar_id = Column(Integer, ForeignKey("webinars.id"), nullable=False)
+    webinar_id = Column(Integer, ForeignKey("webinars.id"), nullable=False, index=True)
     title = Column(String, nullable=False)
     description = Column(Text, nullable=True)
     file_url = Column(String, nullable=True)  # Ссылка на файл
@@ -0,0 +1,14 @@
+from __future__ import annotations
+
+from sqlalchemy import Column, DateTime, String
+
+from app.database import Base
+
+
+# Named lease for single-consumer background jobs (one holder across processes)
+class WorkerLease(Base):
+    __tablename__ = "worker_leases"
+
+    name = Column(String(64), primary_key=True)
+    holder = Column(String(64), nullable=True)
+    expires_at = Column(DateTime(timezone=True), nullable=True)
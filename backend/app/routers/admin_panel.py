@@ -3,35 +3,50 @@ import secrets
 import hmac
 import hashlib
 import time
-import base64
 
 from fastapi import APIRouter, Depends, Form, HTTPException, Request
 from fastapi.responses import RedirectResponse
 from starlette.templating import Jinja2Templates
 from urllib.parse import urlencode
 
-from app.database import SessionLocal
+from app.database import get_db
 from app.database import Base
 from app.models.post import Post
 from app.models.webinar import Webinar
 from app.models.booking import Booking
 from app.models.admin import Admin
 from app.models.user import User
-from app.models.payment import Payment
-from app.models.referral_invite import ReferralInvite
 from app.models.admin_panel_user import AdminPanelUser
 from app.models.balance_request import BalanceRequest
 from app.models.balance_ledger import BalanceLedger
+from app.models.broadcast_job import BroadcastJob
+from app.models.ledger_snapshot import LedgerSnapshot
 from app.models.user_balance import UserBalance
 from app.services.balance_service import (
+    REVIEW_ACTIONS,
+    USER_BALANCE_SORTS,
+    ReviewItem,
     _format_money,
     admin_adjust_balance,
     approve_deposit_request,
     get_balance_cents,
     get_or_create_balance,
+    list_ledger_entries,
+    list_users_with_balance,
     parse_money,
     reject_deposit_request,
+    review_deposit_requests,
 )
+from app.services.admin_sessions import AdminPrincipal, ScopeSet, principal_cache
+from app.services.admin_stats import get_dashboard_stats, invalidate_dashboard_stats
+from app.services.cascade_delete import delete_webinar_tree
+from app.services.feed_cache import feed_cache
+from app.services.broadcast_service import broadcast_progress
+from app.services.password_hashing import HashingBusy, hash_password, needs_rehash, verify_password
+from app.services.reminder_service import schedule_webinar_reminders
+from app.services.ticket_queries import TICKET_TYPES, list_tickets
+from app.utils.metrics import register_stats
+from app.utils.rate_limit import TokenBucketLimiter
 
 # Reuse DB-clear helpers (works for sqlite + postgres)
 from app.routers.admins import _clear_all_tables, _clear_selected_tables  # noqa: F401
@@ -42,14 +57,6 @@ TEMPLATES_DIR = os.path.join(os.path.dirname(__file__), "..", "admin_templates")
 templates = Jinja2Templates(directory=TEMPLATES_DIR)
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 def _admin_secret() -> str:
     secret = (os.getenv("ADMIN_PANEL_SECRET") or "").strip()
     if not secret:
@@ -67,32 +74,39 @@ def _session_ttl_seconds() -> int:
 def _sign(secret: str, payload: str) -> str:
     return hmac.new(secret.encode("utf-8"), payload.encode("utf-8"), hashlib.sha256).hexdigest()
 
-def _pbkdf2_hash_password(password: str) -> str:
-    # Format: pbkdf2_sha256$iterations$salt_b64$hash_b64
-    iterations = int(os.getenv("ADMIN_PANEL_PBKDF2_ITERS") or "200000")
-    salt = secrets.token_bytes(16)
-    dk = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations, dklen=32)
-    return "pbkdf2_sha256$%d$%s$%s" % (
-        iterations,
-        base64.urlsafe_b64encode(salt).decode("ascii").rstrip("="),
-        base64.urlsafe_b64encode(dk).decode("ascii").rstrip("="),
+def _login_limiters() -> tuple[TokenBucketLimiter, TokenBucketLimiter]:
+    def per_minute(name: str, default: float) -> float:
+        try:
+            return float(os.getenv(name) or default)
+        except ValueError:
+            return default
+
+    by_ip = TokenBucketLimiter(
+        rate=per_minute("ADMIN_PANEL_LOGIN_IP_PER_MINUTE", 10) / 60,
+        burst=per_minute("ADMIN_PANEL_LOGIN_IP_BURST", 10),
+    )
+    by_username = TokenBucketLimiter(
+        rate=per_minute("ADMIN_PANEL_LOGIN_USER_PER_MINUTE", 5) / 60,
+        burst=per_minute("ADMIN_PANEL_LOGIN_USER_BURST", 5),
     )
+    return by_ip, by_username
 
 
-def _pbkdf2_verify(password: str, encoded: str) -> bool:
-    try:
-        algo, iters_s, salt_b64, hash_b64 = encoded.split("$", 3)
-        if algo != "pbkdf2_sha256":
-            return False
-        iterations = int(iters_s)
-        pad = "=" * (-len(salt_b64) % 4)
-        salt = base64.urlsafe_b64decode((salt_b64 + pad).encode("ascii"))
-        pad2 = "=" * (-len(hash_b64) % 4)
-        expected = base64.urlsafe_b64decode((hash_b64 + pad2).encode("ascii"))
-        dk = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations, dklen=len(expected))
-        return secrets.compare_digest(dk, expected)
-    except Exception:
-        return False
+# Попытки входа: token bucket на IP и на username (подбор пароля с многих IP упирается во второй)
+login_by_ip, login_by_username = _login_limiters()
+register_stats("admin_login_ip", login_by_ip.snapshot_stats)
+register_stats("admin_login_username", login_by_username.snapshot_stats)
+
+
+def _client_ip(request: Request) -> str:
+    # За Caddy: reverse_proxy дописывает реальный адрес клиента последним в X-Forwarded-For.
+    # Без прокси заголовок задаёт сам клиент, поэтому доверяем ему только по явному флагу
+    if os.getenv("ADMIN_PANEL_TRUST_FORWARDED", "0") == "1":
+        forwarded = request.headers.get("x-forwarded-for") or ""
+        last = forwarded.split(",")[-1].strip()
+        if last:
+            return last
+    return request.client.host if request.client else "unknown"
 
 
 def _normalize_scopes(raw: str | None) -> str | None:
@@ -111,50 +125,14 @@ def _normalize_scopes(raw: str | None) -> str | None:
     return ",".join(dict.fromkeys(parts))  # stable unique
 
 
-def _role_default_scopes(role: str) -> set[str]:
-    r = (role or "").strip().lower()
-    if r in ("developer", "разработчик", "owner", "владелец"):
-        return {"*"}
-    if r in ("admin", "админ", "администратор"):
-        return {
-            "posts:view", "posts:write", "posts:delete",
-            "webinars:view", "webinars:write", "webinars:delete",
-            "tickets:view", "tickets:respond",
-            "data:view", "data:delete",
-            "admins:manage",
-            "balance:view", "balance:manage",
-        }
-    if r in ("support", "поддержка"):
-        return {"tickets:view", "tickets:respond"}
-    if r in ("editor", "редактор"):
-        return {"posts:view", "posts:write", "webinars:view", "webinars:write"}
-    # Unknown roles: no access by default (explicit scopes recommended)
-    return set()
-
-
-def _user_scopes(u: AdminPanelUser) -> set[str]:
-    if u.scopes:
-        return {p.strip().lower() for p in u.scopes.split(",") if p.strip()}
-    return _role_default_scopes(u.role)
-
-
-def _has_scope(u: AdminPanelUser, scope: str) -> bool:
-    scopes = _user_scopes(u)
-    if "*" in scopes:
-        return True
-    s = scope.strip().lower()
-    if s in scopes:
-        return True
-    # Backward-compatible aliases (old coarse scopes)
-    coarse = s.split(":", 1)[0]
-    if coarse in scopes:
-        return True
-    # Wildcards like "posts:*"
-    if ":" in s:
-        prefix = s.split(":", 1)[0]
-        if f"{prefix}:*" in scopes:
-            return True
-    return False
+def _user_scopes(u: AdminPanelUser) -> frozenset[str]:
+    return ScopeSet.compile(u.scopes, u.role).scopes
+
+
+def _has_scope(u: AdminPrincipal | AdminPanelUser, scope: str) -> bool:
+    # У principal права уже скомпилированы (один раз на запись в кэше сессий)
+    scope_set = u.scope_set if isinstance(u, AdminPrincipal) else ScopeSet.compile(u.scopes, u.role)
+    return scope_set.allows(scope)
 
 
 ADMIN_PERMS: list[tuple[str, str, str, str]] = [
@@ -215,7 +193,7 @@ def _ensure_bootstrap_user(db) -> None:
     _admin_secret()  # ensure configured
     user = AdminPanelUser(
         username=u,
-        password_hash=_pbkdf2_hash_password(p),
+        password_hash=hash_password(p),
         role=role,
         scopes="*",
         is_active=True,
@@ -276,8 +254,8 @@ def _login_location(*, next_url: str | None = None, flash: str | None = None, ki
     return "/admin/login?" + urlencode(q, encoding="utf-8", errors="strict")
 
 
-def require_admin_session(request: Request, db=Depends(get_db)) -> AdminPanelUser:
-    _ensure_bootstrap_user(db)
+def require_admin_session(request: Request, db=Depends(get_db)) -> AdminPrincipal:
+    # Bootstrap-пользователь создаётся на /admin/login: без пользователей валидной сессии быть не может
     token_data = _verify_session_token(request.cookies.get("admin_session") or "")
     if not token_data:
         # redirect to login with next
@@ -286,16 +264,21 @@ def require_admin_session(request: Request, db=Depends(get_db)) -> AdminPanelUse
             next_url = f"{next_url}?{request.url.query}"
         raise HTTPException(status_code=303, headers={"Location": _login_location(next_url=next_url)})
     user_id, ver = token_data
+    principal = principal_cache.get(user_id, ver)
+    if principal is not None:
+        return principal
     u = db.query(AdminPanelUser).filter(AdminPanelUser.id == user_id).first()
     if not u or not u.is_active:
         raise HTTPException(status_code=303, headers={"Location": _login_location(flash="Сессия недействительна", kind="bad")})
     if int(u.session_version or 0) != int(ver):
         raise HTTPException(status_code=303, headers={"Location": _login_location(flash="Сессия устарела", kind="bad")})
-    return u
+    principal = AdminPrincipal.from_user(u)
+    principal_cache.put(principal)
+    return principal
 
 
 def require_scope(scope: str):
-    def _dep(user: AdminPanelUser = Depends(require_admin_session)) -> AdminPanelUser:
+    def _dep(user: AdminPrincipal = Depends(require_admin_session)) -> AdminPrincipal:
         if not _has_scope(user, scope):
             # Friendly forbidden page (keep navbar)
             raise HTTPException(status_code=303, headers={"Location": f"/admin/forbidden?need={scope}"})
@@ -306,7 +289,7 @@ def require_scope(scope: str):
 @router.get("/forbidden")
 def admin_forbidden(
     request: Request,
-    user: AdminPanelUser = Depends(require_admin_session),
+    user: AdminPrincipal = Depends(require_admin_session),
 ):
     need = request.query_params.get("need") or ""
     return _render(
@@ -362,7 +345,7 @@ def _redir(url: str, *, flash: str | None = None, kind: str = "ok", details: str
 
 
 @router.get("/")
-def admin_root(_: AdminPanelUser = Depends(require_admin_session)):
+def admin_root(_: AdminPrincipal = Depends(require_admin_session)):
     return _redir("/admin/posts")
 
 @router.get("/login")
@@ -388,6 +371,7 @@ def admin_login_get(request: Request, db=Depends(get_db)):
 
 @router.post("/login")
 def admin_login_post(
+    request: Request,
     username: str = Form(...),
     password: str = Form(...),
     next_url: str = Form("/admin/posts"),
@@ -395,11 +379,21 @@ def admin_login_post(
 ):
     _ensure_bootstrap_user(db)
     _admin_secret()
-    u = db.query(AdminPanelUser).filter(AdminPanelUser.username == username.strip()).first()
+    username = username.strip()
+    if not login_by_ip.allow(_client_ip(request)) or not login_by_username.allow(username.lower()):
+        return _redir("/admin/login", flash="Слишком много попыток входа, попробуйте через минуту", kind="bad")
+    u = db.query(AdminPanelUser).filter(AdminPanelUser.username == username).first()
     if not u or not u.is_active:
         return _redir("/admin/login", flash="Неверный логин или пароль", kind="bad")
-    if not _pbkdf2_verify(password, u.password_hash):
-        return _redir("/admin/login", flash="Неверный логин или пароль", kind="bad")
+    try:
+        if not verify_password(password, u.password_hash):
+            return _redir("/admin/login", flash="Неверный логин или пароль", kind="bad")
+        if needs_rehash(u.password_hash):
+            # Прозрачно поднимаем число итераций до текущего ADMIN_PANEL_PBKDF2_ITERS (сессии не сбрасываются)
+            u.password_hash = hash_password(password)
+            db.commit()
+    except HashingBusy:
+        return _redir("/admin/login", flash="Сервер занят, попробуйте ещё раз через несколько секунд", kind="bad")
 
     token = _make_session_token(u.id, int(u.session_version or 0))
     resp = _redir(next_url or "/admin/posts", flash="Вход выполнен", kind="ok")
@@ -415,7 +409,7 @@ def admin_logout():
 
 
 @router.get("/posts")
-def admin_posts(request: Request, user: AdminPanelUser = Depends(require_scope("posts:view")), db=Depends(get_db)):
+def admin_posts(request: Request, user: AdminPrincipal = Depends(require_scope("posts:view")), db=Depends(get_db)):
     posts = db.query(Post).order_by(Post.created_at.desc()).limit(200).all()
     return _render(
         request,
@@ -430,7 +424,7 @@ def admin_posts(request: Request, user: AdminPanelUser = Depends(require_scope("
 
 @router.post("/posts/create")
 def admin_posts_create(
-    _: AdminPanelUser = Depends(require_scope("posts:write")),
+    _: AdminPrincipal = Depends(require_scope("posts:write")),
     db=Depends(get_db),
     title: str = Form(...),
     content: str = Form(...),
@@ -438,21 +432,23 @@ def admin_posts_create(
     p = Post(title=title.strip(), content=content.strip())
     db.add(p)
     db.commit()
+    feed_cache.invalidate("posts")
     return _redir("/admin/posts", flash="Пост создан", kind="ok")
 
 
 @router.post("/posts/{post_id}/delete")
-def admin_posts_delete(post_id: int, _: AdminPanelUser = Depends(require_scope("posts:delete")), db=Depends(get_db)):
+def admin_posts_delete(post_id: int, _: AdminPrincipal = Depends(require_scope("posts:delete")), db=Depends(get_db)):
     p = db.query(Post).filter(Post.id == post_id).first()
     if not p:
         return _redir("/admin/posts", flash="Пост не найден", kind="bad")
     db.delete(p)
     db.commit()
+    feed_cache.invalidate("posts")
     return _redir("/admin/posts", flash=f"Пост {post_id} удалён", kind="ok")
 
 
 @router.get("/webinars")
-def admin_webinars(request: Request, user: AdminPanelUser = Depends(require_scope("webinars:view")), db=Depends(get_db)):
+def admin_webinars(request: Request, user: AdminPrincipal = Depends(require_scope("webinars:view")), db=Depends(get_db)):
     webinars = db.query(Webinar).order_by(Webinar.id.desc()).limit(200).all()
     return _render(
         request,
@@ -467,7 +463,7 @@ def admin_webinars(request: Request, user: AdminPanelUser = Depends(require_scop
 
 @router.post("/webinars/create")
 def admin_webinars_create(
-    _: AdminPanelUser = Depends(require_scope("webinars:write")),
+    _: AdminPrincipal = Depends(require_scope("webinars:write")),
     db=Depends(get_db),
     title: str = Form(...),
     date_: str = Form(..., alias="date"),
@@ -496,60 +492,81 @@ def admin_webinars_create(
     )
     db.add(w)
     db.commit()
+    feed_cache.invalidate("webinars")
+    schedule_webinar_reminders(db, w)
     return _redir("/admin/webinars", flash="Вебинар создан", kind="ok")
 
 
 @router.post("/webinars/{webinar_id}/delete")
-def admin_webinars_delete(webinar_id: int, _: AdminPanelUser = Depends(require_scope("webinars:delete")), db=Depends(get_db)):
+def admin_webinars_delete(webinar_id: int, _: AdminPrincipal = Depends(require_scope("webinars:delete")), db=Depends(get_db)):
     w = db.query(Webinar).filter(Webinar.id == webinar_id).first()
     if not w:
         return _redir("/admin/webinars", flash="Вебинар не найден", kind="bad")
-    db.delete(w)
+    delete_webinar_tree(db, w)
     db.commit()
+    feed_cache.invalidate("webinars")
     return _redir("/admin/webinars", flash=f"Вебинар {webinar_id} удалён", kind="ok")
 
 
-@router.get("/tickets")
-def admin_tickets(request: Request, user: AdminPanelUser = Depends(require_scope("tickets:view")), db=Depends(get_db)):
-    support = (
-        db.query(Booking)
-        .filter(Booking.type == "support")
-        .order_by(Booking.id.desc())
-        .limit(200)
-        .all()
-    )
-    consultations = (
-        db.query(Booking)
-        .filter(Booking.type == "consultation")
-        .order_by(Booking.id.desc())
-        .limit(200)
-        .all()
+@router.get("/broadcasts")
+def admin_broadcasts(request: Request, user: AdminPrincipal = Depends(require_scope("posts:view")), db=Depends(get_db)):
+    jobs = db.query(BroadcastJob).order_by(BroadcastJob.id.desc()).limit(50).all()
+    return _render(
+        request,
+        "broadcasts.html",
+        section="broadcasts",
+        title="Admin · Рассылки",
+        jobs=[broadcast_progress(j) for j in jobs],
+        admin_user=f"{user.username} · {user.role}",
+        can_manage_users=_has_scope(user, "users"),
     )
 
-    # enrich minimal fields (same as API does)
-    def to_admin_dict(b: Booking):
-        u = db.query(User).filter(User.id == b.user_id).first()
-        return {
-            "id": b.id,
-            "type": b.type,
-            "status": b.status,
-            "topic": b.topic,
-            "message": b.message,
-            "admin_response": b.admin_response,
-            "user_telegram_id": getattr(u, "telegram_id", None) if u else None,
-            "user_first_name": getattr(u, "first_name", None) if u else None,
-            "user_username": getattr(u, "username", None) if u else None,
-        }
 
-    support_ctx = [to_admin_dict(x) for x in support]
-    consult_ctx = [to_admin_dict(x) for x in consultations]
+@router.get("/broadcasts/{job_id}/progress")
+def admin_broadcast_progress(job_id: int, _: AdminPrincipal = Depends(require_scope("posts:view")), db=Depends(get_db)):
+    job = db.query(BroadcastJob).filter(BroadcastJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Broadcast not found")
+    return broadcast_progress(job)
+
+
+@router.get("/tickets")
+def admin_tickets(request: Request, user: AdminPrincipal = Depends(require_scope("tickets:view")), db=Depends(get_db)):
+    status_filter = (request.query_params.get("status") or "").strip()
+    type_filter = (request.query_params.get("type") or "").strip()
+    if type_filter not in TICKET_TYPES:
+        type_filter = ""
+    limit = _limit_safe(request.query_params.get("limit"), 100, 200)
+
+    def cursor(name: str):
+        raw = request.query_params.get(name) or ""
+        return int(raw) if raw.isdigit() else None
+
+    # Пользователи подтягиваются join'ом: по одному запросу на раздел при любом количестве тикетов
+    support = consultations = None
+    if type_filter in ("", "support"):
+        support = list_tickets(
+            db, types=("support",), status=status_filter or None, cursor=cursor("support_cursor"), limit=limit
+        )
+    if type_filter in ("", "consultation"):
+        consultations = list_tickets(
+            db, types=("consultation",), status=status_filter or None, cursor=cursor("consult_cursor"), limit=limit
+        )
+
     return _render(
         request,
         "tickets.html",
         section="tickets",
         title="Admin · Тикеты",
-        support=support_ctx,
-        consultations=consult_ctx,
+        support=support.items if support else [],
+        consultations=consultations.items if consultations else [],
+        support_next=support.next_cursor if support else None,
+        consult_next=consultations.next_cursor if consultations else None,
+        show_support=support is not None,
+        show_consultations=consultations is not None,
+        status_filter=status_filter,
+        type_filter=type_filter,
+        limit=limit,
         admin_user=f"{user.username} · {user.role}",
         can_manage_users=_has_scope(user, "users"),
     )
@@ -558,7 +575,7 @@ def admin_tickets(request: Request, user: AdminPanelUser = Depends(require_scope
 @router.post("/tickets/{ticket_id}/respond")
 def admin_ticket_respond(
     ticket_id: int,
-    _: AdminPanelUser = Depends(require_scope("tickets:respond")),
+    _: AdminPrincipal = Depends(require_scope("tickets:respond")),
     db=Depends(get_db),
     admin_response: str = Form(...),
 ):
@@ -574,7 +591,7 @@ def admin_ticket_respond(
 
 
 @router.get("/admins")
-def admin_admins(request: Request, user: AdminPanelUser = Depends(require_scope("admins:manage")), db=Depends(get_db)):
+def admin_admins(request: Request, user: AdminPrincipal = Depends(require_scope("admins:manage")), db=Depends(get_db)):
     admins = db.query(Admin).order_by(Admin.id.asc()).all()
     return _render(
         request,
@@ -589,7 +606,7 @@ def admin_admins(request: Request, user: AdminPanelUser = Depends(require_scope(
 
 @router.post("/admins/create")
 def admin_admins_create(
-    _: AdminPanelUser = Depends(require_scope("admins:manage")),
+    _: AdminPrincipal = Depends(require_scope("admins:manage")),
     db=Depends(get_db),
     telegram_id: int = Form(...),
     role: str = Form("Администратор"),
@@ -608,7 +625,7 @@ def admin_admins_create(
 @router.post("/admins/{admin_id}/update")
 def admin_admins_update(
     admin_id: int,
-    _: AdminPanelUser = Depends(require_scope("admins:manage")),
+    _: AdminPrincipal = Depends(require_scope("admins:manage")),
     db=Depends(get_db),
     role: str = Form(...),
 ):
@@ -621,7 +638,7 @@ def admin_admins_update(
 
 
 @router.post("/admins/{admin_id}/delete")
-def admin_admins_delete(admin_id: int, _: AdminPanelUser = Depends(require_scope("admins:manage")), db=Depends(get_db)):
+def admin_admins_delete(admin_id: int, _: AdminPrincipal = Depends(require_scope("admins:manage")), db=Depends(get_db)):
     a = db.query(Admin).filter(Admin.id == admin_id).first()
     if not a:
         return _redir("/admin/admins", flash="Админ не найден", kind="bad")
@@ -631,18 +648,11 @@ def admin_admins_delete(admin_id: int, _: AdminPanelUser = Depends(require_scope
 
 
 @router.get("/data")
-def admin_data(request: Request, user: AdminPanelUser = Depends(require_scope("data:view")), db=Depends(get_db)):
+def admin_data(request: Request, user: AdminPrincipal = Depends(require_scope("data:view")), db=Depends(get_db)):
     tables = [t.name for t in Base.metadata.sorted_tables]
 
-    counts = {
-        "users": db.query(User).count(),
-        "admins": db.query(Admin).count(),
-        "posts": db.query(Post).count(),
-        "webinars": db.query(Webinar).count(),
-        "bookings": db.query(Booking).count(),
-        "payments": db.query(Payment).count(),
-        "referrals": db.query(ReferralInvite).count(),
-    }
+    # Все счётчики одним запросом (на Postgres у больших таблиц — оценка планировщика), кэш на несколько секунд
+    stats = get_dashboard_stats(db)
 
     return _render(
         request,
@@ -650,35 +660,48 @@ def admin_data(request: Request, user: AdminPanelUser = Depends(require_scope("d
         section="data",
         title="Admin · Данные",
         tables=tables,
-        counts=counts,
+        counts=stats.counts,
+        estimated=stats.estimated,
+        # Новые дни сверху: (день, регистрации, записи)
+        trend_rows=[
+            (day, signups, bookings)
+            for (day, signups), (_, bookings) in zip(reversed(stats.trends["signups"]), reversed(stats.trends["bookings"]))
+        ],
         admin_user=f"{user.username} · {user.role}",
         can_manage_users=_has_scope(user, "users"),
     )
 
 
 @router.post("/data/clear-db")
-def admin_clear_db(_: AdminPanelUser = Depends(require_scope("data:delete")), db=Depends(get_db)):
+def admin_clear_db(_: AdminPrincipal = Depends(require_scope("data:delete")), db=Depends(get_db)):
     deleted = _clear_all_tables(db)
     db.commit()
+    feed_cache.invalidate()
+    principal_cache.clear()
+    invalidate_dashboard_stats()
     return _redir("/admin/data", flash="База очищена", kind="ok", details=f"deleted_rows={deleted}")
 
 
 @router.post("/data/clear-selected")
 def admin_clear_selected(
-    _: AdminPanelUser = Depends(require_scope("data:delete")),
+    _: AdminPrincipal = Depends(require_scope("data:delete")),
     db=Depends(get_db),
     targets: list[str] = Form(...),
 ):
     targets_set = {t.strip() for t in (targets or []) if t and t.strip()}
     deleted, details = _clear_selected_tables(db, targets_set)
     db.commit()
+    feed_cache.invalidate()
+    invalidate_dashboard_stats()
+    if AdminPanelUser.__tablename__ in targets_set:
+        principal_cache.clear()
     return _redir("/admin/data", flash="Выбранные данные удалены", kind="ok", details=f"deleted_rows={deleted}")
 
 
 @router.get("/users")
 def admin_panel_users(
     request: Request,
-    user: AdminPanelUser = Depends(require_scope("users:manage")),
+    user: AdminPrincipal = Depends(require_scope("users:manage")),
     db=Depends(get_db),
 ):
     users = db.query(AdminPanelUser).order_by(AdminPanelUser.id.asc()).all()
@@ -706,7 +729,7 @@ def admin_panel_users(
 
 @router.post("/users/create")
 def admin_panel_users_create(
-    user: AdminPanelUser = Depends(require_scope("users:manage")),
+    user: AdminPrincipal = Depends(require_scope("users:manage")),
     db=Depends(get_db),
     username: str = Form(...),
     password: str = Form(...),
@@ -720,9 +743,13 @@ def admin_panel_users_create(
     if db.query(AdminPanelUser).filter(AdminPanelUser.username == username).first():
         return _redir("/admin/users", flash="Такой username уже есть", kind="bad")
 
+    try:
+        password_hash = hash_password(password)
+    except HashingBusy:
+        return _redir("/admin/users", flash="Сервер занят, попробуйте ещё раз", kind="bad")
     u = AdminPanelUser(
         username=username,
-        password_hash=_pbkdf2_hash_password(password),
+        password_hash=password_hash,
         role=(role or "admin").strip(),
         scopes=_perms_to_scopes(perms) or _normalize_scopes(scopes),
         is_active=True,
@@ -736,7 +763,7 @@ def admin_panel_users_create(
 @router.post("/users/{user_id}/update")
 def admin_panel_users_update(
     user_id: int,
-    _: AdminPanelUser = Depends(require_scope("users:manage")),
+    _: AdminPrincipal = Depends(require_scope("users:manage")),
     db=Depends(get_db),
     role: str = Form("admin"),
     scopes: str = Form(""),
@@ -751,29 +778,34 @@ def admin_panel_users_update(
     target.scopes = _perms_to_scopes(perms) or _normalize_scopes(scopes)
     target.is_active = bool(is_active)
     db.commit()
+    principal_cache.invalidate(user_id)
     return _redir("/admin/users", flash="Сохранено", kind="ok")
 
 
 @router.post("/users/{user_id}/reset-password")
 def admin_panel_users_reset_password(
     user_id: int,
-    _: AdminPanelUser = Depends(require_scope("users:manage")),
+    _: AdminPrincipal = Depends(require_scope("users:manage")),
     db=Depends(get_db),
     new_password: str = Form(...),
 ):
     target = db.query(AdminPanelUser).filter(AdminPanelUser.id == user_id).first()
     if not target:
         return _redir("/admin/users", flash="Пользователь не найден", kind="bad")
-    target.password_hash = _pbkdf2_hash_password(new_password)
+    try:
+        target.password_hash = hash_password(new_password)
+    except HashingBusy:
+        return _redir("/admin/users", flash="Сервер занят, попробуйте ещё раз", kind="bad")
     target.session_version = int(target.session_version or 0) + 1
     db.commit()
+    principal_cache.invalidate(user_id)
     return _redir("/admin/users", flash="Пароль обновлён (сессии сброшены)", kind="ok")
 
 
 @router.post("/users/{user_id}/delete")
 def admin_panel_users_delete(
     user_id: int,
-    acting: AdminPanelUser = Depends(require_scope("users:manage")),
+    acting: AdminPrincipal = Depends(require_scope("users:manage")),
     db=Depends(get_db),
 ):
     target = db.query(AdminPanelUser).filter(AdminPanelUser.id == user_id).first()
@@ -783,6 +815,7 @@ def admin_panel_users_delete(
         return _redir("/admin/users", flash="Нельзя удалить самого себя", kind="bad")
     db.delete(target)
     db.commit()
+    principal_cache.invalidate(user_id)
     return _redir("/admin/users", flash="Пользователь удалён", kind="ok")
 
 
@@ -800,7 +833,7 @@ def _limit_safe(limit_raw, default=50, max_val=100):
 @router.get("/balance-requests")
 def admin_balance_requests(
     request: Request,
-    user: AdminPanelUser = Depends(require_scope("balance:view")),
+    user: AdminPrincipal = Depends(require_scope("balance:view")),
     db=Depends(get_db),
 ):
     status_filter = (request.query_params.get("status") or "pending").strip().lower()
@@ -816,8 +849,12 @@ def admin_balance_requests(
     total = q.count()
     items = q.offset((page - 1) * limit).limit(limit).all()
 
+    # Пользователи страницы одним запросом
+    user_ids = {r.user_id for r in items}
+    users = {u.id: u for u in db.query(User).filter(User.id.in_(user_ids))} if user_ids else {}
+
     def to_ctx(r):
-        u = db.query(User).filter(User.id == r.user_id).first()
+        u = users.get(r.user_id)
         return {
             "id": r.id,
             "user_id": r.user_id,
@@ -841,16 +878,62 @@ def admin_balance_requests(
         total=total,
         limit=limit,
         status_filter=status_filter,
+        can_manage=_has_scope(user, "balance:manage"),
         admin_user=f"{user.username} · {user.role}",
         can_manage_users=_has_scope(user, "users"),
     )
 
 
+@router.post("/balance-requests/batch")
+def admin_balance_requests_batch(
+    acting: AdminPrincipal = Depends(require_scope("balance:manage")),
+    db=Depends(get_db),
+    action: str = Form(...),
+    selected: list[int] = Form([]),
+    row_id: list[int] = Form([]),
+    amount: list[str] = Form([]),
+    comment: list[str] = Form([]),
+    back: str = Form("/admin/balance-requests"),
+):
+    """Пакетное одобрение/отклонение: все выбранные заявки применяются одной транзакцией."""
+    back = back if back.startswith("/admin/balance-requests") else "/admin/balance-requests"
+    if action not in REVIEW_ACTIONS:
+        return _redir(back, flash="Неизвестное действие", kind="bad")
+    chosen = set(selected)
+    if not chosen:
+        return _redir(back, flash="Не выбрано ни одной заявки", kind="bad")
+
+    items: list[ReviewItem] = []
+    bad_amounts: list[str] = []
+    for rid, raw_amount, raw_comment in zip(row_id, amount, comment):
+        if rid not in chosen:
+            continue
+        amount_cents = None
+        if action == "approve":
+            try:
+                amount_cents = parse_money(raw_amount.strip())
+            except ValueError as e:
+                bad_amounts.append(f"#{rid}: {e}")
+                continue
+        items.append(ReviewItem(rid, action, amount_cents, raw_comment.strip() or None))
+
+    results = review_deposit_requests(db, items, acting.id) if items else []
+    done = sum(1 for r in results if r.ok)
+    failed = bad_amounts + [f"#{r.request_id}: {r.error}" for r in results if not r.ok]
+    verb = "Одобрено" if action == "approve" else "Отклонено"
+    return _redir(
+        back,
+        flash=f"{verb}: {done} из {len(chosen)}",
+        kind="ok" if not failed else "bad",
+        details="; ".join(failed[:20]) or None,
+    )
+
+
 @router.get("/balance-requests/{req_id}")
 def admin_balance_request_detail(
     request: Request,
     req_id: int,
-    user: AdminPanelUser = Depends(require_scope("balance:view")),
+    user: AdminPrincipal = Depends(require_scope("balance:view")),
     db=Depends(get_db),
 ):
     r = db.query(BalanceRequest).filter(BalanceRequest.id == req_id).first()
@@ -873,7 +956,7 @@ def admin_balance_request_detail(
 @router.post("/balance-requests/{req_id}/approve")
 def admin_balance_request_approve(
     req_id: int,
-    acting: AdminPanelUser = Depends(require_scope("balance:manage")),
+    acting: AdminPrincipal = Depends(require_scope("balance:manage")),
     db=Depends(get_db),
     amount: str = Form(...),
     comment: str = Form(""),
@@ -894,7 +977,7 @@ def admin_balance_request_approve(
 @router.post("/balance-requests/{req_id}/reject")
 def admin_balance_request_reject(
     req_id: int,
-    acting: AdminPanelUser = Depends(require_scope("balance:manage")),
+    acting: AdminPrincipal = Depends(require_scope("balance:manage")),
     db=Depends(get_db),
     comment: str = Form(""),
 ):
@@ -908,28 +991,36 @@ def admin_balance_request_reject(
 @router.get("/app-users")
 def admin_app_users(
     request: Request,
-    user: AdminPanelUser = Depends(require_scope("balance:view")),
+    user: AdminPrincipal = Depends(require_scope("balance:view")),
     db=Depends(get_db),
 ):
     search = (request.query_params.get("search") or "").strip()
     limit = _limit_safe(request.query_params.get("limit"), 50, 100)
     page = max(1, int(request.query_params.get("page") or 1))
+    sort = request.query_params.get("sort") or "id"
+    if sort not in USER_BALANCE_SORTS:
+        sort = "id"
+    min_raw = (request.query_params.get("min_balance") or "").strip()
+    max_raw = (request.query_params.get("max_balance") or "").strip()
+    try:
+        min_cents = parse_money(min_raw) if min_raw else None
+        max_cents = parse_money(max_raw) if max_raw else None
+    except ValueError:
+        min_cents = max_cents = None
+        min_raw = max_raw = ""
+
+    # Один запрос с LEFT JOIN user_balances; отсутствующий баланс = 0, без записи в БД
+    rows, total = list_users_with_balance(
+        db,
+        search=search,
+        min_cents=min_cents,
+        max_cents=max_cents,
+        sort=sort,
+        offset=(page - 1) * limit,
+        limit=limit,
+    )
 
-    from sqlalchemy import or_
-
-    q = db.query(User)
-    if search:
-        like = f"%{search}%"
-        conds = [User.username.ilike(like), User.first_name.ilike(like), User.last_name.ilike(like)]
-        if search.isdigit():
-            conds.append(User.telegram_id == int(search))
-        q = q.filter(or_(*conds))
-    q = q.order_by(User.id.desc())
-    total = q.count()
-    users = q.offset((page - 1) * limit).limit(limit).all()
-
-    def to_ctx(u):
-        balance = get_balance_cents(db, u.id)
+    def to_ctx(u, balance):
         return {
             "id": u.id,
             "telegram_id": u.telegram_id,
@@ -947,12 +1038,15 @@ def admin_app_users(
         "app_users.html",
         section="app_users",
         title="Admin · Пользователи приложения",
-        users=[to_ctx(u) for u in users],
+        users=[to_ctx(u, balance) for u, balance in rows],
         page=page,
         pages=pages,
         total=total,
         limit=limit,
         search=search,
+        sort=sort,
+        min_balance=min_raw,
+        max_balance=max_raw,
         admin_user=f"{user.username} · {user.role}",
     )
 
@@ -961,7 +1055,7 @@ def admin_app_users(
 def admin_app_user_profile(
     request: Request,
     user_id: int,
-    acting: AdminPanelUser = Depends(require_scope("balance:view")),
+    acting: AdminPrincipal = Depends(require_scope("balance:view")),
     db=Depends(get_db),
 ):
     u = db.query(User).filter(User.id == user_id).first()
@@ -970,12 +1064,12 @@ def admin_app_user_profile(
     balance = get_balance_cents(db, u.id)
     can_manage = _has_scope(acting, "balance:manage")
 
-    ledger_page = max(1, int(request.query_params.get("ledger_page") or 1))
+    # Keyset по (user_id, id): глубокие страницы стоят столько же, сколько первая
     ledger_limit = _limit_safe(request.query_params.get("ledger_limit"), 50, 100)
-    ledger_q = db.query(BalanceLedger).filter(BalanceLedger.user_id == user_id).order_by(BalanceLedger.created_at.desc())
-    ledger_total = ledger_q.count()
-    ledger_items = ledger_q.offset((ledger_page - 1) * ledger_limit).limit(ledger_limit).all()
-    ledger_pages = (ledger_total + ledger_limit - 1) // ledger_limit if ledger_limit else 0
+    raw_before = request.query_params.get("ledger_before") or ""
+    ledger_before = int(raw_before) if raw_before.isdigit() else None
+    ledger_items, ledger_next = list_ledger_entries(db, user_id, before_id=ledger_before, limit=ledger_limit)
+    ledger_snapshot = db.get(LedgerSnapshot, user_id)
 
     return _render(
         request,
@@ -986,11 +1080,12 @@ def admin_app_user_profile(
         balance_cents=balance,
         balance_formatted=_format_money(balance),
         can_manage=can_manage,
+        adjust_nonce=secrets.token_urlsafe(16),
         ledger_items=ledger_items,
-        ledger_page=ledger_page,
-        ledger_pages=ledger_pages,
-        ledger_total=ledger_total,
+        ledger_before=ledger_before,
+        ledger_next=ledger_next,
         ledger_limit=ledger_limit,
+        ledger_snapshot=ledger_snapshot,
         admin_user=f"{acting.username} · {acting.role}",
     )
 
@@ -998,7 +1093,7 @@ def admin_app_user_profile(
 @router.post("/app-users/{user_id}/block")
 def admin_app_user_block(
     user_id: int,
-    acting: AdminPanelUser = Depends(require_scope("balance:manage")),
+    acting: AdminPrincipal = Depends(require_scope("balance:manage")),
     db=Depends(get_db),
     blocked: str = Form("0"),
 ):
@@ -1013,10 +1108,11 @@ def admin_app_user_block(
 @router.post("/app-users/{user_id}/balance-adjust")
 def admin_app_user_balance_adjust(
     user_id: int,
-    acting: AdminPanelUser = Depends(require_scope("balance:manage")),
+    acting: AdminPrincipal = Depends(require_scope("balance:manage")),
     db=Depends(get_db),
     delta: str = Form(...),
     comment: str = Form(""),
+    nonce: str = Form(""),
 ):
     try:
         delta_cents = parse_money(delta.strip())
@@ -1028,7 +1124,9 @@ def admin_app_user_balance_adjust(
     if not u:
         return _redir("/admin/app-users", flash="Пользователь не найден", kind="bad")
     try:
-        admin_adjust_balance(db, user_id, delta_cents, acting.id, comment or None)
+        # nonce из формы: повторная отправка (двойной клик, F5) применяется один раз
+        key = f"admin_adjust:{acting.id}:{nonce.strip()[:64]}" if nonce.strip() else None
+        admin_adjust_balance(db, user_id, delta_cents, acting.id, comment or None, idempotency_key=key)
         return _redir(f"/admin/app-users/{user_id}", flash="Баланс изменён", kind="ok")
     except ValueError as e:
         return _redir(f"/admin/app-users/{user_id}", flash=str(e), kind="bad")
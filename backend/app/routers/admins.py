@@ -1,13 +1,16 @@
+from contextlib import contextmanager
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
 from typing import List
 from sqlalchemy import text
 
-from app.database import SessionLocal
+from app.database import get_db
 from app.models.admin import Admin
 from app.database import Base
 from app.models import admin, booking, payment, post, referral_invite, user, webinar_material, webinar  # noqa: F401
+from app.models.table_version import bump_table_version
 from app.schemas.admin import AdminCreate, AdminResponse, AdminUpdate
+from app.services.feed_cache import FEED_TABLES, feed_cache
 from app.utils.telegram_webapp import resolve_admin_telegram_id
 
 router = APIRouter(prefix="/admins", tags=["admins"])
@@ -28,11 +31,38 @@ def _quoted_table_name(table) -> str:
     return f"\"{name}\""
 
 
+def _bump_feed_versions(db: Session, cleared) -> None:
+    # Bulk DELETE/TRUNCATE bypasses ORM events: bump the versions by hand so
+    # feed caches of other processes notice (after clear-db the counters start again from 1)
+    for table_name in FEED_TABLES:
+        if table_name in cleared:
+            bump_table_version(db, table_name)
+
+
+@contextmanager
+def _sqlite_foreign_keys_off(db: Session):
+    """
+    Runs the block with SQLite FK enforcement off and commits it.
+    PRAGMA foreign_keys is a no-op inside an open transaction, so the block is
+    committed (or rolled back) before enforcement is switched back on;
+    otherwise the pooled writer connection would stay with foreign_keys=OFF.
+    """
+    db.execute(text("PRAGMA foreign_keys=OFF"))
+    try:
+        yield
+        db.commit()
+    except BaseException:
+        db.rollback()
+        raise
+    finally:
+        db.execute(text("PRAGMA foreign_keys=ON"))
+
+
 def _clear_all_tables(db: Session) -> int:
     """
     Clears all tables in DB.
     Returns total deleted rows (best-effort).
-    - SQLite: PRAGMA foreign_keys OFF + DELETE in reverse topo order.
+    - SQLite: PRAGMA foreign_keys OFF + DELETE in reverse topo order (committed here).
     - Postgres: TRUNCATE ... RESTART IDENTITY CASCADE.
     - Others: DELETE in reverse topo order.
     """
@@ -45,25 +75,29 @@ def _clear_all_tables(db: Session) -> int:
         # TRUNCATE can't reliably return rowcounts across all drivers; return 0.
         table_list = ", ".join(_quoted_table_name(t) for t in tables)
         db.execute(text(f"TRUNCATE TABLE {table_list} RESTART IDENTITY CASCADE"))
+        _bump_feed_versions(db, FEED_TABLES)
         return 0
 
-    total_deleted = 0
-    if dialect == "sqlite":
-        db.execute(text("PRAGMA foreign_keys=OFF"))
-    for table in reversed(Base.metadata.sorted_tables):
-        result = db.execute(table.delete())
-        deleted = result.rowcount if result.rowcount is not None else 0
-        total_deleted += deleted
+    def _delete_all() -> int:
+        total_deleted = 0
+        for table in reversed(Base.metadata.sorted_tables):
+            result = db.execute(table.delete())
+            deleted = result.rowcount if result.rowcount is not None else 0
+            total_deleted += deleted
+        _bump_feed_versions(db, FEED_TABLES)
+        return total_deleted
+
     if dialect == "sqlite":
-        db.execute(text("PRAGMA foreign_keys=ON"))
-    return total_deleted
+        with _sqlite_foreign_keys_off(db):
+            return _delete_all()
+    return _delete_all()
 
 
 def _clear_selected_tables(db: Session, targets_set: set[str]) -> tuple[int, list[dict]]:
     """
     Clears selected tables.
     Returns (total_deleted, details).
-    - SQLite: PRAGMA foreign_keys OFF + DELETE for selected tables.
+    - SQLite: PRAGMA foreign_keys OFF + DELETE for selected tables (committed here).
     - Postgres: TRUNCATE selected ... RESTART IDENTITY CASCADE.
     - Others: DELETE in reverse topo order.
     """
@@ -75,30 +109,26 @@ def _clear_selected_tables(db: Session, targets_set: set[str]) -> tuple[int, lis
             return 0, []
         table_list = ", ".join(_quoted_table_name(t) for t in tables)
         db.execute(text(f"TRUNCATE TABLE {table_list} RESTART IDENTITY CASCADE"))
+        _bump_feed_versions(db, targets_set)
         return 0, [{"table": t.name, "deleted": 0} for t in tables]
 
-    if dialect == "sqlite":
-        db.execute(text("PRAGMA foreign_keys=OFF"))
-    total_deleted = 0
-    details: list[dict] = []
-    for table in reversed(Base.metadata.sorted_tables):
-        if table.name not in targets_set:
-            continue
-        result = db.execute(table.delete())
-        deleted = result.rowcount if result.rowcount is not None else 0
-        total_deleted += deleted
-        details.append({"table": table.name, "deleted": deleted})
-    if dialect == "sqlite":
-        db.execute(text("PRAGMA foreign_keys=ON"))
-    return total_deleted, details
-
+    def _delete_selected() -> tuple[int, list[dict]]:
+        total_deleted = 0
+        details: list[dict] = []
+        for table in reversed(Base.metadata.sorted_tables):
+            if table.name not in targets_set:
+                continue
+            result = db.execute(table.delete())
+            deleted = result.rowcount if result.rowcount is not None else 0
+            total_deleted += deleted
+            details.append({"table": table.name, "deleted": deleted})
+        _bump_feed_versions(db, targets_set)
+        return total_deleted, details
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+    if dialect == "sqlite":
+        with _sqlite_foreign_keys_off(db):
+            return _delete_selected()
+    return _delete_selected()
 
 
 def check_admin(telegram_id: int, db: Session) -> Admin:
@@ -230,6 +260,7 @@ def clear_database(
     check_developer(requester_id, db)
     total_deleted = _clear_all_tables(db)
     db.commit()
+    feed_cache.invalidate()
     return {"message": "Database cleared", "deleted_rows": total_deleted, "dialect": _dialect_name(db)}
 
 
@@ -258,6 +289,7 @@ def clear_selected_data(
 
     total_deleted, details = _clear_selected_tables(db, targets_set)
     db.commit()
+    feed_cache.invalidate()
     return {
         "message": "Selected data cleared",
         "deleted_rows": total_deleted,
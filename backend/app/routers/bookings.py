@@ -1,25 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
-from app.database import SessionLocal
+from app.database import get_db
 from app.models.booking import Booking
 from app.models.user import User
 from app.models.admin import Admin
 from app.schemas.booking import BookingCreate, BookingResponse, BookingResponseAdmin, BookingResponseUpdate
+from app.services.cascade_delete import delete_bookings
+from app.services.reminder_service import schedule_booking_reminders
+from app.services.ticket_queries import Customer, list_tickets, serialize_ticket, tickets_query
+from app.utils.fast_json import trusted_json
 from app.utils.telegram_webapp import resolve_admin_telegram_id
 
 router = APIRouter(prefix="/bookings", tags=["bookings"])
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 def check_admin(telegram_id: int, db: Session) -> Admin:
     """Проверка, является ли пользователь админом"""
     admin = db.query(Admin).filter(Admin.telegram_id == telegram_id).first()
@@ -38,38 +34,19 @@ def get_consultations(
     admin_telegram_id: int = Query(None, description="Telegram ID администратора (legacy)"),
     skip: int = 0,
     limit: int = 100,
+    status: Optional[str] = Query(None, description="Фильтр по статусу"),
+    cursor: Optional[int] = Query(None, description="ID последней записи предыдущей страницы"),
     db: Session = Depends(get_db)
 ):
     """Получить все консультации (только для администраторов)"""
     requester_id = resolve_admin_telegram_id(request, admin_telegram_id)
     check_admin(requester_id, db)
-    
-    consultations = db.query(Booking).filter(
-        Booking.type == "consultation"
-    ).offset(skip).limit(limit).all()
-    
-    result = []
-    for consultation in consultations:
-        user = db.query(User).filter(User.id == consultation.user_id).first()
-        consultation_dict = {
-            "id": consultation.id,
-            "user_id": consultation.user_id,
-            "webinar_id": consultation.webinar_id,
-            "type": consultation.type,
-            "date": consultation.date,
-            "time": consultation.time,
-            "status": consultation.status,
-            "topic": consultation.topic,
-            "message": consultation.message,
-            "admin_response": consultation.admin_response,
-            "admin_id": consultation.admin_id,
-            "user_telegram_id": user.telegram_id if user else None,
-            "user_first_name": user.first_name if user else None,
-            "user_username": user.username if user else None,
-        }
-        result.append(consultation_dict)
-    
-    return result
+    # Пользователь и ответивший админ подтягиваются join'ами: один запрос на страницу
+    page = list_tickets(
+        db, types=("consultation",), status=status, cursor=cursor, newest_first=False, skip=skip, limit=limit
+    )
+    # Словари уже в форме BookingResponseAdmin — без повторной валидации
+    return trusted_json(page.items)
 
 @router.get("/support-tickets", response_model=List[BookingResponseAdmin])
 def get_support_tickets(
@@ -77,38 +54,17 @@ def get_support_tickets(
     admin_telegram_id: int = Query(None, description="Telegram ID администратора (legacy)"),
     skip: int = 0,
     limit: int = 100,
+    status: Optional[str] = Query(None, description="Фильтр по статусу"),
+    cursor: Optional[int] = Query(None, description="ID последней записи предыдущей страницы"),
     db: Session = Depends(get_db)
 ):
     """Получить все обращения в поддержку (только для администраторов)"""
     requester_id = resolve_admin_telegram_id(request, admin_telegram_id)
     check_admin(requester_id, db)
-    
-    support_tickets = db.query(Booking).filter(
-        Booking.type == "support"
-    ).offset(skip).limit(limit).all()
-    
-    result = []
-    for ticket in support_tickets:
-        user = db.query(User).filter(User.id == ticket.user_id).first()
-        ticket_dict = {
-            "id": ticket.id,
-            "user_id": ticket.user_id,
-            "webinar_id": ticket.webinar_id,
-            "type": ticket.type,
-            "date": ticket.date,
-            "time": ticket.time,
-            "status": ticket.status,
-            "topic": ticket.topic,
-            "message": ticket.message,
-            "admin_response": ticket.admin_response,
-            "admin_id": ticket.admin_id,
-            "user_telegram_id": user.telegram_id if user else None,
-            "user_first_name": user.first_name if user else None,
-            "user_username": user.username if user else None,
-        }
-        result.append(ticket_dict)
-    
-    return result
+    page = list_tickets(
+        db, types=("support",), status=status, cursor=cursor, newest_first=False, skip=skip, limit=limit
+    )
+    return trusted_json(page.items)
 
 
 @router.get("/user/{user_id}", response_model=List[BookingResponse])
@@ -120,50 +76,9 @@ def get_user_bookings(user_id: int, db: Session = Depends(get_db)):
 @router.get("/telegram/{telegram_id}", response_model=List[BookingResponse])
 def get_user_bookings_by_telegram(telegram_id: int, db: Session = Depends(get_db)):
     """Получить записи пользователя по telegram_id с информацией об ответах"""
-    user = db.query(User).filter(User.telegram_id == telegram_id).first()
-    if not user:
-        return []
-    bookings = db.query(Booking).filter(Booking.user_id == user.id).all()
-    
-    # Добавляем информацию об админе, который ответил
-    result = []
-    for booking in bookings:
-        admin_name = None
-        admin_role = None
-        
-        # Если есть ответ админа, получаем информацию об админе
-        if booking.admin_id:
-            admin_user = db.query(User).filter(User.id == booking.admin_id).first()
-            if admin_user:
-                admin_info = db.query(Admin).filter(Admin.telegram_id == admin_user.telegram_id).first()
-                admin_name = admin_user.first_name or admin_user.username or "Администратор"
-                admin_role = admin_info.role if admin_info else None
-        
-        # Создаем словарь с данными, включая вычисляемые поля
-        booking_dict = {
-            "id": booking.id,
-            "user_id": booking.user_id,
-            "webinar_id": booking.webinar_id,
-            "type": booking.type,
-            "date": booking.date,
-            "time": booking.time,
-            "status": booking.status,
-            "topic": booking.topic,
-            "message": booking.message,
-            "admin_response": booking.admin_response,
-            "admin_id": booking.admin_id,
-            "admin_name": admin_name,
-            "admin_role": admin_role,
-            "payment_status": getattr(booking, 'payment_status', "unpaid"),
-            "amount": getattr(booking, 'amount', None),
-            "payment_id": getattr(booking, 'payment_id', None),
-            "payment_date": booking.payment_date.isoformat() if hasattr(booking, 'payment_date') and booking.payment_date else None,
-            "attended": getattr(booking, 'attended', 0),
-        }
-        
-        result.append(booking_dict)
-    
-    return result
+    # Ответивший админ (имя и роль) приходит из того же запроса
+    rows = tickets_query(db).filter(Customer.telegram_id == telegram_id).order_by(Booking.id.asc()).all()
+    return trusted_json([serialize_ticket(row, with_customer=False) for row in rows])
 
 
 @router.post("/", response_model=BookingResponse)
@@ -172,6 +87,7 @@ def create_booking(booking: BookingCreate, db: Session = Depends(get_db)):
     db.add(db_booking)
     db.commit()
     db.refresh(db_booking)
+    schedule_booking_reminders(db, db_booking)
     return db_booking
 
 
@@ -197,7 +113,8 @@ def delete_booking(
     if not booking:
         raise HTTPException(status_code=404, detail="Booking not found")
     
-    db.delete(booking)
+    # Вместе с напоминаниями и платежами, которые ссылаются на тикет
+    delete_bookings(db, [booking.id])
     db.commit()
     return {"message": "Booking deleted successfully"}
 
@@ -1,13 +1,16 @@
 from __future__ import annotations
 
+import hmac
 import os
 
 from fastapi import APIRouter, HTTPException, Request
 
+from app.utils.fast_json import FastJSONResponse
+from app.utils.metrics import collect_stats
 from app.utils.telegram_webapp import verify_telegram_webapp_init_data
 
 
-router = APIRouter(prefix="/debug", tags=["debug"])
+router = APIRouter(prefix="/debug", tags=["debug"], default_response_class=FastJSONResponse)
 
 
 @router.post("/telegram")
@@ -28,3 +31,15 @@ async def debug_telegram(request: Request):
         # Return safe reason; verify_telegram_webapp_init_data already censors initData.
         return {"ok": False, "reason": str(exc.detail)}
 
+
+
+@router.get("/metrics")
+def debug_metrics(request: Request):
+    """
+    In-process counters (caches, workers). Internal only: requires X-Internal-Key.
+    """
+    internal_key = (os.getenv("INTERNAL_API_KEY") or "").strip()
+    provided = (request.headers.get("X-Internal-Key") or "").strip()
+    if not internal_key or not provided or not hmac.compare_digest(internal_key, provided):
+        raise HTTPException(status_code=404, detail="Not found")
+    return collect_stats()
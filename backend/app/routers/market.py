@@ -0,0 +1,61 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+
+from app.services.market_data import MarketStore, get_market_store, market_cache_max_age
+from app.services.market_stream import MarketHub, get_market_hub
+
+router = APIRouter(prefix="/market", tags=["market"])
+
+
+def get_store() -> MarketStore:
+    return get_market_store()
+
+
+def get_hub() -> MarketHub:
+    return get_market_hub()
+
+
+def _cache_headers(etag: str) -> dict:
+    max_age = market_cache_max_age()
+    return {
+        "ETag": etag,
+        # Публичные данные: клиент и прокси могут переиспользовать ответ, пока поллер не обновил стор
+        "Cache-Control": f"public, max-age={max_age}, stale-while-revalidate={max_age * 6}",
+    }
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("If-None-Match") or ""
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag in candidates or "*" in candidates
+
+
+@router.get("/tickers")
+def get_tickers(request: Request, store: MarketStore = Depends(get_store)):
+    """Тикеры 24h и спарклайны (24 часовых закрытия) для всех символов одним ответом"""
+    snapshot = store.get()
+    if snapshot is None:
+        # Поллер ещё не успел получить первые данные
+        raise HTTPException(status_code=503, detail="Market data is not ready yet", headers={"Retry-After": "5"})
+    headers = _cache_headers(snapshot.etag)
+    if _etag_matches(request, snapshot.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
+
+
+@router.get("/stream")
+async def stream_tickers(symbols: Optional[str] = None, hub: MarketHub = Depends(get_hub)):
+    """
+    Server-Sent Events: `snapshot` при подключении, дальше `delta` только с изменившимися полями.
+    symbols=BTCUSDT,ETHUSDT — подписка на часть символов (по умолчанию все).
+    """
+    wanted = frozenset(s.strip().upper() for s in symbols.split(",") if s.strip()) if symbols else None
+    if not hub.accepting():
+        raise HTTPException(status_code=503, detail="Too many market stream clients", headers={"Retry-After": "10"})
+    return StreamingResponse(
+        hub.events(wanted or None),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -6,7 +6,7 @@ from __future__ import annotations
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
 
-from app.database import SessionLocal
+from app.database import get_db
 from app.models.user import User
 from app.schemas.balance import (
     BalanceRequestCreate,
@@ -26,14 +26,6 @@ from app.utils.telegram_webapp import get_request_telegram_user_id
 router = APIRouter(prefix="/me", tags=["me"])
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 def _resolve_user(request: Request, db: Session) -> User:
     telegram_id = get_request_telegram_user_id(request)
     user = db.query(User).filter(User.telegram_id == telegram_id).first()
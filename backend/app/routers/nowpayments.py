@@ -8,17 +8,17 @@ from datetime import datetime
 from typing import Optional
 
 import requests
-from fastapi import APIRouter, Body, Depends, HTTPException, Request, Response
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
-from app.database import SessionLocal
+from app.database import get_db
 from app.models.booking import Booking
-from app.models.nowpayments_ipn_event import NowPaymentsIpnEvent
 from app.models.nowpayments_payment import NowPaymentsPayment
 from app.models.payment import Payment as PaymentModel
-from app.models.user_entitlement import UserEntitlement
-from app.models.product_purchase import ProductPurchase
 from app.schemas.nowpayments import CreatePaymentRequest, CreatePaymentResponse, PaymentStatusMinimal
+from app.services.nowpayments_ipn_service import parse_booking_id, store_ipn_event, wake_ipn_applier
+from app.services.provider_cache import get_nowpayments_cache
 from app.utils.security import verify_nowpayments_signature
 
 
@@ -26,46 +26,6 @@ logger = logging.getLogger("nowpayments")
 
 router = APIRouter(prefix="/payments", tags=["payments"])
 
-PAID_ACCESS_ENTITLEMENT = "paid_access"
-
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
-def parse_booking_id(order_id: Optional[str]) -> Optional[int]:
-    if not order_id:
-        return None
-    if not order_id.startswith("booking-"):
-        return None
-    try:
-        return int(order_id.split("booking-")[1])
-    except (ValueError, IndexError):
-        return None
-
-
-def parse_product_purchase_id(order_id: Optional[str]) -> Optional[int]:
-    if not order_id:
-        return None
-    if not order_id.startswith("product-"):
-        return None
-    try:
-        return int(order_id.split("product-")[1])
-    except (ValueError, IndexError):
-        return None
-
-
-def get_booking_by_payment(db: Session, payment_id: int, order_id: Optional[str]) -> Optional[Booking]:
-    booking_id = parse_booking_id(order_id)
-    if booking_id:
-        return db.query(Booking).filter(Booking.id == booking_id).first()
-    return db.query(Booking).filter(Booking.payment_id == str(payment_id)).first()
-
-
 def nowpayments_request(method: str, path: str, **kwargs):
     api_key = os.getenv("NOWPAYMENTS_API_KEY")
     if not api_key:
@@ -135,169 +95,74 @@ def _upsert_nowpayments_payment_from_create(
     db.commit()
 
 
-def _upsert_nowpayments_payment_from_ipn(db: Session, payload: dict) -> None:
-    payment_id = payload.get("payment_id")
-    if payment_id is None:
-        return
-    payment_id = str(payment_id)
-
-    record = db.query(NowPaymentsPayment).filter(NowPaymentsPayment.payment_id == payment_id).first()
-    if not record:
-        record = NowPaymentsPayment(payment_id=payment_id)
-        db.add(record)
-
-    record.order_id = payload.get("order_id") or record.order_id
-    record.status = payload.get("payment_status") or record.status
-    if payload.get("price_amount") is not None:
-        record.price_amount = payload.get("price_amount")
-    if payload.get("price_currency") is not None:
-        record.price_currency = payload.get("price_currency")
-    if payload.get("pay_amount") is not None:
-        record.pay_amount = payload.get("pay_amount")
-    if payload.get("pay_currency") is not None:
-        record.pay_currency = payload.get("pay_currency")
-    record.raw_last_ipn = json.dumps(payload)
-
-    db.commit()
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        return default
 
 
-def _store_ipn_event(
-    db: Session,
-    payload: dict,
-    signature_header: str,
-    signature_valid: bool,
-) -> None:
-    ev = NowPaymentsIpnEvent(
-        payment_id=str(payload.get("payment_id")) if payload.get("payment_id") is not None else None,
-        payment_status=payload.get("payment_status"),
-        order_id=payload.get("order_id"),
-        signature_valid=bool(signature_valid),
-        signature_header=signature_header or None,
-        payload_json=json.dumps(payload),
+def get_currencies_from_nowpayments():
+    # NOWPayments: GET /v1/currencies (кэш: TTL + stale-while-revalidate + снапшот на диске)
+    return get_nowpayments_cache().get(
+        "currencies",
+        lambda: nowpayments_request("GET", "/currencies"),
+        ttl=_env_float("NOWPAYMENTS_CURRENCIES_TTL", 3600),
+        stale_ttl=_env_float("NOWPAYMENTS_CURRENCIES_STALE_TTL", 86400),
+        persist=True,
     )
-    db.add(ev)
-    db.commit()
 
 
-def _apply_non_finished_status(db: Session, payment_id: str, order_id: Optional[str], status: str, payload: dict) -> None:
-    # Обновляем существующую запись в payments (таблица приложения), если она уже есть
-    db_payment = db.query(PaymentModel).filter(PaymentModel.transaction_id == str(payment_id)).first()
-    booking = get_booking_by_payment(db, int(payment_id) if str(payment_id).isdigit() else 0, order_id)
-
-    if db_payment:
-        db_payment.payment_metadata = json.dumps(payload)
-        normalized = (status or "").lower()
-        if normalized in {"expired", "failed"}:
-            db_payment.status = "failed"
-        elif normalized == "refunded":
-            db_payment.status = "refunded"
-        else:
-            db_payment.status = "pending"
-
-    if booking:
-        normalized = (status or "").lower()
-        if normalized in {"expired", "failed"}:
-            booking.payment_status = "failed"
-        elif normalized == "refunded":
-            booking.payment_status = "refunded"
-            booking.status = "pending"
-            booking.payment_date = None
-        else:
-            booking.payment_status = "pending"
-
-    # Product purchase status update
-    pp_id = parse_product_purchase_id(order_id)
-    if pp_id:
-        purchase = db.query(ProductPurchase).filter(ProductPurchase.id == pp_id).first()
-        if purchase:
-            purchase.status = status or purchase.status
-            purchase.raw_last_ipn = json.dumps(payload)
+def get_min_amount_from_nowpayments(currency_from: str, currency_to: str):
+    # NOWPayments: GET /v1/min-amount
+    currency_from = currency_from.strip().lower()
+    currency_to = currency_to.strip().lower()
+    return get_nowpayments_cache().get(
+        f"min-amount:{currency_from}:{currency_to}",
+        lambda: nowpayments_request(
+            "GET", "/min-amount", params={"currency_from": currency_from, "currency_to": currency_to}
+        ),
+        ttl=_env_float("NOWPAYMENTS_MIN_AMOUNT_TTL", 600),
+        stale_ttl=_env_float("NOWPAYMENTS_MIN_AMOUNT_STALE_TTL", 3600),
+        persist=True,
+    )
 
-    db.commit()
 
+def get_estimate_from_nowpayments(amount: float, currency_from: str, currency_to: str):
+    # NOWPayments: GET /v1/estimate (курс меняется — короткий TTL, без снапшота)
+    currency_from = currency_from.strip().lower()
+    currency_to = currency_to.strip().lower()
+    amount = round(float(amount), 2)
+    return get_nowpayments_cache().get(
+        f"estimate:{amount}:{currency_from}:{currency_to}",
+        lambda: nowpayments_request(
+            "GET", "/estimate", params={"amount": amount, "currency_from": currency_from, "currency_to": currency_to}
+        ),
+        ttl=_env_float("NOWPAYMENTS_ESTIMATE_TTL", 60),
+        stale_ttl=_env_float("NOWPAYMENTS_ESTIMATE_STALE_TTL", 120),
+    )
 
-def apply_finished_status(
-    db: Session,
-    payment_id: int,
-    order_id: Optional[str],
-    payload: dict,
-) -> None:
-    db_payment = db.query(PaymentModel).filter(PaymentModel.transaction_id == str(payment_id)).first()
-    booking = get_booking_by_payment(db, payment_id, order_id)
-
-    if db_payment:
-        if db_payment.status != "completed":
-            db_payment.status = "completed"
-            db_payment.completed_at = datetime.now()
-        db_payment.payment_metadata = json.dumps(payload)
-    elif booking:
-        db_payment = PaymentModel(
-            booking_id=booking.id,
-            user_id=booking.user_id,
-            webinar_id=booking.webinar_id,
-            amount=payload.get("price_amount") or booking.amount or 0,
-            currency=(payload.get("price_currency") or "USD").upper(),
-            payment_method="crypto",
-            payment_provider="nowpayments",
-            transaction_id=str(payment_id),
-            status="completed",
-            payment_metadata=json.dumps(payload),
-            completed_at=datetime.now(),
-        )
-        db.add(db_payment)
-
-    if booking:
-        booking.payment_status = "paid"
-        booking.status = "confirmed"
-        booking.payment_date = datetime.now()
-        booking.payment_id = str(payment_id)
-        if payload.get("price_amount"):
-            booking.amount = payload.get("price_amount")
-
-        # Standalone payment (not webinar): выдаём роль/доступ пользователю
-        if (booking.type or "").lower() == "payment":
-            exists = (
-                db.query(UserEntitlement)
-                .filter(UserEntitlement.user_id == booking.user_id, UserEntitlement.code == PAID_ACCESS_ENTITLEMENT)
-                .first()
-            )
-            if not exists:
-                db.add(UserEntitlement(user_id=booking.user_id, code=PAID_ACCESS_ENTITLEMENT))
-
-    # Product purchase: выдаём доступ по order_id product-<id>
-    pp_id = parse_product_purchase_id(order_id)
-    if pp_id:
-        purchase = db.query(ProductPurchase).filter(ProductPurchase.id == pp_id).first()
-        if purchase:
-            purchase.status = "finished"
-            purchase.nowpayments_payment_id = str(payment_id)
-            purchase.raw_last_ipn = json.dumps(payload)
-            if payload.get("pay_address"):
-                purchase.pay_address = payload.get("pay_address")
-            if payload.get("pay_amount") is not None:
-                try:
-                    purchase.pay_amount = float(payload.get("pay_amount"))
-                except Exception:
-                    pass
-            exists2 = (
-                db.query(UserEntitlement)
-                .filter(UserEntitlement.user_id == purchase.user_id, UserEntitlement.code == PAID_ACCESS_ENTITLEMENT)
-                .first()
-            )
-            if not exists2:
-                db.add(UserEntitlement(user_id=purchase.user_id, code=PAID_ACCESS_ENTITLEMENT))
 
-    db.commit()
+@router.get("/currencies")
+def currencies():
+    return get_currencies_from_nowpayments()
 
 
-def get_currencies_from_nowpayments():
-    # NOWPayments: GET /v1/currencies
-    return nowpayments_request("GET", "/currencies")
+@router.get("/min-amount")
+def min_amount(
+    currency_from: str = Query(..., min_length=2, max_length=32),
+    currency_to: str = Query("usdttrc20", min_length=2, max_length=32),
+):
+    return get_min_amount_from_nowpayments(currency_from, currency_to)
 
 
-@router.get("/currencies")
-def currencies():
-    return get_currencies_from_nowpayments()
+@router.get("/estimate")
+def estimate(
+    amount: float = Query(..., gt=0),
+    currency_from: str = Query("usd", min_length=2, max_length=32),
+    currency_to: str = Query("usdttrc20", min_length=2, max_length=32),
+):
+    return get_estimate_from_nowpayments(amount, currency_from, currency_to)
 
 
 @router.post("/create", response_model=CreatePaymentResponse)
@@ -477,27 +342,18 @@ async def nowpayments_ipn(request: Request, db: Session = Depends(get_db)):
             sig_debug.get("matched_mode"),
             sorted(list(payload.keys()))[:25],
         )
-    _store_ipn_event(db, payload, signature, signature_valid)
+    # Только проверка подписи и запись события; применение — в фоне (IpnApplier).
+    # Блокирующая работа с БД не должна занимать event loop.
+    await run_in_threadpool(store_ipn_event, db, payload, signature, signature_valid)
 
     if not signature_valid:
         raise HTTPException(status_code=401, detail="Invalid signature")
 
-    payment_id = payload.get("payment_id")
-    if payment_id is None:
+    if payload.get("payment_id") is None:
         raise HTTPException(status_code=400, detail="Missing payment_id")
 
-    payment_status = payload.get("payment_status")
-    if not payment_status:
+    if not payload.get("payment_status"):
         raise HTTPException(status_code=400, detail="Missing payment_status")
 
-    _upsert_nowpayments_payment_from_ipn(db, payload)
-
-    normalized = str(payment_status).lower()
-    if normalized == "finished":
-        # ЕДИНСТВЕННЫЙ источник истины для выдачи доступа — IPN finished
-        apply_finished_status(db, int(payment_id) if str(payment_id).isdigit() else 0, payload.get("order_id"), payload)
-    else:
-        # waiting / confirming / expired / failed / refunded и т.д.
-        _apply_non_finished_status(db, str(payment_id), payload.get("order_id"), normalized, payload)
-
+    wake_ipn_applier()
     return {"status": "ok"}
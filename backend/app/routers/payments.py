@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
-from app.database import SessionLocal
+from app.database import get_db
 from app.models.payment import Payment
 from app.models.booking import Booking
 from app.models.webinar import Webinar
@@ -13,14 +13,6 @@ from app.utils.telegram_webapp import resolve_admin_telegram_id
 router = APIRouter(prefix="/payments", tags=["payments"])
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 def check_admin_access(request: Request, admin_telegram_id: int | None, db: Session) -> Admin:
     """Проверка прав администратора"""
     requester_id = resolve_admin_telegram_id(request, admin_telegram_id)
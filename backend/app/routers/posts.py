@@ -1,24 +1,20 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
-from app.database import SessionLocal
+from app.database import get_db
 from app.models.post import Post
 from app.models.admin import Admin
-from app.models.user import User
-from app.schemas.post import PostCreate, PostResponse
-from app.utils.telegram import send_telegram_message
+from app.schemas.post import PostCreate, PostFeed, PostResponse
+from app.services.broadcast_service import enqueue_broadcast
+from app.services.feed_cache import feed_cache, feed_response
 from app.utils.telegram_webapp import resolve_admin_telegram_id
 
 router = APIRouter(prefix="/posts", tags=["posts"])
 
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Сколько символов текста поста отдаёт лента
+FEED_EXCERPT_CHARS = 280
 
 
 def check_admin_access(request: Request, admin_telegram_id: int | None, db: Session) -> Admin:
@@ -41,6 +37,41 @@ def get_posts(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
     return posts
 
 
+def posts_feed_page(db: Session, limit: int, cursor: Optional[int] = None) -> dict:
+    """Страница ленты: keyset по id (новые первыми), без полного content."""
+    # id растёт вместе с created_at (его ставит БД при вставке), поэтому порядок тот же, что у get_posts,
+    # а курсор — просто id последнего поста страницы
+    query = db.query(
+        Post.id,
+        Post.title,
+        func.substr(Post.content, 1, FEED_EXCERPT_CHARS).label("excerpt"),
+        (func.length(Post.content) > FEED_EXCERPT_CHARS).label("truncated"),
+        Post.created_at,
+        Post.updated_at,
+    )
+    if cursor is not None:
+        query = query.filter(Post.id < cursor)
+    rows = query.order_by(Post.id.desc()).limit(limit + 1).all()
+    # Строки уже в форме PostSummary: собираем словари без pydantic-валидации
+    items = [{**row._mapping, "truncated": bool(row.truncated)} for row in rows[:limit]]
+    return {"items": items, "next_cursor": items[-1]["id"] if len(rows) > limit else None}
+
+
+@router.get("/feed", response_model=PostFeed)
+def get_posts_feed(
+    request: Request,
+    limit: int = Query(20, ge=1, le=50),
+    cursor: Optional[int] = Query(None, ge=1, description="next_cursor из предыдущей страницы"),
+    db: Session = Depends(get_db)
+):
+    """Лента постов для Mini App (доступно всем)
+
+    Ответ кэшируется в процессе и отдаётся с ETag: повторный запрос с If-None-Match получает 304.
+    """
+    entry = feed_cache.get(db, "posts", f"{limit}:{cursor}", lambda session: posts_feed_page(session, limit, cursor))
+    return feed_response(request, entry)
+
+
 @router.get("/{post_id}", response_model=PostResponse)
 def get_post(post_id: int, db: Session = Depends(get_db)):
     """Получить пост по ID (доступно всем)"""
@@ -64,21 +95,19 @@ def create_post(
     db.add(db_post)
     db.commit()
     db.refresh(db_post)
+    feed_cache.invalidate("posts")
 
-    # Уведомление всем пользователям (в бот): новый пост
-    users = db.query(User).filter(
-        User.telegram_id.isnot(None),
-        User.is_blocked == False  # noqa: E712
-    ).all()
+    # Уведомление всем пользователям (в бот): новый пост — ставим рассылку в очередь
     user_message = (
         "📰 <b>Новая новость!</b>\n\n"
         f"📌 <b>{db_post.title}</b>\n\n"
         "Откройте мини‑приложение и посмотрите подробности."
     )
-    for u in users:
-        send_telegram_message(u.telegram_id, user_message)
+    job = enqueue_broadcast(db, kind="post", text=user_message, ref_id=db_post.id)
 
-    return db_post
+    response = PostResponse.model_validate(db_post)
+    response.broadcast_job_id = job.id
+    return response
 
 
 @router.put("/{post_id}", response_model=PostResponse)
@@ -101,6 +130,7 @@ def update_post(
     
     db.commit()
     db.refresh(db_post)
+    feed_cache.invalidate("posts")
     return db_post
 
 
@@ -120,4 +150,5 @@ def delete_post(
     
     db.delete(db_post)
     db.commit()
+    feed_cache.invalidate("posts")
     return {"message": "Post deleted successfully"}
@@ -8,7 +8,7 @@ from datetime import datetime, timedelta, timezone
 from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 
-from app.database import SessionLocal
+from app.database import get_db
 from app.models.product_purchase import ProductPurchase
 from app.models.user import User
 from app.schemas.product_purchase import ProductPaymentCreateRequest, ProductPaymentCreateResponse
@@ -20,14 +20,6 @@ logger = logging.getLogger("product_payments")
 router = APIRouter(prefix="/product-payments", tags=["product-payments"])
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 @router.post("/create", response_model=ProductPaymentCreateResponse)
 def create_product_payment(
     payload: ProductPaymentCreateRequest,
@@ -4,7 +4,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from sqlalchemy import desc
 
-from app.database import SessionLocal
+from app.database import get_db
 from app.models.user import User
 from app.models.referral_invite import ReferralInvite
 from app.schemas.referral import ReferralInfoResponse, ReferralInviteResponse, ReferralTrackRequest
@@ -14,14 +14,6 @@ from app.utils.telegram import send_telegram_message
 router = APIRouter(prefix="/referrals", tags=["referrals"])
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 def generate_referral_code(db: Session) -> str:
     for _ in range(10):
         code = secrets.token_urlsafe(6).replace("-", "").replace("_", "")
@@ -1,25 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
+from datetime import datetime, timezone
 from typing import List
 
-from app.database import SessionLocal
+from app.database import get_db
 from app.models.booking import Booking
 from app.models.webinar import Webinar
-from app.models.user import User
 from app.models.admin import Admin
-from app.utils.telegram import send_telegram_message
+from app.services.reminder_service import run_reminder_tick
+from app.utils.fast_json import FastJSONResponse
 from app.utils.telegram_webapp import resolve_admin_telegram_id
+from app.utils.webinar_time import as_utc
 
-router = APIRouter(prefix="/reminders", tags=["reminders"])
-
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+router = APIRouter(prefix="/reminders", tags=["reminders"], default_response_class=FastJSONResponse)
 
 
 def check_admin_access(request: Request, admin_telegram_id: int | None, db: Session) -> Admin:
@@ -41,98 +35,44 @@ def check_and_send_reminders(
     """Проверить и отправить напоминания о вебинарах (только для администраторов)
     
     Этот endpoint должен вызываться периодически (например, каждые 5 минут) через cron job или планировщик задач.
-    Он проверяет все предстоящие вебинары и отправляет напоминания за 12 часов, 2 часа и 15 минут (только оплатившим).
+    Время напоминаний (за 12 часов, 2 часа и 15 минут) заранее рассчитано в таблице reminder_schedule;
+    отправляются только оплатившим.
     """
     check_admin_access(request, admin_telegram_id, db)
-    
-    now = datetime.now()
-    reminders_sent = {
-        "12h": 0,
-        "2h": 0,
-        "15m": 0
-    }
-    
-    # Получаем все предстоящие вебинары
-    upcoming_webinars = db.query(Webinar).filter(
-        Webinar.status == "upcoming"
-    ).all()
-    
-    for webinar in upcoming_webinars:
-        try:
-            # Парсим дату и время вебинара
-            webinar_datetime = datetime.strptime(
-                f"{webinar.date} {webinar.time}",
-                "%Y-%m-%d %H:%M"
-            )
-            
-            # Получаем все подтвержденные записи на этот вебинар
-            bookings = db.query(Booking).filter(
-                Booking.webinar_id == webinar.id,
-                Booking.status.in_(["confirmed", "paid"]),
-                Booking.payment_status == "paid"  # только оплатившие
-            ).all()
-            
-            time_until = webinar_datetime - now
-            
-            for booking in bookings:
-                user = db.query(User).filter(User.id == booking.user_id).first()
-                if not user or not user.telegram_id or user.is_blocked:
-                    continue
-                
-                # Напоминание за 12 часов (флаг reminder_sent_24h используется как "12h")
-                if timedelta(hours=11, minutes=50) <= time_until <= timedelta(hours=12, minutes=10):
-                    if booking.reminder_sent_24h == 0:
-                        msg = (
-                            "⏰ <b>Напоминание о вебинаре</b>\n\n"
-                            f"Через <b>12 часов</b> начнётся вебинар:\n"
-                            f"📌 <b>{webinar.title}</b>\n"
-                            f"🗓 <b>{webinar.date}</b> ⏰ <b>{webinar.time}</b>\n\n"
-                            "Откройте мини‑приложение, чтобы посмотреть детали."
-                        )
-                        send_telegram_message(user.telegram_id, msg)
-                        booking.reminder_sent_24h = 1
-                        reminders_sent["12h"] += 1
-                
-                # Напоминание за 2 часа (флаг reminder_sent_1h используется как "2h")
-                elif timedelta(hours=1, minutes=50) <= time_until <= timedelta(hours=2, minutes=10):
-                    if booking.reminder_sent_1h == 0:
-                        msg = (
-                            "⏰ <b>Напоминание о вебинаре</b>\n\n"
-                            f"Через <b>2 часа</b> начнётся вебинар:\n"
-                            f"📌 <b>{webinar.title}</b>\n"
-                            f"🗓 <b>{webinar.date}</b> ⏰ <b>{webinar.time}</b>\n\n"
-                            "Откройте мини‑приложение заранее, чтобы быть готовым."
-                        )
-                        send_telegram_message(user.telegram_id, msg)
-                        booking.reminder_sent_1h = 1
-                        reminders_sent["2h"] += 1
-                
-                # Напоминание за 15 минут (флаг reminder_sent_10m используется как "15m")
-                elif timedelta(minutes=10) <= time_until <= timedelta(minutes=20):
-                    if booking.reminder_sent_10m == 0:
-                        msg = (
-                            "🚀 <b>Вебинар скоро начнётся</b>\n\n"
-                            f"Через <b>15 минут</b> старт:\n"
-                            f"📌 <b>{webinar.title}</b>\n"
-                            f"🗓 <b>{webinar.date}</b> ⏰ <b>{webinar.time}</b>\n\n"
-                            "Откройте мини‑приложение: кнопка <b>«Подключиться»</b> уже доступна."
-                        )
-                        send_telegram_message(user.telegram_id, msg)
-                        booking.reminder_sent_10m = 1
-                        reminders_sent["15m"] += 1
-            
-            db.commit()
-        except Exception as e:
-            print(f"Error processing webinar {webinar.id}: {e}")
-            continue
-    
+
+    # Один проход по индексу reminder_schedule (см. app/services/reminder_service.py)
+    stats = run_reminder_tick(db)
+
     return {
         "message": "Reminders checked and sent",
-        "reminders_sent": reminders_sent,
-        "timestamp": now.isoformat()
+        "reminders_sent": stats["sent"],
+        "failed": stats["failed"],
+        "skipped": stats["skipped"],
+        "expired": stats["expired"],
+        "timestamp": datetime.now().isoformat()
     }
 
 
+def upcoming_webinars_with_counts(db: Session, now: datetime | None = None):
+    """(Webinar, confirmed/paid bookings count) for upcoming webinars that have not started yet."""
+    now = now or datetime.now(timezone.utc)
+    # Количество записей: подзапрос по индексу (webinar_id, status) только для найденных вебинаров,
+    # без GROUP BY по всей таблице bookings
+    bookings_count = (
+        select(func.count(Booking.id))
+        .where(Booking.webinar_id == Webinar.id, Booking.status.in_(["confirmed", "paid"]))
+        .correlate(Webinar)
+        .scalar_subquery()
+    )
+    # Диапазон по индексу starts_at вместо разбора строк date/time в Python
+    return (
+        db.query(Webinar, bookings_count)
+        .filter(Webinar.status == "upcoming", Webinar.starts_at > now)
+        .order_by(Webinar.starts_at)
+        .all()
+    )
+
+
 @router.get("/upcoming")
 def get_upcoming_reminders(
     request: Request,
@@ -142,34 +82,18 @@ def get_upcoming_reminders(
     """Получить список предстоящих вебинаров, которым нужны напоминания (только для администраторов)"""
     check_admin_access(request, admin_telegram_id, db)
     
-    now = datetime.now()
+    now = datetime.now(timezone.utc)
     upcoming = []
     
-    webinars = db.query(Webinar).filter(
-        Webinar.status == "upcoming"
-    ).all()
-    
-    for webinar in webinars:
-        try:
-            webinar_datetime = datetime.strptime(
-                f"{webinar.date} {webinar.time}",
-                "%Y-%m-%d %H:%M"
-            )
-            
-            if webinar_datetime > now:
-                bookings = db.query(Booking).filter(
-                    Booking.webinar_id == webinar.id,
-                    Booking.status.in_(["confirmed", "paid"])
-                ).count()
-                
-                upcoming.append({
-                    "webinar_id": webinar.id,
-                    "title": webinar.title,
-                    "datetime": webinar_datetime.isoformat(),
-                    "time_until": str(webinar_datetime - now),
-                    "bookings_count": bookings
-                })
-        except:
-            continue
+    for webinar, bookings in upcoming_webinars_with_counts(db, now):
+        starts_at = as_utc(webinar.starts_at)
+        upcoming.append({
+            "webinar_id": webinar.id,
+            "title": webinar.title,
+            # Как и раньше — локальное время сервера
+            "datetime": starts_at.astimezone().replace(tzinfo=None).isoformat(),
+            "time_until": str(starts_at - now),
+            "bookings_count": int(bookings)
+        })
     
     return {"upcoming_webinars": upcoming}
@@ -2,125 +2,50 @@ from fastapi import APIRouter, Depends, HTTPException, Body, Query, Request
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
-from app.database import SessionLocal
+from app.database import get_db
 from app.models.user import User
 from app.models.admin import Admin
-from app.models.user_entitlement import UserEntitlement
 from app.schemas.user import UserCreate, UserResponse, UserUpdate
+from app.services.user_profiles import get_profile, list_profiles
+from app.utils.fast_json import trusted_json
 from app.utils.telegram_webapp import resolve_admin_telegram_id
 
 router = APIRouter(prefix="/users", tags=["users"])
 
-PAID_ACCESS_ENTITLEMENT = "paid_access"
-
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 
 @router.get("/", response_model=List[UserResponse])
 def get_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    users = db.query(User).offset(skip).limit(limit).all()
-    
-    # Добавляем информацию об админстве для каждого пользователя
-    result = []
-    for user in users:
-        admin = db.query(Admin).filter(Admin.telegram_id == user.telegram_id).first()
-        has_paid_access = (
-            db.query(UserEntitlement)
-            .filter(UserEntitlement.user_id == user.id, UserEntitlement.code == PAID_ACCESS_ENTITLEMENT)
-            .first()
-            is not None
-        )
-        user_dict = {
-            "id": user.id,
-            "telegram_id": user.telegram_id,
-            "username": user.username,
-            "first_name": user.first_name,
-            "last_name": user.last_name,
-            "photo_url": user.photo_url,
-            "referral_code": user.referral_code,
-            "referred_by_telegram_id": user.referred_by_telegram_id,
-            "is_blocked": user.is_blocked,
-            "is_admin": admin is not None,
-            "role": admin.role if admin else None,
-            "client_role": "member" if has_paid_access else None,
-            "has_paid_access": has_paid_access,
-        }
-        result.append(user_dict)
-    return result
+    # Админство и оплаченный доступ подтягиваются одним запросом (outer join);
+    # словари уже в форме UserResponse — отдаём без повторной валидации
+    return trusted_json(list_profiles(db, skip=skip, limit=limit))
 
 
 @router.get("/telegram/{telegram_id}", response_model=UserResponse)
 def get_user_by_telegram_id(telegram_id: int, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.telegram_id == telegram_id).first()
-    if not user:
+    profile = get_profile(db, telegram_id=telegram_id)
+    if not profile:
         raise HTTPException(status_code=404, detail="User not found")
-    
-    # Проверяем, является ли пользователь админом
-    admin = db.query(Admin).filter(Admin.telegram_id == telegram_id).first()
-    has_paid_access = (
-        db.query(UserEntitlement)
-        .filter(UserEntitlement.user_id == user.id, UserEntitlement.code == PAID_ACCESS_ENTITLEMENT)
-        .first()
-        is not None
-    )
-    
-    # Создаем ответ с информацией об админстве
-    user_dict = {
-        "id": user.id,
-        "telegram_id": user.telegram_id,
-        "username": user.username,
-        "first_name": user.first_name,
-        "last_name": user.last_name,
-        "photo_url": user.photo_url,
-        "referral_code": user.referral_code,
-        "referred_by_telegram_id": user.referred_by_telegram_id,
-        "is_blocked": user.is_blocked,
-        "is_admin": admin is not None,
-        "role": admin.role if admin else None,
-        "client_role": "member" if has_paid_access else None,
-        "has_paid_access": has_paid_access,
-    }
-    return user_dict
+    return trusted_json(profile)
 
 
 @router.get("/{user_id}", response_model=UserResponse)
 def get_user(user_id: int, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
+    profile = get_profile(db, user_id=user_id)
+    if not profile:
         raise HTTPException(status_code=404, detail="User not found")
-    
-    # Проверяем, является ли пользователь админом
-    admin = db.query(Admin).filter(Admin.telegram_id == user.telegram_id).first()
-    has_paid_access = (
-        db.query(UserEntitlement)
-        .filter(UserEntitlement.user_id == user.id, UserEntitlement.code == PAID_ACCESS_ENTITLEMENT)
-        .first()
-        is not None
-    )
-    
-    # Создаем ответ с информацией об админстве
-    user_dict = {
-        "id": user.id,
-        "telegram_id": user.telegram_id,
-        "username": user.username,
-        "first_name": user.first_name,
-        "last_name": user.last_name,
-        "photo_url": user.photo_url,
-        "referral_code": user.referral_code,
-        "referred_by_telegram_id": user.referred_by_telegram_id,
-        "is_blocked": user.is_blocked,
-        "is_admin": admin is not None,
-        "role": admin.role if admin else None,
-        "client_role": "member" if has_paid_access else None,
-        "has_paid_access": has_paid_access,
-    }
-    return user_dict
+    return trusted_json(profile)
+
+
+def _apply_profile_fields(user: User, data) -> None:
+    """Обновляет только переданные поля профиля"""
+    if data.username is not None:
+        user.username = data.username
+    if data.first_name is not None:
+        user.first_name = data.first_name
+    if data.last_name is not None:
+        user.last_name = data.last_name
+    if data.photo_url is not None:
+        user.photo_url = data.photo_url
 
 
 @router.post("/", response_model=UserResponse)
@@ -130,111 +55,25 @@ def create_user(user: UserCreate, db: Session = Depends(get_db)):
     existing_user = db.query(User).filter(User.telegram_id == user.telegram_id).first()
     if existing_user:
         # Обновляем данные пользователя если они изменились
-        if user.username is not None:
-            existing_user.username = user.username
-        if user.first_name is not None:
-            existing_user.first_name = user.first_name
-        if user.last_name is not None:
-            existing_user.last_name = user.last_name
-        if user.photo_url is not None:
-            existing_user.photo_url = user.photo_url
+        _apply_profile_fields(existing_user, user)
         db.commit()
-        db.refresh(existing_user)
-        
-        # Проверяем, является ли пользователь админом
-        admin = db.query(Admin).filter(Admin.telegram_id == existing_user.telegram_id).first()
-        has_paid_access = (
-            db.query(UserEntitlement)
-            .filter(UserEntitlement.user_id == existing_user.id, UserEntitlement.code == PAID_ACCESS_ENTITLEMENT)
-            .first()
-            is not None
-        )
-        return {
-            "id": existing_user.id,
-            "telegram_id": existing_user.telegram_id,
-            "username": existing_user.username,
-            "first_name": existing_user.first_name,
-            "last_name": existing_user.last_name,
-            "photo_url": existing_user.photo_url,
-            "referral_code": existing_user.referral_code,
-            "referred_by_telegram_id": existing_user.referred_by_telegram_id,
-            "is_blocked": existing_user.is_blocked,
-            "is_admin": admin is not None,
-            "role": admin.role if admin else None,
-            "client_role": "member" if has_paid_access else None,
-            "has_paid_access": has_paid_access,
-        }
+        return get_profile(db, user_id=existing_user.id)
     
     # Создаем нового пользователя
     try:
         db_user = User(**user.model_dump())
         db.add(db_user)
         db.commit()
-        db.refresh(db_user)
-        
-        # Проверяем, является ли пользователь админом
-        admin = db.query(Admin).filter(Admin.telegram_id == db_user.telegram_id).first()
-        has_paid_access = (
-            db.query(UserEntitlement)
-            .filter(UserEntitlement.user_id == db_user.id, UserEntitlement.code == PAID_ACCESS_ENTITLEMENT)
-            .first()
-            is not None
-        )
-        return {
-            "id": db_user.id,
-            "telegram_id": db_user.telegram_id,
-            "username": db_user.username,
-            "first_name": db_user.first_name,
-            "last_name": db_user.last_name,
-            "photo_url": db_user.photo_url,
-            "referral_code": db_user.referral_code,
-            "referred_by_telegram_id": db_user.referred_by_telegram_id,
-            "is_blocked": db_user.is_blocked,
-            "is_admin": admin is not None,
-            "role": admin.role if admin else None,
-            "client_role": "member" if has_paid_access else None,
-            "has_paid_access": has_paid_access,
-        }
+        return get_profile(db, user_id=db_user.id)
     except Exception as e:
         db.rollback()
         # Если возникла ошибка UNIQUE constraint, значит пользователь был создан между проверкой и вставкой
         # Повторно проверяем и возвращаем существующего пользователя
         existing_user = db.query(User).filter(User.telegram_id == user.telegram_id).first()
         if existing_user:
-            # Обновляем данные пользователя
-            if user.username is not None:
-                existing_user.username = user.username
-            if user.first_name is not None:
-                existing_user.first_name = user.first_name
-            if user.last_name is not None:
-                existing_user.last_name = user.last_name
-            if user.photo_url is not None:
-                existing_user.photo_url = user.photo_url
+            _apply_profile_fields(existing_user, user)
             db.commit()
-            db.refresh(existing_user)
-            
-            admin = db.query(Admin).filter(Admin.telegram_id == existing_user.telegram_id).first()
-            has_paid_access = (
-                db.query(UserEntitlement)
-                .filter(UserEntitlement.user_id == existing_user.id, UserEntitlement.code == PAID_ACCESS_ENTITLEMENT)
-                .first()
-                is not None
-            )
-            return {
-                "id": existing_user.id,
-                "telegram_id": existing_user.telegram_id,
-                "username": existing_user.username,
-                "first_name": existing_user.first_name,
-                "last_name": existing_user.last_name,
-                "photo_url": existing_user.photo_url,
-                "referral_code": existing_user.referral_code,
-                "referred_by_telegram_id": existing_user.referred_by_telegram_id,
-                "is_blocked": existing_user.is_blocked,
-                "is_admin": admin is not None,
-                "role": admin.role if admin else None,
-                "client_role": "member" if has_paid_access else None,
-                "has_paid_access": has_paid_access,
-            }
+            return get_profile(db, user_id=existing_user.id)
         # Если пользователь все еще не найден, пробрасываем ошибку
         raise HTTPException(status_code=400, detail=f"Failed to create user: {str(e)}")
 
@@ -246,99 +85,44 @@ def create_or_update_user_by_telegram(
     db: Session = Depends(get_db)
 ):
     """Создает или обновляет пользователя по telegram_id. Если пользователь уже существует, обновляет его данные."""
-    # Если данные переданы в body, используем их
-    if user_data:
-        username = user_data.username
-        first_name = user_data.first_name
-        last_name = user_data.last_name
-        photo_url = user_data.photo_url
-        is_blocked = user_data.is_blocked
-    else:
-        # Иначе используем значения по умолчанию
-        username = None
-        first_name = None
-        last_name = None
-        photo_url = None
-        is_blocked = None
+    # Если данные не переданы, используем пустое обновление
+    user_data = user_data or UserUpdate()
     
     # Проверяем, существует ли пользователь
     existing_user = db.query(User).filter(User.telegram_id == telegram_id).first()
     if existing_user:
         # Обновляем данные пользователя
-        if username is not None:
-            existing_user.username = username
-        if first_name is not None:
-            existing_user.first_name = first_name
-        if last_name is not None:
-            existing_user.last_name = last_name
-        if photo_url is not None:
-            existing_user.photo_url = photo_url
-        if is_blocked is not None:
-            existing_user.is_blocked = is_blocked
+        _apply_profile_fields(existing_user, user_data)
+        if user_data.is_blocked is not None:
+            existing_user.is_blocked = user_data.is_blocked
         db.commit()
-        db.refresh(existing_user)
     else:
         # Создаем нового пользователя с обработкой возможной ошибки UNIQUE constraint
         try:
             user = User(
                 telegram_id=telegram_id,
-                username=username,
-                first_name=first_name,
-                last_name=last_name,
-                photo_url=photo_url
+                username=user_data.username,
+                first_name=user_data.first_name,
+                last_name=user_data.last_name,
+                photo_url=user_data.photo_url
             )
             db.add(user)
             db.commit()
-            db.refresh(user)
             existing_user = user
         except Exception as e:
             db.rollback()
             # Если возникла ошибка UNIQUE constraint, значит пользователь был создан между проверкой и вставкой
             # Повторно проверяем и обновляем существующего пользователя
             existing_user = db.query(User).filter(User.telegram_id == telegram_id).first()
-            if existing_user:
-                if username is not None:
-                    existing_user.username = username
-                if first_name is not None:
-                    existing_user.first_name = first_name
-                if last_name is not None:
-                    existing_user.last_name = last_name
-                if photo_url is not None:
-                    existing_user.photo_url = photo_url
-            if is_blocked is not None:
-                existing_user.is_blocked = is_blocked
-                db.commit()
-                db.refresh(existing_user)
-            else:
+            if not existing_user:
                 # Если пользователь все еще не найден, пробрасываем ошибку
                 raise HTTPException(status_code=400, detail=f"Failed to create user: {str(e)}")
+            _apply_profile_fields(existing_user, user_data)
+            if user_data.is_blocked is not None:
+                existing_user.is_blocked = user_data.is_blocked
+            db.commit()
     
-    # Проверяем, является ли пользователь админом
-    admin = db.query(Admin).filter(Admin.telegram_id == telegram_id).first()
-    has_paid_access = (
-        db.query(UserEntitlement)
-        .filter(UserEntitlement.user_id == existing_user.id, UserEntitlement.code == PAID_ACCESS_ENTITLEMENT)
-        .first()
-        is not None
-    )
-    
-    # Создаем ответ с информацией об админстве
-    user_dict = {
-        "id": existing_user.id,
-        "telegram_id": existing_user.telegram_id,
-        "username": existing_user.username,
-        "first_name": existing_user.first_name,
-        "last_name": existing_user.last_name,
-        "photo_url": existing_user.photo_url,
-        "referral_code": existing_user.referral_code,
-        "referred_by_telegram_id": existing_user.referred_by_telegram_id,
-        "is_blocked": existing_user.is_blocked,
-        "is_admin": admin is not None,
-        "role": admin.role if admin else None,
-        "client_role": "member" if has_paid_access else None,
-        "has_paid_access": has_paid_access,
-    }
-    return user_dict
+    return get_profile(db, user_id=existing_user.id)
 
 
 @router.put("/{user_id}/block")
@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
 from typing import List
 
-from app.database import SessionLocal
+from app.database import get_db
 from app.models.webinar_material import WebinarMaterial
 from app.models.webinar import Webinar
 from app.models.admin import Admin
@@ -12,14 +12,6 @@ from app.utils.telegram_webapp import resolve_admin_telegram_id
 router = APIRouter(prefix="/webinar-materials", tags=["webinar-materials"])
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 def check_admin_access(request: Request, admin_telegram_id: int | None, db: Session) -> Admin:
     """Проверка прав администратора"""
     requester_id = resolve_admin_telegram_id(request, admin_telegram_id)
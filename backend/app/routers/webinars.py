@@ -1,26 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from datetime import datetime, timezone
+from typing import List, Literal, Optional
 
-from app.database import SessionLocal
+from app.database import get_db
 from app.models.webinar import Webinar
 from app.models.admin import Admin
-from app.models.user import User
-from app.schemas.webinar import WebinarCreate, WebinarResponse
+from app.schemas.webinar import WebinarCreate, WebinarFeed, WebinarResponse
+from app.services.broadcast_service import enqueue_broadcast
+from app.services.cascade_delete import delete_webinar_tree
+from app.services.feed_cache import feed_cache, feed_response
+from app.services.reminder_service import schedule_webinar_reminders
 from app.utils.telegram import send_telegram_message
 from app.utils.telegram_webapp import resolve_admin_telegram_id
 
 router = APIRouter(prefix="/webinars", tags=["webinars"])
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 def check_admin_access(request: Request, admin_telegram_id: int | None, db: Session) -> Admin:
     """Проверка прав администратора для создания вебинаров"""
     requester_id = resolve_admin_telegram_id(request, admin_telegram_id)
@@ -31,12 +27,62 @@ def check_admin_access(request: Request, admin_telegram_id: int | None, db: Sess
 
 
 @router.get("/", response_model=List[WebinarResponse])
-def get_webinars(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def get_webinars(
+    skip: int = 0,
+    limit: int = 100,
+    when: Optional[Literal["upcoming", "past"]] = Query(None, description="upcoming — ещё не начались, past — уже прошли"),
+    db: Session = Depends(get_db)
+):
     """Получить список всех вебинаров (доступно всем)"""
-    webinars = db.query(Webinar).offset(skip).limit(limit).all()
+    query = db.query(Webinar)
+    if when is not None:
+        # Диапазон по индексу starts_at; вебинары с нераспознанной датой (starts_at NULL) не попадают ни туда, ни туда
+        now = datetime.now(timezone.utc)
+        if when == "upcoming":
+            query = query.filter(Webinar.starts_at > now).order_by(Webinar.starts_at)
+        else:
+            query = query.filter(Webinar.starts_at <= now).order_by(Webinar.starts_at.desc())
+    webinars = query.offset(skip).limit(limit).all()
     return webinars
 
 
+def webinars_feed_page(db: Session, limit: int, cursor: Optional[int] = None) -> dict:
+    """Страница ленты: keyset по id (новые первыми), без description и ссылок."""
+    query = db.query(
+        Webinar.id,
+        Webinar.title,
+        Webinar.date,
+        Webinar.time,
+        Webinar.starts_at,
+        Webinar.duration,
+        Webinar.speaker,
+        Webinar.status,
+        Webinar.price_usd,
+        Webinar.price_eur,
+    )
+    if cursor is not None:
+        query = query.filter(Webinar.id < cursor)
+    rows = query.order_by(Webinar.id.desc()).limit(limit + 1).all()
+    # Строки уже в форме WebinarSummary: собираем словари без pydantic-валидации
+    items = [dict(row._mapping) for row in rows[:limit]]
+    return {"items": items, "next_cursor": items[-1]["id"] if len(rows) > limit else None}
+
+
+@router.get("/feed", response_model=WebinarFeed)
+def get_webinars_feed(
+    request: Request,
+    limit: int = Query(20, ge=1, le=50),
+    cursor: Optional[int] = Query(None, ge=1, description="next_cursor из предыдущей страницы"),
+    db: Session = Depends(get_db)
+):
+    """Лента вебинаров для Mini App (доступно всем)
+
+    Ответ кэшируется в процессе и отдаётся с ETag: повторный запрос с If-None-Match получает 304.
+    """
+    entry = feed_cache.get(db, "webinars", f"{limit}:{cursor}", lambda session: webinars_feed_page(session, limit, cursor))
+    return feed_response(request, entry)
+
+
 @router.get("/{webinar_id}", response_model=WebinarResponse)
 def get_webinar(webinar_id: int, db: Session = Depends(get_db)):
     """Получить вебинар по ID (доступно всем)"""
@@ -69,6 +115,8 @@ def create_webinar(
     db.add(db_webinar)
     db.commit()
     db.refresh(db_webinar)
+    feed_cache.invalidate("webinars")
+    schedule_webinar_reminders(db, db_webinar)
 
     admin_message = (
         "🎓 <b>Вебинар создан</b>\n\n"
@@ -80,11 +128,7 @@ def create_webinar(
     # Use resolved admin id (works with Telegram initData auth)
     send_telegram_message(admin.telegram_id, admin_message)
 
-    # Уведомление всем пользователям (в бот): новый вебинар
-    users = db.query(User).filter(
-        User.telegram_id.isnot(None),
-        User.is_blocked == False  # noqa: E712
-    ).all()
+    # Уведомление всем пользователям (в бот): новый вебинар — ставим рассылку в очередь
     user_message = (
         "🎓 <b>Новый вебинар!</b>\n\n"
         f"📌 Тема: <b>{db_webinar.title}</b>\n"
@@ -92,10 +136,11 @@ def create_webinar(
         f"⏰ Время: <b>{db_webinar.time}</b>\n\n"
         "Откройте мини‑приложение и посмотрите детали."
     )
-    for u in users:
-        send_telegram_message(u.telegram_id, user_message)
+    job = enqueue_broadcast(db, kind="webinar", text=user_message, ref_id=db_webinar.id)
 
-    return db_webinar
+    response = WebinarResponse.model_validate(db_webinar)
+    response.broadcast_job_id = job.id
+    return response
 
 
 @router.put("/{webinar_id}", response_model=WebinarResponse)
@@ -127,6 +172,9 @@ def update_webinar(
     
     db.commit()
     db.refresh(db_webinar)
+    feed_cache.invalidate("webinars")
+    # Дата/время/статус могли измениться — пересчитываем напоминания
+    schedule_webinar_reminders(db, db_webinar)
     return db_webinar
 
 
@@ -150,15 +198,10 @@ def delete_webinar(
     if not db_webinar:
         raise HTTPException(status_code=404, detail="Webinar not found")
     
-    # Импортируем Booking для удаления связанных записей
-    from app.models.booking import Booking
-    
-    # Удаляем все бронирования, связанные с этим вебинаром
-    bookings_count = db.query(Booking).filter(Booking.webinar_id == webinar_id).delete()
-    
-    # Удаляем вебинар
-    db.delete(db_webinar)
+    # Удаляем вебинар вместе с напоминаниями, материалами, платежами и бронированиями
+    bookings_count = delete_webinar_tree(db, db_webinar)
     db.commit()
+    feed_cache.invalidate("webinars")
     return {
         "message": "Webinar deleted successfully",
         "deleted_bookings": bookings_count
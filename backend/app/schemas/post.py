@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 class PostBase(BaseModel):
@@ -13,6 +13,22 @@ class PostResponse(PostBase):
     id: int
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
+    broadcast_job_id: Optional[int] = None  # ID рассылки (только в ответе на создание)
 
     class Config:
         from_attributes = True
+
+
+class PostSummary(BaseModel):
+    """Элемент ленты: без полного текста, только начало (excerpt)"""
+    id: int
+    title: str
+    excerpt: str
+    truncated: bool  # True — полный текст длиннее excerpt (GET /posts/{id})
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+
+class PostFeed(BaseModel):
+    items: List[PostSummary]
+    next_cursor: Optional[int] = None  # передать как ?cursor= для следующей страницы
@@ -1,5 +1,6 @@
+from datetime import datetime
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 
 class WebinarBase(BaseModel):
     title: str
@@ -20,7 +21,27 @@ class WebinarCreate(WebinarBase):
 
 class WebinarResponse(WebinarBase):
     id: int
+    starts_at: Optional[datetime] = None  # Начало в UTC (из date + time)
+    broadcast_job_id: Optional[int] = None  # ID рассылки (только в ответе на создание)
 
     class Config:
         from_attributes = True
 
+
+class WebinarSummary(BaseModel):
+    """Элемент ленты: без описания и ссылок (полные данные — GET /webinars/{id})"""
+    id: int
+    title: str
+    date: str
+    time: str
+    starts_at: Optional[datetime] = None
+    duration: Optional[str] = None
+    speaker: Optional[str] = None
+    status: Optional[str] = None
+    price_usd: Optional[float] = 0.0
+    price_eur: Optional[float] = 0.0
+
+
+class WebinarFeed(BaseModel):
+    items: List[WebinarSummary]
+    next_cursor: Optional[int] = None  # передать как ?cursor= для следующей страницы
@@ -0,0 +1,162 @@
+"""
+Admin panel session principals.
+
+A principal is the immutable part of an AdminPanelUser that a request needs
+(id, username, role, session_version) plus its scopes compiled once into
+frozensets. Principals are cached in-process by (user_id, session_version)
+for a short TTL, so admin pages and form posts skip the AdminPanelUser
+lookup. Updates, deactivation, password resets and deletes in this process
+invalidate the user's entries right away; other processes pick the change
+up when the TTL expires (a password reset bumps session_version, which the
+new cookie carries, so only old cookies can ride out the TTL there).
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from app.models.admin_panel_user import AdminPanelUser
+from app.utils.metrics import register_stats
+
+FULL_ACCESS_ROLES = ("developer", "разработчик", "owner", "владелец")
+ADMIN_ROLES = ("admin", "админ", "администратор")
+SUPPORT_ROLES = ("support", "поддержка")
+EDITOR_ROLES = ("editor", "редактор")
+
+ADMIN_DEFAULT_SCOPES = frozenset(
+    {
+        "posts:view", "posts:write", "posts:delete",
+        "webinars:view", "webinars:write", "webinars:delete",
+        "tickets:view", "tickets:respond",
+        "data:view", "data:delete",
+        "admins:manage",
+        "balance:view", "balance:manage",
+    }
+)
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+def role_default_scopes(role: str) -> frozenset[str]:
+    r = (role or "").strip().lower()
+    if r in FULL_ACCESS_ROLES:
+        return frozenset({"*"})
+    if r in ADMIN_ROLES:
+        return ADMIN_DEFAULT_SCOPES
+    if r in SUPPORT_ROLES:
+        return frozenset({"tickets:view", "tickets:respond"})
+    if r in EDITOR_ROLES:
+        return frozenset({"posts:view", "posts:write", "webinars:view", "webinars:write"})
+    # Unknown roles: no access by default (explicit scopes recommended)
+    return frozenset()
+
+
+@dataclass(frozen=True)
+class ScopeSet:
+    """Scopes with wildcards resolved once: "*" -> everything, "posts:*" -> prefix "posts"."""
+
+    scopes: frozenset[str]
+    everything: bool
+    prefixes: frozenset[str]
+
+    @classmethod
+    def compile(cls, raw: Optional[str], role: str) -> "ScopeSet":
+        if raw:
+            scopes = frozenset(p.strip().lower() for p in raw.split(",") if p.strip())
+        else:
+            scopes = role_default_scopes(role)
+        prefixes = frozenset(s[:-2] for s in scopes if s.endswith(":*"))
+        return cls(scopes=scopes, everything="*" in scopes, prefixes=prefixes)
+
+    def allows(self, scope: str) -> bool:
+        if self.everything:
+            return True
+        s = scope.strip().lower()
+        if s in self.scopes:
+            return True
+        # Backward-compatible aliases (old coarse scopes, e.g. "posts" grants "posts:write")
+        coarse, sep, _ = s.partition(":")
+        if coarse in self.scopes:
+            return True
+        # Wildcards like "posts:*"
+        return bool(sep) and coarse in self.prefixes
+
+
+@dataclass(frozen=True)
+class AdminPrincipal:
+    id: int
+    username: str
+    role: str
+    session_version: int
+    scope_set: ScopeSet
+
+    @classmethod
+    def from_user(cls, u: AdminPanelUser) -> "AdminPrincipal":
+        return cls(
+            id=u.id,
+            username=u.username,
+            role=u.role,
+            session_version=int(u.session_version or 0),
+            scope_set=ScopeSet.compile(u.scopes, u.role),
+        )
+
+
+class PrincipalCache:
+    def __init__(self, *, ttl: Optional[float] = None, max_size: int = 1024, clock=time.monotonic):
+        self.ttl = ttl if ttl is not None else _env_float("ADMIN_PANEL_PRINCIPAL_TTL_SECONDS", 30.0)
+        self.max_size = max_size
+        self.clock = clock
+        self._items: OrderedDict[tuple[int, int], tuple[float, AdminPrincipal]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def get(self, user_id: int, session_version: int) -> Optional[AdminPrincipal]:
+        key = (user_id, session_version)
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None or entry[0] <= self.clock():
+                if entry is not None:
+                    del self._items[key]
+                self.stats["misses"] += 1
+                return None
+            self._items.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[1]
+
+    def put(self, principal: AdminPrincipal) -> None:
+        if self.ttl <= 0:
+            return
+        key = (principal.id, principal.session_version)
+        with self._lock:
+            self._items[key] = (self.clock() + self.ttl, principal)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            for key in [k for k in self._items if k[0] == user_id]:
+                del self._items[key]
+            self.stats["invalidations"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self.stats["invalidations"] += 1
+
+    def snapshot_stats(self) -> dict:
+        with self._lock:
+            return dict(self.stats, size=len(self._items))
+
+
+principal_cache = PrincipalCache()
+register_stats("admin_sessions", principal_cache.snapshot_stats)
@@ -0,0 +1,152 @@
+"""
+Aggregate counters and trends for the admin Data page.
+
+All counters come from one statement (a scalar subquery per table). On
+Postgres, tables whose planner estimate (pg_class.reltuples) is above
+ADMIN_STATS_EXACT_MAX_ROWS use that estimate instead of a full COUNT(*) scan;
+the CASE only runs the exact count for small (or never analyzed) tables.
+Daily signups/bookings are grouped in SQL over the indexed created_at
+columns, both series in one UNION ALL. Results are cached per process for
+ADMIN_STATS_TTL_SECONDS; data clears in the panel drop the cache.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import Date, bindparam, cast, func, literal, select, text, union_all
+from sqlalchemy.orm import Session
+
+from app.models.admin import Admin
+from app.models.booking import Booking
+from app.models.payment import Payment
+from app.models.post import Post
+from app.models.referral_invite import ReferralInvite
+from app.models.user import User
+from app.models.webinar import Webinar
+
+# Counter name -> table, in Data page order
+COUNTED = {
+    "users": User.__table__,
+    "admins": Admin.__table__,
+    "posts": Post.__table__,
+    "webinars": Webinar.__table__,
+    "bookings": Booking.__table__,
+    "payments": Payment.__table__,
+    "referrals": ReferralInvite.__table__,
+}
+
+TRENDS = {
+    "signups": User.__table__.c.created_at,
+    "bookings": Booking.__table__.c.created_at,
+}
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+@dataclass(frozen=True)
+class DashboardStats:
+    counts: dict[str, int]
+    # Counters taken from planner estimates (shown as approximate)
+    estimated: frozenset[str]
+    # name -> [(day, count)] for the last N days, oldest first, zero days included
+    trends: dict[str, list[tuple[date, int]]]
+    computed_at: float
+
+
+def _exact_counts(db: Session) -> dict[str, int]:
+    stmt = select(
+        *(select(func.count()).select_from(table).scalar_subquery().label(name) for name, table in COUNTED.items())
+    )
+    row = db.execute(stmt).one()
+    return {name: int(row._mapping[name]) for name in COUNTED}
+
+
+def _postgres_counts(db: Session, exact_max_rows: int) -> tuple[dict[str, int], frozenset[str]]:
+    quote = db.get_bind().dialect.identifier_preparer.quote
+    columns = []
+    for name, table in COUNTED.items():
+        estimate = f"(SELECT reltuples FROM pg_class WHERE oid = to_regclass('{table.name}'))"
+        # reltuples = -1: never analyzed; the exact subquery only runs when its branch is taken
+        columns.append(
+            f"CASE WHEN {estimate} >= :exact_max THEN {estimate}::bigint "
+            f"ELSE (SELECT count(*) FROM {quote(table.name)}) END AS {name}, "
+            f"COALESCE({estimate} >= :exact_max, false) AS {name}__estimated"
+        )
+    row = db.execute(text("SELECT " + ", ".join(columns)), {"exact_max": exact_max_rows}).one()._mapping
+    counts = {name: int(row[name]) for name in COUNTED}
+    estimated = frozenset(name for name in COUNTED if row[f"{name}__estimated"])
+    return counts, estimated
+
+
+def _day(column, dialect: str):
+    if dialect == "sqlite":
+        return func.date(column)
+    return cast(column, Date)
+
+
+def _trends(db: Session, days: int) -> dict[str, list[tuple[date, int]]]:
+    dialect = db.get_bind().dialect.name
+    today = datetime.now(timezone.utc).date()
+    start = today - timedelta(days=days - 1)
+    since = datetime.combine(start, datetime.min.time(), tzinfo=timezone.utc)
+    parts = []
+    for name, column in TRENDS.items():
+        day = _day(column, dialect)
+        parts.append(
+            select(literal(name).label("series"), day.label("day"), func.count().label("n"))
+            .where(column >= bindparam("since"))
+            .group_by(day)
+        )
+    rows = db.execute(union_all(*parts), {"since": since}).all()
+
+    by_series: dict[str, dict[date, int]] = {name: {} for name in TRENDS}
+    for series, day, n in rows:
+        if isinstance(day, str):  # SQLite date() returns text
+            day = date.fromisoformat(day)
+        by_series[series][day] = int(n)
+    span = [start + timedelta(days=i) for i in range(days)]
+    return {name: [(d, values.get(d, 0)) for d in span] for name, values in by_series.items()}
+
+
+def compute_dashboard_stats(db: Session, *, days: int = 14, exact_max_rows: Optional[int] = None) -> DashboardStats:
+    if db.get_bind().dialect.name == "postgresql":
+        if exact_max_rows is None:
+            exact_max_rows = int(_env_float("ADMIN_STATS_EXACT_MAX_ROWS", 100000))
+        counts, estimated = _postgres_counts(db, exact_max_rows)
+    else:
+        counts, estimated = _exact_counts(db), frozenset()
+    return DashboardStats(counts=counts, estimated=estimated, trends=_trends(db, days), computed_at=time.time())
+
+
+_cached: Optional[tuple[float, DashboardStats]] = None
+_cache_lock = threading.Lock()
+
+
+def get_dashboard_stats(db: Session, *, ttl: Optional[float] = None, days: Optional[int] = None) -> DashboardStats:
+    """Cached compute_dashboard_stats (one computation per TTL per process)."""
+    global _cached
+    ttl = ttl if ttl is not None else _env_float("ADMIN_STATS_TTL_SECONDS", 30.0)
+    now = time.monotonic()
+    with _cache_lock:
+        if _cached is not None and _cached[0] > now:
+            return _cached[1]
+    stats = compute_dashboard_stats(db, days=days or int(_env_float("ADMIN_STATS_TREND_DAYS", 14)))
+    with _cache_lock:
+        _cached = (now + ttl, stats)
+    return stats
+
+
+def invalidate_dashboard_stats() -> None:
+    global _cached
+    with _cache_lock:
+        _cached = None
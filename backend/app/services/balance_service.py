@@ -1,6 +1,15 @@
 """
 Balance service: balance operations, deposit requests, ledger.
 All balance changes must be transactional and recorded in ledger.
+
+Balance changes go through apply_balance_delta():
+- the write lock is taken up front (BEGIN IMMEDIATE on SQLite, SELECT ... FOR
+  UPDATE on Postgres), so approve/adjust/reject can't interleave
+- the balance is changed by one `UPDATE ... SET balance_cents = balance_cents + :d
+  RETURNING balance_cents` (no read-modify-write in Python); the ledger row is
+  inserted in the same transaction with that returned value
+- an optional idempotency key (unique in balance_ledger) makes retries and
+  double submits apply once
 """
 from __future__ import annotations
 
@@ -8,8 +17,12 @@ import decimal
 import logging
 import os
 from datetime import datetime, timezone
-from typing import Optional
+from dataclasses import dataclass
+from typing import Iterable, Optional
 
+from sqlalchemy import case, func, insert, or_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from app.models.balance_ledger import BalanceLedger
@@ -45,40 +58,248 @@ def parse_money(value: str | float | int) -> int:
 
 
 def get_or_create_balance(db: Session, user_id: int) -> UserBalance:
-    """Get user balance or create with 0."""
+    """Get user balance or create with 0. Write path only: reads use get_balance_cents."""
     ub = db.query(UserBalance).filter(UserBalance.user_id == user_id).first()
     if not ub:
-        ub = UserBalance(user_id=user_id, balance_cents=0)
-        db.add(ub)
+        _ensure_balance_rows(db, [user_id])
         db.commit()
-        db.refresh(ub)
+        ub = db.query(UserBalance).filter(UserBalance.user_id == user_id).one()
     return ub
 
 
 def get_balance_cents(db: Session, user_id: int) -> int:
-    ub = get_or_create_balance(db, user_id)
-    return int(ub.balance_cents or 0)
+    """Read-only: a user without a balance row has 0 (nothing is inserted)."""
+    cents = db.query(UserBalance.balance_cents).filter(UserBalance.user_id == user_id).scalar()
+    return int(cents or 0)
+
+
+USER_BALANCE_SORTS = ("id", "balance_desc", "balance_asc")
+
+
+def list_users_with_balance(
+    db: Session,
+    *,
+    search: str = "",
+    min_cents: Optional[int] = None,
+    max_cents: Optional[int] = None,
+    sort: str = "id",
+    offset: int = 0,
+    limit: int = 50,
+) -> tuple[list[tuple[User, int]], int]:
+    """
+    (user, balance_cents) rows for the admin list and the total count.
+    One LEFT JOIN to user_balances; users without a row count as 0.
+    When the range excludes 0 the filter and sort run on the raw column
+    (ix_user_balances_balance), since missing rows can't match anyway.
+    """
+    balance = func.coalesce(UserBalance.balance_cents, 0)
+    zero_in_range = (min_cents is None or min_cents <= 0) and (max_cents is None or max_cents >= 0)
+    sort_key = balance if zero_in_range else UserBalance.balance_cents
+    tie_key = User.id if zero_in_range else UserBalance.user_id
+
+    q = db.query(User, balance.label("balance_cents")).outerjoin(UserBalance, UserBalance.user_id == User.id)
+    if search:
+        like = f"%{search}%"
+        conds = [User.username.ilike(like), User.first_name.ilike(like), User.last_name.ilike(like)]
+        if search.isdigit():
+            conds.append(User.telegram_id == int(search))
+        q = q.filter(or_(*conds))
+    if min_cents is not None:
+        q = q.filter(sort_key >= min_cents)
+    if max_cents is not None:
+        q = q.filter(sort_key <= max_cents)
+
+    total = q.order_by(None).count()
+    if sort == "balance_desc":
+        q = q.order_by(sort_key.desc(), tie_key.desc())
+    elif sort == "balance_asc":
+        q = q.order_by(sort_key.asc(), tie_key.asc())
+    else:
+        q = q.order_by(User.id.desc())
+    rows = q.offset(offset).limit(limit).all()
+    return [(user, int(cents or 0)) for user, cents in rows], total
+
+
+def list_ledger_entries(
+    db: Session,
+    user_id: int,
+    *,
+    before_id: Optional[int] = None,
+    limit: int = 50,
+) -> tuple[list[BalanceLedger], Optional[int]]:
+    """
+    Newest-first page of a user's ledger, keyset on (user_id, id): `before_id` is the
+    next_cursor of the previous page. Returns (entries, next_cursor or None).
+    """
+    query = db.query(BalanceLedger).filter(BalanceLedger.user_id == user_id)
+    if before_id is not None:
+        query = query.filter(BalanceLedger.id < before_id)
+    rows = query.order_by(BalanceLedger.id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return rows, rows[-1].id if has_more and rows else None
+
+
+class DuplicateOperation(Exception):
+    """The idempotency key was already applied; carries the balance it produced."""
+
+    def __init__(self, balance_after: int):
+        super().__init__(balance_after)
+        self.balance_after = balance_after
+
+
+def lock_for_write(db: Session) -> None:
+    """
+    Take the database write lock for the current transaction before reading anything
+    the write depends on. SQLite: BEGIN IMMEDIATE (a deferred transaction that reads
+    first can't upgrade to a write while another writer is active). Postgres: row
+    locks are taken with SELECT ... FOR UPDATE by the callers instead.
+    """
+    conn = db.connection()
+    if conn.dialect.name != "sqlite":
+        return
+    if not conn.connection.dbapi_connection.in_transaction:
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+def _ensure_balance_rows(db: Session, user_ids: Iterable[int]) -> None:
+    """INSERT ... ON CONFLICT DO NOTHING: safe when two transactions create them at once."""
+    values = [{"user_id": user_id, "balance_cents": 0} for user_id in sorted(set(user_ids))]
+    if not values:
+        return
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        stmt = sqlite.insert(UserBalance).values(values).on_conflict_do_nothing(index_elements=["user_id"])
+    elif dialect == "postgresql":
+        stmt = postgresql.insert(UserBalance).values(values).on_conflict_do_nothing(index_elements=["user_id"])
+    else:
+        existing = {
+            uid for (uid,) in db.query(UserBalance.user_id).filter(UserBalance.user_id.in_([v["user_id"] for v in values]))
+        }
+        db.add_all(UserBalance(**v) for v in values if v["user_id"] not in existing)
+        db.flush()
+        return
+    db.execute(stmt)
+
+
+def apply_balance_delta(
+    db: Session,
+    user_id: int,
+    delta_cents: int,
+    *,
+    type_: str,
+    idempotency_key: Optional[str] = None,
+    allow_negative: bool = True,
+    comment: Optional[str] = None,
+    ref_request_id: Optional[int] = None,
+    admin_id: Optional[int] = None,
+) -> int:
+    """
+    Atomically add delta_cents to the user's balance and append the ledger row.
+    Returns the new balance. Does not commit: the caller owns the transaction.
+    Raises DuplicateOperation if idempotency_key was already applied and
+    ValueError if the balance would go below 0 with allow_negative=False.
+    """
+    lock_for_write(db)
+    if idempotency_key:
+        applied = (
+            db.query(BalanceLedger.balance_after_cents)
+            .filter(BalanceLedger.idempotency_key == idempotency_key)
+            .scalar()
+        )
+        if applied is not None:
+            raise DuplicateOperation(int(applied))
+
+    _ensure_balance_rows(db, [user_id])
+    stmt = (
+        update(UserBalance)
+        .where(UserBalance.user_id == user_id)
+        .values(balance_cents=UserBalance.balance_cents + delta_cents, updated_at=func.now())
+        .returning(UserBalance.balance_cents)
+    )
+    if not allow_negative:
+        stmt = stmt.where(UserBalance.balance_cents + delta_cents >= 0)
+    new_balance = db.execute(stmt, execution_options={"synchronize_session": False}).scalar()
+    if new_balance is None:
+        current = get_balance_cents(db, user_id)
+        raise ValueError(f"Balance cannot go below 0. Current: {current}, delta: {delta_cents}")
+
+    _append_ledger(
+        db,
+        user_id=user_id,
+        type_=type_,
+        delta_cents=delta_cents,
+        balance_after=int(new_balance),
+        comment=comment,
+        ref_request_id=ref_request_id,
+        admin_id=admin_id,
+        idempotency_key=idempotency_key,
+    )
+    return int(new_balance)
+
+
+def _commit_idempotent(db: Session, idempotency_key: Optional[str]) -> None:
+    """Commit; a concurrent transaction that won the same idempotency key turns into DuplicateOperation."""
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        if not idempotency_key:
+            raise
+        applied = (
+            db.query(BalanceLedger.balance_after_cents)
+            .filter(BalanceLedger.idempotency_key == idempotency_key)
+            .scalar()
+        )
+        if applied is None:
+            raise
+        raise DuplicateOperation(int(applied))
+
+
+def _locked_request(db: Session, request_id: int) -> BalanceRequest:
+    lock_for_write(db)
+    req = (
+        db.query(BalanceRequest)
+        .filter(BalanceRequest.id == request_id)
+        .populate_existing()
+        .with_for_update()
+        .first()
+    )
+    if not req:
+        db.rollback()
+        raise ValueError("Balance request not found")
+    return req
 
 
 def create_deposit_request(db: Session, user_id: int, tx_ref: str) -> BalanceRequest:
-    """Create deposit request with status pending. Optionally add ledger entry."""
+    """Create deposit request with status pending and its zero-delta ledger entry (one transaction)."""
+    # Read balance_after under the row lock apply_balance_delta takes: otherwise a concurrent
+    # approve/adjust can commit in between and the zero-delta entry breaks the ledger chain
+    lock_for_write(db)
+    _ensure_balance_rows(db, [user_id])
+    balance = (
+        db.query(UserBalance.balance_cents)
+        .filter(UserBalance.user_id == user_id)
+        .with_for_update()
+        .scalar()
+    )
     req = BalanceRequest(
         user_id=user_id,
         tx_ref=tx_ref.strip(),
         status="pending",
     )
     db.add(req)
-    db.commit()
-    db.refresh(req)
-    # Optional ledger: deposit_request_created, delta=0
+    db.flush()
     _append_ledger(
         db,
         user_id=user_id,
         type_="deposit_request_created",
         delta_cents=0,
-        balance_after=get_balance_cents(db, user_id),
+        balance_after=int(balance),
         ref_request_id=req.id,
     )
+    db.commit()
+    db.refresh(req)
     return req
 
 
@@ -91,33 +312,35 @@ def approve_deposit_request(
 ) -> BalanceRequest:
     """
     Approve deposit request: update status, add to balance, ledger.
-    Must be called within transaction. Raises if already processed.
+    The request row is locked, so two admins approving at once apply it once.
+    Raises if already processed.
     """
-    req = db.query(BalanceRequest).filter(BalanceRequest.id == request_id).first()
-    if not req:
-        raise ValueError("Balance request not found")
+    req = _locked_request(db, request_id)
     if req.status != "pending":
-        raise ValueError(f"Cannot approve: request status is {req.status}")
+        status = req.status
+        db.rollback()
+        raise ValueError(f"Cannot approve: request status is {status}")
 
-    ub = get_or_create_balance(db, req.user_id)
-    new_balance = int(ub.balance_cents or 0) + amount_cents
-    ub.balance_cents = new_balance
-    req.status = "approved"
-    req.reviewed_at = datetime.now(timezone.utc)
-    req.reviewed_by_admin_id = admin_id
-    req.admin_comment = comment
-
-    _append_ledger(
-        db,
-        user_id=req.user_id,
-        type_="deposit_request_approved",
-        delta_cents=amount_cents,
-        balance_after=new_balance,
-        comment=comment,
-        ref_request_id=req.id,
-        admin_id=admin_id,
-    )
-    db.commit()
+    key = f"balance_request:{req.id}:approved"
+    try:
+        apply_balance_delta(
+            db,
+            req.user_id,
+            amount_cents,
+            type_="deposit_request_approved",
+            idempotency_key=key,
+            comment=comment,
+            ref_request_id=req.id,
+            admin_id=admin_id,
+        )
+        req.status = "approved"
+        req.reviewed_at = datetime.now(timezone.utc)
+        req.reviewed_by_admin_id = admin_id
+        req.admin_comment = comment
+        _commit_idempotent(db, key)
+    except DuplicateOperation:
+        db.rollback()
+        raise ValueError("Cannot approve: request status is approved")
     db.refresh(req)
     return req
 
@@ -128,12 +351,12 @@ def reject_deposit_request(
     admin_id: int,
     comment: Optional[str] = None,
 ) -> BalanceRequest:
-    """Reject deposit request. Must be called within transaction."""
-    req = db.query(BalanceRequest).filter(BalanceRequest.id == request_id).first()
-    if not req:
-        raise ValueError("Balance request not found")
+    """Reject deposit request (request row locked for the transition)."""
+    req = _locked_request(db, request_id)
     if req.status != "pending":
-        raise ValueError(f"Cannot reject: request status is {req.status}")
+        status = req.status
+        db.rollback()
+        raise ValueError(f"Cannot reject: request status is {status}")
 
     req.status = "rejected"
     req.reviewed_at = datetime.now(timezone.utc)
@@ -156,6 +379,147 @@ def reject_deposit_request(
     return req
 
 
+REVIEW_ACTIONS = ("approve", "reject")
+
+
+@dataclass
+class ReviewItem:
+    request_id: int
+    action: str
+    amount_cents: Optional[int] = None
+    comment: Optional[str] = None
+
+
+@dataclass
+class ReviewResult:
+    request_id: int
+    ok: bool
+    status: Optional[str] = None
+    error: Optional[str] = None
+
+
+def _validate_review_items(items: list[ReviewItem]) -> tuple[list[ReviewItem], dict[int, str]]:
+    valid: list[ReviewItem] = []
+    errors: dict[int, str] = {}
+    seen: set[int] = set()
+    for item in items:
+        if item.request_id in seen:
+            errors[item.request_id] = "Duplicate request in batch"
+        elif item.action not in REVIEW_ACTIONS:
+            errors[item.request_id] = f"Unknown action: {item.action}"
+        elif item.action == "approve" and (item.amount_cents is None or item.amount_cents <= 0):
+            errors[item.request_id] = "Amount must be positive"
+        else:
+            valid.append(item)
+        seen.add(item.request_id)
+    # A duplicate invalidates the first occurrence too: which amount was meant is unknown
+    valid = [item for item in valid if item.request_id not in errors]
+    return valid, errors
+
+
+def review_deposit_requests(db: Session, items: list[ReviewItem], admin_id: int) -> list[ReviewResult]:
+    """
+    Approve/reject many deposit requests in one transaction.
+    Invalid items and requests that are no longer pending are reported and skipped;
+    the rest are locked and applied together: one UPDATE for all affected balances
+    (per-user sums, RETURNING) and one bulk ledger insert. Results keep input order.
+    """
+    valid, errors = _validate_review_items(items)
+    by_id = {item.request_id: item for item in valid}
+    applied: dict[int, str] = {}
+    if by_id:
+        lock_for_write(db)
+        locked = {
+            r.id: r
+            for r in db.query(BalanceRequest)
+            .filter(BalanceRequest.id.in_(list(by_id)))
+            .order_by(BalanceRequest.id)
+            .populate_existing()
+            .with_for_update()
+        }
+        todo: list[tuple[ReviewItem, BalanceRequest]] = []
+        for request_id, item in by_id.items():
+            req = locked.get(request_id)
+            if req is None:
+                errors[request_id] = "Balance request not found"
+            elif req.status != "pending":
+                errors[request_id] = f"Cannot {item.action}: request status is {req.status}"
+            else:
+                todo.append((item, req))
+        if todo:
+            try:
+                _apply_reviews(db, todo, admin_id)
+                applied = {item.request_id: req.status for item, req in todo}
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+        else:
+            db.rollback()
+
+    results = []
+    for item in items:
+        if item.request_id in applied:
+            results.append(ReviewResult(item.request_id, True, status=applied[item.request_id]))
+        else:
+            results.append(ReviewResult(item.request_id, False, error=errors.get(item.request_id)))
+    return results
+
+
+def _apply_reviews(db: Session, todo: list[tuple[ReviewItem, BalanceRequest]], admin_id: int) -> None:
+    deltas: dict[int, int] = {}
+    for item, req in todo:
+        if item.action == "approve":
+            deltas[req.user_id] = deltas.get(req.user_id, 0) + item.amount_cents
+
+    user_ids = {req.user_id for _, req in todo}
+    balances: dict[int, int] = {}
+    if deltas:
+        _ensure_balance_rows(db, deltas)
+        stmt = (
+            update(UserBalance)
+            .where(UserBalance.user_id.in_(list(deltas)))
+            .values(
+                balance_cents=UserBalance.balance_cents + case(deltas, value=UserBalance.user_id, else_=0),
+                updated_at=func.now(),
+            )
+            .returning(UserBalance.user_id, UserBalance.balance_cents)
+        )
+        for user_id, new_balance in db.execute(stmt, execution_options={"synchronize_session": False}):
+            # Start of this batch's chain for the user
+            balances[user_id] = int(new_balance) - deltas[user_id]
+    rest = user_ids - set(balances)
+    if rest:
+        balances.update(
+            db.query(UserBalance.user_id, UserBalance.balance_cents).filter(UserBalance.user_id.in_(list(rest))).all()
+        )
+
+    now = datetime.now(timezone.utc)
+    ledger_rows = []
+    for item, req in todo:
+        approve = item.action == "approve"
+        delta = item.amount_cents if approve else 0
+        balances[req.user_id] = int(balances.get(req.user_id, 0)) + delta
+        ledger_rows.append(
+            {
+                "user_id": req.user_id,
+                "type": "deposit_request_approved" if approve else "deposit_request_rejected",
+                "delta_cents": delta,
+                "balance_after_cents": balances[req.user_id],
+                "comment": item.comment,
+                "ref_request_id": req.id,
+                "admin_id": admin_id,
+                "idempotency_key": f"balance_request:{req.id}:approved" if approve else None,
+            }
+        )
+        req.status = "approved" if approve else "rejected"
+        req.reviewed_at = now
+        req.reviewed_by_admin_id = admin_id
+        req.admin_comment = item.comment
+    db.execute(insert(BalanceLedger), ledger_rows)
+    db.flush()
+
+
 def admin_adjust_balance(
     db: Session,
     user_id: int,
@@ -163,28 +527,31 @@ def admin_adjust_balance(
     admin_id: int,
     comment: Optional[str] = None,
     allow_negative: bool = False,
+    idempotency_key: Optional[str] = None,
 ) -> UserBalance:
     """
     Admin adjust user balance. By default, balance cannot go below 0.
+    A repeated idempotency_key (e.g. a double-submitted form) is applied once.
     """
-    ub = get_or_create_balance(db, user_id)
-    current = int(ub.balance_cents or 0)
-    new_balance = current + delta_cents
-    if not allow_negative and new_balance < 0:
-        raise ValueError(f"Balance cannot go below 0. Current: {current}, delta: {delta_cents}")
-    ub.balance_cents = new_balance
-    _append_ledger(
-        db,
-        user_id=user_id,
-        type_="admin_adjust",
-        delta_cents=delta_cents,
-        balance_after=new_balance,
-        comment=comment,
-        admin_id=admin_id,
-    )
-    db.commit()
-    db.refresh(ub)
-    return ub
+    try:
+        apply_balance_delta(
+            db,
+            user_id,
+            delta_cents,
+            type_="admin_adjust",
+            idempotency_key=idempotency_key,
+            allow_negative=allow_negative,
+            comment=comment,
+            admin_id=admin_id,
+        )
+        _commit_idempotent(db, idempotency_key)
+    except DuplicateOperation:
+        db.rollback()
+        logger.info("balance adjust replayed user_id=%s key=%s", user_id, idempotency_key)
+    except ValueError:
+        db.rollback()
+        raise
+    return db.query(UserBalance).filter(UserBalance.user_id == user_id).populate_existing().one()
 
 
 def _append_ledger(
@@ -197,14 +564,17 @@ def _append_ledger(
     comment: Optional[str] = None,
     ref_request_id: Optional[int] = None,
     admin_id: Optional[int] = None,
+    idempotency_key: Optional[str] = None,
 ) -> None:
-    entry = BalanceLedger(
-        user_id=user_id,
-        type=type_,
-        delta_cents=delta_cents,
-        balance_after_cents=balance_after,
-        comment=comment,
-        ref_request_id=ref_request_id,
-        admin_id=admin_id,
+    db.execute(
+        insert(BalanceLedger).values(
+            user_id=user_id,
+            type=type_,
+            delta_cents=delta_cents,
+            balance_after_cents=balance_after,
+            comment=comment,
+            ref_request_id=ref_request_id,
+            admin_id=admin_id,
+            idempotency_key=idempotency_key,
+        )
     )
-    db.add(entry)
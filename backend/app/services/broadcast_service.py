@@ -0,0 +1,342 @@
+"""
+Broadcast service: persisted announcement jobs drained by a background worker.
+
+Routers only enqueue a BroadcastJob and return its id; the worker walks users
+in id order (keyset cursor stored on the job), sends with bounded concurrency
+and respects Telegram limits (global msg/sec + per-chat interval).
+"""
+from __future__ import annotations
+
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models.broadcast_job import BroadcastJob
+from app.models.user import User
+from app.utils.telegram import send_telegram_message
+
+logger = logging.getLogger("broadcast")
+
+ACTIVE_STATUSES = ("pending", "running")
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # SQLite returns naive datetimes; we always store UTC.
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _recipients_query(db: Session):
+    return db.query(User).filter(
+        User.telegram_id.isnot(None),
+        User.is_blocked == False,  # noqa: E712
+    )
+
+
+def enqueue_broadcast(db: Session, *, kind: str, text: str, ref_id: Optional[int] = None) -> BroadcastJob:
+    """Persist a broadcast job and wake the worker. Returns immediately."""
+    total = _recipients_query(db).with_entities(func.count(User.id)).scalar() or 0
+    job = BroadcastJob(kind=kind, ref_id=ref_id, text=text, status="pending", total=int(total))
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    wake_broadcast_worker()
+    return job
+
+
+def broadcast_progress(job: BroadcastJob) -> dict:
+    """Progress snapshot for the admin panel: sent/failed/remaining and msg/sec."""
+    sent = int(job.sent or 0)
+    failed = int(job.failed or 0)
+    total = int(job.total or 0)
+    processed = sent + failed
+    started = _as_utc(job.started_at)
+    finished = _as_utc(job.finished_at)
+    rate = 0.0
+    if started:
+        elapsed = ((finished or _utcnow()) - started).total_seconds()
+        if elapsed > 0:
+            rate = processed / elapsed
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "ref_id": job.ref_id,
+        "status": job.status,
+        "total": total,
+        "sent": sent,
+        "failed": failed,
+        "remaining": max(total - processed, 0) if job.status in ACTIVE_STATUSES else 0,
+        "per_second": round(rate, 2),
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": started.isoformat() if started else None,
+        "finished_at": finished.isoformat() if finished else None,
+        "error": job.error,
+    }
+
+
+class TelegramRateLimiter:
+    """
+    Token bucket for the global bot limit plus a minimum interval per chat.
+    Thread-safe; acquire() blocks until the message may be sent.
+    """
+
+    def __init__(self, rate_per_sec: float, per_chat_interval: float = 1.0):
+        self.rate = max(float(rate_per_sec), 0.1)
+        self.capacity = max(1.0, self.rate)
+        self.per_chat_interval = max(float(per_chat_interval), 0.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._chat_last: dict[int, float] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, chat_id: int) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                chat_wait = self._chat_last.get(chat_id, float("-inf")) + self.per_chat_interval - now
+                if self._tokens >= 1.0 and chat_wait <= 0:
+                    self._tokens -= 1.0
+                    self._chat_last[chat_id] = now
+                    if len(self._chat_last) > 10000:
+                        self._prune(now)
+                    return
+                token_wait = (1.0 - self._tokens) / self.rate if self._tokens < 1.0 else 0.0
+                wait = max(token_wait, chat_wait, 0.001)
+            time.sleep(wait)
+
+    def _prune(self, now: float) -> None:
+        cutoff = now - self.per_chat_interval
+        self._chat_last = {k: v for k, v in self._chat_last.items() if v > cutoff}
+
+
+class BroadcastWorker:
+    """Claims broadcast jobs (lease via locked_by/heartbeat_at) and drains them."""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        send: Callable[[int, str], bool] = send_telegram_message,
+        *,
+        concurrency: Optional[int] = None,
+        rate_per_sec: Optional[float] = None,
+        per_chat_interval: Optional[float] = None,
+        batch_size: Optional[int] = None,
+        poll_interval: Optional[float] = None,
+        lease_seconds: Optional[int] = None,
+    ):
+        self.session_factory = session_factory
+        self.send = send
+        self.concurrency = concurrency or _env_int("BROADCAST_CONCURRENCY", 8)
+        self.batch_size = batch_size or _env_int("BROADCAST_BATCH_SIZE", 200)
+        self.poll_interval = poll_interval or _env_float("BROADCAST_POLL_SECONDS", 5.0)
+        self.lease_seconds = lease_seconds or _env_int("BROADCAST_LEASE_SECONDS", 120)
+        self.limiter = TelegramRateLimiter(
+            rate_per_sec or _env_float("BROADCAST_RATE_PER_SEC", 25.0),
+            per_chat_interval if per_chat_interval is not None else _env_float("BROADCAST_PER_CHAT_INTERVAL", 1.0),
+        )
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="broadcast-send")
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # --- lifecycle ---
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run_forever, name="broadcast-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self._pool.shutdown(wait=False)
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def run_forever(self) -> None:
+        logger.info("broadcast worker started id=%s", self.worker_id)
+        while not self._stop.is_set():
+            try:
+                worked = self.run_once()
+            except Exception:
+                logger.exception("broadcast worker iteration failed")
+                worked = False
+            if not worked:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def run_once(self) -> bool:
+        """Claim and fully process one job. Returns False when there was nothing to do."""
+        db = self.session_factory()
+        try:
+            job_id = self._claim(db)
+            if job_id is None:
+                return False
+            self._process(db, job_id)
+            return True
+        finally:
+            db.close()
+
+    # --- internals ---
+
+    def _claim(self, db: Session) -> Optional[int]:
+        now = _utcnow()
+        stale = now - timedelta(seconds=self.lease_seconds)
+        claimable = or_(
+            BroadcastJob.status == "pending",
+            (BroadcastJob.status == "running") & or_(BroadcastJob.heartbeat_at.is_(None), BroadcastJob.heartbeat_at < stale),
+        )
+        candidate = db.query(BroadcastJob.id).filter(claimable).order_by(BroadcastJob.id.asc()).first()
+        if not candidate:
+            return None
+        # Conditional UPDATE: only one worker wins the lease even with several processes.
+        claimed = (
+            db.query(BroadcastJob)
+            .filter(BroadcastJob.id == candidate.id, claimable)
+            .update(
+                {
+                    BroadcastJob.status: "running",
+                    BroadcastJob.locked_by: self.worker_id,
+                    BroadcastJob.heartbeat_at: now,
+                    BroadcastJob.started_at: func.coalesce(BroadcastJob.started_at, now),
+                },
+                synchronize_session=False,
+            )
+        )
+        db.commit()
+        return candidate.id if claimed == 1 else None
+
+    def _send_one(self, chat_id: int, text: str) -> bool:
+        self.limiter.acquire(chat_id)
+        try:
+            return bool(self.send(chat_id, text))
+        except Exception:
+            logger.exception("broadcast send failed chat_id=%s", chat_id)
+            return False
+
+    def _process(self, db: Session, job_id: int) -> None:
+        job = db.query(BroadcastJob).filter(BroadcastJob.id == job_id).first()
+        if not job:
+            return
+        text = job.text
+        cursor = int(job.last_user_id or 0)
+        logger.info("broadcast start job_id=%s kind=%s total=%s cursor=%s", job.id, job.kind, job.total, cursor)
+        try:
+            while not self._stop.is_set():
+                batch = (
+                    _recipients_query(db)
+                    .with_entities(User.id, User.telegram_id)
+                    .filter(User.id > cursor)
+                    .order_by(User.id.asc())
+                    .limit(self.batch_size)
+                    .all()
+                )
+                if not batch:
+                    break
+                results = list(self._pool.map(lambda row: self._send_one(int(row.telegram_id), text), batch))
+                ok = sum(1 for r in results if r)
+                cursor = int(batch[-1].id)
+                updated = (
+                    db.query(BroadcastJob)
+                    .filter(BroadcastJob.id == job_id, BroadcastJob.locked_by == self.worker_id)
+                    .update(
+                        {
+                            BroadcastJob.sent: BroadcastJob.sent + ok,
+                            BroadcastJob.failed: BroadcastJob.failed + (len(results) - ok),
+                            BroadcastJob.last_user_id: cursor,
+                            BroadcastJob.heartbeat_at: _utcnow(),
+                        },
+                        synchronize_session=False,
+                    )
+                )
+                db.commit()
+                if updated != 1:
+                    # Lease lost (another worker took over after a stall) — stop quietly.
+                    logger.warning("broadcast lease lost job_id=%s", job_id)
+                    return
+            if self._stop.is_set():
+                return
+            db.query(BroadcastJob).filter(
+                BroadcastJob.id == job_id, BroadcastJob.locked_by == self.worker_id
+            ).update(
+                {BroadcastJob.status: "done", BroadcastJob.finished_at: _utcnow(), BroadcastJob.heartbeat_at: _utcnow()},
+                synchronize_session=False,
+            )
+            db.commit()
+            logger.info("broadcast done job_id=%s", job_id)
+        except Exception as exc:
+            db.rollback()
+            db.query(BroadcastJob).filter(BroadcastJob.id == job_id).update(
+                {BroadcastJob.status: "failed", BroadcastJob.error: str(exc)[:2000], BroadcastJob.finished_at: _utcnow()},
+                synchronize_session=False,
+            )
+            db.commit()
+            raise
+
+
+_worker: Optional[BroadcastWorker] = None
+_worker_lock = threading.Lock()
+
+
+def start_broadcast_worker() -> Optional[BroadcastWorker]:
+    """Start the in-process worker (disabled with BROADCAST_WORKER_ENABLED=0)."""
+    global _worker
+    if os.getenv("BROADCAST_WORKER_ENABLED", "1") != "1":
+        return None
+    with _worker_lock:
+        if _worker is None:
+            _worker = BroadcastWorker()
+        _worker.start()
+        return _worker
+
+
+def stop_broadcast_worker() -> None:
+    global _worker
+    with _worker_lock:
+        if _worker is not None:
+            _worker.stop()
+            _worker = None
+
+
+def wake_broadcast_worker() -> None:
+    if _worker is not None:
+        _worker.wake()
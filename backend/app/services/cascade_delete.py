@@ -0,0 +1,48 @@
+"""
+Deletes of webinars and bookings together with the rows that reference them.
+
+The production SQLite profile enforces foreign keys (PRAGMA foreign_keys=ON)
+and Postgres always does, but the FKs to bookings/webinars have no ON DELETE
+rule. Dependents are therefore removed explicitly, children first:
+reminder_schedule -> payments -> webinar_materials -> bookings -> webinars.
+The caller commits, so the whole tree goes in one transaction.
+"""
+from __future__ import annotations
+
+from typing import Iterable
+
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+
+from app.models.booking import Booking
+from app.models.payment import Payment
+from app.models.reminder_schedule import ReminderSchedule
+from app.models.webinar import Webinar
+from app.models.webinar_material import WebinarMaterial
+
+
+def delete_bookings(db: Session, booking_ids: Iterable[int]) -> int:
+    """Delete bookings with their reminder rows and payments. Returns the number of bookings."""
+    ids = list(booking_ids)
+    if not ids:
+        return 0
+    db.query(ReminderSchedule).filter(ReminderSchedule.booking_id.in_(ids)).delete(synchronize_session=False)
+    db.query(Payment).filter(Payment.booking_id.in_(ids)).delete(synchronize_session=False)
+    return db.query(Booking).filter(Booking.id.in_(ids)).delete(synchronize_session=False)
+
+
+def delete_webinar_tree(db: Session, webinar: Webinar) -> int:
+    """Delete a webinar with its materials, bookings and payments. Returns the number of bookings."""
+    webinar_id = webinar.id
+    booking_ids = select(Booking.id).where(Booking.webinar_id == webinar_id).scalar_subquery()
+    db.query(ReminderSchedule).filter(ReminderSchedule.webinar_id == webinar_id).delete(synchronize_session=False)
+    # Payments point at the webinar directly and/or through one of its bookings
+    db.query(Payment).filter(
+        or_(Payment.webinar_id == webinar_id, Payment.booking_id.in_(booking_ids))
+    ).delete(synchronize_session=False)
+    db.query(WebinarMaterial).filter(WebinarMaterial.webinar_id == webinar_id).delete(synchronize_session=False)
+    bookings_count = delete_bookings(db, db.scalars(select(Booking.id).where(Booking.webinar_id == webinar_id)).all())
+    # Through the session, so the table_versions bump (feed caches) still fires
+    db.delete(webinar)
+    db.flush()
+    return bookings_count
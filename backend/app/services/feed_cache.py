@@ -0,0 +1,122 @@
+"""
+In-process cache of public feed responses (posts, webinars) with ETag/304.
+
+Entries are keyed by (table, request key) and hold the serialized JSON body,
+the table_versions value it was built from and a strong ETag
+("<table>-<version>-<body hash>"). A hit inside FEED_CACHE_REVALIDATE_SECONDS
+costs no database query at all; after that window one primary-key lookup of
+the table version either confirms the entry or rebuilds it, which is how
+writes made by other worker processes are picked up. Writes in this process
+drop the table's entries right away (invalidate()).
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+from fastapi import Request, Response
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.utils.fast_json import dumps
+from app.utils.metrics import register_stats
+
+FEED_TABLES = ("posts", "webinars")
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+@dataclass
+class CachedFeed:
+    version: int
+    etag: str
+    body: bytes
+    checked_at: float
+
+
+def table_version(db: Session, table_name: str) -> int:
+    value = db.execute(
+        text("SELECT version FROM table_versions WHERE table_name = :name"), {"name": table_name}
+    ).scalar()
+    return int(value or 0)
+
+
+class FeedCache:
+    def __init__(self, *, revalidate_seconds: float = 5.0, max_entries: int = 256, clock: Callable[[], float] = time.monotonic):
+        self.revalidate_seconds = revalidate_seconds
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries: OrderedDict[tuple[str, str], CachedFeed] = OrderedDict()
+        # Bumped by invalidate(): a build that started before it must not be stored
+        self._generations: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "revalidated": 0, "builds": 0, "invalidations": 0}
+
+    def get(self, db: Session, table_name: str, key: str, build: Callable[[Session], Any]) -> CachedFeed:
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get((table_name, key))
+            if entry is not None and now - entry.checked_at < self.revalidate_seconds:
+                self._entries.move_to_end((table_name, key))
+                self.stats["hits"] += 1
+                return entry
+            generation = self._generations.get(table_name, 0)
+
+        version = table_version(db, table_name)
+        if entry is not None and entry.version == version:
+            with self._lock:
+                entry.checked_at = now
+                self.stats["revalidated"] += 1
+            return entry
+
+        body = dumps(build(db))
+        digest = hashlib.sha1(body).hexdigest()[:16]
+        # The hash keeps the ETag unique even if table_versions is cleared and counts again from 1
+        entry = CachedFeed(version=version, etag=f'"{table_name}-{version}-{digest}"', body=body, checked_at=now)
+        with self._lock:
+            self.stats["builds"] += 1
+            if self._generations.get(table_name, 0) == generation:
+                self._entries[(table_name, key)] = entry
+                self._entries.move_to_end((table_name, key))
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, table_name: Optional[str] = None) -> None:
+        """Drop cached feeds of `table_name` (all feeds if None). Call after the write is committed."""
+        with self._lock:
+            tables = [table_name] if table_name else list({t for t, _ in self._entries} | set(FEED_TABLES))
+            for name in tables:
+                self._generations[name] = self._generations.get(name, 0) + 1
+            for cache_key in [k for k in self._entries if k[0] in tables]:
+                del self._entries[cache_key]
+            self.stats["invalidations"] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {**self.stats, "entries": len(self._entries)}
+
+
+feed_cache = FeedCache(revalidate_seconds=_env_float("FEED_CACHE_REVALIDATE_SECONDS", 5.0))
+register_stats("feed_cache", feed_cache.snapshot)
+
+
+def feed_response(request: Request, entry: CachedFeed) -> Response:
+    """200 with the cached body, or 304 when the client already has this ETag."""
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    # Weak comparison (RFC 9110): in-app compression sends the ETag back as W/"..."
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    if entry.etag in tags or "*" in tags:
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
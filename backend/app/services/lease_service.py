@@ -0,0 +1,50 @@
+"""
+Named leases in the `worker_leases` table.
+
+Lets exactly one process run a single-consumer job (e.g. the IPN applier)
+even with several API workers: the lease is taken and renewed with a
+conditional UPDATE and expires if the holder stops renewing it.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.worker_lease import WorkerLease
+
+
+def acquire_lease(db: Session, name: str, holder: str, ttl_seconds: float) -> bool:
+    """Take or renew the lease; True if `holder` owns it afterwards. Commits."""
+    now = datetime.now(timezone.utc)
+    expires_at = now + timedelta(seconds=ttl_seconds)
+    updated = (
+        db.query(WorkerLease)
+        .filter(
+            WorkerLease.name == name,
+            or_(WorkerLease.holder == holder, WorkerLease.holder.is_(None), WorkerLease.expires_at < now),
+        )
+        .update({WorkerLease.holder: holder, WorkerLease.expires_at: expires_at}, synchronize_session=False)
+    )
+    db.commit()
+    if updated == 1:
+        return True
+    if db.query(WorkerLease.name).filter(WorkerLease.name == name).first():
+        return False
+    try:
+        db.add(WorkerLease(name=name, holder=holder, expires_at=expires_at))
+        db.commit()
+        return True
+    except IntegrityError:
+        # Another process created it first
+        db.rollback()
+        return False
+
+
+def release_lease(db: Session, name: str, holder: str) -> None:
+    db.query(WorkerLease).filter(WorkerLease.name == name, WorkerLease.holder == holder).update(
+        {WorkerLease.holder: None, WorkerLease.expires_at: None}, synchronize_session=False
+    )
+    db.commit()
@@ -0,0 +1,294 @@
+"""
+Ledger reconciliation: checks that balance_ledger and user_balances agree.
+
+The job streams balance_ledger in id order from the last checkpoint and keeps
+one compact snapshot row per user (opening balance, running sum, last entry),
+so each run only reads entries added since the previous one. For every entry
+it checks the balance_after chain (previous balance_after + delta); when it
+has caught up it compares every user_balances row with the snapshot sum in a
+single query and records the drift. Snapshots and the checkpoint are committed
+together per batch, so an interrupted run resumes where it stopped.
+
+Entries younger than `settle_seconds` are left for the next run: on Postgres an
+id can become visible after a larger one (sequence order != commit order).
+"""
+from __future__ import annotations
+
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+
+from sqlalchemy import exists, func, update
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models.balance_ledger import BalanceLedger
+from app.models.ledger_checkpoint import LedgerCheckpoint
+from app.models.ledger_snapshot import LedgerSnapshot
+from app.models.user_balance import UserBalance
+from app.services.lease_service import acquire_lease, release_lease
+from app.utils.metrics import register_stats
+
+logger = logging.getLogger("ledger_reconcile")
+
+CHECKPOINT = "balance_ledger_reconcile"
+RECONCILER_LEASE = "ledger_reconciler"
+# Keep reports small; the snapshot rows hold the full per-user counters
+MAX_REPORTED = 100
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+@dataclass
+class ReconcileReport:
+    processed: int = 0
+    batches: int = 0
+    last_ledger_id: int = 0
+    caught_up: bool = False
+    chain_breaks: list[dict] = field(default_factory=list)
+    drift: list[dict] = field(default_factory=list)
+    # Totals over all snapshots (not just this run): a break stays reported after it was streamed past
+    total_chain_breaks: int = 0
+    drift_users: int = 0
+
+
+def _checkpoint(db: Session) -> LedgerCheckpoint:
+    cp = db.get(LedgerCheckpoint, CHECKPOINT)
+    if cp is None:
+        cp = LedgerCheckpoint(name=CHECKPOINT, last_ledger_id=0)
+        db.add(cp)
+        db.flush()
+    return cp
+
+
+def _apply_batch(db: Session, rows: list, report: ReconcileReport) -> None:
+    user_ids = {r.user_id for r in rows}
+    snapshots = {s.user_id: s for s in db.query(LedgerSnapshot).filter(LedgerSnapshot.user_id.in_(user_ids))}
+    for r in rows:
+        snap = snapshots.get(r.user_id)
+        if snap is None:
+            opening = int(r.balance_after_cents) - int(r.delta_cents)
+            snap = LedgerSnapshot(
+                user_id=r.user_id,
+                opening_cents=opening,
+                ledger_sum_cents=opening,
+                last_balance_after_cents=opening,
+                last_ledger_id=0,
+                entries=0,
+                chain_breaks=0,
+                drift_cents=0,
+            )
+            db.add(snap)
+            snapshots[r.user_id] = snap
+        expected = snap.last_balance_after_cents + int(r.delta_cents)
+        if int(r.balance_after_cents) != expected:
+            snap.chain_breaks += 1
+            if len(report.chain_breaks) < MAX_REPORTED:
+                report.chain_breaks.append(
+                    {"ledger_id": r.id, "user_id": r.user_id, "expected_cents": expected, "balance_after_cents": int(r.balance_after_cents)}
+                )
+        # The sum follows deltas (that is how user_balances moves), the chain follows what was recorded
+        snap.ledger_sum_cents += int(r.delta_cents)
+        snap.last_balance_after_cents = int(r.balance_after_cents)
+        snap.last_ledger_id = r.id
+        snap.entries += 1
+
+
+def _check_drift(db: Session, last_ledger_id: int, report: ReconcileReport) -> None:
+    """One statement: balances vs snapshot sums, skipping users with entries not reconciled yet."""
+    pending = exists().where(BalanceLedger.user_id == UserBalance.user_id, BalanceLedger.id > last_ledger_id)
+    ledger_sum = func.coalesce(LedgerSnapshot.ledger_sum_cents, 0)
+    rows = (
+        db.query(UserBalance.user_id, UserBalance.balance_cents, ledger_sum.label("ledger_sum_cents"))
+        .outerjoin(LedgerSnapshot, LedgerSnapshot.user_id == UserBalance.user_id)
+        .filter(ledger_sum != UserBalance.balance_cents, ~pending)
+        .order_by(UserBalance.user_id)
+        .all()
+    )
+    db.execute(update(LedgerSnapshot).where(LedgerSnapshot.drift_cents != 0).values(drift_cents=0))
+    for user_id, balance_cents, sum_cents in rows:
+        drift = int(balance_cents) - int(sum_cents)
+        db.execute(update(LedgerSnapshot).where(LedgerSnapshot.user_id == user_id).values(drift_cents=drift))
+        if len(report.drift) < MAX_REPORTED:
+            report.drift.append({"user_id": user_id, "balance_cents": int(balance_cents), "ledger_sum_cents": int(sum_cents), "drift_cents": drift})
+
+
+def _snapshot_totals(db: Session, report: ReconcileReport) -> None:
+    total_breaks, drift_users = db.query(
+        func.coalesce(func.sum(LedgerSnapshot.chain_breaks), 0),
+        func.count(LedgerSnapshot.user_id).filter(LedgerSnapshot.drift_cents != 0),
+    ).one()
+    report.total_chain_breaks = int(total_breaks)
+    report.drift_users = int(drift_users)
+
+
+def reconcile_ledger(
+    db: Session,
+    *,
+    batch_size: int = 1000,
+    settle_seconds: float = 30.0,
+    max_batches: Optional[int] = None,
+) -> ReconcileReport:
+    """
+    Advance the checkpoint over settled ledger entries (at most max_batches batches)
+    and, once caught up, check user_balances against the snapshots. Commits per batch.
+    """
+    report = ReconcileReport()
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=settle_seconds)
+    cp = _checkpoint(db)
+    while max_batches is None or report.batches < max_batches:
+        rows = (
+            db.query(BalanceLedger.id, BalanceLedger.user_id, BalanceLedger.delta_cents, BalanceLedger.balance_after_cents)
+            .filter(BalanceLedger.id > cp.last_ledger_id, BalanceLedger.created_at <= cutoff)
+            .order_by(BalanceLedger.id)
+            .limit(batch_size)
+            .all()
+        )
+        if rows:
+            _apply_batch(db, rows, report)
+            cp.last_ledger_id = rows[-1].id
+            report.processed += len(rows)
+            report.batches += 1
+            db.commit()
+        if len(rows) < batch_size:
+            report.caught_up = True
+            break
+    report.last_ledger_id = cp.last_ledger_id
+    if report.caught_up:
+        _check_drift(db, cp.last_ledger_id, report)
+        _snapshot_totals(db, report)
+    db.commit()
+    if report.chain_breaks or report.drift:
+        logger.warning(
+            "ledger reconcile: chain_breaks=%s drift_users=%s (first: %s %s)",
+            len(report.chain_breaks), len(report.drift), report.chain_breaks[:1], report.drift[:1],
+        )
+    return report
+
+
+class LedgerReconciler:
+    """Periodic reconciliation; one active instance across processes (named lease)."""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        *,
+        interval: Optional[float] = None,
+        batch_size: Optional[int] = None,
+        settle_seconds: Optional[float] = None,
+        max_batches: Optional[int] = None,
+        lease_seconds: Optional[float] = None,
+    ):
+        self.session_factory = session_factory
+        self.interval = interval or _env_float("LEDGER_RECONCILE_INTERVAL_SECONDS", 600.0)
+        self.batch_size = batch_size or _env_int("LEDGER_RECONCILE_BATCH_SIZE", 1000)
+        self.settle_seconds = settle_seconds if settle_seconds is not None else _env_float("LEDGER_RECONCILE_SETTLE_SECONDS", 30.0)
+        # Bounded work per lease renewal; a backlog continues right away in the next iteration
+        self.max_batches = max_batches or _env_int("LEDGER_RECONCILE_MAX_BATCHES", 50)
+        self.lease_seconds = lease_seconds or _env_float("LEDGER_RECONCILE_LEASE_SECONDS", 300.0)
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {"runs": 0, "processed": 0, "last_ledger_id": 0, "chain_breaks": 0, "drift_users": 0, "last_run_at": None}
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run_forever, name="ledger-reconciler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+        db = self.session_factory()
+        try:
+            release_lease(db, RECONCILER_LEASE, self.holder)
+        except Exception:
+            logger.exception("ledger reconciler lease release failed")
+        finally:
+            db.close()
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def run_forever(self) -> None:
+        logger.info("ledger reconciler started holder=%s", self.holder)
+        while not self._stop.is_set():
+            try:
+                more = self.run_once()
+            except Exception:
+                logger.exception("ledger reconcile iteration failed")
+                more = False
+            if not more:
+                self._wake.wait(self.interval)
+                self._wake.clear()
+
+    def run_once(self) -> bool:
+        """One bounded pass if this process holds the lease. True if entries are left to process."""
+        db = self.session_factory()
+        try:
+            if not acquire_lease(db, RECONCILER_LEASE, self.holder, self.lease_seconds):
+                return False
+            report = reconcile_ledger(
+                db, batch_size=self.batch_size, settle_seconds=self.settle_seconds, max_batches=self.max_batches
+            )
+        finally:
+            db.close()
+        self.stats["runs"] += 1
+        self.stats["processed"] += report.processed
+        self.stats["last_ledger_id"] = report.last_ledger_id
+        if report.caught_up:
+            self.stats["chain_breaks"] = report.total_chain_breaks
+            self.stats["drift_users"] = report.drift_users
+        self.stats["last_run_at"] = time.time()
+        return not report.caught_up
+
+    def snapshot_stats(self) -> dict:
+        return dict(self.stats)
+
+
+_reconciler: Optional[LedgerReconciler] = None
+_reconciler_lock = threading.Lock()
+
+
+def start_ledger_reconciler() -> Optional[LedgerReconciler]:
+    """Start the in-process reconciler (disabled with LEDGER_RECONCILE_ENABLED=0)."""
+    global _reconciler
+    if os.getenv("LEDGER_RECONCILE_ENABLED", "1") != "1":
+        return None
+    with _reconciler_lock:
+        if _reconciler is None:
+            _reconciler = LedgerReconciler()
+            register_stats("ledger_reconcile", _reconciler.snapshot_stats)
+        _reconciler.start()
+        return _reconciler
+
+
+def stop_ledger_reconciler() -> None:
+    global _reconciler
+    with _reconciler_lock:
+        if _reconciler is not None:
+            _reconciler.stop()
+            _reconciler = None
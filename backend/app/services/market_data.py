@@ -0,0 +1,444 @@
+"""
+Market data for the Home screen: one poller per deployment, all clients read its store.
+
+- the poller refreshes 24h tickers for the configured symbols in one batched
+  upstream call, and hourly sparklines (24 closes) on a slower interval
+- every refresh builds a ready-to-send JSON snapshot with its ETag; the
+  snapshot (and the ETag) only changes when the data changes
+- the source is pluggable: Binance in production, a local fixture feed in
+  tests/dev (MARKET_SOURCE=fixture, MARKET_FIXTURE_PATH=...)
+- if the source fails, the last snapshot keeps being served
+- with several API workers only the holder of the "market_poller" lease calls
+  the source; it writes each new snapshot to `market_snapshots` and the other
+  workers load it from there every MARKET_POLL_SECONDS, so upstream traffic
+  does not grow with the worker count and every worker answers with the same
+  body and ETag (If-None-Match keeps working whichever worker gets the request)
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Callable, Optional, Protocol
+
+import requests
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models.market_snapshot import MarketSnapshotRow
+from app.services.lease_service import acquire_lease, release_lease
+from app.utils.metrics import register_stats
+
+logger = logging.getLogger("market")
+
+DEFAULT_SYMBOLS = ("BTCUSDT", "ETHUSDT", "BNBUSDT", "SOLUSDT", "ADAUSDT", "XRPUSDT")
+SPARKLINE_POINTS = 24
+POLLER_LEASE = "market_poller"
+SHARED_SNAPSHOT = "home"
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+def configured_symbols() -> tuple[str, ...]:
+    raw = (os.getenv("MARKET_SYMBOLS") or "").strip()
+    if not raw:
+        return DEFAULT_SYMBOLS
+    symbols = [s.strip().upper() for s in raw.split(",") if s.strip()]
+    return tuple(dict.fromkeys(symbols)) or DEFAULT_SYMBOLS
+
+
+@dataclass(frozen=True)
+class Ticker:
+    price: float
+    change_pct_24h: float
+    quote_volume: float
+    high_24h: float
+    low_24h: float
+
+
+class MarketSource(Protocol):
+    def fetch_tickers(self, symbols: tuple[str, ...]) -> dict[str, Ticker]: ...
+
+    def fetch_sparkline(self, symbol: str, points: int) -> list[float]: ...
+
+
+class BinanceSource:
+    """Public Binance REST API (no key). Tickers for all symbols come back in one request."""
+
+    def __init__(self, base_url: Optional[str] = None, timeout: Optional[float] = None):
+        self.base_url = (base_url or os.getenv("MARKET_BINANCE_BASE") or "https://api.binance.com").rstrip("/")
+        self.timeout = timeout or _env_float("MARKET_TIMEOUT", 10.0)
+        self._http = requests.Session()
+
+    def _get(self, path: str, params: dict):
+        response = self._http.get(f"{self.base_url}{path}", params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def fetch_tickers(self, symbols: tuple[str, ...]) -> dict[str, Ticker]:
+        data = self._get("/api/v3/ticker/24hr", {"symbols": json.dumps(list(symbols), separators=(",", ":"))})
+        result = {}
+        for item in data:
+            result[item["symbol"]] = Ticker(
+                price=float(item["lastPrice"]),
+                change_pct_24h=float(item["priceChangePercent"]),
+                quote_volume=float(item["quoteVolume"]),
+                high_24h=float(item["highPrice"]),
+                low_24h=float(item["lowPrice"]),
+            )
+        return result
+
+    def fetch_sparkline(self, symbol: str, points: int) -> list[float]:
+        klines = self._get("/api/v3/klines", {"symbol": symbol, "interval": "1h", "limit": points})
+        return [float(k[4]) for k in klines]  # close price
+
+
+class FixtureSource:
+    """
+    Local feed: {"tickers": {SYMBOL: {price, change_pct_24h, ...}}, "sparklines": {SYMBOL: [..]}}.
+    Tests mutate `data` between polls.
+    """
+
+    def __init__(self, data: dict):
+        self.data = data
+
+    @classmethod
+    def from_file(cls, path: str) -> "FixtureSource":
+        with open(path, "r", encoding="utf-8") as fh:
+            return cls(json.load(fh))
+
+    def fetch_tickers(self, symbols: tuple[str, ...]) -> dict[str, Ticker]:
+        tickers = self.data.get("tickers") or {}
+        result = {}
+        for symbol in symbols:
+            item = tickers.get(symbol)
+            if item is None:
+                continue
+            result[symbol] = Ticker(
+                price=float(item["price"]),
+                change_pct_24h=float(item.get("change_pct_24h", 0.0)),
+                quote_volume=float(item.get("quote_volume", 0.0)),
+                high_24h=float(item.get("high_24h", item["price"])),
+                low_24h=float(item.get("low_24h", item["price"])),
+            )
+        return result
+
+    def fetch_sparkline(self, symbol: str, points: int) -> list[float]:
+        return [float(p) for p in (self.data.get("sparklines") or {}).get(symbol, [])][-points:]
+
+
+def source_from_env() -> MarketSource:
+    kind = (os.getenv("MARKET_SOURCE") or "binance").strip().lower()
+    if kind == "fixture":
+        return FixtureSource.from_file(os.getenv("MARKET_FIXTURE_PATH") or "market_fixture.json")
+    return BinanceSource()
+
+
+@dataclass(frozen=True)
+class MarketSnapshot:
+    body: bytes
+    etag: str
+    version: int
+    updated_at: float
+
+
+class MarketStore:
+    """
+    Latest snapshot; replaced atomically by the poller, read lock-free by requests.
+    Listeners (the stream hub) get `(version, delta)` after every change, where
+    delta is {symbol: changed fields}.
+    """
+
+    def __init__(self):
+        self._snapshot: Optional[MarketSnapshot] = None
+        self._items: dict[str, dict] = {}
+        self._listeners: list[Callable[[int, dict], None]] = []
+        self._lock = threading.Lock()
+
+    def get(self) -> Optional[MarketSnapshot]:
+        return self._snapshot
+
+    def items(self) -> tuple[int, dict[str, dict]]:
+        """(version, {symbol: item}) of the current snapshot."""
+        with self._lock:
+            return (self._snapshot.version if self._snapshot else 0), dict(self._items)
+
+    def add_listener(self, listener: Callable[[int, dict], None]) -> None:
+        with self._lock:
+            self._listeners.append(listener)
+
+    def publish(self, items: list[dict], now: float) -> bool:
+        """Store a new snapshot unless the items are unchanged. Returns True if it changed."""
+        payload = {"updated_at": datetime.fromtimestamp(now, timezone.utc).isoformat(), "items": items}
+        digest = hashlib.sha1(json.dumps(items, separators=(",", ":")).encode("utf-8")).hexdigest()[:20]
+        with self._lock:
+            current = self._snapshot
+            if current is not None and current.etag == f'"{digest}"':
+                return False
+            snapshot = MarketSnapshot(
+                body=json.dumps(payload, separators=(",", ":")).encode("utf-8"),
+                etag=f'"{digest}"',
+                version=(current.version + 1) if current else 1,
+                updated_at=now,
+            )
+            listeners, delta = self._replace(snapshot, items)
+        self._notify(listeners, snapshot.version, delta)
+        return True
+
+    def adopt(self, snapshot: MarketSnapshot) -> bool:
+        """Store a snapshot built by another process as is (same body and ETag). True if it changed."""
+        with self._lock:
+            current = self._snapshot
+            if current is not None and current.etag == snapshot.etag:
+                return False
+            if current is not None and snapshot.version <= current.version:
+                # Stream clients skip versions they have seen: never go back
+                snapshot = MarketSnapshot(snapshot.body, snapshot.etag, current.version + 1, snapshot.updated_at)
+            listeners, delta = self._replace(snapshot, json.loads(snapshot.body)["items"])
+        self._notify(listeners, snapshot.version, delta)
+        return True
+
+    def _replace(self, snapshot: MarketSnapshot, items: list[dict]) -> tuple[list, dict]:
+        """Swap in the snapshot (lock held); returns the listeners to notify and the delta."""
+        new_items = {item["symbol"]: item for item in items}
+        delta = _delta(self._items, new_items)
+        self._snapshot, self._items = snapshot, new_items
+        return list(self._listeners), delta
+
+    @staticmethod
+    def _notify(listeners: list, version: int, delta: dict) -> None:
+        for listener in listeners:
+            try:
+                listener(version, delta)
+            except Exception:
+                logger.exception("market listener failed")
+
+
+def _delta(old: dict[str, dict], new: dict[str, dict]) -> dict[str, dict]:
+    """Changed fields per symbol. The sparkline is only sent when the hourly series rolls over:
+    its last point is the live price, which clients take from `price`."""
+    delta = {}
+    for symbol, item in new.items():
+        previous = old.get(symbol) or {}
+        changed = {k: v for k, v in item.items() if k != "symbol" and previous.get(k) != v}
+        old_line, new_line = previous.get("sparkline") or [], item.get("sparkline") or []
+        if "sparkline" in changed and len(old_line) == len(new_line) and old_line[:-1] == new_line[:-1]:
+            del changed["sparkline"]
+        if changed:
+            delta[symbol] = changed
+    return delta
+
+
+class MarketPoller:
+    """
+    Refreshes the store from the source on a fixed interval. With a session factory
+    only the lease holder polls the source and shares the snapshot through the
+    database; the other processes load it from there.
+    """
+
+    def __init__(
+        self,
+        source: Optional[MarketSource] = None,
+        store: Optional[MarketStore] = None,
+        *,
+        symbols: Optional[tuple[str, ...]] = None,
+        interval: Optional[float] = None,
+        sparkline_interval: Optional[float] = None,
+        clock: Callable[[], float] = time.time,
+        session_factory: Optional[Callable[[], Session]] = None,
+        lease_seconds: Optional[float] = None,
+    ):
+        self.source = source or source_from_env()
+        self.store = store if store is not None else MarketStore()
+        self.symbols = symbols or configured_symbols()
+        self.interval = interval or _env_float("MARKET_POLL_SECONDS", 5.0)
+        self.sparkline_interval = sparkline_interval or _env_float("MARKET_SPARKLINE_SECONDS", 300.0)
+        self.clock = clock
+        self.session_factory = session_factory
+        self.lease_seconds = lease_seconds or _env_float("MARKET_LEASE_SECONDS", max(30.0, self.interval * 6))
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.leader = session_factory is None
+        self._sparklines: dict[str, list[float]] = {}
+        self._sparklines_at = 0.0
+        self.stats = {"polls": 0, "changes": 0, "errors": 0, "sparkline_refreshes": 0, "shared_loads": 0}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # --- lifecycle ---
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run_forever, name="market-poller", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+        if self.session_factory is None:
+            return
+        db = self.session_factory()
+        try:
+            release_lease(db, POLLER_LEASE, self.holder)
+        except Exception:
+            logger.exception("market poller lease release failed")
+        finally:
+            db.close()
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def run_forever(self) -> None:
+        logger.info("market poller started symbols=%s holder=%s", ",".join(self.symbols), self.holder)
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as exc:
+                self.stats["errors"] += 1
+                logger.warning("market poll failed, serving last snapshot error=%s", exc.__class__.__name__)
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def run_once(self) -> bool:
+        """One refresh (poll as the lease holder, else load the shared snapshot). True if the store changed."""
+        if self.session_factory is None:
+            return self._poll()
+        db = self.session_factory()
+        try:
+            if not acquire_lease(db, POLLER_LEASE, self.holder, self.lease_seconds):
+                self.leader = False
+                return self._load_shared(db)
+            if not self.leader:
+                # Just took over: continue from the shared snapshot (and its version)
+                self._load_shared(db)
+                self.leader = True
+            changed = self._poll()
+            if changed:
+                self._save_shared(db)
+            return changed
+        finally:
+            db.close()
+
+    def _poll(self) -> bool:
+        now = self.clock()
+        self.stats["polls"] += 1
+        tickers = self.source.fetch_tickers(self.symbols)
+        if not self._sparklines or now - self._sparklines_at >= self.sparkline_interval:
+            self._refresh_sparklines()
+            self._sparklines_at = now
+        changed = self.store.publish(self._build_items(tickers), now)
+        if changed:
+            self.stats["changes"] += 1
+        return changed
+
+    def snapshot_stats(self) -> dict:
+        snapshot = self.store.get()
+        return dict(
+            self.stats,
+            symbols=len(self.symbols),
+            leader=self.leader,
+            version=snapshot.version if snapshot else 0,
+            age_seconds=round(self.clock() - snapshot.updated_at, 1) if snapshot else None,
+        )
+
+    # --- internals ---
+
+    def _load_shared(self, db: Session) -> bool:
+        row = db.get(MarketSnapshotRow, SHARED_SNAPSHOT)
+        if row is None:
+            return False
+        self.stats["shared_loads"] += 1
+        return self.store.adopt(MarketSnapshot(row.body.encode("utf-8"), row.etag, row.version, row.updated_at))
+
+    def _save_shared(self, db: Session) -> None:
+        snapshot = self.store.get()
+        values = dict(
+            version=snapshot.version, etag=snapshot.etag, body=snapshot.body.decode("utf-8"), updated_at=snapshot.updated_at
+        )
+        row = db.get(MarketSnapshotRow, SHARED_SNAPSHOT)
+        if row is None:
+            db.add(MarketSnapshotRow(name=SHARED_SNAPSHOT, **values))
+        else:
+            for key, value in values.items():
+                setattr(row, key, value)
+        try:
+            db.commit()
+        except IntegrityError:
+            # Lease changed hands while the row was first created: the new holder writes the next one
+            db.rollback()
+
+    def _refresh_sparklines(self) -> None:
+        self.stats["sparkline_refreshes"] += 1
+        for symbol in self.symbols:
+            try:
+                self._sparklines[symbol] = self.source.fetch_sparkline(symbol, SPARKLINE_POINTS)
+            except Exception as exc:
+                # Keep the previous line for this symbol; tickers are what matters
+                logger.warning("sparkline refresh failed symbol=%s error=%s", symbol, exc.__class__.__name__)
+
+    def _build_items(self, tickers: dict[str, Ticker]) -> list[dict]:
+        items = []
+        for symbol in self.symbols:
+            ticker = tickers.get(symbol)
+            if ticker is None:
+                continue
+            sparkline = list(self._sparklines.get(symbol) or [])
+            if sparkline:
+                # The last hourly candle is still open: its close is the live price
+                sparkline[-1] = ticker.price
+            items.append({"symbol": symbol, **asdict(ticker), "sparkline": sparkline})
+        return items
+
+
+_store = MarketStore()
+_poller: Optional[MarketPoller] = None
+_poller_lock = threading.Lock()
+
+
+def get_market_store() -> MarketStore:
+    return _store
+
+
+def market_cache_max_age() -> int:
+    return max(1, int(_env_float("MARKET_POLL_SECONDS", 5.0)))
+
+
+def start_market_poller() -> Optional[MarketPoller]:
+    """
+    Start the in-process poller (disabled with MARKET_POLLER_ENABLED=0). Every worker
+    runs one; the lease decides which of them calls the source.
+    """
+    global _poller
+    if os.getenv("MARKET_POLLER_ENABLED", "1") != "1":
+        return None
+    with _poller_lock:
+        if _poller is None:
+            _poller = MarketPoller(store=_store, session_factory=SessionLocal)
+            register_stats("market", _poller.snapshot_stats)
+        _poller.start()
+        return _poller
+
+
+def stop_market_poller() -> None:
+    global _poller
+    with _poller_lock:
+        if _poller is not None:
+            _poller.stop()
+            _poller = None
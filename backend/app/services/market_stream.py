@@ -0,0 +1,223 @@
+"""
+Server-Sent Events fan-out for market data (/market/stream).
+
+The poller thread publishes one delta per change into the hub; the hub hands
+it to each event loop with a single call_soon_threadsafe and merges it into
+every subscriber's pending map there. Pending state is keyed by symbol, so a
+slow client never queues: later updates overwrite earlier ones (coalescing)
+and memory per connection is bounded by symbols x fields, however far behind
+it is. The generator only pulls the next delta when the previous write has
+been accepted by the server, which is the per-client backpressure.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from typing import AsyncIterator, Optional
+
+from app.services.market_data import MarketStore, get_market_store
+from app.utils.metrics import register_stats
+
+logger = logging.getLogger("market_stream")
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+class StreamLimitReached(Exception):
+    pass
+
+
+class Subscriber:
+    __slots__ = ("symbols", "pending", "event", "version", "coalesced", "loop", "exact")
+
+    def __init__(self, symbols: Optional[frozenset[str]], loop: asyncio.AbstractEventLoop):
+        self.symbols = symbols
+        self.pending: dict[str, dict] = {}
+        self.event = asyncio.Event()
+        self.version = 0
+        self.coalesced = 0
+        self.loop = loop
+        # pending is exactly the published delta of `version` (no filter, nothing merged):
+        # the hub can send the bytes it already encoded for that version
+        self.exact = False
+
+    def offer(self, version: int, delta: dict[str, dict]) -> None:
+        """Runs on the subscriber's loop."""
+        if version <= self.version:
+            return  # already covered by the snapshot this client started from
+        self.version = version
+        if self.symbols is None and not self.pending:
+            self.pending = delta  # shared and never mutated: merges below copy first
+            self.exact = True
+            self.event.set()
+            return
+        if self.exact:
+            self.pending = {symbol: dict(fields) for symbol, fields in self.pending.items()}
+            self.exact = False
+        touched = False
+        for symbol, fields in delta.items():
+            if self.symbols is not None and symbol not in self.symbols:
+                continue
+            pending = self.pending.get(symbol)
+            if pending is None:
+                self.pending[symbol] = dict(fields)
+            else:
+                self.coalesced += 1
+                pending.update(fields)
+            touched = True
+        if touched:
+            self.event.set()
+
+    def take(self) -> tuple[dict[str, dict], bool]:
+        pending, exact = self.pending, self.exact
+        self.pending, self.exact = {}, False
+        self.event.clear()
+        return pending, exact
+
+
+class MarketHub:
+    def __init__(
+        self,
+        store: MarketStore,
+        *,
+        max_clients: Optional[int] = None,
+        heartbeat: Optional[float] = None,
+        max_lifetime: Optional[float] = None,
+    ):
+        self.store = store
+        self.max_clients = max_clients or int(_env_float("MARKET_STREAM_MAX_CLIENTS", 10000))
+        self.heartbeat = heartbeat or _env_float("MARKET_STREAM_HEARTBEAT_SECONDS", 15.0)
+        # Edge proxies cut long responses (Caddy write timeout); EventSource reconnects by itself
+        self.max_lifetime = max_lifetime if max_lifetime is not None else _env_float("MARKET_STREAM_MAX_SECONDS", 50.0)
+        self._by_loop: dict[asyncio.AbstractEventLoop, set[Subscriber]] = {}
+        self._encoded: tuple[int, bytes] = (0, b"")
+        self._lock = threading.Lock()
+        self.stats = {"connected": 0, "connections_total": 0, "rejected": 0, "deltas": 0, "events_sent": 0, "coalesced": 0}
+        store.add_listener(self.publish)
+
+    # --- poller side (any thread) ---
+
+    def publish(self, version: int, delta: dict[str, dict]) -> None:
+        if not delta:
+            return
+        with self._lock:
+            self.stats["deltas"] += 1
+            loops = [loop for loop, subs in self._by_loop.items() if subs]
+        for loop in loops:
+            try:
+                loop.call_soon_threadsafe(self._fan_out, loop, version, delta)
+            except RuntimeError:
+                pass  # loop already closed; its subscribers are gone with it
+
+    # --- loop side ---
+
+    def _fan_out(self, loop: asyncio.AbstractEventLoop, version: int, delta: dict[str, dict]) -> None:
+        with self._lock:
+            subscribers = list(self._by_loop.get(loop, ()))
+        for subscriber in subscribers:
+            subscriber.offer(version, delta)
+
+    def subscribe(self, symbols: Optional[frozenset[str]] = None) -> Subscriber:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self.stats["connected"] >= self.max_clients:
+                self.stats["rejected"] += 1
+                raise StreamLimitReached()
+            subscriber = Subscriber(symbols, loop)
+            self._by_loop.setdefault(loop, set()).add(subscriber)
+            self.stats["connected"] += 1
+            self.stats["connections_total"] += 1
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        with self._lock:
+            subs = self._by_loop.get(subscriber.loop)
+            if subs is None or subscriber not in subs:
+                return
+            subs.discard(subscriber)
+            if not subs:
+                del self._by_loop[subscriber.loop]
+            self.stats["connected"] -= 1
+            self.stats["coalesced"] += subscriber.coalesced
+
+    def snapshot_for(self, subscriber: Subscriber) -> dict:
+        version, items = self.store.items()
+        subscriber.version = max(subscriber.version, version)
+        return {
+            symbol: {k: v for k, v in item.items() if k != "symbol"}
+            for symbol, item in items.items()
+            if subscriber.symbols is None or symbol in subscriber.symbols
+        }
+
+    def accepting(self) -> bool:
+        with self._lock:
+            if self.stats["connected"] < self.max_clients:
+                return True
+            self.stats["rejected"] += 1
+            return False
+
+    async def events(self, symbols: Optional[frozenset[str]] = None) -> AsyncIterator[bytes]:
+        """SSE byte stream: `snapshot` first, then coalesced `delta` events and heartbeats.
+        Subscribes on first iteration, so a response that is never sent leaves nothing behind."""
+        try:
+            subscriber = self.subscribe(symbols)
+        except StreamLimitReached:
+            return  # lost the race for the last slot after accepting(); the client retries
+        started = time.monotonic()
+        try:
+            yield b"retry: 2000\n" + _event("snapshot", subscriber.version, self.snapshot_for(subscriber))
+            while True:
+                remaining = self.max_lifetime - (time.monotonic() - started) if self.max_lifetime else self.heartbeat
+                if remaining <= 0:
+                    return
+                try:
+                    # asyncio.timeout (no extra task per wait, unlike wait_for)
+                    async with asyncio.timeout(min(self.heartbeat, remaining)):
+                        await subscriber.event.wait()
+                except TimeoutError:
+                    yield b": ping\n\n"
+                    continue
+                pending, exact = subscriber.take()
+                if pending:
+                    self.stats["events_sent"] += 1
+                    yield self._encode_shared(subscriber.version, pending) if exact else _event("delta", subscriber.version, pending)
+        finally:
+            self.unsubscribe(subscriber)
+
+    def _encode_shared(self, version: int, delta: dict[str, dict]) -> bytes:
+        # Most clients keep up and get the same delta: encode it once per version
+        cached_version, body = self._encoded
+        if cached_version != version:
+            body = _event("delta", version, delta)
+            self._encoded = (version, body)
+        return body
+
+    def snapshot_stats(self) -> dict:
+        with self._lock:
+            return dict(self.stats, loops=len(self._by_loop))
+
+
+def _event(name: str, version: int, data: dict) -> bytes:
+    return f"event: {name}\nid: {version}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode("utf-8")
+
+
+_hub: Optional[MarketHub] = None
+_hub_lock = threading.Lock()
+
+
+def get_market_hub() -> MarketHub:
+    global _hub
+    with _hub_lock:
+        if _hub is None:
+            _hub = MarketHub(get_market_store())
+            register_stats("market_stream", _hub.snapshot_stats)
+        return _hub
@@ -0,0 +1,533 @@
+"""
+NOWPayments IPN pipeline.
+
+Stage 1 (webhook): verify the signature and append the raw event to
+`nowpayments_ipn_events` with apply_status="queued". Nothing else.
+
+Stage 2 (IpnApplier): a single consumer (named lease) reads queued events in
+id order, groups them by payment_id, drops repeated statuses and applies the
+state transitions (payments, bookings, product purchases, entitlements) for a
+whole batch in one transaction. If the batch fails, payments are retried one
+by one so a single bad event cannot block the queue.
+
+A payment whose events still fail stays queued with an exponential backoff
+(apply_attempts / next_attempt_at); its later events wait behind it so the
+transitions keep their order. After NOWPAYMENTS_IPN_MAX_ATTEMPTS the events
+become "dead" and are only applied again after requeue_dead_ipn_events()
+(replay_ipn_events.py). The webhook already answered 200, so NOWPayments will
+not resend: dropping a failed event would lose the payment.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import socket
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Iterable, Optional
+
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models.booking import Booking
+from app.models.nowpayments_ipn_event import NowPaymentsIpnEvent
+from app.models.nowpayments_payment import NowPaymentsPayment
+from app.models.payment import Payment as PaymentModel
+from app.models.product_purchase import ProductPurchase
+from app.models.user_entitlement import UserEntitlement
+from app.services.lease_service import acquire_lease, release_lease
+
+logger = logging.getLogger("nowpayments")
+
+PAID_ACCESS_ENTITLEMENT = "paid_access"
+APPLIER_LEASE = "nowpayments_ipn_applier"
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+def parse_booking_id(order_id: Optional[str]) -> Optional[int]:
+    if not order_id:
+        return None
+    if not order_id.startswith("booking-"):
+        return None
+    try:
+        return int(order_id.split("booking-")[1])
+    except (ValueError, IndexError):
+        return None
+
+
+def parse_product_purchase_id(order_id: Optional[str]) -> Optional[int]:
+    if not order_id:
+        return None
+    if not order_id.startswith("product-"):
+        return None
+    try:
+        return int(order_id.split("product-")[1])
+    except (ValueError, IndexError):
+        return None
+
+
+def get_booking_by_payment(db: Session, payment_id: int, order_id: Optional[str]) -> Optional[Booking]:
+    booking_id = parse_booking_id(order_id)
+    if booking_id:
+        return db.query(Booking).filter(Booking.id == booking_id).first()
+    return db.query(Booking).filter(Booking.payment_id == str(payment_id)).first()
+
+
+# --- stage 1 ---
+
+
+def store_ipn_event(db: Session, payload: dict, signature_header: str, signature_valid: bool) -> NowPaymentsIpnEvent:
+    """Durably append the event. Only signed events with payment_id/status are queued for the applier."""
+    payment_id = payload.get("payment_id")
+    queued = bool(signature_valid) and payment_id is not None and bool(payload.get("payment_status"))
+    ev = NowPaymentsIpnEvent(
+        payment_id=str(payment_id) if payment_id is not None else None,
+        payment_status=payload.get("payment_status"),
+        order_id=payload.get("order_id"),
+        signature_valid=bool(signature_valid),
+        signature_header=signature_header or None,
+        payload_json=json.dumps(payload),
+        apply_status="queued" if queued else "ignored",
+    )
+    db.add(ev)
+    db.commit()
+    return ev
+
+
+# --- state transitions (no commits: the applier owns the transaction) ---
+
+
+def upsert_nowpayments_payment_from_ipn(db: Session, payload: dict) -> None:
+    payment_id = payload.get("payment_id")
+    if payment_id is None:
+        return
+    payment_id = str(payment_id)
+
+    record = db.query(NowPaymentsPayment).filter(NowPaymentsPayment.payment_id == payment_id).first()
+    if not record:
+        record = NowPaymentsPayment(payment_id=payment_id)
+        db.add(record)
+
+    record.order_id = payload.get("order_id") or record.order_id
+    record.status = payload.get("payment_status") or record.status
+    if payload.get("price_amount") is not None:
+        record.price_amount = payload.get("price_amount")
+    if payload.get("price_currency") is not None:
+        record.price_currency = payload.get("price_currency")
+    if payload.get("pay_amount") is not None:
+        record.pay_amount = payload.get("pay_amount")
+    if payload.get("pay_currency") is not None:
+        record.pay_currency = payload.get("pay_currency")
+    record.raw_last_ipn = json.dumps(payload)
+    db.flush()
+
+
+def _grant_paid_access(db: Session, user_id: int) -> None:
+    exists = (
+        db.query(UserEntitlement.id)
+        .filter(UserEntitlement.user_id == user_id, UserEntitlement.code == PAID_ACCESS_ENTITLEMENT)
+        .first()
+    )
+    if not exists:
+        db.add(UserEntitlement(user_id=user_id, code=PAID_ACCESS_ENTITLEMENT))
+        db.flush()
+
+
+def apply_non_finished_status(db: Session, payment_id: str, order_id: Optional[str], status: str, payload: dict) -> None:
+    # Обновляем существующую запись в payments (таблица приложения), если она уже есть
+    db_payment = db.query(PaymentModel).filter(PaymentModel.transaction_id == str(payment_id)).first()
+    booking = get_booking_by_payment(db, int(payment_id) if str(payment_id).isdigit() else 0, order_id)
+    normalized = (status or "").lower()
+
+    if db_payment:
+        db_payment.payment_metadata = json.dumps(payload)
+        if normalized in {"expired", "failed"}:
+            db_payment.status = "failed"
+        elif normalized == "refunded":
+            db_payment.status = "refunded"
+        else:
+            db_payment.status = "pending"
+
+    if booking:
+        if normalized in {"expired", "failed"}:
+            booking.payment_status = "failed"
+        elif normalized == "refunded":
+            booking.payment_status = "refunded"
+            booking.status = "pending"
+            booking.payment_date = None
+        else:
+            booking.payment_status = "pending"
+
+    # Product purchase status update
+    pp_id = parse_product_purchase_id(order_id)
+    if pp_id:
+        purchase = db.query(ProductPurchase).filter(ProductPurchase.id == pp_id).first()
+        if purchase:
+            purchase.status = status or purchase.status
+            purchase.raw_last_ipn = json.dumps(payload)
+    db.flush()
+
+
+def apply_finished_status(db: Session, payment_id: int, order_id: Optional[str], payload: dict) -> None:
+    db_payment = db.query(PaymentModel).filter(PaymentModel.transaction_id == str(payment_id)).first()
+    booking = get_booking_by_payment(db, payment_id, order_id)
+
+    if db_payment:
+        if db_payment.status != "completed":
+            db_payment.status = "completed"
+            db_payment.completed_at = datetime.now()
+        db_payment.payment_metadata = json.dumps(payload)
+    elif booking:
+        db_payment = PaymentModel(
+            booking_id=booking.id,
+            user_id=booking.user_id,
+            webinar_id=booking.webinar_id,
+            amount=payload.get("price_amount") or booking.amount or 0,
+            currency=(payload.get("price_currency") or "USD").upper(),
+            payment_method="crypto",
+            payment_provider="nowpayments",
+            transaction_id=str(payment_id),
+            status="completed",
+            payment_metadata=json.dumps(payload),
+            completed_at=datetime.now(),
+        )
+        db.add(db_payment)
+
+    if booking:
+        booking.payment_status = "paid"
+        booking.status = "confirmed"
+        booking.payment_date = datetime.now()
+        booking.payment_id = str(payment_id)
+        if payload.get("price_amount"):
+            booking.amount = payload.get("price_amount")
+
+        # Standalone payment (not webinar): выдаём роль/доступ пользователю
+        if (booking.type or "").lower() == "payment":
+            _grant_paid_access(db, booking.user_id)
+
+    # Product purchase: выдаём доступ по order_id product-<id>
+    pp_id = parse_product_purchase_id(order_id)
+    if pp_id:
+        purchase = db.query(ProductPurchase).filter(ProductPurchase.id == pp_id).first()
+        if purchase:
+            purchase.status = "finished"
+            purchase.nowpayments_payment_id = str(payment_id)
+            purchase.raw_last_ipn = json.dumps(payload)
+            if payload.get("pay_address"):
+                purchase.pay_address = payload.get("pay_address")
+            if payload.get("pay_amount") is not None:
+                try:
+                    purchase.pay_amount = float(payload.get("pay_amount"))
+                except Exception:
+                    pass
+            _grant_paid_access(db, purchase.user_id)
+    db.flush()
+
+
+def apply_ipn_payload(db: Session, payload: dict) -> None:
+    payment_id = payload.get("payment_id")
+    status = str(payload.get("payment_status") or "").lower()
+    upsert_nowpayments_payment_from_ipn(db, payload)
+    if status == "finished":
+        # ЕДИНСТВЕННЫЙ источник истины для выдачи доступа — IPN finished
+        apply_finished_status(db, int(payment_id) if str(payment_id).isdigit() else 0, payload.get("order_id"), payload)
+    else:
+        # waiting / confirming / expired / failed / refunded и т.д.
+        apply_non_finished_status(db, str(payment_id), payload.get("order_id"), status, payload)
+
+
+# --- stage 2 ---
+
+
+def _normalized(status: Optional[str]) -> str:
+    return str(status or "").strip().lower()
+
+
+def _last_applied_statuses(db: Session, payment_ids: set[str]) -> dict[str, str]:
+    """Status of the most recently applied event per payment (one grouped query)."""
+    latest = (
+        db.query(func.max(NowPaymentsIpnEvent.id))
+        .filter(NowPaymentsIpnEvent.payment_id.in_(payment_ids), NowPaymentsIpnEvent.apply_status == "applied")
+        .group_by(NowPaymentsIpnEvent.payment_id)
+    )
+    rows = (
+        db.query(NowPaymentsIpnEvent.payment_id, NowPaymentsIpnEvent.payment_status)
+        .filter(NowPaymentsIpnEvent.id.in_(latest))
+        .all()
+    )
+    return {pid: _normalized(status) for pid, status in rows}
+
+
+def _apply_group(db: Session, events: list[NowPaymentsIpnEvent], previous: Optional[str]) -> dict[int, str]:
+    """Apply one payment's events in order; returns event id -> outcome."""
+    outcome = {}
+    for ev in events:
+        status = _normalized(ev.payment_status)
+        if status == previous:
+            # NOWPayments retries and repeats statuses; the transition is already applied
+            outcome[ev.id] = "duplicate"
+            continue
+        apply_ipn_payload(db, json.loads(ev.payload_json or "{}"))
+        outcome[ev.id] = "applied"
+        previous = status
+    return outcome
+
+
+def _mark(db: Session, outcome: dict[int, str], error: Optional[str] = None) -> None:
+    now = datetime.now(timezone.utc)
+    by_status: dict[str, list[int]] = {}
+    for event_id, status in outcome.items():
+        by_status.setdefault(status, []).append(event_id)
+    for status, ids in by_status.items():
+        db.query(NowPaymentsIpnEvent).filter(NowPaymentsIpnEvent.id.in_(ids)).update(
+            {
+                NowPaymentsIpnEvent.apply_status: status,
+                NowPaymentsIpnEvent.applied_at: now,
+                NowPaymentsIpnEvent.apply_error: error,
+            },
+            synchronize_session=False,
+        )
+
+
+def _retry_delay(attempts: int) -> timedelta:
+    base = _env_float("NOWPAYMENTS_IPN_RETRY_BASE_SECONDS", 30.0)
+    cap = _env_float("NOWPAYMENTS_IPN_RETRY_MAX_SECONDS", 3600.0)
+    return timedelta(seconds=min(base * 2 ** max(attempts - 1, 0), cap))
+
+
+def _schedule_retry(db: Session, event_ids: list[int], error: str, max_attempts: int) -> dict[int, str]:
+    """Count a failed attempt: back off, or give up ("dead") after max_attempts. Returns event id -> outcome."""
+    now = datetime.now(timezone.utc)
+    outcome = {}
+    rows = (
+        db.query(NowPaymentsIpnEvent.id, NowPaymentsIpnEvent.apply_attempts)
+        .filter(NowPaymentsIpnEvent.id.in_(event_ids))
+        .all()
+    )
+    for event_id, attempts in rows:
+        attempts = int(attempts or 0) + 1
+        dead = attempts >= max_attempts
+        db.query(NowPaymentsIpnEvent).filter(NowPaymentsIpnEvent.id == event_id).update(
+            {
+                NowPaymentsIpnEvent.apply_status: "dead" if dead else "queued",
+                NowPaymentsIpnEvent.apply_attempts: attempts,
+                NowPaymentsIpnEvent.next_attempt_at: None if dead else now + _retry_delay(attempts),
+                NowPaymentsIpnEvent.applied_at: now if dead else None,
+                NowPaymentsIpnEvent.apply_error: error,
+            },
+            synchronize_session=False,
+        )
+        outcome[event_id] = "dead" if dead else "retry"
+    return outcome
+
+
+def apply_queued_ipn_events(db: Session, *, batch_size: Optional[int] = None, max_attempts: Optional[int] = None) -> dict:
+    """Apply up to `batch_size` due queued events. Returns counters by outcome."""
+    batch_size = batch_size or _env_int("NOWPAYMENTS_IPN_BATCH_SIZE", 200)
+    max_attempts = max_attempts or _env_int("NOWPAYMENTS_IPN_MAX_ATTEMPTS", 10)
+    now = datetime.now(timezone.utc)
+    queued = NowPaymentsIpnEvent.apply_status == "queued"
+    events = (
+        db.query(NowPaymentsIpnEvent)
+        .filter(queued, or_(NowPaymentsIpnEvent.next_attempt_at.is_(None), NowPaymentsIpnEvent.next_attempt_at <= now))
+        .order_by(NowPaymentsIpnEvent.id.asc())
+        .limit(batch_size)
+        .all()
+    )
+    stats = {"events": 0, "applied": 0, "duplicate": 0, "error": 0, "dead": 0}
+    if events:
+        # Payments with an earlier event still backing off: their new events wait behind it
+        waiting = {
+            pid
+            for (pid,) in db.query(NowPaymentsIpnEvent.payment_id)
+            .filter(
+                queued,
+                NowPaymentsIpnEvent.next_attempt_at > now,
+                NowPaymentsIpnEvent.payment_id.in_({ev.payment_id for ev in events}),
+            )
+            .distinct()
+        }
+        events = [ev for ev in events if ev.payment_id not in waiting]
+    stats["events"] = len(events)
+    if not events:
+        return stats
+
+    groups: "OrderedDict[str, list[NowPaymentsIpnEvent]]" = OrderedDict()
+    for ev in events:
+        groups.setdefault(ev.payment_id, []).append(ev)
+    group_ids = {pid: [ev.id for ev in evs] for pid, evs in groups.items()}
+    previous = _last_applied_statuses(db, set(groups))
+
+    outcome: dict[int, str] = {}
+    try:
+        for pid, evs in groups.items():
+            outcome.update(_apply_group(db, evs, previous.get(pid)))
+        _mark(db, outcome)
+        db.commit()
+    except Exception:
+        db.rollback()
+        logger.exception("ipn batch failed, retrying payments one by one")
+        outcome = {}
+        for pid, ids in group_ids.items():
+            evs = db.query(NowPaymentsIpnEvent).filter(NowPaymentsIpnEvent.id.in_(ids)).order_by(NowPaymentsIpnEvent.id).all()
+            try:
+                group_outcome = _apply_group(db, evs, previous.get(pid))
+                _mark(db, group_outcome)
+                db.commit()
+                outcome.update(group_outcome)
+            except Exception as exc:
+                db.rollback()
+                logger.exception("ipn apply failed payment_id=%s", pid)
+                group_outcome = _schedule_retry(db, ids, str(exc)[:2000], max_attempts)
+                db.commit()
+                outcome.update(group_outcome)
+                if "dead" in group_outcome.values():
+                    logger.error("ipn events dead after %s attempts payment_id=%s ids=%s", max_attempts, pid, ids)
+
+    for status in outcome.values():
+        # error = failed this run (retrying later or dead); dead is also counted on its own
+        if status in ("retry", "dead"):
+            stats["error"] += 1
+        if status != "retry":
+            stats[status] += 1
+    logger.info(
+        "ipn batch events=%s payments=%s applied=%s duplicate=%s error=%s dead=%s",
+        stats["events"], len(groups), stats["applied"], stats["duplicate"], stats["error"], stats["dead"],
+    )
+    return stats
+
+
+def requeue_dead_ipn_events(
+    db: Session, *, event_ids: Optional[Iterable[int]] = None, payment_id: Optional[str] = None
+) -> int:
+    """Put dead events back in the queue with a fresh attempt budget (all, or by id / payment). Returns the count."""
+    query = db.query(NowPaymentsIpnEvent).filter(NowPaymentsIpnEvent.apply_status == "dead")
+    if event_ids is not None:
+        query = query.filter(NowPaymentsIpnEvent.id.in_(list(event_ids)))
+    if payment_id is not None:
+        query = query.filter(NowPaymentsIpnEvent.payment_id == str(payment_id))
+    count = query.update(
+        {
+            NowPaymentsIpnEvent.apply_status: "queued",
+            NowPaymentsIpnEvent.apply_attempts: 0,
+            NowPaymentsIpnEvent.next_attempt_at: None,
+            NowPaymentsIpnEvent.applied_at: None,
+        },
+        synchronize_session=False,
+    )
+    db.commit()
+    wake_ipn_applier()
+    return count
+
+
+class IpnApplier:
+    """Background consumer of queued IPN events; one active instance across processes."""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        *,
+        batch_size: Optional[int] = None,
+        poll_interval: Optional[float] = None,
+        lease_seconds: Optional[float] = None,
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size or _env_int("NOWPAYMENTS_IPN_BATCH_SIZE", 200)
+        self.poll_interval = poll_interval or _env_float("NOWPAYMENTS_IPN_POLL_SECONDS", 5.0)
+        self.lease_seconds = lease_seconds or _env_float("NOWPAYMENTS_IPN_LEASE_SECONDS", 60.0)
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run_forever, name="ipn-applier", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+        db = self.session_factory()
+        try:
+            release_lease(db, APPLIER_LEASE, self.holder)
+        except Exception:
+            logger.exception("ipn applier lease release failed")
+        finally:
+            db.close()
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def run_forever(self) -> None:
+        logger.info("ipn applier started holder=%s", self.holder)
+        while not self._stop.is_set():
+            try:
+                worked = self.run_once()
+            except Exception:
+                logger.exception("ipn applier iteration failed")
+                worked = False
+            if not worked:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def run_once(self) -> bool:
+        """Apply one batch if this process holds the lease. True if a full batch was applied."""
+        db = self.session_factory()
+        try:
+            if not acquire_lease(db, APPLIER_LEASE, self.holder, self.lease_seconds):
+                return False
+            stats = apply_queued_ipn_events(db, batch_size=self.batch_size)
+            return stats["events"] >= self.batch_size
+        finally:
+            db.close()
+
+
+_applier: Optional[IpnApplier] = None
+_applier_lock = threading.Lock()
+
+
+def start_ipn_applier() -> Optional[IpnApplier]:
+    """Start the in-process applier (disabled with NOWPAYMENTS_IPN_APPLIER_ENABLED=0)."""
+    global _applier
+    if os.getenv("NOWPAYMENTS_IPN_APPLIER_ENABLED", "1") != "1":
+        return None
+    with _applier_lock:
+        if _applier is None:
+            _applier = IpnApplier()
+        _applier.start()
+        return _applier
+
+
+def stop_ipn_applier() -> None:
+    global _applier
+    with _applier_lock:
+        if _applier is not None:
+            _applier.stop()
+            _applier = None
+
+
+def wake_ipn_applier() -> None:
+    if _applier is not None:
+        _applier.wake()
@@ -0,0 +1,140 @@
+"""
+Admin panel password hashing (PBKDF2-SHA256) on a bounded worker pool.
+
+Hashing is deliberately expensive (200k iterations by default), so it never
+runs on the request thread directly: at most ADMIN_PANEL_HASH_WORKERS hashes
+run at once and at most ADMIN_PANEL_HASH_QUEUE more wait for a worker. Beyond
+that HashingBusy is raised immediately instead of queueing, so a burst of
+login attempts costs a bounded amount of CPU and the API keeps serving.
+hashlib.pbkdf2_hmac releases the GIL, so a thread pool is enough for real
+parallelism without forking extra processes in the web worker.
+
+Stored format: pbkdf2_sha256$iterations$salt_b64$hash_b64. Hashes made with
+fewer iterations than configured are flagged by needs_rehash().
+"""
+from __future__ import annotations
+
+import base64
+import hashlib
+import os
+import secrets
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional, TypeVar
+
+from app.utils.metrics import register_stats
+
+T = TypeVar("T")
+
+DEFAULT_ITERATIONS = 200000
+
+
+class HashingBusy(Exception):
+    """The hashing pool and its queue are full; the caller should ask the client to retry later."""
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+def configured_iterations() -> int:
+    return _env_int("ADMIN_PANEL_PBKDF2_ITERS", DEFAULT_ITERATIONS)
+
+
+def _b64(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _unb64(text: str) -> bytes:
+    return base64.urlsafe_b64decode((text + "=" * (-len(text) % 4)).encode("ascii"))
+
+
+def hash_password_sync(password: str, iterations: Optional[int] = None) -> str:
+    iterations = iterations or configured_iterations()
+    salt = secrets.token_bytes(16)
+    dk = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations, dklen=32)
+    return "pbkdf2_sha256$%d$%s$%s" % (iterations, _b64(salt), _b64(dk))
+
+
+def verify_password_sync(password: str, encoded: str) -> bool:
+    try:
+        algo, iters_s, salt_b64, hash_b64 = encoded.split("$", 3)
+        if algo != "pbkdf2_sha256":
+            return False
+        expected = _unb64(hash_b64)
+        dk = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), _unb64(salt_b64), int(iters_s), dklen=len(expected))
+        return secrets.compare_digest(dk, expected)
+    except Exception:
+        return False
+
+
+def needs_rehash(encoded: str) -> bool:
+    """True if the stored hash uses fewer iterations than configured (or an unknown format)."""
+    try:
+        algo, iters_s, _ = encoded.split("$", 2)
+        return algo != "pbkdf2_sha256" or int(iters_s) < configured_iterations()
+    except ValueError:
+        return True
+
+
+class HashingPool:
+    def __init__(self, *, workers: Optional[int] = None, queue: Optional[int] = None):
+        self.workers = max(1, workers or _env_int("ADMIN_PANEL_HASH_WORKERS", 2))
+        self.queue = max(0, queue if queue is not None else _env_int("ADMIN_PANEL_HASH_QUEUE", 8))
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pbkdf2")
+        self._slots = threading.BoundedSemaphore(self.workers + self.queue)
+        self._lock = threading.Lock()
+        self.stats = {"submitted": 0, "rejected": 0, "in_flight": 0}
+
+    def submit(self, fn: Callable[..., T], *args) -> "Future[T]":
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.stats["rejected"] += 1
+            raise HashingBusy()
+        with self._lock:
+            self.stats["submitted"] += 1
+            self.stats["in_flight"] += 1
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, _future) -> None:
+        with self._lock:
+            self.stats["in_flight"] -= 1
+        self._slots.release()
+
+    def run(self, fn: Callable[..., T], *args) -> T:
+        """Run on the pool and wait (called from sync handlers, which already run off the event loop)."""
+        return self.submit(fn, *args).result()
+
+    def snapshot_stats(self) -> dict:
+        with self._lock:
+            return dict(self.stats, workers=self.workers, queue=self.queue)
+
+
+_pool: Optional[HashingPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_hashing_pool() -> HashingPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = HashingPool()
+            register_stats("password_hashing", _pool.snapshot_stats)
+        return _pool
+
+
+def hash_password(password: str) -> str:
+    return get_hashing_pool().run(hash_password_sync, password)
+
+
+def verify_password(password: str, encoded: str) -> bool:
+    return get_hashing_pool().run(verify_password_sync, password, encoded)
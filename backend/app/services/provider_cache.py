@@ -0,0 +1,183 @@
+"""
+Cache for slow-changing payment-provider metadata (currencies, min amounts, estimates).
+
+- fresh entries (age < ttl) are served directly
+- stale entries (age < ttl + stale_ttl) are served immediately while one
+  background refresh runs (stale-while-revalidate)
+- concurrent misses for the same key share a single upstream call (single-flight)
+- if the provider fails, the last known value is served (stale-if-error)
+- `persist=True` entries are snapshotted to disk, so a restart starts warm
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+from app.utils.metrics import register_stats
+
+logger = logging.getLogger("provider_cache")
+
+
+@dataclass
+class _Entry:
+    value: Any
+    fetched_at: float
+    persist: bool = False
+
+
+class ProviderCache:
+    def __init__(self, name: str, *, snapshot_path: Optional[str] = None, max_entries: int = 512, clock: Callable[[], float] = time.time):
+        self.name = name
+        self.snapshot_path = snapshot_path
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._inflight: dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+        self._refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix=f"{name}-refresh")
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "errors": 0, "stale_on_error": 0}
+        self._load_snapshot()
+
+    # --- public API ---
+
+    def get(self, key: str, loader: Callable[[], Any], *, ttl: float, stale_ttl: float = 0.0, persist: bool = False) -> Any:
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                age = now - entry.fetched_at
+                if age < ttl:
+                    self.stats["hits"] += 1
+                    return entry.value
+                if age < ttl + stale_ttl:
+                    self.stats["stale_hits"] += 1
+                    self._start_refresh(key, loader, persist, background=True)
+                    return entry.value
+            self.stats["misses"] += 1
+            future, created = self._start_refresh(key, loader, persist, background=False)
+        if created:
+            # This caller does the upstream call; concurrent callers wait on the same future
+            self._refresh(key, loader, persist, future)
+        try:
+            return future.result()
+        except Exception:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self.stats["stale_on_error"] += 1
+            if entry is not None:
+                logger.warning("%s: provider failed, serving last known value key=%s", self.name, key)
+                return entry.value
+            raise
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def snapshot_stats(self) -> dict:
+        with self._lock:
+            return dict(self.stats, size=len(self._entries), inflight=len(self._inflight))
+
+    # --- internals ---
+
+    def _start_refresh(self, key: str, loader: Callable[[], Any], persist: bool, *, background: bool) -> tuple[Future, bool]:
+        """Caller holds self._lock. Returns (in-flight future for key, whether it was just created)."""
+        future = self._inflight.get(key)
+        if future is not None:
+            return future, False
+        future = Future()
+        self._inflight[key] = future
+        if background:
+            self._refresher.submit(self._refresh, key, loader, persist, future)
+            return future, False
+        return future, True
+
+    def _refresh(self, key: str, loader: Callable[[], Any], persist: bool, future: Future) -> None:
+        try:
+            value = loader()
+        except BaseException as exc:
+            with self._lock:
+                self.stats["errors"] += 1
+                self._inflight.pop(key, None)
+            logger.warning("%s: refresh failed key=%s error=%s", self.name, key, exc.__class__.__name__)
+            future.set_exception(exc)
+            return
+        with self._lock:
+            self.stats["refreshes"] += 1
+            self._entries[key] = _Entry(value=value, fetched_at=self.clock(), persist=persist)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._inflight.pop(key, None)
+        future.set_result(value)
+        if persist:
+            self._write_snapshot()
+
+    def _load_snapshot(self) -> None:
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as fh:
+                data = json.load(fh)
+            for key, item in (data.get("entries") or {}).items():
+                self._entries[key] = _Entry(value=item["value"], fetched_at=float(item["fetched_at"]), persist=True)
+            logger.info("%s: loaded %s entries from snapshot", self.name, len(self._entries))
+        except Exception:
+            logger.exception("%s: snapshot is unreadable, starting cold path=%s", self.name, self.snapshot_path)
+
+    def _write_snapshot(self) -> None:
+        if not self.snapshot_path:
+            return
+        with self._lock:
+            entries = {k: {"value": e.value, "fetched_at": e.fetched_at} for k, e in self._entries.items() if e.persist}
+        with self._snapshot_lock:
+            try:
+                directory = os.path.dirname(self.snapshot_path) or "."
+                os.makedirs(directory, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".snapshot-")
+                with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                    json.dump({"entries": entries}, fh)
+                os.replace(tmp_path, self.snapshot_path)
+            except Exception:
+                logger.exception("%s: failed to write snapshot path=%s", self.name, self.snapshot_path)
+
+
+def default_cache_dir() -> str:
+    """PROVIDER_CACHE_DIR, else next to the SQLite DB (a persistent volume in docker), else tmp."""
+    configured = (os.getenv("PROVIDER_CACHE_DIR") or "").strip()
+    if configured:
+        return configured
+    from app.database import DATABASE_URL
+
+    if DATABASE_URL.startswith("sqlite:///"):
+        return os.path.join(os.path.dirname(os.path.abspath(DATABASE_URL[len("sqlite:///"):])), "cache")
+    return os.path.join(tempfile.gettempdir(), "provider-cache")
+
+
+_nowpayments_cache: Optional[ProviderCache] = None
+_nowpayments_cache_lock = threading.Lock()
+
+
+def get_nowpayments_cache() -> ProviderCache:
+    global _nowpayments_cache
+    with _nowpayments_cache_lock:
+        if _nowpayments_cache is None:
+            _nowpayments_cache = ProviderCache(
+                "nowpayments",
+                snapshot_path=os.path.join(default_cache_dir(), "nowpayments.json"),
+            )
+            register_stats("nowpayments_cache", _nowpayments_cache.snapshot_stats)
+        return _nowpayments_cache
@@ -0,0 +1,549 @@
+"""
+Webinar reminders: due times are precomputed into `reminder_schedule`.
+
+Rows are (re)scheduled when a webinar is created/updated or a booking is made,
+so a tick never parses webinar dates or walks bookings one by one. A tick runs
+a fixed set of statements regardless of how many bookings exist:
+
+1. expire rows whose send window has passed
+2. claim due rows (range over the status/due_at index) with a per-tick token
+3. one SELECT joining the claimed rows to bookings, users and webinars
+4. send, then bulk-update schedule statuses and bookings.reminder_sent_* flags
+
+Eligibility (paid, confirmed, user not blocked, webinar still upcoming) is
+checked at send time, so a booking paid after scheduling is still reminded.
+
+ReminderScheduler runs ticks in-process: it keeps a min-heap of the next due
+times and sleeps until the earliest one. Schedule changes wake it up directly
+(same process), via LISTEN/NOTIFY on Postgres, or via a cheap MAX(id)
+watermark poll on SQLite.
+"""
+from __future__ import annotations
+
+import heapq
+import logging
+import os
+import select as select_module
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+
+from sqlalchemy import exists, func, insert, literal, select, text, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, aliased
+
+from app.database import SessionLocal
+
+from app.models.booking import Booking
+from app.models.reminder_schedule import ReminderSchedule
+from app.models.user import User
+from app.models.webinar import Webinar
+from app.services.broadcast_service import TelegramRateLimiter
+from app.utils.telegram import send_telegram_message
+from app.utils.webinar_time import as_utc
+
+logger = logging.getLogger("reminders")
+
+
+@dataclass(frozen=True)
+class ReminderKind:
+    name: str
+    before_start: timedelta
+    # How late a reminder may still go out (backend restart, slow send)
+    grace: timedelta
+    # Legacy per-booking flag; column names predate the 12h/2h/15m schedule
+    booking_flag: str
+
+
+REMINDER_KINDS: tuple[ReminderKind, ...] = (
+    ReminderKind("12h", timedelta(hours=12), timedelta(minutes=10), "reminder_sent_24h"),
+    ReminderKind("2h", timedelta(hours=2), timedelta(minutes=10), "reminder_sent_1h"),
+    ReminderKind("15m", timedelta(minutes=15), timedelta(minutes=5), "reminder_sent_10m"),
+)
+KINDS_BY_NAME = {k.name: k for k in REMINDER_KINDS}
+# A webinar starting sooner than this has no reminder left to schedule
+MIN_SCHEDULE_LEAD = min(k.before_start - k.grace for k in REMINDER_KINDS)
+
+ELIGIBLE_BOOKING_STATUSES = ("confirmed", "paid")
+# Bookings that can never become eligible are not scheduled at all
+UNSCHEDULED_BOOKING_STATUSES = ("cancelled",)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def reminder_message(kind: str, title: str, date: str, time: str) -> str:
+    if kind == "12h":
+        return (
+            "⏰ <b>Напоминание о вебинаре</b>\n\n"
+            f"Через <b>12 часов</b> начнётся вебинар:\n"
+            f"📌 <b>{title}</b>\n"
+            f"🗓 <b>{date}</b> ⏰ <b>{time}</b>\n\n"
+            "Откройте мини‑приложение, чтобы посмотреть детали."
+        )
+    if kind == "2h":
+        return (
+            "⏰ <b>Напоминание о вебинаре</b>\n\n"
+            f"Через <b>2 часа</b> начнётся вебинар:\n"
+            f"📌 <b>{title}</b>\n"
+            f"🗓 <b>{date}</b> ⏰ <b>{time}</b>\n\n"
+            "Откройте мини‑приложение заранее, чтобы быть готовым."
+        )
+    return (
+        "🚀 <b>Вебинар скоро начнётся</b>\n\n"
+        f"Через <b>15 минут</b> старт:\n"
+        f"📌 <b>{title}</b>\n"
+        f"🗓 <b>{date}</b> ⏰ <b>{time}</b>\n\n"
+        "Откройте мини‑приложение: кнопка <b>«Подключиться»</b> уже доступна."
+    )
+
+
+# --- scheduling ---
+
+NOTIFY_CHANNEL = "reminder_schedule"
+
+
+def _notify_changed(db: Session) -> None:
+    """Tell schedulers (this and other processes) that due times changed. Delivered on commit."""
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text(f"NOTIFY {NOTIFY_CHANNEL}"))
+
+
+def _insert_missing(db: Session, webinar: Webinar, *, booking_id: Optional[int] = None, now: Optional[datetime] = None) -> None:
+    """One INSERT ... SELECT per kind covering every booking of the webinar."""
+    start = as_utc(webinar.starts_at)
+    if start is None or (webinar.status or "upcoming") != "upcoming":
+        return
+    now = now or _utcnow()
+    for kind in REMINDER_KINDS:
+        due_at = start - kind.before_start
+        expires_at = due_at + kind.grace
+        if expires_at <= now:
+            continue
+        existing = aliased(ReminderSchedule)
+        source = select(
+            Booking.id,
+            Booking.webinar_id,
+            Booking.user_id,
+            literal(kind.name),
+            literal(due_at, ReminderSchedule.due_at.type),
+            literal(expires_at, ReminderSchedule.expires_at.type),
+            literal("pending"),
+        ).where(
+            Booking.webinar_id == webinar.id,
+            Booking.status.notin_(UNSCHEDULED_BOOKING_STATUSES),
+            func.coalesce(getattr(Booking, kind.booking_flag), 0) == 0,
+            ~exists().where(existing.booking_id == Booking.id, existing.kind == kind.name),
+        )
+        if booking_id is not None:
+            source = source.where(Booking.id == booking_id)
+        db.execute(
+            insert(ReminderSchedule).from_select(
+                ["booking_id", "webinar_id", "user_id", "kind", "due_at", "expires_at", "status"],
+                source,
+            )
+        )
+
+
+def schedule_webinar_reminders(db: Session, webinar: Webinar) -> None:
+    """(Re)compute pending reminders after a webinar is created or its date/time/status changed."""
+    db.query(ReminderSchedule).filter(
+        ReminderSchedule.webinar_id == webinar.id,
+        ReminderSchedule.status == "pending",
+    ).delete(synchronize_session=False)
+    _insert_missing(db, webinar)
+    _notify_changed(db)
+    db.commit()
+    wake_reminder_scheduler()
+
+
+def schedule_booking_reminders(db: Session, booking: Booking) -> None:
+    """Schedule reminders for a freshly created webinar booking."""
+    if not booking.webinar_id:
+        return
+    webinar = db.query(Webinar).filter(Webinar.id == booking.webinar_id).first()
+    if not webinar:
+        return
+    _insert_missing(db, webinar, booking_id=booking.id)
+    _notify_changed(db)
+    db.commit()
+    wake_reminder_scheduler()
+
+
+def unschedule_webinar_reminders(db: Session, webinar_id: int) -> int:
+    """Drop all schedule rows of a webinar (caller commits together with the delete)."""
+    return db.query(ReminderSchedule).filter(ReminderSchedule.webinar_id == webinar_id).delete(synchronize_session=False)
+
+
+def unschedule_booking_reminders(db: Session, booking_id: int) -> int:
+    return db.query(ReminderSchedule).filter(ReminderSchedule.booking_id == booking_id).delete(synchronize_session=False)
+
+
+def backfill_reminder_schedule(db: Session) -> None:
+    """Schedule reminders for existing upcoming webinars (idempotent; run at startup)."""
+    now = _utcnow()
+    # Only webinars that still have a reminder window ahead (range over the starts_at index)
+    webinars = db.query(Webinar).filter(
+        Webinar.status == "upcoming", Webinar.starts_at > now + MIN_SCHEDULE_LEAD
+    )
+    for webinar in webinars.all():
+        _insert_missing(db, webinar, now=now)
+    db.commit()
+
+
+# --- sending ---
+
+
+def _is_eligible(row) -> bool:
+    kind = KINDS_BY_NAME.get(row.kind)
+    if kind is None:
+        return False
+    return (
+        row.booking_status in ELIGIBLE_BOOKING_STATUSES
+        and row.payment_status == "paid"
+        and not (getattr(row, kind.booking_flag) or 0)
+        and row.telegram_id is not None
+        and not row.is_blocked
+        and (row.webinar_status or "upcoming") == "upcoming"
+    )
+
+
+def run_reminder_tick(
+    db: Session,
+    send: Callable[[int, str], bool] = send_telegram_message,
+    *,
+    now: Optional[datetime] = None,
+    batch_size: Optional[int] = None,
+    concurrency: Optional[int] = None,
+) -> dict:
+    """Send every reminder whose window is open. Returns per-kind and per-outcome counters."""
+    now = now or _utcnow()
+    batch_size = batch_size or _env_int("REMINDER_BATCH_SIZE", 500)
+    concurrency = concurrency or _env_int("REMINDER_SEND_CONCURRENCY", 8)
+    token = uuid.uuid4().hex
+    stats = {"sent": {k.name: 0 for k in REMINDER_KINDS}, "failed": 0, "skipped": 0, "expired": 0}
+
+    # 1. Windows that closed without a send (backend was down, webinar moved, ...)
+    stats["expired"] = db.execute(
+        update(ReminderSchedule)
+        .where(ReminderSchedule.status.in_(("pending", "sending")), ReminderSchedule.expires_at <= now)
+        .values(status="expired")
+        .execution_options(synchronize_session=False)
+    ).rowcount or 0
+
+    # 2. Claim due rows; the token keeps concurrent ticks from sending twice
+    due_ids = (
+        select(ReminderSchedule.id)
+        .where(ReminderSchedule.status == "pending", ReminderSchedule.due_at <= now)
+        .order_by(ReminderSchedule.due_at)
+        .limit(batch_size)
+        .scalar_subquery()
+    )
+    claimed = db.execute(
+        update(ReminderSchedule)
+        .where(ReminderSchedule.id.in_(due_ids), ReminderSchedule.status == "pending")
+        .values(status="sending", claimed_by=token)
+        .execution_options(synchronize_session=False)
+    ).rowcount or 0
+    db.commit()
+    if not claimed:
+        return stats
+
+    # 3. Everything needed to decide and render, in one joined query
+    rows = db.execute(
+        select(
+            ReminderSchedule.id,
+            ReminderSchedule.kind,
+            ReminderSchedule.booking_id,
+            Booking.status.label("booking_status"),
+            Booking.payment_status,
+            Booking.reminder_sent_24h,
+            Booking.reminder_sent_1h,
+            Booking.reminder_sent_10m,
+            User.telegram_id,
+            User.is_blocked,
+            Webinar.title,
+            Webinar.date,
+            Webinar.time,
+            Webinar.status.label("webinar_status"),
+        )
+        .join(Booking, Booking.id == ReminderSchedule.booking_id)
+        .join(Webinar, Webinar.id == ReminderSchedule.webinar_id)
+        .outerjoin(User, User.id == Booking.user_id)
+        .where(ReminderSchedule.claimed_by == token)
+    ).all()
+
+    to_send = [r for r in rows if _is_eligible(r)]
+    skipped_ids = [r.id for r in rows if not _is_eligible(r)]
+
+    # 4. Send with bounded concurrency under the bot-wide rate limit
+    limiter = TelegramRateLimiter(_env_float("REMINDER_RATE_PER_SEC", 25.0), 0)
+
+    def _send(row) -> bool:
+        limiter.acquire(int(row.telegram_id))
+        try:
+            return bool(send(int(row.telegram_id), reminder_message(row.kind, row.title, row.date, row.time)))
+        except Exception:
+            logger.exception("reminder send failed schedule_id=%s", row.id)
+            return False
+
+    if to_send:
+        with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(to_send))), thread_name_prefix="reminder-send") as pool:
+            results = list(pool.map(_send, to_send))
+    else:
+        results = []
+
+    sent_ids = [r.id for r, ok in zip(to_send, results) if ok]
+    failed_ids = [r.id for r, ok in zip(to_send, results) if not ok]
+    for status, ids in (("sent", sent_ids), ("failed", failed_ids), ("skipped", skipped_ids)):
+        if ids:
+            db.execute(
+                update(ReminderSchedule)
+                .where(ReminderSchedule.id.in_(ids))
+                .values(status=status, sent_at=now if status == "sent" else None)
+                .execution_options(synchronize_session=False)
+            )
+
+    # Legacy flags: like the old scan, an attempted reminder is not retried
+    for kind in REMINDER_KINDS:
+        booking_ids = [r.booking_id for r in to_send if r.kind == kind.name]
+        if booking_ids:
+            db.execute(
+                update(Booking)
+                .where(Booking.id.in_(booking_ids))
+                .values({kind.booking_flag: 1})
+                .execution_options(synchronize_session=False)
+            )
+    db.commit()
+
+    for row, ok in zip(to_send, results):
+        if ok:
+            stats["sent"][row.kind] += 1
+    stats["failed"] = len(failed_ids)
+    stats["skipped"] = len(skipped_ids)
+    logger.info(
+        "reminder tick claimed=%s sent=%s failed=%s skipped=%s expired=%s",
+        claimed, sum(stats["sent"].values()), stats["failed"], stats["skipped"], stats["expired"],
+    )
+    return stats
+
+
+# --- in-process scheduler ---
+
+
+class ReminderScheduler:
+    """
+    Sleeps until the earliest pending due_at, then runs a tick.
+
+    The heap holds the next `heap_size` due times; it is reloaded when the
+    schedule changes (wake(), NOTIFY or a moved watermark) or runs dry.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        send: Callable[[int, str], bool] = send_telegram_message,
+        *,
+        poll_interval: Optional[float] = None,
+        max_sleep: Optional[float] = None,
+        heap_size: Optional[int] = None,
+        listen: Optional[bool] = None,
+    ):
+        self.session_factory = session_factory
+        self.send = send
+        # Watermark poll for changes made by other processes (SQLite / no LISTEN)
+        self.poll_interval = poll_interval or _env_float("REMINDER_WATERMARK_POLL_SECONDS", 30.0)
+        # Safety net: re-read the schedule at least this often
+        self.max_sleep = max_sleep or _env_float("REMINDER_MAX_SLEEP_SECONDS", 900.0)
+        self.heap_size = heap_size or _env_int("REMINDER_HEAP_SIZE", 256)
+        self.listen = listen if listen is not None else os.getenv("REMINDER_LISTEN", "1") == "1"
+        self._heap: list[datetime] = []
+        self._watermark: Optional[int] = None
+        self._dirty = True
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._listener: Optional[threading.Thread] = None
+        self.ticks = 0
+
+    # --- lifecycle ---
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run_forever, name="reminder-scheduler", daemon=True)
+        self._thread.start()
+        if self.listen and self._listen_engine() is not None:
+            self._listener = threading.Thread(target=self._listen_forever, name="reminder-listen", daemon=True)
+            self._listener.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def wake(self) -> None:
+        self._dirty = True
+        self._wake.set()
+
+    def next_due(self) -> Optional[datetime]:
+        return self._heap[0] if self._heap else None
+
+    def run_forever(self) -> None:
+        logger.info("reminder scheduler started")
+        last_poll = last_reload = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                if self._dirty or time.monotonic() - last_reload >= self.max_sleep:
+                    self._reload()
+                    last_reload = time.monotonic()
+                now = _utcnow()
+                if self._heap and self._heap[0] <= now:
+                    self._run_tick(now)
+                    continue
+                timeout = self.max_sleep
+                if self._heap:
+                    timeout = min(timeout, (self._heap[0] - now).total_seconds())
+                if self._listener is None:
+                    timeout = min(timeout, self.poll_interval - (time.monotonic() - last_poll))
+            except Exception:
+                logger.exception("reminder scheduler iteration failed")
+                self._dirty = True
+                timeout = self.poll_interval
+
+            if self._wake.wait(max(timeout, 0.0)):
+                self._wake.clear()
+                continue
+            if self._listener is None and time.monotonic() - last_poll >= self.poll_interval:
+                last_poll = time.monotonic()
+                try:
+                    self._check_watermark()
+                except Exception:
+                    logger.exception("reminder watermark check failed")
+
+    # --- internals ---
+
+    def _run_tick(self, now: datetime) -> None:
+        db = self.session_factory()
+        try:
+            run_reminder_tick(db, self.send, now=now)
+        finally:
+            db.close()
+        self.ticks += 1
+        while self._heap and self._heap[0] <= now:
+            heapq.heappop(self._heap)
+        # Claimed rows are gone from "pending"; a full batch may have left more due rows
+        self._dirty = True
+
+    def _reload(self) -> None:
+        db = self.session_factory()
+        try:
+            due = (
+                db.query(ReminderSchedule.due_at)
+                .filter(ReminderSchedule.status == "pending")
+                .order_by(ReminderSchedule.due_at)
+                .limit(self.heap_size)
+                .all()
+            )
+            self._watermark = db.query(func.max(ReminderSchedule.id)).scalar()
+        finally:
+            db.close()
+        self._heap = [as_utc(row.due_at) for row in due]
+        heapq.heapify(self._heap)
+        self._dirty = False
+
+    def _check_watermark(self) -> None:
+        # New/rescheduled rows always get a higher id, so MAX(id) is enough
+        db = self.session_factory()
+        try:
+            watermark = db.query(func.max(ReminderSchedule.id)).scalar()
+        finally:
+            db.close()
+        if watermark != self._watermark:
+            self._dirty = True
+
+    def _listen_engine(self) -> Optional[Engine]:
+        db = self.session_factory()
+        try:
+            bind = db.get_bind()
+        finally:
+            db.close()
+        return bind if bind.dialect.name == "postgresql" else None
+
+    def _listen_forever(self) -> None:
+        engine = self._listen_engine()
+        raw = engine.raw_connection()
+        try:
+            conn = raw.driver_connection
+            if not hasattr(conn, "notifies"):
+                logger.warning("reminder LISTEN unsupported by driver, using watermark polling")
+                self._listener = None
+                return
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {NOTIFY_CHANNEL}")
+            logger.info("reminder scheduler listening on %s", NOTIFY_CHANNEL)
+            while not self._stop.is_set():
+                readable, _, _ = select_module.select([conn], [], [], 5.0)
+                if not readable:
+                    continue
+                conn.poll()
+                if conn.notifies:
+                    conn.notifies.clear()
+                    self.wake()
+        except Exception:
+            logger.exception("reminder LISTEN failed, using watermark polling")
+            self._listener = None
+            self.wake()
+        finally:
+            raw.close()
+
+
+_scheduler: Optional[ReminderScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def start_reminder_scheduler() -> Optional[ReminderScheduler]:
+    """Start the in-process scheduler (disabled with REMINDER_SCHEDULER_ENABLED=0)."""
+    global _scheduler
+    if os.getenv("REMINDER_SCHEDULER_ENABLED", "1") != "1":
+        return None
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = ReminderScheduler()
+        _scheduler.start()
+        return _scheduler
+
+
+def stop_reminder_scheduler() -> None:
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is not None:
+            _scheduler.stop()
+            _scheduler = None
+
+
+def wake_reminder_scheduler() -> None:
+    if _scheduler is not None:
+        _scheduler.wake()
@@ -0,0 +1,114 @@
+"""
+Ticket (support / consultation) and booking lists with their people attached.
+
+The customer, the responding admin user and that admin's role come from
+outer joins in the same SELECT, so a page costs one query at any size.
+Pages are keyset-based on booking id (`cursor` = last id of the previous
+page), so deep pages cost the same as the first one.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+from sqlalchemy.orm import Query, Session, aliased
+
+from app.models.admin import Admin
+from app.models.booking import Booking
+from app.models.user import User
+
+TICKET_TYPES = ("support", "consultation")
+
+Customer = aliased(User, name="customer")
+Responder = aliased(User, name="responder")
+
+
+@dataclass
+class TicketPage:
+    items: list[dict]
+    next_cursor: Optional[int]
+
+
+def tickets_query(db: Session) -> Query:
+    """(Booking, customer fields, responder fields, responder role) rows; every join is unique."""
+    return (
+        db.query(
+            Booking,
+            Customer.telegram_id.label("user_telegram_id"),
+            Customer.first_name.label("user_first_name"),
+            Customer.username.label("user_username"),
+            Responder.id.label("responder_id"),
+            Responder.first_name.label("admin_first_name"),
+            Responder.username.label("admin_username"),
+            Admin.role.label("admin_role"),
+        )
+        .outerjoin(Customer, Customer.id == Booking.user_id)
+        .outerjoin(Responder, Responder.id == Booking.admin_id)
+        .outerjoin(Admin, Admin.telegram_id == Responder.telegram_id)
+    )
+
+
+def serialize_ticket(row, *, with_customer: bool = True) -> dict:
+    """BookingResponseAdmin shape; with_customer=False gives the BookingResponse shape (user's own list)."""
+    booking = row[0]
+    admin_name = None
+    if row.responder_id is not None:
+        admin_name = row.admin_first_name or row.admin_username or "Администратор"
+    data = {
+        "id": booking.id,
+        "user_id": booking.user_id,
+        "webinar_id": booking.webinar_id,
+        "type": booking.type,
+        "date": booking.date,
+        "time": booking.time,
+        "status": booking.status,
+        "topic": booking.topic,
+        "message": booking.message,
+        "admin_response": booking.admin_response,
+        "admin_id": booking.admin_id,
+        "admin_name": admin_name,
+        "admin_role": row.admin_role if admin_name else None,
+        "payment_status": booking.payment_status or "unpaid",
+        "amount": booking.amount,
+        "payment_id": booking.payment_id,
+        "payment_date": booking.payment_date.isoformat() if booking.payment_date else None,
+        "attended": booking.attended or 0,
+    }
+    if with_customer:
+        data["user_telegram_id"] = row.user_telegram_id
+        data["user_first_name"] = row.user_first_name
+        data["user_username"] = row.user_username
+    return data
+
+
+def list_tickets(
+    db: Session,
+    *,
+    types: Optional[Iterable[str]] = None,
+    status: Optional[str] = None,
+    user_id: Optional[int] = None,
+    cursor: Optional[int] = None,
+    newest_first: bool = True,
+    skip: int = 0,
+    limit: int = 100,
+) -> TicketPage:
+    """
+    One page of bookings matching the filters. `cursor` continues after the last id
+    of the previous page; `skip` is only for legacy offset callers.
+    """
+    query = tickets_query(db)
+    if types is not None:
+        query = query.filter(Booking.type.in_(list(types)))
+    if status:
+        query = query.filter(Booking.status == status)
+    if user_id is not None:
+        query = query.filter(Booking.user_id == user_id)
+    if cursor is not None:
+        query = query.filter(Booking.id < cursor if newest_first else Booking.id > cursor)
+    query = query.order_by(Booking.id.desc() if newest_first else Booking.id.asc())
+    if skip:
+        query = query.offset(skip)
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    items = [serialize_ticket(row) for row in rows[:limit]]
+    return TicketPage(items=items, next_cursor=items[-1]["id"] if has_more and items else None)
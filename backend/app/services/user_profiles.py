@@ -0,0 +1,72 @@
+"""
+User profile assembler for the users router.
+
+A profile is the user row plus its admin role and paid-access flag. Both come
+from outer joins in the same SELECT, so a page of N users costs one query
+instead of 2N+1.
+"""
+from __future__ import annotations
+
+from typing import Optional
+
+from sqlalchemy import and_
+from sqlalchemy.orm import Query, Session
+
+from app.models.admin import Admin
+from app.models.user import User
+from app.models.user_entitlement import UserEntitlement
+
+PAID_ACCESS_ENTITLEMENT = "paid_access"
+
+
+def profiles_query(db: Session) -> Query:
+    """(User, admin_id, admin_role, entitlement_id) rows; both joins are unique, so no row fan-out."""
+    return (
+        db.query(
+            User,
+            Admin.id.label("admin_id"),
+            Admin.role.label("admin_role"),
+            UserEntitlement.id.label("paid_access_id"),
+        )
+        .outerjoin(Admin, Admin.telegram_id == User.telegram_id)
+        .outerjoin(
+            UserEntitlement,
+            and_(UserEntitlement.user_id == User.id, UserEntitlement.code == PAID_ACCESS_ENTITLEMENT),
+        )
+    )
+
+
+def serialize_profile(user: User, admin_id: Optional[int], admin_role: Optional[str], paid_access_id: Optional[int]) -> dict:
+    has_paid_access = paid_access_id is not None
+    return {
+        "id": user.id,
+        "telegram_id": user.telegram_id,
+        "username": user.username,
+        "first_name": user.first_name,
+        "last_name": user.last_name,
+        "photo_url": user.photo_url,
+        "referral_code": user.referral_code,
+        "referred_by_telegram_id": user.referred_by_telegram_id,
+        "is_blocked": user.is_blocked,
+        "is_admin": admin_id is not None,
+        "role": admin_role if admin_id is not None else None,
+        "client_role": "member" if has_paid_access else None,
+        "has_paid_access": has_paid_access,
+    }
+
+
+def list_profiles(db: Session, *, skip: int = 0, limit: int = 100) -> list[dict]:
+    rows = profiles_query(db).order_by(User.id.asc()).offset(skip).limit(limit).all()
+    return [serialize_profile(*row) for row in rows]
+
+
+def get_profile(db: Session, *, user_id: Optional[int] = None, telegram_id: Optional[int] = None) -> Optional[dict]:
+    query = profiles_query(db)
+    if user_id is not None:
+        query = query.filter(User.id == user_id)
+    elif telegram_id is not None:
+        query = query.filter(User.telegram_id == telegram_id)
+    else:
+        raise ValueError("user_id or telegram_id is required")
+    row = query.first()
+    return serialize_profile(*row) if row else None
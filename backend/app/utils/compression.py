@@ -0,0 +1,134 @@
+"""
+Optional in-app response compression (zstd / gzip) for deployments without a
+compressing proxy. Caddy already compresses /api/* in docker-compose.prod.yml,
+so it is off unless API_COMPRESSION is set, e.g. "zstd,gzip" (server
+preference order). zstd needs the optional `zstandard` package; without it
+only gzip is offered.
+
+Only complete, compressible bodies of at least API_COMPRESSION_MIN_BYTES are
+compressed. Streaming responses (the market SSE stream) and responses that
+already carry a Content-Encoding pass through untouched.
+"""
+from __future__ import annotations
+
+import gzip
+import logging
+import os
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+logger = logging.getLogger("compression")
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+def configured_encodings() -> list[str]:
+    """API_COMPRESSION as a list of supported encodings, in server preference order."""
+    encodings = []
+    for name in (os.getenv("API_COMPRESSION") or "").lower().split(","):
+        name = name.strip()
+        if name == "zstd" and zstandard is None:
+            logger.warning("API_COMPRESSION: zstd requested but zstandard is not installed, skipping it")
+            continue
+        if name in ("zstd", "gzip") and name not in encodings:
+            encodings.append(name)
+    return encodings
+
+
+def _accepted(accept_encoding: str) -> set[str]:
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(name.strip())
+    return accepted
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, *, encodings: list[str], minimum_size: int = 1024, gzip_level: int = 6, zstd_level: int = 3):
+        self.app = app
+        self.encodings = encodings
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.zstd_level = zstd_level
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accepted = _accepted(Headers(scope=scope).get("accept-encoding", ""))
+        encoding = next((name for name in self.encodings if name in accepted), None)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressingResponder(self, encoding, send).run(scope, receive)
+
+    def compress(self, encoding: str, body: bytes) -> bytes:
+        if encoding == "zstd":
+            return zstandard.ZstdCompressor(level=self.zstd_level).compress(body)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+
+class _CompressingResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.send = send
+        self.start: Optional[Message] = None
+        self.passthrough = False
+
+    async def run(self, scope: Scope, receive: Receive) -> None:
+        await self.middleware.app(scope, receive, self.on_send)
+
+    async def on_send(self, message: Message) -> None:
+        if self.passthrough:
+            await self.send(message)
+            return
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            content_type = headers.get("content-type", "")
+            if "content-encoding" in headers or not content_type.startswith(COMPRESSIBLE_TYPES):
+                self.passthrough = True
+                await self.send(message)
+                return
+            self.start = message
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        if message.get("more_body", False) or len(body) < self.middleware.minimum_size:
+            # Streamed (or too small to be worth it): send as is
+            self.passthrough = True
+            headers = MutableHeaders(raw=self.start["headers"])
+            headers.add_vary_header("Accept-Encoding")
+            await self.send(self.start)
+            await self.send(message)
+            return
+
+        compressed = self.middleware.compress(self.encoding, body)
+        headers = MutableHeaders(raw=self.start["headers"])
+        headers["Content-Encoding"] = self.encoding
+        headers["Content-Length"] = str(len(compressed))
+        headers.add_vary_header("Accept-Encoding")
+        if "etag" in headers and not headers["etag"].startswith("W/"):
+            # Different bytes than the identity body: the strong validator becomes weak
+            headers["ETag"] = "W/" + headers["etag"]
+        await self.send(self.start)
+        await self.send({"type": "http.response.body", "body": compressed})
@@ -0,0 +1,131 @@
+"""
+Connection pool and slow query instrumentation.
+
+Engines built by app.database use InstrumentedQueuePool; instrument_engine()
+attaches a PoolStats to the pool (checkout wait, overflow use, timeouts) and
+cursor listeners that count and log statements slower than DB_SLOW_QUERY_MS.
+Snapshots are exported through app.utils.metrics under "db".
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger("db")
+
+# Upper bounds (ms) of checkout wait buckets; the last bucket is everything above
+WAIT_BUCKETS_MS = (1, 10, 100, 1000)
+
+
+class PoolStats:
+    def __init__(self, *, slow_ms: float = 500.0, keep_slow: int = 20):
+        self.slow_ms = slow_ms
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.overflow_checkouts = 0
+        self.overflow_peak = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+        self.wait_buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self.slow_queries = 0
+        self.recent_slow: deque[dict] = deque(maxlen=keep_slow)
+
+    def record_checkout(self, wait_s: float, overflow: int) -> None:
+        wait_ms = wait_s * 1000
+        bucket = next((i for i, bound in enumerate(WAIT_BUCKETS_MS) if wait_ms < bound), len(WAIT_BUCKETS_MS))
+        with self._lock:
+            self.checkouts += 1
+            self.wait_ms_total += wait_ms
+            self.wait_ms_max = max(self.wait_ms_max, wait_ms)
+            self.wait_buckets[bucket] += 1
+            if overflow > 0:
+                self.overflow_checkouts += 1
+                self.overflow_peak = max(self.overflow_peak, overflow)
+
+    def record_timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+    def record_query(self, duration_s: float, statement: str) -> None:
+        duration_ms = duration_s * 1000
+        if duration_ms < self.slow_ms:
+            return
+        statement = " ".join(statement.split())[:300]
+        logger.warning("slow query ms=%.1f sql=%s", duration_ms, statement)
+        with self._lock:
+            self.slow_queries += 1
+            self.recent_slow.append({"ms": round(duration_ms, 1), "sql": statement, "at": time.time()})
+
+    def snapshot(self, pool=None) -> dict:
+        with self._lock:
+            labels = [f"<{bound}ms" for bound in WAIT_BUCKETS_MS] + [f">={WAIT_BUCKETS_MS[-1]}ms"]
+            data = {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "overflow_checkouts": self.overflow_checkouts,
+                "overflow_peak": self.overflow_peak,
+                "wait_ms_avg": round(self.wait_ms_total / self.checkouts, 3) if self.checkouts else 0.0,
+                "wait_ms_max": round(self.wait_ms_max, 3),
+                "wait_buckets": dict(zip(labels, self.wait_buckets)),
+                "slow_queries": self.slow_queries,
+                "recent_slow": list(self.recent_slow),
+            }
+        if isinstance(pool, QueuePool):
+            data.update(size=pool.size(), checked_out=pool.checkedout(), overflow=max(0, pool.overflow()))
+        return data
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that reports checkout wait and overflow to `stats` (if attached)."""
+
+    stats: Optional[PoolStats] = None
+
+    def connect(self):
+        stats = self.stats
+        if stats is None:
+            return super().connect()
+        started = time.perf_counter()
+        try:
+            conn = super().connect()
+        except exc.TimeoutError:
+            stats.record_timeout()
+            raise
+        stats.record_checkout(time.perf_counter() - started, self.overflow())
+        return conn
+
+    def recreate(self) -> "InstrumentedQueuePool":
+        # engine.dispose() swaps in a fresh pool; keep counting into the same stats
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+def instrument_engine(engine, *, slow_ms: float = 500.0) -> PoolStats:
+    stats = PoolStats(slow_ms=slow_ms)
+    if isinstance(engine.pool, InstrumentedQueuePool):
+        engine.pool.stats = stats
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _started(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _finished(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get("query_started")
+        if started:
+            stats.record_query(time.perf_counter() - started.pop(), statement)
+
+    @event.listens_for(engine, "handle_error")
+    def _failed(context):
+        conn = context.connection
+        if conn is not None and conn.info.get("query_started"):
+            conn.info["query_started"].pop()
+
+    return stats
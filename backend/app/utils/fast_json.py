@@ -0,0 +1,49 @@
+"""
+Fast JSON responses.
+
+FastJSONResponse renders with orjson (stdlib json if it is not installed).
+It is not the app-wide default: for routes with a response_model, FastAPI's
+default class already dumps the validated data to bytes in Pydantic's core,
+and any explicit response class would replace that with validate + dump to
+Python + render, which measures no faster. It is the default class of routers whose
+routes return plain dicts (no response_model): FastAPI still runs
+jsonable_encoder on those, only the json.dumps render is replaced.
+
+Routers that already build dicts in the exact response shape (user profiles,
+booking lists) return trusted_json(payload), which skips FastAPI's pass over
+the value (response_model validation) entirely. The response_model stays on
+the route for the OpenAPI schema, and tests check the dicts against it.
+"""
+from __future__ import annotations
+
+import json
+from typing import Any
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speed-up
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    # Whatever orjson / json cannot encode natively (Decimal, pydantic models, sets, ...)
+    return jsonable_encoder(value)
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def trusted_json(content: Any, status_code: int = 200) -> FastJSONResponse:
+    """Response for a payload the router built itself in the response_model shape."""
+    return FastJSONResponse(content, status_code=status_code)
@@ -0,0 +1,34 @@
+"""
+Tiny in-process stats registry.
+
+Components register a callable returning a dict of counters; `/debug/metrics`
+(internal key only) returns a snapshot of all of them.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from typing import Callable
+
+logger = logging.getLogger("metrics")
+
+_sources: dict[str, Callable[[], dict]] = {}
+_lock = threading.Lock()
+
+
+def register_stats(name: str, source: Callable[[], dict]) -> None:
+    with _lock:
+        _sources[name] = source
+
+
+def collect_stats() -> dict:
+    with _lock:
+        sources = dict(_sources)
+    result = {}
+    for name, source in sorted(sources.items()):
+        try:
+            result[name] = source()
+        except Exception:
+            logger.exception("stats source failed name=%s", name)
+            result[name] = {"error": True}
+    return result
@@ -0,0 +1,54 @@
+"""
+In-process token buckets keyed by string (client IP, username, ...).
+
+Each key refills at `rate` tokens per second up to `burst`. Keys are kept in
+an LRU of bounded size, so a flood of distinct keys cannot grow memory; an
+evicted key simply starts again with a full bucket.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenBucketLimiter:
+    def __init__(self, *, rate: float, burst: float, max_keys: int = 10000, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()  # key -> (tokens, updated_at)
+        self._lock = threading.Lock()
+        self.stats = {"allowed": 0, "limited": 0}
+
+    def _tokens(self, key: str, now: float) -> float:
+        tokens, updated_at = self._buckets.get(key, (self.burst, now))
+        return min(self.burst, tokens + (now - updated_at) * self.rate)
+
+    def allow(self, key: str, cost: float = 1.0) -> bool:
+        """Take `cost` tokens from the key's bucket; False (nothing taken) if there are not enough."""
+        now = self.clock()
+        with self._lock:
+            tokens = self._tokens(key, now)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            self.stats["allowed" if allowed else "limited"] += 1
+            return allowed
+
+    def retry_after(self, key: str, cost: float = 1.0) -> float:
+        """Seconds until `cost` tokens are available for the key."""
+        with self._lock:
+            tokens = self._tokens(key, self.clock())
+        if tokens >= cost or self.rate <= 0:
+            return 0.0
+        return (cost - tokens) / self.rate
+
+    def snapshot_stats(self) -> dict:
+        with self._lock:
+            return dict(self.stats, keys=len(self._buckets))
@@ -1,5 +1,9 @@
+import logging
 import os
-import requests
+
+from app.utils.telegram_bot_api import BotApiError, get_bot_api
+
+logger = logging.getLogger("telegram")
 
 
 def send_telegram_message(telegram_id: int, text: str) -> bool:
@@ -7,15 +11,12 @@ def send_telegram_message(telegram_id: int, text: str) -> bool:
     if not token or not telegram_id:
         return False
 
-    url = f"https://api.telegram.org/bot{token}/sendMessage"
-    payload = {
-        "chat_id": telegram_id,
-        "text": text,
-        "parse_mode": "HTML",
-        "disable_web_page_preview": True,
-    }
+    # Pooled keep-alive client (retries 429 with retry_after); see telegram_bot_api.py
     try:
-        response = requests.post(url, json=payload, timeout=10)
-        return response.ok
-    except requests.RequestException:
+        get_bot_api().send_message_sync(telegram_id, text)
+        return True
+    except BotApiError as exc:
+        # 403 — пользователь заблокировал бота, 400 — чат не найден: не шумим в логах
+        if exc.status_code not in (400, 403):
+            logger.warning("telegram send failed chat_id=%s error=%s", telegram_id, exc)
         return False
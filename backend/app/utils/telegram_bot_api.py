@@ -0,0 +1,252 @@
+"""
+Shared Telegram Bot API client.
+
+One httpx.AsyncClient (keep-alive pool, HTTP/2 when `h2` is installed) lives on a
+dedicated event-loop thread, so the same connections are reused by:
+- async code:  `await client.send_message(...)`
+- sync code:   `client.send_message_sync(...)` (routers, workers, bot service)
+
+429 responses are retried after `parameters.retry_after`; while a flood-wait is
+active every call on the client waits, so parallel senders don't keep hammering.
+
+Self-contained on purpose (stdlib + httpx only): the bot container copies this file.
+"""
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Optional
+
+import httpx
+
+logger = logging.getLogger("telegram.bot_api")
+
+DEFAULT_API_BASE = "https://api.telegram.org"
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+def http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+class BotApiError(Exception):
+    def __init__(self, status_code: int, description: str, *, error_code: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(f"{status_code}: {description}")
+        self.status_code = status_code
+        self.description = description
+        self.error_code = error_code if error_code is not None else status_code
+        self.retry_after = retry_after
+
+
+class _LoopThread:
+    """Event loop running forever in a daemon thread."""
+
+    def __init__(self, name: str):
+        self.loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self.thread.start()
+        self._ready.wait()
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(self._ready.set)
+        self.loop.run_forever()
+
+    def submit(self, coro) -> Future:
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def stop(self) -> None:
+        if self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=5)
+
+
+class BotApiClient:
+    def __init__(
+        self,
+        token: Optional[str] = None,
+        *,
+        base_url: Optional[str] = None,
+        timeout: Optional[float] = None,
+        connect_timeout: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        max_retry_after: Optional[float] = None,
+        max_connections: Optional[int] = None,
+        http2: Optional[bool] = None,
+    ):
+        self.token = (token if token is not None else os.getenv("TELEGRAM_BOT_TOKEN") or "").strip()
+        self.base_url = (base_url or os.getenv("TELEGRAM_API_BASE") or DEFAULT_API_BASE).rstrip("/")
+        self.timeout = timeout if timeout is not None else _env_float("TELEGRAM_TIMEOUT", 10.0)
+        self.connect_timeout = connect_timeout if connect_timeout is not None else _env_float("TELEGRAM_CONNECT_TIMEOUT", 5.0)
+        self.max_retries = max_retries if max_retries is not None else _env_int("TELEGRAM_MAX_RETRIES", 3)
+        self.max_retry_after = max_retry_after if max_retry_after is not None else _env_float("TELEGRAM_MAX_RETRY_AFTER", 60.0)
+        self.max_connections = max_connections or _env_int("TELEGRAM_MAX_CONNECTIONS", 20)
+        if http2 is None:
+            http2 = os.getenv("TELEGRAM_HTTP2", "1") == "1"
+        self.http2 = bool(http2) and http2_available()
+
+        self._runner: Optional[_LoopThread] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._flood_until = 0.0
+        self._lock = threading.Lock()
+
+    # --- plumbing ---
+
+    def _ensure_runner(self) -> _LoopThread:
+        with self._lock:
+            if self._runner is None:
+                self._runner = _LoopThread("telegram-bot-api")
+            return self._runner
+
+    def _http(self) -> httpx.AsyncClient:
+        # Only touched from the runner loop, so no locking needed.
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=self.http2,
+                timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=30.0,
+                ),
+            )
+        return self._client
+
+    def _url(self, method: str) -> str:
+        return f"{self.base_url}/bot{self.token}/{method}"
+
+    async def _call(self, method: str, payload: Optional[dict], timeout: Optional[float]) -> Any:
+        attempt = 0
+        while True:
+            wait = self._flood_until - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            try:
+                request_timeout = httpx.Timeout(timeout, connect=self.connect_timeout) if timeout else None
+                kwargs = {"json": payload or {}}
+                if request_timeout is not None:
+                    kwargs["timeout"] = request_timeout
+                response = await self._http().post(self._url(method), **kwargs)
+            except httpx.HTTPError as exc:
+                if attempt >= self.max_retries:
+                    raise BotApiError(0, f"network error: {exc.__class__.__name__}") from exc
+                attempt += 1
+                await asyncio.sleep(min(0.5 * 2 ** (attempt - 1), 5.0))
+                continue
+
+            try:
+                data = response.json()
+            except ValueError:
+                data = {}
+            if response.status_code == 200 and data.get("ok"):
+                return data.get("result")
+
+            params = data.get("parameters") or {}
+            description = data.get("description") or response.text[:200] or "Bot API error"
+            if response.status_code == 429:
+                retry_after = float(params.get("retry_after") or 1)
+                if attempt >= self.max_retries or retry_after > self.max_retry_after:
+                    raise BotApiError(429, description, retry_after=retry_after)
+                attempt += 1
+                self._flood_until = max(self._flood_until, time.monotonic() + retry_after)
+                logger.warning("bot api flood wait method=%s retry_after=%s attempt=%s", method, retry_after, attempt)
+                continue
+            if response.status_code >= 500 and attempt < self.max_retries:
+                attempt += 1
+                await asyncio.sleep(min(0.5 * 2 ** (attempt - 1), 5.0))
+                continue
+            raise BotApiError(response.status_code, description, error_code=data.get("error_code"))
+
+    # --- awaitable API ---
+
+    async def call(self, method: str, payload: Optional[dict] = None, *, timeout: Optional[float] = None) -> Any:
+        """Call a Bot API method; returns `result` or raises BotApiError."""
+        if not self.token:
+            raise BotApiError(0, "TELEGRAM_BOT_TOKEN is not configured")
+        runner = self._ensure_runner()
+        coro = self._call(method, payload, timeout)
+        try:
+            current = asyncio.get_running_loop()
+        except RuntimeError:
+            current = None
+        if current is runner.loop:
+            return await coro
+        # The pool is bound to the runner loop: hop there and await the result.
+        return await asyncio.wrap_future(runner.submit(coro))
+
+    async def send_message(
+        self,
+        chat_id: int,
+        text: str,
+        *,
+        parse_mode: Optional[str] = "HTML",
+        disable_web_page_preview: bool = True,
+        reply_markup: Optional[dict] = None,
+    ) -> Any:
+        payload: dict = {"chat_id": chat_id, "text": text, "disable_web_page_preview": disable_web_page_preview}
+        if parse_mode:
+            payload["parse_mode"] = parse_mode
+        if reply_markup:
+            payload["reply_markup"] = reply_markup
+        return await self.call("sendMessage", payload)
+
+    # --- sync API ---
+
+    def call_sync(self, method: str, payload: Optional[dict] = None, *, timeout: Optional[float] = None) -> Any:
+        if not self.token:
+            raise BotApiError(0, "TELEGRAM_BOT_TOKEN is not configured")
+        runner = self._ensure_runner()
+        if threading.current_thread() is runner.thread:
+            raise RuntimeError("call_sync() must not be used from the Bot API loop; await call() instead")
+        return runner.submit(self._call(method, payload, timeout)).result()
+
+    def send_message_sync(self, chat_id: int, text: str, **kwargs) -> Any:
+        runner = self._ensure_runner()
+        if threading.current_thread() is runner.thread:
+            raise RuntimeError("send_message_sync() must not be used from the Bot API loop")
+        return runner.submit(self.send_message(chat_id, text, **kwargs)).result()
+
+    def close(self) -> None:
+        with self._lock:
+            runner, self._runner = self._runner, None
+        if runner is None:
+            return
+        client, self._client = self._client, None
+        if client is not None:
+            runner.submit(client.aclose()).result(timeout=5)
+        runner.stop()
+
+
+_default_client: Optional[BotApiClient] = None
+_default_lock = threading.Lock()
+
+
+def get_bot_api() -> BotApiClient:
+    """Process-wide client for TELEGRAM_BOT_TOKEN (re-created if the token changes)."""
+    global _default_client
+    token = (os.getenv("TELEGRAM_BOT_TOKEN") or "").strip()
+    with _default_lock:
+        if _default_client is None or _default_client.token != token:
+            old, _default_client = _default_client, BotApiClient(token)
+            if old is not None:
+                old.close()
+        return _default_client
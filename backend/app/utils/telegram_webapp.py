@@ -4,11 +4,17 @@ import hashlib
 import hmac
 import json
 import os
+import threading
 import time
 import urllib.parse
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional
 
 from fastapi import HTTPException, Request
 
+from app.utils.metrics import register_stats
+
 
 def _debug_enabled() -> bool:
     return os.getenv("DEBUG_TELEGRAM_AUTH") == "1"
@@ -39,6 +45,99 @@ def _build_data_check_string(data: dict[str, str]) -> str:
     return "\n".join(items)
 
 
+@lru_cache(maxsize=8)
+def _secret_keys(bot_token: str) -> tuple[bytes, bytes]:
+    """(secret_key, legacy_secret_key) for a bot token; derived once per token."""
+    secret_key = hmac.new(b"WebAppData", bot_token.encode("utf-8"), hashlib.sha256).digest()
+    # Legacy implementations used sha256(bot_token) as secret_key
+    legacy_secret_key = hashlib.sha256(bot_token.encode("utf-8")).digest()
+    return secret_key, legacy_secret_key
+
+
+def _legacy_hash_enabled() -> bool:
+    return os.getenv("TELEGRAM_AUTH_LEGACY_HASH", "1") == "1"
+
+
+class _VerifiedInitDataCache:
+    """
+    LRU of successfully verified initData -> user.
+
+    The Mini App sends the same initData header on every request of a session,
+    so repeated requests skip parsing and HMACs. Entries never outlive the
+    initData itself (auth_date + TELEGRAM_AUTH_MAX_AGE_SECONDS).
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._items: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+
+    @staticmethod
+    def key(bot_token: str, init_data: str) -> str:
+        # Token is part of the key: rotating it must invalidate every entry
+        return hashlib.sha256(f"{bot_token}\n{init_data}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str, now: float) -> Optional[dict]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            expires_at, user = item
+            if expires_at <= now:
+                del self._items[key]
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return user
+
+    def put(self, key: str, user: dict, expires_at: float) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._items[key] = (expires_at, user)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = len(self._items)
+        total = self.hits + self.misses
+        return {
+            "size": size,
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+            "expired": self.expired,
+        }
+
+
+_init_data_cache = _VerifiedInitDataCache(
+    max_size=int(os.getenv("TELEGRAM_AUTH_CACHE_SIZE", "4096")),
+    ttl=float(os.getenv("TELEGRAM_AUTH_CACHE_TTL_SECONDS", "300")),
+)
+register_stats("telegram_auth_cache", _init_data_cache.stats)
+
+
+def telegram_auth_cache_stats() -> dict:
+    return _init_data_cache.stats()
+
+
 def verify_telegram_webapp_init_data(init_data: str, bot_token: str) -> dict:
     """
     Verifies Telegram WebApp initData signature.
@@ -53,6 +152,13 @@ def verify_telegram_webapp_init_data(init_data: str, bot_token: str) -> dict:
     if not bot_token:
         raise HTTPException(status_code=500, detail="TELEGRAM_BOT_TOKEN is not configured")
 
+    max_age = int(os.getenv("TELEGRAM_AUTH_MAX_AGE_SECONDS", "86400"))
+    now = time.time()
+    cache_key = _VerifiedInitDataCache.key(bot_token, init_data)
+    cached = _init_data_cache.get(cache_key, now)
+    if cached is not None:
+        return dict(cached)
+
     data = _parse_init_data(init_data)
     received_hash = (data.get("hash") or "").strip()
     if not received_hash:
@@ -77,14 +183,17 @@ def verify_telegram_webapp_init_data(init_data: str, bot_token: str) -> dict:
     data_check_string_raw = _build_data_check_string(data)
     data_check_string = data_check_string_raw.encode("utf-8")
 
-    secret_key = hmac.new(b"WebAppData", bot_token.encode("utf-8"), hashlib.sha256).digest()
+    secret_key, legacy_secret_key = _secret_keys(bot_token)
     calculated_hash = hmac.new(secret_key, data_check_string, hashlib.sha256).hexdigest()
+    valid = hmac.compare_digest(calculated_hash, received_hash)
 
-    # Backward compatibility (legacy implementations used sha256(bot_token) as secret_key)
-    legacy_secret_key = hashlib.sha256(bot_token.encode("utf-8")).digest()
-    legacy_hash = hmac.new(legacy_secret_key, data_check_string, hashlib.sha256).hexdigest()
+    # Backward compatibility (TELEGRAM_AUTH_LEGACY_HASH=0 turns it off)
+    legacy_hash = ""
+    if not valid and _legacy_hash_enabled():
+        legacy_hash = hmac.new(legacy_secret_key, data_check_string, hashlib.sha256).hexdigest()
+        valid = hmac.compare_digest(legacy_hash, received_hash)
 
-    if not (hmac.compare_digest(calculated_hash, received_hash) or hmac.compare_digest(legacy_hash, received_hash)):
+    if not valid:
         if _debug_enabled():
             # DO NOT log full initData. Only a safe prefix & metadata.
             keys = sorted([k for k in data.keys()])
@@ -112,12 +221,14 @@ def verify_telegram_webapp_init_data(init_data: str, bot_token: str) -> dict:
         raise HTTPException(status_code=401, detail="Invalid Telegram initData signature")
 
     # optional TTL check
-    max_age = int(os.getenv("TELEGRAM_AUTH_MAX_AGE_SECONDS", "86400"))
+    expires_at = now + _init_data_cache.ttl
     auth_date_raw = (data.get("auth_date") or "").strip()
     if auth_date_raw.isdigit():
         auth_date = int(auth_date_raw)
-        if max_age > 0 and int(time.time()) - auth_date > max_age:
+        if max_age > 0 and int(now) - auth_date > max_age:
             raise HTTPException(status_code=401, detail="Telegram initData expired")
+        if max_age > 0:
+            expires_at = min(expires_at, auth_date + max_age + 1)
 
     user_raw = data.get("user") or ""
     if not user_raw:
@@ -128,7 +239,8 @@ def verify_telegram_webapp_init_data(init_data: str, bot_token: str) -> dict:
         raise HTTPException(status_code=401, detail="Invalid Telegram initData user") from exc
     if not isinstance(user, dict) or not user.get("id"):
         raise HTTPException(status_code=401, detail="Telegram initData user has no id")
-    return user
+    _init_data_cache.put(cache_key, user, expires_at)
+    return dict(user)
 
 
 def get_request_telegram_user_id(request: Request) -> int:
@@ -0,0 +1,26 @@
+"""
+Webinar start time. date/time are stored as server-local wall time strings
+(YYYY-MM-DD, HH:MM), as the admin forms send them; webinars.starts_at keeps
+the same instant as a UTC timestamp for SQL range filters.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from typing import Optional
+
+
+def webinar_start_utc(date: Optional[str], time: Optional[str]) -> Optional[datetime]:
+    """UTC start from the date/time strings; None if they do not parse."""
+    try:
+        local = datetime.strptime(f"{(date or '').strip()} {(time or '').strip()}", "%Y-%m-%d %H:%M")
+    except ValueError:
+        return None
+    # astimezone() on a naive datetime interprets it in the server's local timezone
+    return local.astimezone(timezone.utc)
+
+
+def as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # SQLite returns naive datetimes; we always store UTC.
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
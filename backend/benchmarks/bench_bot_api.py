@@ -0,0 +1,63 @@
+"""
+Benchmark: per-call requests.post vs the pooled BotApiClient, against the local fake Bot API.
+
+Run (from backend/):
+  python benchmarks/bench_bot_api.py --messages 500 --concurrency 8 --latency 0.005
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "tests"))
+
+from app.utils.telegram_bot_api import BotApiClient  # noqa: E402
+from fake_bot_api import FakeBotApi  # noqa: E402
+
+
+def _run(label: str, fake: FakeBotApi, send, messages: int, concurrency: int) -> None:
+    before_calls = len(fake.calls)
+    before_conns = fake.connections
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(lambda i: send(1000 + i, f"benchmark message {i}"), range(messages)))
+    elapsed = time.perf_counter() - started
+    print(
+        f"{label:<28} {messages / elapsed:8.1f} msg/s  "
+        f"total={elapsed:6.2f}s  calls={len(fake.calls) - before_calls}  "
+        f"new_connections={fake.connections - before_conns}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.0, help="fake server latency per call, seconds")
+    args = parser.parse_args()
+
+    with FakeBotApi(latency=args.latency) as fake:
+        url = f"{fake.base_url}/bot{fake.token}/sendMessage"
+
+        def legacy_send(chat_id: int, text: str) -> bool:
+            # What app/utils/telegram.py used to do: a fresh connection per message
+            payload = {"chat_id": chat_id, "text": text, "parse_mode": "HTML", "disable_web_page_preview": True}
+            return requests.post(url, json=payload, timeout=10).ok
+
+        client = BotApiClient(fake.token, base_url=fake.base_url, max_connections=args.concurrency)
+        try:
+            _run("requests.post per call", fake, legacy_send, args.messages, args.concurrency)
+            _run("BotApiClient (pooled)", fake, client.send_message_sync, args.messages, args.concurrency)
+        finally:
+            client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Benchmark: thousands of idle /market/stream subscribers on one event loop.
+
+Measures memory per connection (tracemalloc, after the snapshot event) and
+the time for one poller update to reach every subscriber. A share of the
+subscribers never reads (slow clients) to show that their pending state stays
+bounded by symbols x fields instead of growing with the number of updates.
+
+Run (from backend/):
+  python benchmarks/bench_market_stream.py --subscribers 5000 --updates 50 --slow 0.2
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from app.services.market_data import DEFAULT_SYMBOLS, FixtureSource, MarketPoller, MarketStore  # noqa: E402
+from app.services.market_stream import MarketHub  # noqa: E402
+
+
+def _source() -> FixtureSource:
+    return FixtureSource(
+        {
+            "tickers": {s: {"price": 100.0 + i, "change_pct_24h": 1.0, "quote_volume": 1e6} for i, s in enumerate(DEFAULT_SYMBOLS)},
+            "sparklines": {s: [100.0 + i] * 24 for i, s in enumerate(DEFAULT_SYMBOLS)},
+        }
+    )
+
+
+async def _reader(events, done: list[int]) -> None:
+    async for _ in events:
+        done[0] += 1
+
+
+async def _publish(poller: MarketPoller, source: FixtureSource, n: int) -> None:
+    symbol = DEFAULT_SYMBOLS[n % len(DEFAULT_SYMBOLS)]
+    source.data["tickers"][symbol]["price"] += 1
+    await asyncio.to_thread(poller.run_once)
+
+
+async def main_async(args) -> None:
+    source = _source()
+    store = MarketStore()
+    poller = MarketPoller(source, store, symbols=DEFAULT_SYMBOLS, interval=1, sparkline_interval=3600)
+    poller.run_once()
+    hub = MarketHub(store, max_clients=args.subscribers + 1, heartbeat=3600, max_lifetime=0)
+
+    slow_count = int(args.subscribers * args.slow)
+    fast_count = args.subscribers - slow_count
+    done = [0]
+    tracemalloc.start()
+    base = tracemalloc.take_snapshot()
+    generators, tasks = [], []
+    for i in range(args.subscribers):
+        events = hub.events()
+        await events.__anext__()  # snapshot
+        generators.append(events)
+        if i >= slow_count:
+            tasks.append(asyncio.create_task(_reader(events, done)))
+    await asyncio.sleep(0)
+    connected = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    per_conn = sum(s.size_diff for s in connected.compare_to(base, "filename")) / args.subscribers
+    print(f"subscribers={args.subscribers} (slow={slow_count})  memory/connection={per_conn / 1024:.2f} KiB")
+
+    latencies = []
+    for n in range(args.updates):
+        started = time.perf_counter()
+        await _publish(poller, source, n)
+        while done[0] < fast_count * (n + 1):
+            await asyncio.sleep(0)
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    print(
+        f"updates={args.updates}  fan-out to all readers p50={latencies[len(latencies) // 2] * 1000:.1f}ms "
+        f"max={latencies[-1] * 1000:.1f}ms"
+    )
+
+    # Memory while slow clients keep falling behind: pending state must not grow with updates.
+    # Compare two steady states (readers parked in wait) so in-flight waits cancel out.
+    tracemalloc.start()
+    for n in range(args.updates, 2 * args.updates):
+        await _publish(poller, source, n)
+        while done[0] < fast_count * (n + 1):
+            await asyncio.sleep(0)
+    before = tracemalloc.take_snapshot()
+    for n in range(2 * args.updates, 3 * args.updates):
+        await _publish(poller, source, n)
+        while done[0] < fast_count * (n + 1):
+            await asyncio.sleep(0)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    growth = sum(s.size_diff for s in after.compare_to(before, "filename"))
+    slow = [g.ag_frame.f_locals["subscriber"] for g in generators[:slow_count]]
+    print(
+        f"memory growth over {args.updates} more updates={growth / 1024:.1f} KiB  "
+        f"max pending symbols on a slow client={max((len(s.pending) for s in slow), default=0)} "
+        f"(of {len(DEFAULT_SYMBOLS)})  coalesced={sum(s.coalesced for s in slow)}"
+    )
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    for events in generators[:slow_count]:
+        await events.aclose()
+    print(f"connected after close={hub.snapshot_stats()['connected']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--subscribers", type=int, default=5000)
+    parser.add_argument("--updates", type=int, default=50)
+    parser.add_argument("--slow", type=float, default=0.2, help="share of subscribers that never read")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Benchmark: JSON serialization of the get_users, get_posts and
+get_user_bookings_by_telegram payloads, per strategy:
+
+  encoder+json     jsonable_encoder + json.dumps (FastAPI dict route, stock JSONResponse)
+  model+dump_json  response_model validation + Pydantic dump_json (stock route with a response_model)
+  model+orjson     response_model validation + orjson render (FastJSONResponse default class)
+  trusted orjson   trusted_json(): the router's dicts straight to orjson, no re-validation
+
+Payloads come from the real service code against a temporary SQLite database
+(migrated, then seeded with --rows users / posts / bookings). The compressed
+size of each payload (gzip, and zstd when `zstandard` is installed) is printed
+too, for API_COMPRESSION.
+
+Run (from backend/):
+  python benchmarks/bench_serialization.py --rows 100 --repeat 2000
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Callable, List
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from app.migrations import upgrade  # noqa: E402
+from app.models.admin import Admin  # noqa: E402
+from app.models.booking import Booking  # noqa: E402
+from app.models.post import Post  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.routers import posts  # noqa: E402
+from app.schemas.booking import BookingResponse  # noqa: E402
+from app.schemas.post import PostResponse  # noqa: E402
+from app.schemas.user import UserResponse  # noqa: E402
+from app.services.ticket_queries import Customer, serialize_ticket, tickets_query  # noqa: E402
+from app.services.user_profiles import list_profiles  # noqa: E402
+from app.utils.fast_json import dumps  # noqa: E402
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CUSTOMER_TELEGRAM_ID = 500_000
+
+
+def _seed(db, rows: int) -> None:
+    users = [
+        User(telegram_id=CUSTOMER_TELEGRAM_ID + i, username=f"user{i}", first_name="Иван", last_name="Петров",
+             photo_url=f"https://t.me/i/userpic/320/{i:08x}.jpg", referral_code=f"REF{i:05d}")
+        for i in range(rows)
+    ]
+    db.add_all(users)
+    db.flush()
+    db.add(Admin(telegram_id=users[1].telegram_id, role="админ"))
+    paragraph = "Биткоин закрыл неделю выше уровня сопротивления, объёмы на споте растут. "
+    db.add_all([Post(title=f"Обзор рынка #{i}", content=paragraph * 20) for i in range(rows)])
+    db.add_all(
+        [
+            Booking(user_id=users[0].id, type=("consultation", "support", "webinar")[i % 3], date="2030-01-01",
+                    time="12:00", status="confirmed", topic="Портфель", message="Хочу обсудить стратегию " * 4,
+                    admin_response="Добрый день! Ответили в чате." if i % 2 else None,
+                    admin_id=users[1].id if i % 2 else None, amount=25.0)
+            for i in range(rows)
+        ]
+    )
+    db.commit()
+
+
+def _time(fn: Callable[[], bytes], repeat: int) -> tuple[float, int]:
+    body = fn()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1e6, len(body)
+
+
+def _strategies(payload: Any, model: Any, trusted: bool) -> dict[str, Callable[[], bytes]]:
+    adapter = TypeAdapter(List[model])
+    strategies = {
+        "encoder+json": lambda: json.dumps(jsonable_encoder(payload), ensure_ascii=False, separators=(",", ":")).encode("utf-8"),
+        "model+dump_json": lambda: adapter.dump_json(adapter.validate_python(payload)),
+        "model+orjson": lambda: dumps(adapter.dump_python(adapter.validate_python(payload), mode="json")),
+    }
+    if trusted:
+        strategies["trusted orjson"] = lambda: dumps(payload)
+    return strategies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100, help="items per payload (routers default to limit=100)")
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.sqlite3')}")
+        upgrade(engine)
+        db = sessionmaker(bind=engine)()
+        _seed(db, args.rows)
+
+        payloads = {
+            # (payload as the router returns it, response_model item, router returns trusted dicts)
+            "get_users": (list_profiles(db, limit=args.rows), UserResponse, True),
+            "get_posts": (db.query(Post).order_by(Post.created_at.desc()).limit(args.rows).all(), PostResponse, False),
+            "get_user_bookings_by_telegram": (
+                [
+                    serialize_ticket(row, with_customer=False)
+                    for row in tickets_query(db).filter(Customer.telegram_id == CUSTOMER_TELEGRAM_ID).all()
+                ],
+                BookingResponse,
+                True,
+            ),
+        }
+        feed = posts.posts_feed_page(db, min(args.rows, 50))
+
+        print(f"rows={args.rows} repeat={args.repeat} zstd={'yes' if zstandard else 'not installed'}")
+        for name, (payload, model, trusted) in payloads.items():
+            print(f"\n{name}")
+            baseline = None
+            for label, fn in _strategies(payload, model, trusted).items():
+                micros, size = _time(fn, args.repeat)
+                baseline = baseline or micros
+                print(f"  {label:<16} {micros:9.1f} us/op  x{baseline / micros:5.1f}  {size:7d} bytes")
+            body = dumps(jsonable_encoder(payload))
+            sizes = f"gzip={len(gzip.compress(body, compresslevel=6))}"
+            if zstandard is not None:
+                sizes += f" zstd={len(zstandard.ZstdCompressor(level=3).compress(body))}"
+            print(f"  compressed: identity={len(body)} {sizes}")
+
+        micros, size = _time(lambda: dumps(feed), args.repeat)
+        print(f"\nposts feed page (summary, {len(feed['items'])} items): {micros:.1f} us/op {size} bytes; cache hit: 0 us, 0 queries")
+        db.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Benchmark: SQLite "basic" profile (one engine, rollback journal) vs "production"
+(WAL + pragmas + read-only reader pool + single writer), with several worker
+processes hitting one database file, like gunicorn --workers N.
+
+Each process runs `--threads` threads; every operation is a read (point lookup
++ small range scan) except `--write-ratio` of them, which insert a row and
+update a counter in one transaction.
+
+Run (from backend/):
+  python benchmarks/bench_sqlite_profile.py --workers 4 --threads 4 --seconds 5 --write-ratio 0.1
+"""
+from __future__ import annotations
+
+import argparse
+import multiprocessing as mp
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from sqlalchemy import Column, Integer, MetaData, String, Table, func, select, update
+from sqlalchemy.exc import OperationalError
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from app.database import build_engines, make_session_factory  # noqa: E402
+
+metadata = MetaData()
+items = Table(
+    "bench_items",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("bucket", Integer, index=True, nullable=False),
+    Column("payload", String(64), nullable=False),
+)
+counters = Table(
+    "bench_counters",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("value", Integer, nullable=False),
+)
+
+SEED_ROWS = 20000
+BUCKETS = 200
+
+
+def _seed(url: str) -> None:
+    writer, reader = build_engines(url, profile="basic")
+    metadata.create_all(writer)
+    with writer.begin() as conn:
+        conn.execute(
+            items.insert(),
+            [{"bucket": i % BUCKETS, "payload": f"row-{i}"} for i in range(SEED_ROWS)],
+        )
+        conn.execute(counters.insert(), [{"id": 1, "value": 0}])
+    writer.dispose()
+
+
+def _worker(url: str, profile: str, threads: int, seconds: float, write_ratio: float, out) -> None:
+    writer, reader = build_engines(url, profile=profile, read_pool_size=threads)
+    factory = make_session_factory(writer, reader)
+    deadline = time.monotonic() + seconds
+    lock = threading.Lock()
+    result = {"reads": 0, "writes": 0, "locked": 0, "read_lat": [], "write_lat": []}
+
+    def loop(seed: int) -> None:
+        rnd = random.Random(seed)
+        local = {"reads": 0, "writes": 0, "locked": 0, "read_lat": [], "write_lat": []}
+        while time.monotonic() < deadline:
+            is_write = rnd.random() < write_ratio
+            started = time.perf_counter()
+            try:
+                with factory() as db:
+                    if is_write:
+                        db.execute(items.insert().values(bucket=rnd.randrange(BUCKETS), payload="new"))
+                        db.execute(update(counters).where(counters.c.id == 1).values(value=counters.c.value + 1))
+                        db.commit()
+                    else:
+                        db.execute(select(items.c.payload).where(items.c.id == rnd.randint(1, SEED_ROWS))).first()
+                        db.execute(
+                            select(func.count()).select_from(items).where(items.c.bucket == rnd.randrange(BUCKETS))
+                        ).scalar()
+            except OperationalError as exc:
+                if "locked" not in str(exc):
+                    raise
+                local["locked"] += 1
+                continue
+            elapsed = time.perf_counter() - started
+            key = "writes" if is_write else "reads"
+            local[key] += 1
+            local["write_lat" if is_write else "read_lat"].append(elapsed)
+        with lock:
+            for key in ("reads", "writes", "locked"):
+                result[key] += local[key]
+            result["read_lat"].extend(local["read_lat"])
+            result["write_lat"].extend(local["write_lat"])
+
+    pool = [threading.Thread(target=loop, args=(os.getpid() * 100 + i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    writer.dispose()
+    if reader is not None:
+        reader.dispose()
+    out.put(result)
+
+
+def _p95(values: list[float]) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * 0.95))] * 1000
+
+
+def _run(profile: str, args) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'bench.sqlite3')}"
+        _seed(url)
+        out = mp.Queue()
+        procs = [
+            mp.Process(target=_worker, args=(url, profile, args.threads, args.seconds, args.write_ratio, out))
+            for _ in range(args.workers)
+        ]
+        for p in procs:
+            p.start()
+        results = [out.get() for _ in procs]
+        for p in procs:
+            p.join()
+
+    reads = sum(r["reads"] for r in results)
+    writes = sum(r["writes"] for r in results)
+    locked = sum(r["locked"] for r in results)
+    read_lat = [x for r in results for x in r["read_lat"]]
+    write_lat = [x for r in results for x in r["write_lat"]]
+    print(
+        f"{profile:<11} reads/s={reads / args.seconds:9.1f}  writes/s={writes / args.seconds:7.1f}  "
+        f"p95 read={_p95(read_lat):7.2f}ms  p95 write={_p95(write_lat):7.2f}ms  locked_errors={locked}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4, help="processes (gunicorn workers)")
+    parser.add_argument("--threads", type=int, default=4, help="threads per process (threadpool handlers)")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--write-ratio", type=float, default=0.1)
+    parser.add_argument("--busy-timeout", type=float, default=None, help="SQLITE_BUSY_TIMEOUT override, seconds")
+    args = parser.parse_args()
+    if args.busy_timeout is not None:
+        os.environ["SQLITE_BUSY_TIMEOUT"] = str(args.busy_timeout)
+
+    print(
+        f"workers={args.workers} threads={args.threads} seconds={args.seconds} write_ratio={args.write_ratio}"
+    )
+    for profile in ("basic", "production"):
+        _run(profile, args)
+
+
+if __name__ == "__main__":
+    main()
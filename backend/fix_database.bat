@@ -23,7 +23,7 @@ if errorlevel 1 (
 echo Запуск миграции базы данных...
 echo.
 
-python migrate_db.py
+python -m app.migrations upgrade
 
 echo.
 pause
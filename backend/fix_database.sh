@@ -21,5 +21,5 @@ fi
 echo "Запуск миграции базы данных..."
 echo ""
 
-python migrate_db.py
+python -m app.migrations upgrade
 
@@ -21,7 +21,7 @@ def remove_test_data():
         except Exception as e:
             if 'admin_response' in str(e) or 'admin_id' in str(e):
                 print("WARNING: Таблица bookings не имеет новых колонок (admin_response, admin_id)")
-                print("Выполните миграцию: python migrate_bookings_sqlalchemy.py")
+                print("Выполните миграцию: python -m app.migrations upgrade")
                 print("Или запустите приложение - оно создаст правильную структуру")
                 return False
             else:
@@ -0,0 +1,53 @@
+"""
+Повторная обработка IPN NOWPayments, которые applier пометил как "dead"
+(не применились после NOWPAYMENTS_IPN_MAX_ATTEMPTS попыток).
+Событие снова ставится в очередь с новым запасом попыток; применит его
+работающий backend (IpnApplier).
+
+Использование (из backend/):
+  python replay_ipn_events.py --list                 показать dead-события
+  python replay_ipn_events.py --all                  вернуть в очередь все
+  python replay_ipn_events.py --payment-id 5077125   только события платежа
+  python replay_ipn_events.py --event-id 12 --event-id 13
+"""
+import argparse
+import sys
+
+from app.database import SessionLocal
+from app.models.nowpayments_ipn_event import NowPaymentsIpnEvent
+from app.services.nowpayments_ipn_service import requeue_dead_ipn_events
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python replay_ipn_events.py")
+    parser.add_argument("--list", action="store_true", help="показать dead-события и выйти")
+    parser.add_argument("--all", action="store_true", help="вернуть в очередь все dead-события")
+    parser.add_argument("--payment-id", help="только события этого payment_id")
+    parser.add_argument("--event-id", type=int, action="append", help="только эти события (можно несколько раз)")
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        if args.list:
+            dead = (
+                db.query(NowPaymentsIpnEvent)
+                .filter(NowPaymentsIpnEvent.apply_status == "dead")
+                .order_by(NowPaymentsIpnEvent.id)
+                .all()
+            )
+            for ev in dead:
+                error = (ev.apply_error or "").splitlines()[0][:120] if ev.apply_error else ""
+                print(f"{ev.id:8d} payment_id={ev.payment_id} status={ev.payment_status} attempts={ev.apply_attempts} {error}")
+            print(f"dead: {len(dead)}")
+            return 0
+        if not (args.all or args.payment_id or args.event_id):
+            parser.error("укажите --all, --payment-id или --event-id")
+        count = requeue_dead_ipn_events(db, event_ids=args.event_id, payment_id=args.payment_id)
+        print(f"OK: в очередь возвращено событий: {count}")
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,13 @@
 import uvicorn
 
+from app.migrations import upgrade
+
 if __name__ == "__main__":
+    # Dev: apply pending migrations before the server starts (prod runs them as a separate step)
+    upgrade()
     uvicorn.run(
         "app.main:app",
         host="0.0.0.0",
         port=8000,
         reload=True
     )
-
@@ -8,6 +8,9 @@ export HOST="${HOST:-0.0.0.0}"
 export PORT="${PORT:-8000}"
 export WORKERS="${WORKERS:-2}"
 
+# Schema migrations once, before the workers fork (workers only check the version)
+python -m app.migrations upgrade
+
 exec gunicorn -k uvicorn.workers.UvicornWorker "app.main:app" \
   --bind "${HOST}:${PORT}" \
   --workers "${WORKERS}" \
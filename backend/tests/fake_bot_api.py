@@ -0,0 +1,122 @@
+"""
+Local fake Telegram Bot API server for tests and benchmarks.
+
+    with FakeBotApi() as api:
+        client = BotApiClient("TOKEN", base_url=api.base_url)
+        ...
+        api.messages  # recorded sendMessage payloads
+
+Supports HTTP/1.1 keep-alive (counts TCP connections), artificial latency and
+scripted 429 flood-waits.
+"""
+from __future__ import annotations
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeBotApi:
+    def __init__(self, *, latency: float = 0.0, token: str = "TEST:TOKEN"):
+        self.token = token
+        self.latency = latency
+        self.calls: list[tuple[str, dict]] = []
+        self.connections = 0
+        self._flood: list[float] = []  # retry_after values to answer with, FIFO
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def messages(self) -> list[dict]:
+        with self._lock:
+            return [payload for method, payload in self.calls if method == "sendMessage"]
+
+    def flood(self, *retry_after: float) -> None:
+        """Answer the next len(retry_after) calls with 429 Too Many Requests."""
+        with self._lock:
+            self._flood.extend(retry_after)
+
+    def start(self) -> "FakeBotApi":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeBotApi":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with fake._lock:
+                    fake.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status: int, body: dict) -> None:
+                raw = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                try:
+                    payload = json.loads(raw or b"{}")
+                except ValueError:
+                    payload = {}
+                prefix = f"/bot{fake.token}/"
+                if not self.path.startswith(prefix):
+                    self._reply(401, {"ok": False, "error_code": 401, "description": "Unauthorized"})
+                    return
+                method = self.path[len(prefix):]
+                if fake.latency:
+                    time.sleep(fake.latency)
+                with fake._lock:
+                    retry_after = fake._flood.pop(0) if fake._flood else None
+                    if retry_after is None:
+                        fake.calls.append((method, payload))
+                        message_id = len(fake.calls)
+                if retry_after is not None:
+                    self._reply(429, {
+                        "ok": False,
+                        "error_code": 429,
+                        "description": f"Too Many Requests: retry after {retry_after}",
+                        "parameters": {"retry_after": retry_after},
+                    })
+                    return
+                if method == "sendMessage":
+                    if payload.get("chat_id") == 403:
+                        self._reply(403, {"ok": False, "error_code": 403, "description": "Forbidden: bot was blocked by the user"})
+                        return
+                    self._reply(200, {"ok": True, "result": {"message_id": message_id, "chat": {"id": payload.get("chat_id")}, "text": payload.get("text")}})
+                    return
+                if method == "getUpdates":
+                    self._reply(200, {"ok": True, "result": []})
+                    return
+                self._reply(200, {"ok": True, "result": True})
+
+        return Handler
@@ -0,0 +1,105 @@
+"""
+Tests for admin login: bounded hashing pool, token-bucket throttling, iteration upgrade.
+Run: pytest tests/test_admin_login.py -v
+"""
+from __future__ import annotations
+
+import threading
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+import app.models  # noqa: F401 - ensure all models registered
+from app.models.admin_panel_user import AdminPanelUser
+from app.routers import admin_panel
+from app.services.password_hashing import HashingBusy, HashingPool, hash_password_sync, needs_rehash
+from app.utils.rate_limit import TokenBucketLimiter
+
+
+def test_token_bucket_refills_over_time():
+    now = {"t": 0.0}
+    limiter = TokenBucketLimiter(rate=1.0, burst=2, clock=lambda: now["t"])
+    assert limiter.allow("a") and limiter.allow("a") and not limiter.allow("a")
+    assert limiter.allow("b")  # keys are independent
+    assert limiter.retry_after("a") == pytest.approx(1.0)
+    now["t"] = 1.0
+    assert limiter.allow("a") and not limiter.allow("a")
+
+
+def test_hashing_pool_rejects_beyond_queue_limit():
+    pool = HashingPool(workers=1, queue=1)
+    gate = threading.Event()
+    running = [pool.submit(gate.wait), pool.submit(gate.wait)]
+    with pytest.raises(HashingBusy):
+        pool.submit(gate.wait)
+    gate.set()
+    for future in running:
+        future.result(timeout=5)
+    assert pool.submit(lambda: 42).result(timeout=5) == 42
+    assert pool.snapshot_stats()["rejected"] == 1
+
+
+@pytest.fixture
+def login(monkeypatch):
+    monkeypatch.setenv("ADMIN_PANEL_SECRET", "test-secret")
+    monkeypatch.setenv("ADMIN_PANEL_PBKDF2_ITERS", "2000")
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    with factory() as db:
+        db.add(AdminPanelUser(username="anna", password_hash=hash_password_sync("secret", 1000), role="admin"))
+        db.commit()
+    monkeypatch.setattr(admin_panel, "login_by_ip", TokenBucketLimiter(rate=0, burst=100))
+    monkeypatch.setattr(admin_panel, "login_by_username", TokenBucketLimiter(rate=0, burst=3))
+
+    def get_db():
+        db = factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    api = FastAPI()
+    api.include_router(admin_panel.router)
+    api.dependency_overrides[admin_panel.get_db] = get_db
+    client = TestClient(api, follow_redirects=False)
+
+    def post(username: str, password: str):
+        return client.post("/admin/login", data={"username": username, "password": password})
+
+    return post, factory
+
+
+def test_successful_login_upgrades_iteration_count(login):
+    post, factory = login
+    resp = post("anna", "secret")
+    assert resp.status_code == 303 and "admin_session" in resp.headers.get("set-cookie", "")
+    with factory() as db:
+        stored = db.query(AdminPanelUser).one().password_hash
+    assert stored.startswith("pbkdf2_sha256$2000$") and not needs_rehash(stored)
+
+
+def test_login_attempts_are_throttled_per_username(login):
+    post, factory = login
+    for _ in range(3):
+        assert "admin_session" not in post("anna", "wrong").headers.get("set-cookie", "")
+    # Even the right password is refused once the username bucket is empty
+    resp = post("anna", "secret")
+    assert "admin_session" not in resp.headers.get("set-cookie", "")
+    assert "flash=" in resp.headers["location"]
+
+
+def test_forwarded_for_is_only_trusted_when_enabled(monkeypatch):
+    request = Request(
+        {"type": "http", "headers": [(b"x-forwarded-for", b"6.6.6.6, 203.0.113.7")], "client": ("10.0.0.2", 5000)}
+    )
+    monkeypatch.delenv("ADMIN_PANEL_TRUST_FORWARDED", raising=False)
+    assert admin_panel._client_ip(request) == "10.0.0.2"
+    monkeypatch.setenv("ADMIN_PANEL_TRUST_FORWARDED", "1")
+    # Caddy appends the real peer last; anything before it is client-supplied
+    assert admin_panel._client_ip(request) == "203.0.113.7"
@@ -0,0 +1,97 @@
+"""
+Tests for admin panel session principals: compiled scopes, cache and invalidation.
+Run: pytest tests/test_admin_sessions.py -v
+"""
+from __future__ import annotations
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+import app.models  # noqa: F401 - ensure all models registered
+from app.models.admin_panel_user import AdminPanelUser
+from app.routers import admin_panel
+from app.services.admin_sessions import AdminPrincipal, PrincipalCache, ScopeSet
+
+
+@pytest.mark.parametrize(
+    "raw, role, scope, allowed",
+    [
+        ("*", "custom", "balance:manage", True),
+        ("posts:*", "custom", "posts:delete", True),
+        ("posts:*", "custom", "webinars:view", False),
+        ("posts", "custom", "posts:write", True),  # old coarse scope
+        ("users:manage", "custom", "users", False),
+        (None, "admin", "balance:manage", True),
+        (None, "support", "posts:view", False),
+        (None, "developer", "anything", True),
+    ],
+)
+def test_compiled_scopes_match_previous_rules(raw, role, scope, allowed):
+    assert ScopeSet.compile(raw, role).allows(scope) is allowed
+
+
+def test_cache_expires_and_invalidates_by_user():
+    now = {"t": 0.0}
+    cache = PrincipalCache(ttl=30, clock=lambda: now["t"])
+    p = AdminPrincipal(1, "anna", "admin", 0, ScopeSet.compile(None, "admin"))
+    cache.put(p)
+    cache.put(AdminPrincipal(2, "bob", "admin", 3, p.scope_set))
+
+    assert cache.get(1, 0) is p and cache.get(1, 1) is None  # other session_version
+    cache.invalidate(1)
+    assert cache.get(1, 0) is None and cache.get(2, 3) is not None
+    now["t"] = 31
+    assert cache.get(2, 3) is None
+
+
+@pytest.fixture
+def panel(monkeypatch):
+    monkeypatch.setenv("ADMIN_PANEL_SECRET", "test-secret")
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    with factory() as db:
+        user = AdminPanelUser(username="anna", password_hash="x", role="support", is_active=True, session_version=0)
+        db.add(user)
+        db.commit()
+        user_id = user.id
+    monkeypatch.setattr(admin_panel, "principal_cache", PrincipalCache(ttl=60))
+
+    def get_db():
+        db = factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    api = FastAPI()
+
+    @api.get("/probe")
+    def probe(user=Depends(admin_panel.require_scope("tickets:view"))):
+        return {"id": user.id}
+
+    api.dependency_overrides[admin_panel.get_db] = get_db
+    client = TestClient(api, follow_redirects=False)
+    client.cookies.set("admin_session", admin_panel._make_session_token(user_id, 0))
+    return client, engine, factory, user_id
+
+
+def test_session_lookup_is_cached_until_user_changes(panel):
+    client, engine, factory, user_id = panel
+    statements: list[str] = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    for _ in range(5):
+        assert client.get("/probe").json() == {"id": user_id}
+    assert sum("FROM admin_panel_users" in s for s in statements) == 1
+
+    # Deactivation through the panel handler invalidates the cached principal
+    with factory() as db:
+        admin_panel.admin_panel_users_update(user_id, None, db, role="support", scopes="", perms=None, is_active=None)
+    resp = client.get("/probe")
+    assert resp.status_code == 303 and "/admin/login" in resp.headers["location"]
@@ -4,8 +4,10 @@ Run: pytest tests/test_balance.py -v
 """
 from __future__ import annotations
 
+import threading
+
 import pytest
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, func
 from sqlalchemy.orm import sessionmaker
 
 from app.database import Base
@@ -15,11 +17,17 @@ from app.models.balance_request import BalanceRequest
 from app.models.user import User
 from app.models.user_balance import UserBalance
 from app.services.balance_service import (
+    ReviewItem,
     admin_adjust_balance,
+    apply_balance_delta,
     approve_deposit_request,
+    create_deposit_request,
     get_balance_cents,
+    list_users_with_balance,
     reject_deposit_request,
+    review_deposit_requests,
 )
+from app.services.ledger_reconciliation import reconcile_ledger
 
 
 @pytest.fixture
@@ -128,3 +136,212 @@ def test_double_reject_rejected(db, user, admin_user_id):
     reject_deposit_request(db, req.id, admin_user_id)
     with pytest.raises(ValueError, match="status is rejected"):
         reject_deposit_request(db, req.id, admin_user_id)
+
+
+def test_reading_balance_never_writes(db, user):
+    assert get_balance_cents(db, user.id) == 0
+    assert db.query(UserBalance).count() == 0
+    assert not db.new and not db.dirty
+
+
+def test_users_list_joins_balances_without_creating_rows(db):
+    users = [User(telegram_id=500 + i, first_name=f"u{i}") for i in range(5)]
+    db.add_all(users)
+    db.flush()
+    db.add_all(
+        [
+            UserBalance(user_id=users[1].id, balance_cents=5000),
+            UserBalance(user_id=users[2].id, balance_cents=-300),
+            UserBalance(user_id=users[3].id, balance_cents=12000),
+        ]
+    )
+    db.commit()
+
+    rows, total = list_users_with_balance(db, sort="balance_desc", limit=10)
+    assert total == 5
+    assert [cents for _, cents in rows] == [12000, 5000, 0, 0, -300]
+    assert db.query(UserBalance).count() == 3
+
+    # Range without 0 runs on the raw column: users without a row can't match
+    rows, total = list_users_with_balance(db, min_cents=1000, sort="balance_asc")
+    assert total == 2 and [u.id for u, _ in rows] == [users[1].id, users[3].id]
+
+    rows, total = list_users_with_balance(db, max_cents=0, sort="balance_asc")
+    assert total == 3 and rows[0][1] == -300
+
+
+
+def test_adjust_with_same_idempotency_key_applies_once(db, user, admin_user_id):
+    for _ in range(3):
+        ub = admin_adjust_balance(db, user.id, 2500, admin_user_id, "bonus", idempotency_key="form:1")
+    assert ub.balance_cents == 2500
+    assert db.query(BalanceLedger).filter(BalanceLedger.idempotency_key == "form:1").count() == 1
+
+    # A failed adjust leaves nothing behind and the session usable
+    with pytest.raises(ValueError, match="cannot go below 0"):
+        admin_adjust_balance(db, user.id, -5000, admin_user_id, idempotency_key="form:2")
+    assert db.query(BalanceLedger).filter(BalanceLedger.user_id == user.id).count() == 1
+
+
+@pytest.fixture
+def file_sessions(tmp_path):
+    """Real file database shared by threads: each worker gets its own connection and session."""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'balance.db'}", connect_args={"check_same_thread": False, "timeout": 30}
+    )
+    Base.metadata.create_all(engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def _run_threads(n: int, target) -> list[BaseException]:
+    errors: list[BaseException] = []
+    start = threading.Barrier(n)
+
+    def runner(i: int) -> None:
+        start.wait()
+        try:
+            target(i)
+        except BaseException as e:  # noqa: BLE001 - reported by the test
+            errors.append(e)
+
+    threads = [threading.Thread(target=runner, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return errors
+
+
+def test_concurrent_adjustments_keep_balance_equal_to_ledger(file_sessions):
+    with file_sessions() as db:
+        u = User(telegram_id=777, first_name="Stress")
+        db.add(u)
+        db.commit()
+        user_id = u.id
+
+    threads, per_thread = 8, 25
+
+    def work(i: int) -> None:
+        with file_sessions() as db:
+            for n in range(per_thread):
+                delta = 300 if n % 3 else -200
+                try:
+                    # Retried keys (n % 5 == 0 twice) must still apply once
+                    key = f"t{i}:{n}"
+                    admin_adjust_balance(db, user_id, delta, 1, idempotency_key=key)
+                    if n % 5 == 0:
+                        admin_adjust_balance(db, user_id, delta, 1, idempotency_key=key)
+                except ValueError:
+                    pass  # would go below 0: rejected as a whole
+                if n % 4 == 0:
+                    # Zero-delta entries record the balance too and must not break the chain
+                    create_deposit_request(db, user_id, f"0xstress{i}:{n}")
+
+    assert _run_threads(threads, work) == []
+
+    with file_sessions() as db:
+        balance = get_balance_cents(db, user_id)
+        entries = db.query(BalanceLedger).filter(BalanceLedger.user_id == user_id).order_by(BalanceLedger.id).all()
+        assert balance == sum(e.delta_cents for e in entries) >= 0
+        # Every entry records the balance right after it: no lost or interleaved update
+        running = 0
+        for e in entries:
+            running += e.delta_cents
+            assert e.balance_after_cents == running >= 0
+        keys = [e.idempotency_key for e in entries if e.idempotency_key]
+        assert len(keys) == len(set(keys))
+        assert sum(e.type == "deposit_request_created" for e in entries) == threads * 7
+        report = reconcile_ledger(db, settle_seconds=0)
+        assert report.chain_breaks == [] and report.drift == []
+
+
+def test_concurrent_approvals_of_one_request_apply_once(file_sessions):
+    with file_sessions() as db:
+        u = User(telegram_id=778, first_name="Race")
+        db.add(u)
+        db.flush()
+        req = BalanceRequest(user_id=u.id, tx_ref="0xrace", status="pending")
+        db.add(req)
+        db.commit()
+        user_id, request_id = u.id, req.id
+
+    approved: list[int] = []
+
+    def approve(i: int) -> None:
+        with file_sessions() as db:
+            try:
+                approve_deposit_request(db, request_id, 1000, i + 1)
+                approved.append(i)
+            except ValueError:
+                pass
+
+    assert _run_threads(6, approve) == []
+    assert len(approved) == 1
+    with file_sessions() as db:
+        assert get_balance_cents(db, user_id) == 1000
+        total = db.query(func.sum(BalanceLedger.delta_cents)).filter(BalanceLedger.user_id == user_id).scalar()
+        assert total == 1000
+
+
+def test_apply_delta_creates_balance_row_and_returns_new_balance(db, user):
+    assert apply_balance_delta(db, user.id, 700, type_="admin_adjust") == 700
+    assert apply_balance_delta(db, user.id, -200, type_="admin_adjust") == 500
+    db.commit()
+    assert db.query(UserBalance).filter(UserBalance.user_id == user.id).one().balance_cents == 500
+
+
+def _pending(db, user_id: int, n: int) -> list[BalanceRequest]:
+    reqs = [BalanceRequest(user_id=user_id, tx_ref=f"0xbatch{i}", status="pending") for i in range(n)]
+    db.add_all(reqs)
+    db.commit()
+    return reqs
+
+
+def test_batch_review_applies_valid_items_in_one_transaction(db, user, admin_user_id):
+    other = User(telegram_id=54321, first_name="Other")
+    db.add(other)
+    db.commit()
+    mine = _pending(db, user.id, 3)
+    theirs = _pending(db, other.id, 1)
+    reject_deposit_request(db, theirs[0].id, admin_user_id)
+    admin_adjust_balance(db, user.id, 500, admin_user_id)
+
+    results = review_deposit_requests(
+        db,
+        [
+            ReviewItem(mine[0].id, "approve", 1000, "promo"),
+            ReviewItem(mine[1].id, "approve", 2000),
+            ReviewItem(mine[2].id, "reject", comment="bad tx"),
+            ReviewItem(theirs[0].id, "approve", 700),  # already rejected
+            ReviewItem(999, "approve", 0),  # invalid amount
+        ],
+        admin_user_id,
+    )
+    assert [(r.ok, r.status) for r in results[:3]] == [(True, "approved"), (True, "approved"), (True, "rejected")]
+    assert "status is rejected" in results[3].error and "positive" in results[4].error
+
+    assert get_balance_cents(db, user.id) == 3500
+    assert get_balance_cents(db, other.id) == 0
+    entries = db.query(BalanceLedger).filter(BalanceLedger.user_id == user.id).order_by(BalanceLedger.id).all()
+    # The balance_after chain continues through the batch entries
+    assert [(e.delta_cents, e.balance_after_cents) for e in entries[-3:]] == [(1000, 1500), (2000, 3500), (0, 3500)]
+
+
+def test_batch_review_statement_count_does_not_grow_with_batch_size(db, user, admin_user_id):
+    from sqlalchemy import event
+
+    def count(n: int) -> int:
+        ids = [r.id for r in _pending(db, user.id, n)]
+        statements: list[str] = []
+        listener = lambda *args: statements.append(args[2])  # noqa: E731
+        event.listen(db.get_bind(), "before_cursor_execute", listener)
+        results = review_deposit_requests(db, [ReviewItem(rid, "approve", 100) for rid in ids], admin_user_id)
+        event.remove(db.get_bind(), "before_cursor_execute", listener)
+        assert all(r.ok for r in results)
+        return len(statements)
+
+    small, large = count(2), count(40)
+    # Request status updates are one executemany; everything else is a fixed number of statements
+    assert small == large
+    assert get_balance_cents(db, user.id) == 4200
@@ -0,0 +1,75 @@
+"""
+Tests for the pooled Bot API client against the local fake server.
+Run: pytest tests/test_bot_api.py -v
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.utils.telegram_bot_api import BotApiClient, BotApiError
+from fake_bot_api import FakeBotApi
+
+
+@pytest.fixture
+def fake():
+    with FakeBotApi() as api:
+        yield api
+
+
+@pytest.fixture
+def client(fake):
+    c = BotApiClient(fake.token, base_url=fake.base_url, http2=False, max_retries=3)
+    try:
+        yield c
+    finally:
+        c.close()
+
+
+def test_sync_send_reuses_connections(fake, client):
+    for i in range(20):
+        result = client.send_message_sync(100 + i, f"msg {i}")
+        assert result["chat"]["id"] == 100 + i
+    assert len(fake.messages) == 20
+    assert fake.messages[0]["parse_mode"] == "HTML"
+    assert fake.connections == 1
+
+
+def test_concurrent_sync_callers_share_pool(fake, client):
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda i: client.send_message_sync(i, "x"), range(40)))
+    assert len(fake.messages) == 40
+    assert fake.connections <= client.max_connections
+
+
+def test_awaitable_entry_point_from_foreign_loop(fake, client):
+    async def main():
+        return await asyncio.gather(*(client.send_message(i, "async") for i in range(5)))
+
+    results = asyncio.run(main())
+    assert [r["chat"]["id"] for r in results] == list(range(5))
+
+
+def test_429_honors_retry_after(fake, client):
+    fake.flood(0.3)
+    started = time.monotonic()
+    client.send_message_sync(1, "after flood")
+    assert time.monotonic() - started >= 0.3
+    assert len(fake.messages) == 1
+
+
+def test_429_gives_up_after_max_retries(fake, client):
+    fake.flood(0.01, 0.01, 0.01, 0.01)
+    with pytest.raises(BotApiError) as exc:
+        client.send_message_sync(1, "never")
+    assert exc.value.status_code == 429
+    assert exc.value.retry_after == pytest.approx(0.01)
+
+
+def test_client_error_is_not_retried(fake, client):
+    with pytest.raises(BotApiError) as exc:
+        client.send_message_sync(403, "blocked")
+    assert exc.value.status_code == 403
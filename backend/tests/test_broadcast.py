@@ -0,0 +1,194 @@
+"""
+Tests for the broadcast worker: draining, progress counters, lease claiming.
+Run: pytest tests/test_broadcast.py -v
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+import app.models  # noqa: F401 - ensure all models registered
+from app.models.broadcast_job import BroadcastJob
+from app.models.user import User
+from app.services.broadcast_service import BroadcastWorker, broadcast_progress, enqueue_broadcast
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'broadcast.sqlite3'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)
+
+
+def _seed_users(db, n: int, blocked: int = 0):
+    for i in range(n):
+        db.add(User(telegram_id=1000 + i, first_name=f"u{i}", is_blocked=i < blocked))
+    db.commit()
+
+
+def _worker(session_factory, send, **kwargs):
+    return BroadcastWorker(
+        session_factory,
+        send,
+        concurrency=4,
+        rate_per_sec=10000,
+        per_chat_interval=0,
+        batch_size=7,
+        poll_interval=0.01,
+        **kwargs,
+    )
+
+
+def _job(db, job_id) -> BroadcastJob:
+    db.expire_all()
+    return db.query(BroadcastJob).filter(BroadcastJob.id == job_id).one()
+
+
+def _age_lease(db, job_id, seconds: int) -> None:
+    # The owning process died: its heartbeat stops moving
+    db.query(BroadcastJob).filter(BroadcastJob.id == job_id).update(
+        {BroadcastJob.heartbeat_at: datetime.now(timezone.utc) - timedelta(seconds=seconds)}
+    )
+    db.commit()
+
+
+def test_worker_drains_job_and_reports_progress(session_factory):
+    db = session_factory()
+    _seed_users(db, 20, blocked=3)
+    job = enqueue_broadcast(db, kind="post", text="hello", ref_id=1)
+    assert job.status == "pending"
+    assert job.total == 17
+
+    sent_to = []
+
+    def send(chat_id, text):
+        sent_to.append(chat_id)
+        return chat_id % 5 != 0  # some chats fail
+
+    worker = _worker(session_factory, send)
+    try:
+        assert worker.run_once() is True
+        assert worker.run_once() is False  # nothing left
+    finally:
+        worker.stop()
+
+    db.expire_all()
+    job = db.query(BroadcastJob).filter(BroadcastJob.id == job.id).first()
+    progress = broadcast_progress(job)
+    assert progress["status"] == "done"
+    assert sorted(sent_to) == list(range(1003, 1020))
+    assert progress["sent"] + progress["failed"] == 17
+    assert progress["failed"] == sum(1 for c in sent_to if c % 5 == 0)
+    assert progress["remaining"] == 0
+    db.close()
+
+
+def test_running_job_with_fresh_lease_is_not_reclaimed(session_factory):
+    db = session_factory()
+    _seed_users(db, 3)
+    job = enqueue_broadcast(db, kind="webinar", text="hi")
+
+    first = _worker(session_factory, lambda chat_id, text: True)
+    second = _worker(session_factory, lambda chat_id, text: True)
+    try:
+        assert first._claim(db) == job.id
+        assert second._claim(db) is None
+    finally:
+        first.stop()
+        second.stop()
+    db.close()
+
+
+def test_restarted_worker_resumes_from_saved_cursor(session_factory):
+    db = session_factory()
+    _seed_users(db, 20)
+    job = enqueue_broadcast(db, kind="post", text="hello")
+
+    sent_to = []
+    first = _worker(session_factory, lambda chat_id, text: sent_to.append(chat_id) or True, lease_seconds=60)
+
+    def send_then_shutdown(chat_id, text):
+        # Shutdown arrives while the first batch is in flight
+        first._stop.set()
+        sent_to.append(chat_id)
+        return True
+
+    first.send = send_then_shutdown
+    try:
+        assert first.run_once() is True
+    finally:
+        first.stop()
+    interrupted = _job(db, job.id)
+    assert interrupted.status == "running"
+    assert interrupted.sent == 7 and interrupted.last_user_id == 7
+
+    _age_lease(db, job.id, 120)
+    restarted = _worker(session_factory, lambda chat_id, text: sent_to.append(chat_id) or True, lease_seconds=60)
+    try:
+        assert restarted.run_once() is True
+    finally:
+        restarted.stop()
+    # Every user exactly once: the restart continued after the cursor instead of starting over
+    assert sorted(sent_to) == list(range(1000, 1020))
+    progress = broadcast_progress(_job(db, job.id))
+    assert (progress["status"], progress["sent"], progress["failed"]) == ("done", 20, 0)
+    db.close()
+
+
+def test_job_with_stale_lease_is_reclaimed_and_old_owner_backs_off(session_factory):
+    db = session_factory()
+    _seed_users(db, 20)
+    job = enqueue_broadcast(db, kind="webinar", text="hi")
+
+    stalled_sends = []
+    stalled = _worker(session_factory, lambda chat_id, text: stalled_sends.append(chat_id) or True, lease_seconds=60)
+    takeover = _worker(session_factory, lambda chat_id, text: True, lease_seconds=60)
+    try:
+        assert stalled._claim(db) == job.id
+        assert takeover._claim(db) is None
+        _age_lease(db, job.id, 120)
+        assert takeover._claim(db) == job.id
+        assert _job(db, job.id).locked_by == takeover.worker_id
+
+        # The stalled worker wakes up: its first progress update no longer matches the lease
+        stalled._process(db, job.id)
+        after_stall = _job(db, job.id)
+        assert after_stall.status == "running" and after_stall.locked_by == takeover.worker_id
+        assert after_stall.sent == 0 and after_stall.last_user_id == 0
+        assert len(stalled_sends) == 7  # only the batch that was already in flight
+
+        takeover._process(db, job.id)
+    finally:
+        stalled.stop()
+        takeover.stop()
+    done = _job(db, job.id)
+    assert (done.status, done.sent, done.last_user_id) == ("done", 20, 20)
+    db.close()
+
+
+def test_failed_and_raising_sends_are_counted_without_failing_the_job(session_factory):
+    db = session_factory()
+    _seed_users(db, 15)
+    job = enqueue_broadcast(db, kind="post", text="hello")
+
+    def send(chat_id, text):
+        if chat_id % 3 == 0:
+            raise RuntimeError("Forbidden: bot was blocked by the user")
+        return chat_id % 4 != 0
+
+    worker = _worker(session_factory, send)
+    try:
+        assert worker.run_once() is True
+    finally:
+        worker.stop()
+    chats = range(1000, 1015)
+    failed = sum(1 for c in chats if c % 3 == 0 or c % 4 == 0)
+    progress = broadcast_progress(_job(db, job.id))
+    assert (progress["status"], progress["error"]) == ("done", None)
+    assert (progress["sent"], progress["failed"]) == (15 - failed, failed)
+    assert progress["remaining"] == 0
+    db.close()
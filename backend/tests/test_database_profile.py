@@ -0,0 +1,165 @@
+"""
+Tests for the SQLite production profile: pragmas and read/write session routing.
+Run: pytest tests/test_database_profile.py -v
+"""
+from __future__ import annotations
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import Column, Integer, MetaData, String, Table, event, func, insert, select, text
+from sqlalchemy.exc import OperationalError
+
+from app.database import Base, build_engines, get_db, make_session_factory
+import app.models  # noqa: F401 - ensure all models registered
+from app.models.admin import Admin
+from app.models.booking import Booking
+from app.models.payment import Payment
+from app.models.reminder_schedule import ReminderSchedule
+from app.models.user import User
+from app.models.webinar import Webinar
+from app.models.webinar_material import WebinarMaterial
+from app.routers import bookings, webinars
+from app.routers.admins import _clear_selected_tables
+
+metadata = MetaData()
+notes = Table("notes", metadata, Column("id", Integer, primary_key=True), Column("body", String(50)))
+
+
+@pytest.fixture
+def engines(tmp_path):
+    writer, reader = build_engines(f"sqlite:///{tmp_path / 'profile.sqlite3'}", profile="production", read_pool_size=2)
+    metadata.create_all(writer)
+    yield writer, reader
+    writer.dispose()
+    reader.dispose()
+
+
+def _tracked(engine) -> list[str]:
+    seen: list[str] = []
+    event.listen(engine, "before_cursor_execute", lambda *args: seen.append(args[2]))
+    return seen
+
+
+def test_production_profile_applies_wal_and_read_only_reader(engines):
+    writer, reader = engines
+    with writer.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+        assert conn.exec_driver_sql("PRAGMA foreign_keys").scalar() == 1
+    with reader.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA query_only").scalar() == 1
+        with pytest.raises(OperationalError):
+            conn.execute(insert(notes).values(body="nope"))
+
+
+def test_basic_profile_and_memory_databases_use_one_engine(tmp_path):
+    assert build_engines(f"sqlite:///{tmp_path / 'a.sqlite3'}", profile="basic")[1] is None
+    assert build_engines("sqlite://", profile="production")[1] is None
+
+
+def test_reads_go_to_reader_until_transaction_writes(engines):
+    writer, reader = engines
+    on_writer, on_reader = _tracked(writer), _tracked(reader)
+    factory = make_session_factory(writer, reader)
+
+    with factory() as db:
+        db.execute(select(notes)).all()
+        assert len(on_reader) == 1 and not on_writer
+
+        db.execute(insert(notes).values(body="draft"))
+        # Same transaction must see its own uncommitted row: stays on the writer
+        assert db.execute(select(notes.c.body)).scalars().all() == ["draft"]
+        assert len(on_reader) == 1
+        db.commit()
+
+        db.execute(select(notes)).all()
+        assert len(on_reader) == 2
+
+        db.execute(select(notes).with_for_update()).all()
+        db.execute(select(notes)).all()
+        assert len(on_reader) == 2
+        db.rollback()
+
+        db.execute(text("SELECT count(*) FROM notes")).scalar()
+        assert len(on_reader) == 3
+
+
+@pytest.fixture
+def app_factory(tmp_path, monkeypatch):
+    monkeypatch.delenv("REQUIRE_TELEGRAM_AUTH", raising=False)
+    writer, reader = build_engines(f"sqlite:///{tmp_path / 'app.sqlite3'}", profile="production", read_pool_size=2)
+    Base.metadata.create_all(writer)
+    yield make_session_factory(writer, reader)
+    writer.dispose()
+    reader.dispose()
+
+
+def _seed_webinar(db) -> tuple[int, int]:
+    user = User(telegram_id=100)
+    webinar = Webinar(title="Рынок", date="2030-01-01", time="12:00")
+    db.add_all([user, webinar, Admin(telegram_id=1, role="owner")])
+    db.flush()
+    booking = Booking(user_id=user.id, webinar_id=webinar.id, type="webinar", date="2030-01-01", status="confirmed")
+    db.add(booking)
+    db.flush()
+    db.add_all(
+        [
+            Payment(booking_id=booking.id, user_id=user.id, webinar_id=webinar.id, amount=10.0, status="completed"),
+            WebinarMaterial(webinar_id=webinar.id, title="Слайды"),
+            ReminderSchedule(booking_id=booking.id, webinar_id=webinar.id, user_id=user.id, kind="24h",
+                             due_at=func.now(), expires_at=func.now()),
+        ]
+    )
+    db.commit()
+    return webinar.id, booking.id
+
+
+def _client(factory) -> TestClient:
+    api = FastAPI()
+    api.include_router(webinars.router)
+    api.include_router(bookings.router)
+
+    def _get_db():
+        with factory() as session:
+            yield session
+
+    api.dependency_overrides[get_db] = _get_db
+    return TestClient(api)
+
+
+def _count(db, model) -> int:
+    return db.execute(select(func.count()).select_from(model)).scalar()
+
+
+def test_deleting_webinar_removes_dependents_with_foreign_keys_on(app_factory):
+    with app_factory() as db:
+        webinar_id, _ = _seed_webinar(db)
+
+    resp = _client(app_factory).delete(f"/webinars/{webinar_id}", params={"admin_telegram_id": 1})
+    assert resp.status_code == 200, resp.text
+    assert resp.json()["deleted_bookings"] == 1
+    with app_factory() as db:
+        for model in (Webinar, Booking, Payment, WebinarMaterial, ReminderSchedule):
+            assert _count(db, model) == 0, model
+
+
+def test_deleting_paid_booking_removes_its_payment(app_factory):
+    with app_factory() as db:
+        _, booking_id = _seed_webinar(db)
+
+    resp = _client(app_factory).delete(f"/bookings/{booking_id}", params={"admin_telegram_id": 1})
+    assert resp.status_code == 200, resp.text
+    with app_factory() as db:
+        assert _count(db, Booking) == _count(db, Payment) == _count(db, ReminderSchedule) == 0
+        assert _count(db, Webinar) == 1
+
+
+def test_clearing_tables_turns_foreign_keys_back_on(app_factory):
+    with app_factory() as db:
+        _seed_webinar(db)
+        # Parents only: would violate the FKs if enforcement stayed on during the clear
+        _clear_selected_tables(db, {"webinars", "bookings"})
+        db.commit()
+        assert _count(db, Webinar) == 0
+        assert db.execute(text("PRAGMA foreign_keys")).scalar() == 1
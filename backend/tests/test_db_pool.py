@@ -0,0 +1,72 @@
+"""
+Tests for database pool settings and pool / slow query metrics.
+Run: pytest tests/test_db_pool.py -v
+"""
+from __future__ import annotations
+
+import pytest
+from sqlalchemy import create_engine, exc, text
+
+from app import database
+from app.routers import admin_panel, bookings, users
+from app.utils.db_metrics import InstrumentedQueuePool, instrument_engine
+
+
+def test_engine_options_from_env(monkeypatch):
+    monkeypatch.setenv("DB_POOL_SIZE", "20")
+    monkeypatch.setenv("DB_MAX_OVERFLOW", "0")
+    monkeypatch.setenv("DB_POOL_PRE_PING", "0")
+    monkeypatch.setenv("DB_STATEMENT_TIMEOUT_MS", "5000")
+    options = database.engine_options("postgresql+psycopg2://u:p@db/app")
+    assert options["pool_size"] == 20 and options["max_overflow"] == 0
+    assert options["pool_pre_ping"] is False and options["pool_recycle"] == 1800
+    assert options["connect_args"] == {"options": "-c statement_timeout=5000"}
+    assert options["poolclass"] is InstrumentedQueuePool
+
+
+def test_routers_share_one_session_dependency():
+    assert admin_panel.get_db is bookings.get_db is users.get_db is database.get_db
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.sqlite3'}",
+        poolclass=InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=1,
+        pool_timeout=0.05,
+    )
+    yield engine
+    engine.dispose()
+
+
+def test_pool_stats_count_overflow_and_timeouts(engine):
+    stats = instrument_engine(engine, slow_ms=10000)
+    first, second = engine.connect(), engine.connect()
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+    snap = stats.snapshot(engine.pool)
+    assert snap["checkouts"] == 2 and snap["timeouts"] == 1
+    assert snap["overflow_checkouts"] == 1 and snap["overflow_peak"] == 1
+    assert snap["checked_out"] == 2 and sum(snap["wait_buckets"].values()) == 2
+    first.close()
+    second.close()
+
+    engine.dispose()  # new pool object, same stats
+    with engine.connect():
+        pass
+    assert stats.snapshot(engine.pool)["checkouts"] == 3
+
+
+def test_slow_queries_are_counted(engine, caplog):
+    stats = instrument_engine(engine, slow_ms=0)
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        with pytest.raises(exc.OperationalError):
+            conn.execute(text("SELECT * FROM missing_table"))
+        conn.execute(text("SELECT 2"))
+    snap = stats.snapshot()
+    assert snap["slow_queries"] == 2
+    assert [q["sql"] for q in snap["recent_slow"]] == ["SELECT 1", "SELECT 2"]
+    assert "slow query" in caplog.text
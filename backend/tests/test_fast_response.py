@@ -0,0 +1,148 @@
+"""
+Tests for the fast response layer: orjson rendering, trusted router payloads and
+optional in-app compression.
+Run: pytest tests/test_fast_response.py -v
+"""
+from __future__ import annotations
+
+import gzip
+import json
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import pytest
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, get_db
+import app.models  # noqa: F401 - ensure all models registered
+from app.models.admin import Admin
+from app.models.booking import Booking
+from app.models.user import User
+from app.routers import bookings, users
+from app.schemas.booking import BookingResponse
+from app.schemas.user import UserResponse
+from app.utils.compression import CompressionMiddleware
+from app.utils.fast_json import FastJSONResponse
+
+
+class Item(BaseModel):
+    name: str
+    at: datetime
+
+
+def test_fast_json_matches_the_stock_encoder():
+    content = {
+        "at": datetime(2030, 1, 2, 3, 4, 5, 600, tzinfo=timezone.utc),
+        "naive": datetime(2030, 1, 2, 3, 4, 5),
+        "amount": Decimal("12.50"),
+        "item": Item(name="Вебинар", at=datetime(2030, 1, 1)),
+        "by_id": {1: "one"},
+        "none": None,
+    }
+    stock = JSONResponse(jsonable_encoder(content)).body
+    assert json.loads(FastJSONResponse(content).body) == json.loads(stock)
+
+
+@pytest.fixture
+def client(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'fast.sqlite3'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    with factory() as db:
+        customer, responder = User(telegram_id=100, first_name="Ivan"), User(telegram_id=1, first_name="Anna")
+        db.add_all([customer, responder, Admin(telegram_id=1, role="owner")])
+        db.flush()
+        db.add_all(
+            [
+                Booking(user_id=customer.id, type="consultation", date="2030-01-01", status="pending"),
+                Booking(user_id=customer.id, type="support", date="2030-01-02", status="answered",
+                        admin_id=responder.id, admin_response="ok", amount=10.5),
+            ]
+        )
+        db.commit()
+
+    api = FastAPI()
+    api.include_router(users.router)
+    api.include_router(bookings.router)
+
+    def _get_db():
+        session = factory()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    api.dependency_overrides[get_db] = _get_db
+    yield TestClient(api)
+    engine.dispose()
+
+
+@pytest.mark.parametrize(
+    "path, model",
+    [
+        ("/users/", UserResponse),
+        ("/users/telegram/1", UserResponse),
+        ("/bookings/telegram/100", BookingResponse),
+    ],
+)
+def test_trusted_payloads_have_the_response_model_shape(client, path, model):
+    body = client.get(path).json()
+    for item in body if isinstance(body, list) else [body]:
+        # Same keys as the documented model, and the values validate against it
+        assert set(item) == set(model.model_fields)
+        assert model.model_validate(item).model_dump(mode="json") == item
+    if path.startswith("/bookings"):
+        assert [b["admin_name"] for b in body] == [None, "Anna"]
+
+
+def _compressed_app(encodings, minimum_size=100):
+    api = FastAPI()
+
+    @api.get("/big")
+    def big():
+        return JSONResponse({"items": ["x" * 50] * 100}, headers={"ETag": '"v1"'})
+
+    @api.get("/small")
+    def small():
+        return {"ok": True}
+
+    @api.get("/stream")
+    def stream():
+        return StreamingResponse(iter([b"data: 1\n\n"] * 50), media_type="text/event-stream")
+
+    api.add_middleware(CompressionMiddleware, encodings=encodings, minimum_size=minimum_size)
+    return TestClient(api)
+
+
+def test_gzip_only_for_large_complete_bodies():
+    client = _compressed_app(["gzip"])
+    resp = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["content-encoding"] == "gzip" and resp.headers["vary"] == "Accept-Encoding"
+    assert resp.headers["etag"] == 'W/"v1"'
+    assert resp.json()["items"][0] == "x" * 50  # the client decodes it
+
+    assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/stream", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/big", headers={"Accept-Encoding": "gzip;q=0, identity"}).headers
+
+
+def test_zstd_is_preferred_when_configured():
+    zstandard = pytest.importorskip("zstandard")
+    client = _compressed_app(["zstd", "gzip"])
+    with client.stream("GET", "/big", headers={"Accept-Encoding": "gzip, zstd"}) as resp:
+        assert resp.headers["content-encoding"] == "zstd"
+        raw = b"".join(resp.iter_raw())
+    assert json.loads(zstandard.ZstdDecompressor().decompress(raw))["items"]
+
+
+def test_gzip_body_roundtrips():
+    client = _compressed_app(["gzip"])
+    with client.stream("GET", "/big", headers={"Accept-Encoding": "gzip"}) as resp:
+        raw = b"".join(resp.iter_raw())
+    assert json.loads(gzip.decompress(raw)) == {"items": ["x" * 50] * 100}
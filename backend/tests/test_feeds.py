@@ -0,0 +1,133 @@
+"""
+Tests for the posts / webinars feeds: keyset pages, ETag/304 and the response cache.
+Run: pytest tests/test_feeds.py -v
+"""
+from __future__ import annotations
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.database import get_db
+from app.migrations import upgrade
+from app.models.post import Post
+from app.models.webinar import Webinar
+from app.routers import posts, webinars
+from app.services.feed_cache import FeedCache, table_version
+
+
+class Clock:
+    now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'feeds.sqlite3'}", connect_args={"check_same_thread": False})
+    upgrade(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session_factory(engine):
+    return sessionmaker(bind=engine)
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def client(session_factory, clock, monkeypatch):
+    cache = FeedCache(revalidate_seconds=5.0, clock=clock)
+    monkeypatch.setattr(posts, "feed_cache", cache)
+    monkeypatch.setattr(webinars, "feed_cache", cache)
+    api = FastAPI()
+    api.include_router(posts.router)
+    api.include_router(webinars.router)
+
+    def _get_db():
+        session = session_factory()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    api.dependency_overrides[get_db] = _get_db
+    return TestClient(api)
+
+
+def _queries(engine) -> list[str]:
+    seen: list[str] = []
+    event.listen(engine, "before_cursor_execute", lambda *args: seen.append(args[2]))
+    return seen
+
+
+def test_posts_feed_pages_by_cursor_without_full_content(client, session_factory):
+    with session_factory() as db:
+        db.add_all([Post(title=f"p{i}", content="x" * (300 if i == 4 else 10)) for i in range(1, 6)])
+        db.commit()
+
+    first = client.get("/posts/feed?limit=2").json()
+    assert [item["id"] for item in first["items"]] == [5, 4]
+    assert first["items"][1] == {**first["items"][1], "excerpt": "x" * posts.FEED_EXCERPT_CHARS, "truncated": True}
+    assert "content" not in first["items"][0] and first["items"][0]["truncated"] is False
+    second = client.get(f"/posts/feed?limit=2&cursor={first['next_cursor']}").json()
+    last = client.get(f"/posts/feed?limit=2&cursor={second['next_cursor']}").json()
+    assert [item["id"] for item in second["items"] + last["items"]] == [3, 2, 1]
+    assert last["next_cursor"] is None
+
+
+def test_cached_feed_costs_no_queries_and_answers_304(client, engine, session_factory):
+    with session_factory() as db:
+        db.add(Webinar(title="w", date="2030-01-01", time="10:00", description="long text"))
+        db.commit()
+
+    first = client.get("/webinars/feed")
+    assert first.status_code == 200 and "description" not in first.json()["items"][0]
+    etag = first.headers["etag"]
+
+    seen = _queries(engine)
+    assert client.get("/webinars/feed").headers["etag"] == etag
+    not_modified = client.get("/webinars/feed", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304 and not_modified.content == b""
+    assert seen == []
+
+
+def test_writes_bump_the_table_version_and_refresh_the_feed(client, engine, session_factory, clock):
+    with session_factory() as db:
+        db.add(Post(title="first", content="..."))
+        db.commit()
+        assert table_version(db, "posts") == 2  # seeded by the migration, +1 insert
+    etag = client.get("/posts/feed").headers["etag"]
+
+    # A write from another process: this cache only notices after the revalidation window
+    with session_factory() as db:
+        db.add(Post(title="second", content="..."))
+        db.commit()
+    assert client.get("/posts/feed", headers={"If-None-Match": etag}).status_code == 304
+
+    clock.now += 10
+    seen = _queries(engine)
+    fresh = client.get("/posts/feed", headers={"If-None-Match": etag})
+    assert fresh.status_code == 200 and fresh.headers["etag"] != etag
+    assert [item["title"] for item in fresh.json()["items"]] == ["second", "first"]
+    assert len(seen) == 2  # version lookup + page
+
+    # Unchanged table after the window: one version lookup, same ETag
+    clock.now += 10
+    seen.clear()
+    assert client.get("/posts/feed").headers["etag"] == fresh.headers["etag"]
+    assert len(seen) == 1
+
+    # Writes in this process drop the entry at once
+    posts.feed_cache.invalidate("posts")
+    seen.clear()
+    client.get("/posts/feed")
+    assert len(seen) == 2
@@ -0,0 +1,146 @@
+"""
+Tests for the incremental ledger reconciliation job and keyset ledger pages.
+Run: pytest tests/test_ledger_reconciliation.py -v
+"""
+from __future__ import annotations
+
+import pytest
+from sqlalchemy import create_engine, event, update
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+import app.models  # noqa: F401 - ensure all models registered
+from app.models.balance_ledger import BalanceLedger
+from app.models.ledger_snapshot import LedgerSnapshot
+from app.models.user import User
+from app.models.user_balance import UserBalance
+from app.services.balance_service import admin_adjust_balance, list_ledger_entries
+from app.services.ledger_reconciliation import LedgerReconciler, reconcile_ledger
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    return engine
+
+
+@pytest.fixture
+def db(engine):
+    session = sessionmaker(bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def users(db):
+    items = [User(telegram_id=900 + i, first_name=f"u{i}") for i in range(3)]
+    db.add_all(items)
+    db.commit()
+    return items
+
+
+def _reconcile(db, **kwargs):
+    return reconcile_ledger(db, settle_seconds=0, **kwargs)
+
+
+def test_consistent_ledger_reports_nothing_and_resumes_from_checkpoint(engine, db, users):
+    for i, u in enumerate(users):
+        admin_adjust_balance(db, u.id, 1000 * (i + 1), 1)
+        admin_adjust_balance(db, u.id, -300, 1)
+
+    report = _reconcile(db, batch_size=4)
+    assert report.processed == 6 and report.batches == 2 and report.caught_up
+    assert report.chain_breaks == [] and report.drift == []
+    snap = db.get(LedgerSnapshot, users[2].id)
+    assert (snap.ledger_sum_cents, snap.entries, snap.drift_cents) == (2700, 2, 0)
+
+    # The next run reads only entries added since the checkpoint
+    admin_adjust_balance(db, users[0].id, 50, 1)
+    statements: list[str] = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    report = _reconcile(db)
+    assert report.processed == 1 and report.last_ledger_id == 7
+    assert db.get(LedgerSnapshot, users[0].id).ledger_sum_cents == 750
+    ledger_reads = [s for s in statements if "FROM balance_ledger " in s and "balance_ledger.id >" in s]
+    assert ledger_reads  # keyset from the checkpoint, not a full scan
+
+
+def test_drift_and_chain_breaks_are_reported(db, users):
+    admin_adjust_balance(db, users[0].id, 1000, 1)
+    admin_adjust_balance(db, users[1].id, 500, 1)
+    # Balance changed behind the ledger's back, and a ledger row with a wrong running balance
+    db.execute(update(UserBalance).where(UserBalance.user_id == users[0].id).values(balance_cents=1200))
+    db.add(BalanceLedger(user_id=users[1].id, type="admin_adjust", delta_cents=100, balance_after_cents=900))
+    db.execute(update(UserBalance).where(UserBalance.user_id == users[1].id).values(balance_cents=600))
+    db.commit()
+
+    report = _reconcile(db)
+    assert report.drift == [{"user_id": users[0].id, "balance_cents": 1200, "ledger_sum_cents": 1000, "drift_cents": 200}]
+    assert [(b["user_id"], b["expected_cents"], b["balance_after_cents"]) for b in report.chain_breaks] == [(users[1].id, 600, 900)]
+    assert db.get(LedgerSnapshot, users[0].id).drift_cents == 200
+    assert db.get(LedgerSnapshot, users[1].id).chain_breaks == 1
+
+    # Fixed through the ledger: drift clears on the next run
+    admin_adjust_balance(db, users[0].id, -200, 1)
+    db.execute(update(UserBalance).where(UserBalance.user_id == users[0].id).values(balance_cents=800))
+    db.commit()
+    assert _reconcile(db).drift == []
+    assert db.get(LedgerSnapshot, users[0].id).drift_cents == 0
+
+
+def test_unsettled_entries_wait_for_the_next_run(db, users):
+    admin_adjust_balance(db, users[0].id, 1000, 1)
+    report = reconcile_ledger(db, settle_seconds=3600)
+    assert report.processed == 0 and report.drift == []  # the user has unreconciled entries: not compared yet
+
+
+def test_reconciler_processes_backlog_in_bounded_passes(engine, users):
+    factory = sessionmaker(bind=engine)
+    with factory() as db:
+        for n in range(7):
+            admin_adjust_balance(db, users[n % 3].id, 100, 1)
+
+    reconciler = LedgerReconciler(factory, batch_size=2, settle_seconds=0, max_batches=2)
+    assert reconciler.run_once() is True
+    assert reconciler.run_once() is False
+    assert reconciler.snapshot_stats()["processed"] == 7 and reconciler.snapshot_stats()["drift_users"] == 0
+
+
+def test_reconciler_stats_keep_breaks_after_a_clean_run(engine, users):
+    factory = sessionmaker(bind=engine)
+    with factory() as db:
+        admin_adjust_balance(db, users[0].id, 1000, 1)
+        admin_adjust_balance(db, users[1].id, 500, 1)
+        db.add(BalanceLedger(user_id=users[1].id, type="admin_adjust", delta_cents=100, balance_after_cents=900))
+        db.execute(update(UserBalance).where(UserBalance.user_id == users[1].id).values(balance_cents=600))
+        db.execute(update(UserBalance).where(UserBalance.user_id == users[0].id).values(balance_cents=1200))
+        db.commit()
+
+    reconciler = LedgerReconciler(factory, settle_seconds=0)
+    reconciler.run_once()
+    assert (reconciler.snapshot_stats()["chain_breaks"], reconciler.snapshot_stats()["drift_users"]) == (1, 1)
+
+    # Second run streams only new, consistent entries: the earlier break and the drift are still there
+    with factory() as db:
+        admin_adjust_balance(db, users[2].id, 300, 1)
+    reconciler.run_once()
+    stats = reconciler.snapshot_stats()
+    assert stats["runs"] == 2 and stats["processed"] == 4
+    assert (stats["chain_breaks"], stats["drift_users"]) == (1, 1)
+
+
+def test_ledger_keyset_pages(db, users):
+    for n in range(5):
+        admin_adjust_balance(db, users[0].id, 100 + n, 1)
+    admin_adjust_balance(db, users[1].id, 1, 1)
+
+    seen, cursor = [], None
+    while True:
+        items, cursor = list_ledger_entries(db, users[0].id, before_id=cursor, limit=2)
+        seen.extend(e.delta_cents for e in items)
+        if cursor is None:
+            break
+    assert seen == [104, 103, 102, 101, 100]
@@ -0,0 +1,246 @@
+"""
+Tests for the shared market-data poller, /market/tickers and the /market/stream SSE hub.
+Run: pytest tests/test_market.py -v
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+import app.models  # noqa: F401 - ensure all models registered
+from app.routers import market
+from app.services.market_data import FixtureSource, MarketPoller, MarketStore
+from app.services.market_stream import MarketHub
+
+SYMBOLS = ("BTCUSDT", "ETHUSDT")
+
+
+class CountingSource(FixtureSource):
+    def __init__(self, data: dict):
+        super().__init__(data)
+        self.ticker_calls = 0
+        self.sparkline_calls = 0
+        self.fail = False
+
+    def fetch_tickers(self, symbols):
+        self.ticker_calls += 1
+        if self.fail:
+            raise ConnectionError("upstream down")
+        return super().fetch_tickers(symbols)
+
+    def fetch_sparkline(self, symbol, points):
+        self.sparkline_calls += 1
+        return super().fetch_sparkline(symbol, points)
+
+
+@pytest.fixture
+def source():
+    return CountingSource(
+        {
+            "tickers": {
+                "BTCUSDT": {"price": 100.0, "change_pct_24h": 2.5, "quote_volume": 10.0, "high_24h": 110.0, "low_24h": 80.0},
+                "ETHUSDT": {"price": 50.0, "change_pct_24h": -1.0, "quote_volume": 5.0},
+            },
+            "sparklines": {"BTCUSDT": [90.0, 95.0, 99.0], "ETHUSDT": [48.0, 49.0]},
+        }
+    )
+
+
+@pytest.fixture
+def clock():
+    return {"now": 1_000_000.0}
+
+
+@pytest.fixture
+def poller(source, clock):
+    return MarketPoller(
+        source, MarketStore(), symbols=SYMBOLS, interval=5, sparkline_interval=300, clock=lambda: clock["now"]
+    )
+
+
+@pytest.fixture
+def client(poller):
+    api = FastAPI()
+    api.include_router(market.router)
+    api.dependency_overrides[market.get_store] = lambda: poller.store
+    return TestClient(api)
+
+
+def _client_for(store: MarketStore) -> TestClient:
+    api = FastAPI()
+    api.include_router(market.router)
+    api.dependency_overrides[market.get_store] = lambda: store
+    return TestClient(api)
+
+
+def _parse_sse(chunk: bytes) -> tuple[str, dict]:
+    fields = dict(line.split(": ", 1) for line in chunk.decode().splitlines() if ": " in line and not line.startswith(":"))
+    return fields["event"], json.loads(fields["data"])
+
+
+def test_all_symbols_in_one_response_with_etag(poller, client):
+    assert client.get("/market/tickers").status_code == 503
+
+    poller.run_once()
+    resp = client.get("/market/tickers")
+    assert resp.status_code == 200
+    assert resp.headers["cache-control"].startswith("public, max-age=")
+    items = resp.json()["items"]
+    assert [i["symbol"] for i in items] == list(SYMBOLS)
+    # Last (open) hourly candle follows the live price
+    assert items[0]["sparkline"] == [90.0, 95.0, 100.0]
+
+    again = client.get("/market/tickers", headers={"If-None-Match": resp.headers["etag"]})
+    assert again.status_code == 304 and again.content == b""
+
+
+def test_snapshot_changes_only_when_data_changes(poller, source, clock):
+    assert poller.run_once() is True
+    first = poller.store.get()
+
+    clock["now"] += 5
+    assert poller.run_once() is False
+    assert poller.store.get() is first
+
+    source.data["tickers"]["ETHUSDT"]["price"] = 51.0
+    clock["now"] += 5
+    assert poller.run_once() is True
+    assert poller.store.get().etag != first.etag
+    assert poller.store.get().version == 2
+
+
+def test_sparklines_refresh_on_their_own_interval(poller, source, clock):
+    for _ in range(10):
+        poller.run_once()
+        clock["now"] += 5
+    assert source.ticker_calls == 10
+    assert source.sparkline_calls == len(SYMBOLS)
+
+    clock["now"] += 300
+    poller.run_once()
+    assert source.sparkline_calls == 2 * len(SYMBOLS)
+
+
+def test_source_failure_keeps_last_snapshot(poller, source, client):
+    poller.run_once()
+    body = client.get("/market/tickers").content
+
+    source.fail = True
+    with pytest.raises(ConnectionError):
+        poller.run_once()
+    resp = client.get("/market/tickers")
+    assert resp.status_code == 200 and resp.content == body
+    assert json.loads(body)["items"][1]["price"] == 50.0
+
+
+def test_slow_stream_client_gets_coalesced_latest_values(poller, source):
+    hub = MarketHub(poller.store, heartbeat=5, max_lifetime=0)
+    poller.run_once()
+
+    def three_polls():
+        for price in (101.0, 102.0, 103.0):
+            source.data["tickers"]["BTCUSDT"]["price"] = price
+            poller.run_once()
+
+    async def scenario():
+        events = hub.events()
+        first = await events.__anext__()
+        # The client is not reading while the poller thread publishes three changes
+        await asyncio.to_thread(three_polls)
+        second = await asyncio.wait_for(events.__anext__(), 1)
+        await events.aclose()
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert _parse_sse(first)[1]["BTCUSDT"]["price"] == 100.0
+    # One event with only the latest changed field (sparkline tail follows price client-side)
+    assert _parse_sse(second) == ("delta", {"BTCUSDT": {"price": 103.0}})
+    stats = hub.snapshot_stats()
+    assert stats["coalesced"] == 2 and stats["connected"] == 0
+
+
+def test_stream_only_sends_subscribed_symbols(poller, source):
+    hub = MarketHub(poller.store, heartbeat=5, max_lifetime=0)
+    poller.run_once()
+
+    def eth_then_btc():
+        source.data["tickers"]["ETHUSDT"]["price"] = 55.0
+        poller.run_once()
+        source.data["tickers"]["BTCUSDT"]["change_pct_24h"] = 3.0
+        poller.run_once()
+
+    async def scenario():
+        events = hub.events(frozenset({"BTCUSDT"}))
+        first = await events.__anext__()
+        await asyncio.to_thread(eth_then_btc)
+        second = await asyncio.wait_for(events.__anext__(), 1)
+        await events.aclose()
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert list(_parse_sse(first)[1]) == ["BTCUSDT"]
+    assert _parse_sse(second)[1] == {"BTCUSDT": {"change_pct_24h": 3.0}}
+
+
+def test_stream_endpoint_sends_snapshot_and_heartbeats(poller):
+    poller.run_once()
+    hub = MarketHub(poller.store, heartbeat=0.05, max_lifetime=0.2)
+    api = FastAPI()
+    api.include_router(market.router)
+    api.dependency_overrides[market.get_hub] = lambda: hub
+
+    with TestClient(api).stream("GET", "/market/stream?symbols=ethusdt") as resp:
+        assert resp.headers["content-type"].startswith("text/event-stream")
+        body = resp.read()  # the stream ends at max_lifetime
+    first, *rest = body.split(b"\n\n")
+    event, data = _parse_sse(first)
+    assert event == "snapshot" and list(data) == ["ETHUSDT"] and data["ETHUSDT"]["price"] == 50.0
+    assert b": ping" in rest[0]
+    assert hub.snapshot_stats()["connected"] == 0
+
+
+def test_one_worker_polls_and_the_others_serve_its_snapshot(tmp_path, source, clock):
+    """Two pollers as two gunicorn workers on one database: only the lease holder calls the source."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'market.db'}")
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    leader_source = CountingSource(source.data)
+
+    def worker(src):
+        return MarketPoller(
+            src, MarketStore(), symbols=SYMBOLS, interval=5, clock=lambda: clock["now"], session_factory=factory
+        )
+
+    first, second = worker(source), worker(leader_source)
+    assert second.run_once() is True and first.run_once() is True
+    assert second.leader and not first.leader
+    first.run_once()
+    assert (leader_source.ticker_calls, source.ticker_calls) == (1, 0)
+
+    # Same body and ETag from either worker: a 304 holds whichever worker answers
+    resp = _client_for(second.store).get("/market/tickers")
+    again = _client_for(first.store).get("/market/tickers", headers={"If-None-Match": resp.headers["etag"]})
+    assert again.status_code == 304
+    assert first.store.get().body == resp.content
+
+    source.data["tickers"]["BTCUSDT"]["price"] = 101.0
+    clock["now"] += 5
+    assert second.run_once() is True and first.run_once() is True
+    assert first.store.get().etag == second.store.get().etag
+    assert json.loads(first.store.get().body)["items"][0]["price"] == 101.0
+
+    # The holder stops: the other worker takes over and continues the version sequence
+    second.stop()
+    clock["now"] += 5
+    source.data["tickers"]["ETHUSDT"]["price"] = 52.0
+    assert first.run_once() is True and first.leader
+    assert source.ticker_calls == 1 and first.store.get().version == 3
+    assert first.snapshot_stats()["shared_loads"] >= 2
+    engine.dispose()
@@ -0,0 +1,193 @@
+"""
+Tests for the versioned migration runner.
+Run: pytest tests/test_migrations.py -v
+"""
+from __future__ import annotations
+
+import logging
+
+import pytest
+from sqlalchemy import Column, ForeignKey, Integer, MetaData, String, Table, create_engine, inspect, text
+
+from app.migrations import MIGRATIONS, check_schema, current_version, upgrade
+from app.migrations import runner
+from app.migrations.runner import Migration, SchemaOutOfDate
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrations.sqlite3'}")
+    yield engine
+    engine.dispose()
+
+
+def test_fresh_database_upgrades_once_and_boot_check_passes(engine):
+    with pytest.raises(SchemaOutOfDate):
+        check_schema(engine)
+    assert upgrade(engine) == [m.version for m in MIGRATIONS]
+    assert {"users", "bookings", "balance_ledger"} <= set(inspect(engine).get_table_names())
+    assert upgrade(engine) == []
+    assert check_schema(engine) == MIGRATIONS[-1].version
+
+
+def _schema(engine) -> dict:
+    inspector = inspect(engine)
+    schema = {}
+    for table in inspector.get_table_names():
+        if table == "schema_version":
+            continue
+        schema[table] = {
+            "columns": {(c["name"], str(c["type"]), c["nullable"], c.get("primary_key", 0)) for c in inspector.get_columns(table)},
+            "indexes": {(ix["name"], tuple(ix["column_names"]), bool(ix["unique"])) for ix in inspector.get_indexes(table)},
+            "unique": {(uc["name"], tuple(uc["column_names"])) for uc in inspector.get_unique_constraints(table)},
+            "foreign_keys": {
+                (tuple(fk["constrained_columns"]), fk["referred_table"], tuple(fk["referred_columns"]))
+                for fk in inspector.get_foreign_keys(table)
+            },
+        }
+    return schema
+
+
+def test_migrations_build_exactly_the_models_schema(engine, tmp_path):
+    # Steps declare their own objects: a model change without a new step fails here
+    from app.database import Base
+    import app.models  # noqa: F401
+
+    models = create_engine(f"sqlite:///{tmp_path / 'models.sqlite3'}")
+    Base.metadata.create_all(models)
+    upgrade(engine)
+    expected, actual = _schema(models), _schema(engine)
+    models.dispose()
+    assert set(actual) == set(expected)
+    for table in expected:
+        assert actual[table] == expected[table], table
+
+
+def test_baseline_adds_missing_columns_to_old_tables(engine):
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE users (id INTEGER PRIMARY KEY, telegram_id INTEGER, username VARCHAR)")
+        conn.exec_driver_sql("INSERT INTO users (id, telegram_id, username) VALUES (1, 42, 'anna')")
+    upgrade(engine)
+    columns = {c["name"] for c in inspect(engine).get_columns("users")}
+    assert {"created_at", "first_name"} <= columns
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT username FROM users WHERE telegram_id = 42")).scalar() == "anna"
+
+
+# Tables as the old create_all() built them, before the versioned migrations
+PRE_SERIES_SCHEMA = (
+    "CREATE TABLE users (id INTEGER PRIMARY KEY, telegram_id INTEGER, username VARCHAR, first_name VARCHAR, "
+    "last_name VARCHAR, photo_url VARCHAR, referral_code VARCHAR, referred_by_telegram_id INTEGER, is_blocked BOOLEAN NOT NULL)",
+    "CREATE UNIQUE INDEX ix_users_telegram_id ON users (telegram_id)",
+    "CREATE TABLE webinars (id INTEGER PRIMARY KEY, title VARCHAR NOT NULL, date VARCHAR NOT NULL, time VARCHAR NOT NULL, "
+    "duration VARCHAR, speaker VARCHAR, status VARCHAR, description TEXT, price_usd FLOAT, price_eur FLOAT, "
+    "meeting_link VARCHAR, meeting_platform VARCHAR, recording_link VARCHAR)",
+    "CREATE TABLE bookings (id INTEGER PRIMARY KEY, user_id INTEGER REFERENCES users(id), "
+    "webinar_id INTEGER REFERENCES webinars(id), type VARCHAR, date VARCHAR, time VARCHAR, status VARCHAR, topic VARCHAR, "
+    "message TEXT, admin_response TEXT, admin_id INTEGER REFERENCES users(id), payment_status VARCHAR, amount FLOAT, "
+    "payment_id VARCHAR, payment_date DATETIME, reminder_sent_24h INTEGER, reminder_sent_1h INTEGER, "
+    "reminder_sent_10m INTEGER, attended INTEGER)",
+    "CREATE TABLE payments (id INTEGER PRIMARY KEY, booking_id INTEGER NOT NULL REFERENCES bookings(id), "
+    "user_id INTEGER NOT NULL REFERENCES users(id), webinar_id INTEGER REFERENCES webinars(id), amount FLOAT NOT NULL, "
+    "currency VARCHAR, payment_method VARCHAR, payment_provider VARCHAR, transaction_id VARCHAR, status VARCHAR, "
+    "created_at DATETIME, completed_at DATETIME, payment_metadata TEXT)",
+    "CREATE TABLE webinar_materials (id INTEGER PRIMARY KEY, webinar_id INTEGER NOT NULL REFERENCES webinars(id), "
+    "title VARCHAR NOT NULL, description TEXT, file_url VARCHAR, file_type VARCHAR, created_at DATETIME)",
+    "CREATE TABLE posts (id INTEGER PRIMARY KEY, title VARCHAR NOT NULL, content TEXT NOT NULL, created_at DATETIME, updated_at DATETIME)",
+    "CREATE TABLE referral_invites (id INTEGER PRIMARY KEY, referrer_telegram_id INTEGER NOT NULL, referred_telegram_id INTEGER, "
+    "referred_username VARCHAR, referred_first_name VARCHAR, referred_last_name VARCHAR, created_at DATETIME)",
+    "CREATE INDEX ix_referral_invites_referrer_telegram_id ON referral_invites (referrer_telegram_id)",
+    "INSERT INTO users (id, telegram_id, is_blocked) VALUES (1, 42, 0)",
+    "INSERT INTO webinars (id, title, date, time) VALUES (1, 'Рынок', '2030-01-01', '12:00')",
+    "INSERT INTO bookings (id, user_id, webinar_id, type, status) VALUES (1, 1, 1, 'webinar', 'confirmed')",
+)
+
+
+def _pre_series_database(engine) -> None:
+    with engine.begin() as conn:
+        for statement in PRE_SERIES_SCHEMA:
+            conn.exec_driver_sql(statement)
+
+
+def _indexes(engine, table: str) -> set[str]:
+    return {ix["name"] for ix in inspect(engine).get_indexes(table)}
+
+
+def test_baseline_leaves_later_steps_alone_on_a_pre_series_schema(engine):
+    _pre_series_database(engine)
+    assert upgrade(engine, target=1) == [1]
+
+    inspector = inspect(engine)
+    assert "table_versions" not in inspector.get_table_names()
+    assert "starts_at" not in {c["name"] for c in inspector.get_columns("webinars")}
+    assert {"reminder_schedule", "balance_ledger"} <= set(inspector.get_table_names())
+    assert "ix_bookings_user_id_id" not in _indexes(engine, "bookings")
+    assert "ix_referral_invites_referrer_telegram_id" in _indexes(engine, "referral_invites")
+
+    assert upgrade(engine) == [m.version for m in MIGRATIONS[1:]]
+    assert "ix_bookings_user_id_id" in _indexes(engine, "bookings")
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT starts_at IS NOT NULL FROM webinars WHERE id = 1")).scalar() == 1
+        assert conn.execute(text("SELECT status FROM bookings WHERE id = 1")).scalar() == "confirmed"
+
+
+def test_index_pack_is_built_by_its_own_step_on_an_existing_schema(engine, caplog):
+    from app.migrations.versions import _INDEX_PACK
+
+    _pre_series_database(engine)
+    caplog.set_level(logging.INFO, logger="migrations")
+    upgrade(engine, target=2)
+
+    created_by: dict[str, int] = {}
+    step = None
+    for record in caplog.records:
+        message = record.getMessage()
+        if message.startswith("apply "):
+            step = int(message.split()[1])
+        elif message.startswith("create index "):
+            created_by[message.split()[2].split(".", 1)[1]] = step
+    assert {created_by.get(index.name) for index in _INDEX_PACK} == {2}
+    for index in _INDEX_PACK:
+        assert index.name in _indexes(engine, index.table.name)
+    # The composite (referrer, referred) index replaces its prefix
+    assert "ix_referral_invites_referrer_telegram_id" not in _indexes(engine, "referral_invites")
+
+
+def test_failed_step_rolls_back_and_is_not_recorded(engine):
+    def broken(ctx):
+        ctx.execute("CREATE TABLE half_done (id INTEGER PRIMARY KEY)")
+        raise RuntimeError("boom")
+
+    steps = [Migration(1, "ok", lambda ctx: ctx.execute("CREATE TABLE kept (id INTEGER PRIMARY KEY)")), Migration(2, "broken", broken)]
+    with pytest.raises(RuntimeError):
+        runner.upgrade(engine, steps)
+    tables = set(inspect(engine).get_table_names())
+    assert "kept" in tables and "half_done" not in tables
+    assert current_version(engine) == 1
+
+
+def test_rebuild_table_copies_rows_in_batches_and_keeps_references(engine):
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE parents (id INTEGER PRIMARY KEY, name VARCHAR(10))")
+        conn.exec_driver_sql("CREATE TABLE children (id INTEGER PRIMARY KEY, parent_id INTEGER REFERENCES parents(id))")
+        for i in range(1, 8):
+            conn.exec_driver_sql(f"INSERT INTO parents (id, name) VALUES ({i}, 'p{i}')")
+        conn.exec_driver_sql("INSERT INTO children (id, parent_id) VALUES (1, 3)")
+
+    # New definition: wider, NOT NULL name plus a column ALTER TABLE cannot add with this constraint
+    parents = Table(
+        "parents",
+        MetaData(),
+        Column("id", Integer, primary_key=True),
+        Column("name", String(100), nullable=False, index=True),
+        Column("rank", Integer, nullable=False, server_default="0"),
+    )
+    Table("children", parents.metadata, Column("id", Integer, primary_key=True), Column("parent_id", ForeignKey("parents.id")))
+    step = Migration(1, "rebuild parents", lambda ctx: ctx.rebuild_table(parents, batch_size=3), transactional=False)
+    runner.upgrade(engine, [step])
+
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*), sum(rank) FROM parents")).one() == (7, 0)
+        assert "ix_parents_name" in {ix["name"] for ix in inspect(conn).get_indexes("parents")}
+        assert conn.execute(text("PRAGMA foreign_key_check")).all() == []
+        assert conn.execute(text("SELECT p.name FROM children c JOIN parents p ON p.id = c.parent_id")).scalar() == "p3"
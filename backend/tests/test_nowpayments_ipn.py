@@ -0,0 +1,205 @@
+"""
+Tests for the two-stage NOWPayments IPN pipeline (store, then apply in batches).
+Run: pytest tests/test_nowpayments_ipn.py -v
+"""
+from __future__ import annotations
+
+import hashlib
+import hmac
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+import app.models  # noqa: F401 - ensure all models registered
+from app.models.booking import Booking
+from app.models.nowpayments_ipn_event import NowPaymentsIpnEvent
+from app.models.payment import Payment
+from app.models.user import User
+from app.models.user_entitlement import UserEntitlement
+from app.routers import nowpayments
+from app.services import nowpayments_ipn_service
+from app.services.nowpayments_ipn_service import IpnApplier, apply_queued_ipn_events, requeue_dead_ipn_events, store_ipn_event
+
+SECRET = "ipn-secret"
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'ipn.sqlite3'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)
+
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def booking(db):
+    user = User(telegram_id=555, first_name="Payer")
+    db.add(user)
+    db.flush()
+    b = Booking(user_id=user.id, type="payment", date="2026-01-01", status="pending", payment_status="pending")
+    db.add(b)
+    db.commit()
+    return b
+
+
+def _event(db, booking, status: str, payment_id: int = 9001):
+    payload = {"payment_id": payment_id, "payment_status": status, "order_id": f"booking-{booking.id}", "price_amount": 10}
+    return store_ipn_event(db, payload, "sig", True)
+
+
+def test_webhook_only_stores_the_event(session_factory, monkeypatch, booking):
+    monkeypatch.setenv("NOWPAYMENTS_IPN_SECRET", SECRET)
+    api = FastAPI()
+    api.include_router(nowpayments.router)
+
+    def _get_db():
+        session = session_factory()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    api.dependency_overrides[nowpayments.get_db] = _get_db
+    client = TestClient(api)
+
+    body = json.dumps({"payment_id": 1, "payment_status": "finished", "order_id": f"booking-{booking.id}"}).encode()
+    sig = hmac.new(SECRET.encode(), body, hashlib.sha512).hexdigest()
+    assert client.post("/payments/ipn", content=body, headers={"x-nowpayments-sig": sig}).status_code == 200
+    assert client.post("/payments/ipn", content=body, headers={"x-nowpayments-sig": "bad"}).status_code == 401
+
+    db = session_factory()
+    try:
+        statuses = [e.apply_status for e in db.query(NowPaymentsIpnEvent).order_by(NowPaymentsIpnEvent.id)]
+        assert statuses == ["queued", "ignored"]
+        # Nothing applied yet: that's the applier's job
+        assert db.query(Booking).filter(Booking.id == booking.id).first().payment_status == "pending"
+    finally:
+        db.close()
+
+
+def test_applier_applies_in_order_and_drops_repeated_statuses(db, booking):
+    for status in ("waiting", "waiting", "confirming", "finished", "finished"):
+        _event(db, booking, status)
+
+    stats = apply_queued_ipn_events(db)
+    assert stats == {"events": 5, "applied": 3, "duplicate": 2, "error": 0, "dead": 0}
+
+    db.expire_all()
+    b = db.query(Booking).filter(Booking.id == booking.id).first()
+    assert b.payment_status == "paid" and b.status == "confirmed"
+    assert db.query(Payment).filter(Payment.transaction_id == "9001").count() == 1
+    assert db.query(UserEntitlement).filter(UserEntitlement.user_id == b.user_id).count() == 1
+
+    # A retry arriving in a later batch is still recognised as a repeat
+    _event(db, booking, "finished")
+    assert apply_queued_ipn_events(db)["duplicate"] == 1
+
+
+def test_bad_event_does_not_block_other_payments(db, booking):
+    broken = _event(db, booking, "finished", payment_id=1)
+    broken.payload_json = "{not json"
+    db.commit()
+    _event(db, booking, "finished", payment_id=2)
+
+    stats = apply_queued_ipn_events(db)
+    assert stats["applied"] == 1 and stats["error"] == 1
+    outcome = {e.payment_id: (e.apply_status, e.apply_attempts) for e in db.query(NowPaymentsIpnEvent)}
+    assert outcome == {"1": ("queued", 1), "2": ("applied", 0)}
+
+
+def test_only_one_applier_holds_the_lease(session_factory, db, booking):
+    _event(db, booking, "finished")
+    first = IpnApplier(session_factory, batch_size=10, lease_seconds=60)
+    second = IpnApplier(session_factory, batch_size=10, lease_seconds=60)
+
+    first.run_once()
+    _event(db, booking, "refunded")
+    second.run_once()  # lease is held by `first`: must not consume
+    assert db.query(NowPaymentsIpnEvent).filter(NowPaymentsIpnEvent.apply_status == "queued").count() == 1
+
+    first.stop()  # releases the lease
+    second.run_once()
+    assert db.query(NowPaymentsIpnEvent).filter(NowPaymentsIpnEvent.apply_status == "queued").count() == 0
+
+
+def _make_due(db) -> None:
+    db.query(NowPaymentsIpnEvent).filter(NowPaymentsIpnEvent.next_attempt_at.isnot(None)).update(
+        {NowPaymentsIpnEvent.next_attempt_at: datetime.now(timezone.utc) - timedelta(seconds=1)}
+    )
+    db.commit()
+
+
+def test_failed_apply_is_retried_by_a_later_tick(session_factory, db, booking, monkeypatch):
+    finished = _event(db, booking, "finished")
+    real_apply = nowpayments_ipn_service.apply_ipn_payload
+    calls = {"n": 0}
+
+    def flaky_apply(session, payload):
+        calls["n"] += 1
+        if calls["n"] <= 2:  # the batch and the per-payment retry both hit the outage
+            raise RuntimeError("database is locked")
+        real_apply(session, payload)
+
+    monkeypatch.setattr(nowpayments_ipn_service, "apply_ipn_payload", flaky_apply)
+    applier = IpnApplier(session_factory, batch_size=10, lease_seconds=60)
+    try:
+        applier.run_once()
+        db.expire_all()
+        ev = db.get(NowPaymentsIpnEvent, finished.id)
+        assert (ev.apply_status, ev.apply_attempts) == ("queued", 1)
+        assert "database is locked" in ev.apply_error
+        assert ev.next_attempt_at is not None
+
+        # A newer event of the same payment waits behind the backed-off one
+        refunded = _event(db, booking, "refunded")
+        applier.run_once()
+        db.expire_all()
+        assert db.get(NowPaymentsIpnEvent, refunded.id).apply_status == "queued"
+        assert db.get(Booking, booking.id).payment_status == "pending"
+
+        _make_due(db)
+        applier.run_once()
+    finally:
+        applier.stop()
+    db.expire_all()
+    assert [e.apply_status for e in db.query(NowPaymentsIpnEvent).order_by(NowPaymentsIpnEvent.id)] == ["applied", "applied"]
+    assert db.get(Booking, booking.id).payment_status == "refunded"  # finished first, then refunded
+    assert db.query(Payment).filter(Payment.transaction_id == "9001").count() == 1
+
+
+def test_event_goes_dead_after_max_attempts_and_can_be_replayed(db, booking):
+    broken = _event(db, booking, "finished")
+    payload = broken.payload_json
+    broken.payload_json = "{not json"
+    db.commit()
+
+    for attempt in range(3):
+        stats = apply_queued_ipn_events(db, max_attempts=3)
+        _make_due(db)
+    assert stats["dead"] == 1
+    db.expire_all()
+    ev = db.get(NowPaymentsIpnEvent, broken.id)
+    assert (ev.apply_status, ev.apply_attempts) == ("dead", 3)
+    assert apply_queued_ipn_events(db, max_attempts=3)["events"] == 0  # dead events are left alone
+
+    # Fixed by hand, then replayed
+    ev.payload_json = payload
+    db.commit()
+    assert requeue_dead_ipn_events(db, payment_id="9001") == 1
+    assert apply_queued_ipn_events(db, max_attempts=3)["applied"] == 1
+    db.expire_all()
+    assert db.get(Booking, booking.id).payment_status == "paid"
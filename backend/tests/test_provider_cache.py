@@ -0,0 +1,100 @@
+"""
+Tests for the provider metadata cache (TTL, stale-while-revalidate, single-flight, snapshot).
+Run: pytest tests/test_provider_cache.py -v
+"""
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+
+from app.services.provider_cache import ProviderCache
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_fresh_hit_then_stale_served_while_refreshing():
+    clock = _Clock()
+    cache = ProviderCache("test", clock=clock)
+    calls = []
+    refreshed = threading.Event()
+
+    def loader():
+        calls.append(clock.now)
+        if len(calls) > 1:
+            refreshed.set()
+        return {"version": len(calls)}
+
+    assert cache.get("k", loader, ttl=10, stale_ttl=100) == {"version": 1}
+    assert cache.get("k", loader, ttl=10, stale_ttl=100) == {"version": 1}
+    assert len(calls) == 1
+
+    clock.now += 50  # stale: served immediately, refreshed in background
+    assert cache.get("k", loader, ttl=10, stale_ttl=100) == {"version": 1}
+    assert refreshed.wait(2)
+    for _ in range(100):
+        if cache.get("k", loader, ttl=10, stale_ttl=100) == {"version": 2}:
+            break
+        time.sleep(0.01)
+    assert cache.get("k", loader, ttl=10, stale_ttl=100) == {"version": 2}
+    assert len(calls) == 2
+
+
+def test_concurrent_misses_share_one_upstream_call():
+    cache = ProviderCache("test")
+    calls = []
+    gate = threading.Event()
+
+    def slow_loader():
+        calls.append(1)
+        gate.wait(2)
+        return ["usdttrc20"]
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get("c", slow_loader, ttl=60))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    time.sleep(0.1)
+    gate.set()
+    for t in threads:
+        t.join(2)
+
+    assert len(calls) == 1
+    assert results == [["usdttrc20"]] * 8
+
+
+def test_provider_error_serves_last_known_value_or_raises():
+    clock = _Clock()
+    cache = ProviderCache("test", clock=clock)
+    cache.get("k", lambda: "old", ttl=10)
+
+    def failing():
+        raise RuntimeError("provider down")
+
+    clock.now += 1000  # expired beyond the stale window
+    assert cache.get("k", failing, ttl=10) == "old"
+    with pytest.raises(RuntimeError):
+        cache.get("other", failing, ttl=10)
+
+
+def test_snapshot_makes_restart_warm(tmp_path):
+    path = str(tmp_path / "cache" / "provider.json")
+    first = ProviderCache("test", snapshot_path=path)
+    first.get("currencies", lambda: ["btc", "usdttrc20"], ttl=3600, persist=True)
+    first.get("estimate", lambda: {"x": 1}, ttl=3600)  # not persisted
+
+    restarted = ProviderCache("test", snapshot_path=path)
+
+    def must_not_call():
+        raise AssertionError("cold start hit the provider")
+
+    assert restarted.get("currencies", must_not_call, ttl=3600) == ["btc", "usdttrc20"]
+    with pytest.raises(AssertionError):
+        restarted.get("estimate", must_not_call, ttl=3600)
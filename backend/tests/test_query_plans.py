@@ -0,0 +1,145 @@
+"""
+Query-plan regression suite: the main query of each router must not full-scan a table.
+
+The schema comes from the migrations; planner statistics (sqlite_stat1) are
+scaled to QUERY_PLAN_ROWS rows per table (default 1M), so SQLite plans the
+queries as it would on a production-sized database without seeding one.
+Statements are captured from the real router / service code and run through
+EXPLAIN QUERY PLAN; any bare `SCAN <table>` step fails the test.
+Run: pytest tests/test_query_plans.py -v
+"""
+from __future__ import annotations
+
+import os
+import re
+
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+
+from app.migrations import upgrade
+from app.models.booking import Booking
+from app.models.payment import Payment
+from app.models.post import Post
+from app.models.referral_invite import ReferralInvite
+from app.models.user import User
+from app.models.webinar import Webinar
+from app.models.webinar_material import WebinarMaterial
+from app.routers import bookings, payments, posts, reminders, webinar_materials, webinars
+from app.services import nowpayments_ipn_service, reminder_service
+from app.services.ticket_queries import list_tickets
+
+ROWS = int(os.getenv("QUERY_PLAN_ROWS", "1000000"))
+FULL_SCAN = re.compile(r"^SCAN (\w+)$")
+
+
+@pytest.fixture(scope="module")
+def factory(tmp_path_factory):
+    url = f"sqlite:///{tmp_path_factory.mktemp('plans') / 'plans.sqlite3'}"
+    engine = create_engine(url)
+    upgrade(engine)
+    session = sessionmaker(bind=engine)()
+    users = [User(telegram_id=1000 + i, username=f"u{i}") for i in range(50)]
+    session.add_all(users)
+    session.flush()
+    webinars = [Webinar(title=f"w{i}", date="2030-01-01", time="10:00", status="upcoming" if i % 2 else "completed") for i in range(20)]
+    session.add_all(webinars)
+    session.flush()
+    for i in range(400):
+        webinar = webinars[i % 20] if i % 3 else None
+        session.add(
+            Booking(
+                user_id=users[i % 50].id,
+                webinar_id=webinar.id if webinar else None,
+                type="webinar" if webinar else ("support", "consultation")[i % 2],
+                status=("pending", "confirmed", "paid", "cancelled")[i % 4],
+                payment_id=str(90000 + i) if i % 5 == 0 else None,
+                date="2030-01-01",
+            )
+        )
+    session.flush()
+    for i in range(200):
+        session.add(Payment(booking_id=1 + i, user_id=users[i % 50].id, amount=10, transaction_id=f"tx{i}" if i % 2 else None))
+        session.add(WebinarMaterial(webinar_id=webinars[i % 20].id, title=f"m{i}"))
+        session.add(Post(title=f"p{i}", content="..."))
+        session.add(ReferralInvite(referrer_telegram_id=1000 + i % 50, referred_telegram_id=5000 + i))
+    session.commit()
+    session.close()
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE")
+        # Scale every table to ROWS rows with the same number of distinct keys per index
+        # (pessimistic: rows per key grow with the table; unique keys stay at 1)
+        for tbl, idx, stat in conn.exec_driver_sql("SELECT tbl, idx, stat FROM sqlite_stat1").all():
+            counts = [int(part) for part in stat.split() if part.isdigit()]
+            scale = ROWS / max(counts[0], 1)
+            scaled = [ROWS] + [n if n == 1 else round(n * scale) for n in counts[1:]]
+            conn.execute(
+                text("UPDATE sqlite_stat1 SET stat = :stat WHERE tbl = :tbl AND idx IS :idx"),
+                {"stat": " ".join(map(str, scaled)), "tbl": tbl, "idx": idx},
+            )
+    engine.dispose()  # statistics are loaded when a connection opens
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def _plans(factory, run) -> list[tuple[str, list[str]]]:
+    session = factory()
+    engine = session.get_bind()
+    captured: list[tuple[str, tuple]] = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "DELETE", "UPDATE", "INSERT INTO REMINDER")):
+            captured.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        run(session)
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+        session.rollback()
+    result = []
+    with engine.connect() as conn:
+        for statement, parameters in captured:
+            rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+            result.append((statement, [row[-1] for row in rows]))
+        conn.rollback()
+    session.close()
+    return result
+
+
+ROUTER_QUERIES = {
+    "bookings: user bookings": lambda db: bookings.get_user_bookings(1, db),
+    "bookings: by telegram id": lambda db: bookings.get_user_bookings_by_telegram(1001, db),
+    "bookings: support tickets": lambda db: list_tickets(db, types=("support",), limit=50),
+    "bookings: consultations by status": lambda db: list_tickets(db, types=("consultation",), status="pending", limit=50),
+    "bookings: tickets of a user": lambda db: list_tickets(db, user_id=3, limit=50),
+    "payments: by booking": lambda db: payments.get_payments_by_booking(5, db),
+    "payments: by user": lambda db: payments.get_user_payments(2, db),
+    "nowpayments: booking by payment id": lambda db: nowpayments_ipn_service.get_booking_by_payment(db, 90005, None),
+    "nowpayments: payment by transaction id": lambda db: db.query(Payment).filter(Payment.transaction_id == "tx3").first(),
+    "webinars: upcoming": lambda db: webinars.get_webinars(0, 20, "upcoming", db),
+    "webinars: past": lambda db: webinars.get_webinars(0, 20, "past", db),
+    "webinar_materials: by webinar": lambda db: webinar_materials.get_webinar_materials(2, db),
+    "posts: feed": lambda db: posts.get_posts(0, 20, db),
+    "posts: keyset feed page": lambda db: posts.posts_feed_page(db, 20, 150),
+    "webinars: keyset feed page": lambda db: webinars.webinars_feed_page(db, 20, 15),
+    "webinars: delete cascade to bookings": lambda db: db.query(Booking).filter(Booking.webinar_id == 4).delete(),
+    "reminders: upcoming with booking counts": lambda db: reminders.upcoming_webinars_with_counts(db),
+    "reminders: schedule backfill": lambda db: reminder_service.backfill_reminder_schedule(db),
+    "referrals: dedup check": lambda db: db.query(ReferralInvite)
+    .filter(ReferralInvite.referrer_telegram_id == 1001, ReferralInvite.referred_telegram_id == 5001)
+    .first(),
+    "referrals: invites of a referrer": lambda db: db.query(ReferralInvite)
+    .filter(ReferralInvite.referrer_telegram_id == 1001)
+    .all(),
+}
+
+
+@pytest.mark.parametrize("name", sorted(ROUTER_QUERIES))
+def test_router_query_uses_indexes(factory, name):
+    plans = _plans(factory, ROUTER_QUERIES[name])
+    assert plans, f"{name}: no statements captured"
+    for statement, steps in plans:
+        scans = [step for step in steps if FULL_SCAN.match(step)]
+        assert not scans, f"{name}: full scan {scans}\n{statement}\n" + "\n".join(steps)
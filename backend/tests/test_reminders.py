@@ -0,0 +1,209 @@
+"""
+Tests for the precomputed reminder schedule and the set-based tick.
+Run: pytest tests/test_reminders.py -v
+"""
+from __future__ import annotations
+
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+import app.models  # noqa: F401 - ensure all models registered
+from app.models.booking import Booking
+from app.models.reminder_schedule import ReminderSchedule
+from app.models.user import User
+from app.models.webinar import Webinar
+from app.services.reminder_service import (
+    ReminderScheduler,
+    run_reminder_tick,
+    schedule_booking_reminders,
+    schedule_webinar_reminders,
+)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'reminders.sqlite3'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    return engine
+
+
+@pytest.fixture
+def db(engine):
+    session = sessionmaker(bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def _webinar(db, starts_in: timedelta) -> Webinar:
+    # date/time are server-local wall time, like the admin forms send them
+    start = datetime.now() + starts_in
+    w = Webinar(title="Crypto 101", date=start.strftime("%Y-%m-%d"), time=start.strftime("%H:%M"), status="upcoming")
+    db.add(w)
+    db.commit()
+    schedule_webinar_reminders(db, w)
+    return w
+
+
+def _book(db, webinar: Webinar, n: int, *, paid: bool = True, start_tg: int = 1000) -> list[Booking]:
+    bookings = []
+    for i in range(n):
+        user = User(telegram_id=start_tg + i, first_name=f"u{i}")
+        db.add(user)
+        db.flush()
+        b = Booking(
+            user_id=user.id,
+            webinar_id=webinar.id,
+            type="webinar",
+            date=webinar.date,
+            status="confirmed" if paid else "pending",
+            payment_status="paid" if paid else "unpaid",
+        )
+        db.add(b)
+        db.commit()
+        schedule_booking_reminders(db, b)
+        bookings.append(b)
+    return bookings
+
+
+def _count_statements(engine):
+    counter = {"n": 0}
+
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        counter["n"] += 1
+
+    event.listen(engine, "before_cursor_execute", _before)
+    return counter, lambda: event.remove(engine, "before_cursor_execute", _before)
+
+
+def test_tick_sends_due_reminders_once_and_sets_flags(db):
+    webinar = _webinar(db, timedelta(hours=1, minutes=58))
+    paid = _book(db, webinar, 3)
+    _book(db, webinar, 2, paid=False, start_tg=2000)
+
+    # 12h window is already closed, so only 2h and 15m are scheduled per booking
+    assert db.query(ReminderSchedule).count() == 5 * 2
+
+    sent = []
+    stats = run_reminder_tick(db, lambda chat_id, text: sent.append((chat_id, text)) or True)
+    assert stats["sent"] == {"12h": 0, "2h": 3, "15m": 0}
+    assert stats["skipped"] == 2  # unpaid bookings
+    assert sorted(c for c, _ in sent) == [1000, 1001, 1002]
+    assert "2 часа" in sent[0][1]
+
+    db.expire_all()
+    assert all(b.reminder_sent_1h == 1 for b in db.query(Booking).filter(Booking.id.in_([b.id for b in paid])))
+
+    again = run_reminder_tick(db, lambda chat_id, text: pytest.fail("sent twice"))
+    assert sum(again["sent"].values()) == 0
+
+
+def test_tick_query_count_does_not_depend_on_booking_count(engine, db):
+    small = _webinar(db, timedelta(hours=1, minutes=58))
+    _book(db, small, 2)
+    counter, stop = _count_statements(engine)
+    run_reminder_tick(db, lambda chat_id, text: True)
+    stop()
+    few = counter["n"]
+
+    big = _webinar(db, timedelta(hours=1, minutes=58))
+    _book(db, big, 40, start_tg=5000)
+    counter, stop = _count_statements(engine)
+    stats = run_reminder_tick(db, lambda chat_id, text: True)
+    stop()
+
+    assert stats["sent"]["2h"] == 40
+    assert counter["n"] == few
+
+
+def test_rescheduling_webinar_moves_pending_reminders(db):
+    webinar = _webinar(db, timedelta(hours=1, minutes=58))
+    _book(db, webinar, 1)
+
+    later = datetime.now() + timedelta(days=2)
+    webinar.date = later.strftime("%Y-%m-%d")
+    webinar.time = later.strftime("%H:%M")
+    db.commit()
+    schedule_webinar_reminders(db, webinar)
+
+    kinds = sorted(r.kind for r in db.query(ReminderSchedule).filter(ReminderSchedule.status == "pending"))
+    assert kinds == ["12h", "15m", "2h"]
+    stats = run_reminder_tick(db, lambda chat_id, text: pytest.fail("not due yet"))
+    assert sum(stats["sent"].values()) == 0
+
+
+def _due_row(db, due_in: timedelta) -> ReminderSchedule:
+    webinar = _webinar(db, timedelta(days=3))
+    (booking,) = _book(db, webinar, 1, start_tg=9000 + webinar.id)
+    row = (
+        db.query(ReminderSchedule)
+        .filter(ReminderSchedule.booking_id == booking.id, ReminderSchedule.kind == "2h")
+        .first()
+    )
+    now = datetime.now(timezone.utc)
+    row.due_at = now + due_in
+    row.expires_at = now + due_in + timedelta(minutes=10)
+    db.commit()
+    return row
+
+
+def test_scheduler_sleeps_until_next_due_time(engine, db):
+    sent = threading.Event()
+    scheduler = ReminderScheduler(
+        sessionmaker(bind=engine),
+        lambda chat_id, text: sent.set() or True,
+        poll_interval=30,
+        listen=False,
+    )
+    _due_row(db, timedelta(seconds=0.5))
+    started = time.monotonic()
+    scheduler.start()
+    try:
+        assert sent.wait(5)
+        assert time.monotonic() - started >= 0.4
+    finally:
+        scheduler.stop()
+    assert scheduler.ticks == 1  # no idle ticks before the deadline
+
+
+def test_scheduler_is_woken_by_schedule_changes(engine, db):
+    sent = threading.Event()
+    scheduler = ReminderScheduler(
+        sessionmaker(bind=engine),
+        lambda chat_id, text: sent.set() or True,
+        poll_interval=30,
+        listen=False,
+    )
+    scheduler.start()
+    try:
+        time.sleep(0.1)
+        assert scheduler.next_due() is None
+        _due_row(db, timedelta(seconds=0.2))
+        scheduler.wake()  # what schedule_*_reminders does in-process
+        assert sent.wait(5)
+    finally:
+        scheduler.stop()
+
+
+def test_scheduler_picks_up_other_process_changes_via_watermark(engine, db):
+    sent = threading.Event()
+    scheduler = ReminderScheduler(
+        sessionmaker(bind=engine),
+        lambda chat_id, text: sent.set() or True,
+        poll_interval=0.2,
+        listen=False,
+    )
+    scheduler.start()
+    try:
+        time.sleep(0.1)
+        _due_row(db, timedelta(seconds=0.1))  # no wake(): only the DB changed
+        assert sent.wait(5)
+    finally:
+        scheduler.stop()
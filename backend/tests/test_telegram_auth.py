@@ -0,0 +1,100 @@
+"""
+Tests for Telegram initData verification and its cache.
+Run: pytest tests/test_telegram_auth.py -v
+"""
+from __future__ import annotations
+
+import hashlib
+import hmac
+import json
+import time
+import urllib.parse
+
+import pytest
+from fastapi import HTTPException
+
+from app.utils import telegram_webapp
+from app.utils.telegram_webapp import telegram_auth_cache_stats, verify_telegram_webapp_init_data
+
+TOKEN = "123456:TEST-TOKEN"
+
+
+def _sign(fields: dict[str, str], *, legacy: bool = False, token: str = TOKEN) -> str:
+    dcs = "\n".join(sorted(f"{k}={v}" for k, v in fields.items())).encode("utf-8")
+    if legacy:
+        secret = hashlib.sha256(token.encode("utf-8")).digest()
+    else:
+        secret = hmac.new(b"WebAppData", token.encode("utf-8"), hashlib.sha256).digest()
+    signed = dict(fields, hash=hmac.new(secret, dcs, hashlib.sha256).hexdigest())
+    return urllib.parse.urlencode(signed)
+
+
+def _init_data(user_id: int = 42, *, auth_date: int | None = None, **kwargs) -> str:
+    fields = {
+        "auth_date": str(auth_date if auth_date is not None else int(time.time())),
+        "query_id": "AAE",
+        "user": json.dumps({"id": user_id, "first_name": "Test"}, separators=(",", ":")),
+    }
+    return _sign(fields, **kwargs)
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    cache = telegram_webapp._VerifiedInitDataCache(max_size=2, ttl=300)
+    monkeypatch.setattr(telegram_webapp, "_init_data_cache", cache)
+    return cache
+
+
+def test_repeated_init_data_is_served_from_cache():
+    init_data = _init_data()
+    assert verify_telegram_webapp_init_data(init_data, TOKEN)["id"] == 42
+    assert verify_telegram_webapp_init_data(init_data, TOKEN)["id"] == 42
+
+    stats = telegram_auth_cache_stats()
+    assert stats["misses"] == 1
+    assert stats["hits"] == 1
+
+
+def test_cache_is_keyed_by_token_and_bad_signatures_are_not_cached():
+    init_data = _init_data()
+    verify_telegram_webapp_init_data(init_data, TOKEN)
+    with pytest.raises(HTTPException):
+        verify_telegram_webapp_init_data(init_data, "999:OTHER")
+    with pytest.raises(HTTPException):
+        verify_telegram_webapp_init_data(init_data, "999:OTHER")
+    assert telegram_auth_cache_stats()["hits"] == 0
+
+
+def test_lru_eviction():
+    a, b, c = _init_data(1), _init_data(2), _init_data(3)
+    for init_data in (a, b, a, c):  # c evicts b (a was used more recently)
+        verify_telegram_webapp_init_data(init_data, TOKEN)
+    stats = telegram_auth_cache_stats()
+    assert stats["size"] == 2 and stats["evictions"] == 1
+    verify_telegram_webapp_init_data(a, TOKEN)
+    assert telegram_auth_cache_stats()["hits"] == 2
+
+
+def test_cached_entry_does_not_outlive_auth_date(monkeypatch, fresh_cache):
+    monkeypatch.setenv("TELEGRAM_AUTH_MAX_AGE_SECONDS", "60")
+    issued = int(time.time()) - 59
+    init_data = _init_data(auth_date=issued)
+    verify_telegram_webapp_init_data(init_data, TOKEN)
+
+    # Jump past auth_date + max_age: the cached entry must not be returned
+    monkeypatch.setattr(telegram_webapp.time, "time", lambda: issued + 120)
+    with pytest.raises(HTTPException) as exc:
+        verify_telegram_webapp_init_data(init_data, TOKEN)
+    assert exc.value.detail == "Telegram initData expired"
+    assert fresh_cache.expired == 1
+
+
+def test_legacy_hash_can_be_disabled(monkeypatch):
+    init_data = _init_data(legacy=True)
+    assert verify_telegram_webapp_init_data(init_data, TOKEN)["id"] == 42
+
+    telegram_webapp._init_data_cache.clear()
+    monkeypatch.setenv("TELEGRAM_AUTH_LEGACY_HASH", "0")
+    with pytest.raises(HTTPException) as exc:
+        verify_telegram_webapp_init_data(init_data, TOKEN)
+    assert exc.value.status_code == 401
@@ -0,0 +1,108 @@
+"""
+Tests for the set-based ticket/booking list used by the bookings router and the admin panel.
+Run: pytest tests/test_ticket_queries.py -v
+"""
+from __future__ import annotations
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+import app.models  # noqa: F401 - ensure all models registered
+from app.models.admin import Admin
+from app.models.booking import Booking
+from app.models.user import User
+from app.services.ticket_queries import list_tickets, serialize_ticket, tickets_query
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    return engine
+
+
+@pytest.fixture
+def db(engine):
+    session = sessionmaker(bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def _seed(db, n: int):
+    admin_user = User(telegram_id=1, first_name="Anna")
+    customers = [User(telegram_id=100 + i, first_name=f"u{i}", username=f"user{i}") for i in range(n)]
+    db.add_all([admin_user, *customers])
+    db.flush()
+    db.add(Admin(telegram_id=1, role="owner"))
+    for i, customer in enumerate(customers):
+        kind = "support" if i % 2 == 0 else "consultation"
+        answered = i % 3 == 0
+        db.add(
+            Booking(
+                user_id=customer.id,
+                type=kind,
+                date="2026-01-01",
+                status="answered" if answered else "pending",
+                topic=f"t{i}",
+                admin_id=admin_user.id if answered else None,
+                admin_response="ok" if answered else None,
+            )
+        )
+    db.commit()
+    return admin_user, customers
+
+
+def _count_statements(engine) -> list[str]:
+    statements: list[str] = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    return statements
+
+
+@pytest.mark.parametrize("n", [6, 60])
+def test_page_is_one_query_at_any_size(engine, db, n):
+    _seed(db, n)
+    statements = _count_statements(engine)
+
+    page = list_tickets(db, types=("support",), limit=100)
+
+    assert len(statements) == 1
+    assert len(page.items) == n // 2 and page.next_cursor is None
+    first = page.items[-1]  # newest first: the oldest support ticket is last
+    assert first["user_first_name"] == "u0" and first["user_username"] == "user0" and first["user_telegram_id"] == 100
+    assert first["admin_name"] == "Anna" and first["admin_role"] == "owner"
+
+
+def test_keyset_pages_and_filters(db):
+    _seed(db, 30)
+
+    seen, cursor = [], None
+    while True:
+        page = list_tickets(db, types=("support", "consultation"), cursor=cursor, limit=7)
+        seen.extend(item["id"] for item in page.items)
+        if page.next_cursor is None:
+            break
+        cursor = page.next_cursor
+    assert seen == sorted(seen, reverse=True) and len(seen) == len(set(seen)) == 30
+
+    answered = list_tickets(db, types=("consultation",), status="answered").items
+    assert answered and all(t["type"] == "consultation" and t["status"] == "answered" for t in answered)
+
+    oldest_first = list_tickets(db, types=("support",), newest_first=False, limit=2)
+    assert [t["topic"] for t in oldest_first.items] == ["t0", "t2"]
+
+
+def test_responder_without_admin_row_keeps_name_without_role(db):
+    _, customers = _seed(db, 2)
+    helper = User(telegram_id=5, username="helper")
+    db.add(helper)
+    db.flush()
+    db.add(Booking(user_id=customers[1].id, type="support", date="2026-01-02", admin_id=helper.id))
+    db.commit()
+
+    rows = tickets_query(db).filter(Booking.admin_id == helper.id).all()
+    ticket = serialize_ticket(rows[0])
+    assert ticket["admin_name"] == "helper" and ticket["admin_role"] is None
@@ -0,0 +1,66 @@
+"""
+Tests for the batched user profile loader used by the users router.
+Run: pytest tests/test_user_profiles.py -v
+"""
+from __future__ import annotations
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+import app.models  # noqa: F401 - ensure all models registered
+from app.models.admin import Admin
+from app.models.user import User
+from app.models.user_entitlement import UserEntitlement
+from app.services.user_profiles import PAID_ACCESS_ENTITLEMENT, get_profile, list_profiles
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    return engine
+
+
+@pytest.fixture
+def db(engine):
+    session = sessionmaker(bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def _seed(db, n: int):
+    users = [User(telegram_id=100 + i, first_name=f"u{i}") for i in range(n)]
+    db.add_all(users)
+    db.flush()
+    db.add(Admin(telegram_id=101, role="owner"))
+    db.add(UserEntitlement(user_id=users[2].id, code=PAID_ACCESS_ENTITLEMENT))
+    db.add(UserEntitlement(user_id=users[3].id, code="something_else"))
+    db.commit()
+    return users
+
+
+def test_list_profiles_is_one_query_per_page(engine, db):
+    _seed(db, 50)
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    profiles = list_profiles(db, limit=100)
+
+    assert len(statements) == 1
+    assert len(profiles) == 50
+    by_tg = {p["telegram_id"]: p for p in profiles}
+    assert by_tg[101]["is_admin"] is True and by_tg[101]["role"] == "owner"
+    assert by_tg[100]["is_admin"] is False and by_tg[100]["role"] is None
+    assert by_tg[102]["has_paid_access"] is True and by_tg[102]["client_role"] == "member"
+    assert by_tg[103]["has_paid_access"] is False and by_tg[103]["client_role"] is None
+
+
+def test_get_profile_by_id_and_telegram_id(db):
+    users = _seed(db, 4)
+    assert get_profile(db, telegram_id=101)["role"] == "owner"
+    assert get_profile(db, user_id=users[2].id)["has_paid_access"] is True
+    assert get_profile(db, telegram_id=999) is None
@@ -1,26 +1,24 @@
 import os
+import sys
 import time
 import requests
 
+try:
+    # In the bot image the shared client is copied next to this file (see bot/Dockerfile)
+    from telegram_bot_api import BotApiClient
+except ImportError:  # local run from a repo checkout
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend", "app", "utils"))
+    from telegram_bot_api import BotApiClient
 
-def _api(token: str) -> str:
-    return f"https://api.telegram.org/bot{token}"
-
-
-def send_message(token: str, chat_id: int, text: str, webapp_url: str | None = None):
-    payload: dict = {
-        "chat_id": chat_id,
-        "text": text,
-        "parse_mode": "HTML",
-        "disable_web_page_preview": True,
-    }
 
+def send_message(client: BotApiClient, chat_id: int, text: str, webapp_url: str | None = None):
+    reply_markup = None
     if webapp_url:
-        payload["reply_markup"] = {
+        reply_markup = {
             "inline_keyboard": [[{"text": "Open Mini App", "web_app": {"url": webapp_url}}]]
         }
 
-    requests.post(f"{_api(token)}/sendMessage", json=payload, timeout=20).raise_for_status()
+    client.send_message_sync(chat_id, text, reply_markup=reply_markup)
 
 
 def _track_referral(
@@ -76,18 +74,19 @@ def main():
     timeout = int(os.getenv("BOT_LONGPOLL_TIMEOUT") or "30")
     sleep_s = float(os.getenv("BOT_POLL_SLEEP") or "0.5")
 
+    # One pooled keep-alive client for long polling and replies
+    client = BotApiClient(token)
+
     print("[bot] started, webapp_url=", base_webapp_url, "backend_url=", backend_url)
 
     while True:
         try:
-            r = requests.get(
-                f"{_api(token)}/getUpdates",
-                params={"timeout": timeout, "offset": offset, "allowed_updates": ["message"]},
+            updates = client.call_sync(
+                "getUpdates",
+                {"timeout": timeout, "offset": offset, "allowed_updates": ["message"]},
                 timeout=timeout + 10,
             )
-            r.raise_for_status()
-            data = r.json()
-            for upd in data.get("result", []):
+            for upd in updates or []:
                 offset = max(offset, int(upd["update_id"]) + 1)
                 msg = upd.get("message") or {}
                 text = (msg.get("text") or "").strip()
@@ -120,14 +119,14 @@ def main():
                         )
 
                     send_message(
-                        token,
+                        client,
                         chat_id,
                         "✅ <b>Mini App готов</b>\n\nНажми кнопку ниже, чтобы открыть.",
                         webapp_url=webapp_url,
                     )
                 elif text.startswith("/help"):
                     send_message(
-                        token,
+                        client,
                         chat_id,
                         "Команды:\n/start — открыть Mini App\n/help — помощь",
                         webapp_url=base_webapp_url,
@@ -1,3 +1,5 @@
+# Legacy poller: reminders are now sent by the scheduler inside backend
+# (app/services/reminder_service.py). Kept for REMINDER_SCHEDULER_ENABLED=0 setups.
 import os
 import time
 import requests
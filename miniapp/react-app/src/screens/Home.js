@@ -4,9 +4,9 @@ import CopyTradingHeader from '../components/CopyTradingHeader';
 import CryptoCard from '../components/CryptoCard';
 import ScreenWrapper from '../components/ScreenWrapper';
 // import PaymentFlow from '../components/PaymentFlow'; // временно отключено (оплата в разработке)
-import { getPosts, getMyBalance, getDepositAddress, createBalanceRequest } from '../services/api';
+import { getPostsFeed, getPost, getMyBalance, getDepositAddress, createBalanceRequest, getMarketTickers, openMarketStream } from '../services/api';
 
-// Popular cryptocurrencies to fetch from Binance
+// Display metadata for symbols served by backend /market/tickers
 const BINANCE_SYMBOLS = [
     { symbol: 'BTCUSDT', name: 'Bitcoin', id: 'bitcoin', image: 'https://assets.coingecko.com/coins/images/1/large/bitcoin.png' },
     { symbol: 'ETHUSDT', name: 'Ethereum', id: 'ethereum', image: 'https://assets.coingecko.com/coins/images/279/large/ethereum.png' },
@@ -16,6 +16,25 @@ const BINANCE_SYMBOLS = [
     { symbol: 'XRPUSDT', name: 'XRP', id: 'ripple', image: 'https://assets.coingecko.com/coins/images/44/large/xrp-symbol-white-128.png' }
 ];
 
+// Market items ({symbol: {price, change_pct_24h, quote_volume, sparkline}}) -> CryptoCard shape
+function toCryptos(market) {
+    return BINANCE_SYMBOLS
+        .filter(crypto => market[crypto.symbol])
+        .map(crypto => {
+            const item = market[crypto.symbol];
+            return {
+                id: crypto.id,
+                name: crypto.name,
+                symbol: crypto.symbol.replace('USDT', '').toLowerCase(),
+                current_price: item.price,
+                price_change_percentage_24h: item.change_pct_24h,
+                market_cap: item.quote_volume * item.price, // Approximate
+                image: crypto.image,
+                sparkline_in_7d: { price: item.sparkline || [] }
+            };
+        });
+}
+
 export default function Home({ user, apiConnected }) {
     const [cryptos, setCryptos] = useState([]);
     const [currentCryptoIndex, setCurrentCryptoIndex] = useState(0);
@@ -24,6 +43,10 @@ export default function Home({ user, apiConnected }) {
     const [aboutModalOpen, setAboutModalOpen] = useState(false);
     const [paymentContext, setPaymentContext] = useState(null);
     const [posts, setPosts] = useState([]);
+    const [postsCursor, setPostsCursor] = useState(null);
+    const [postsLoadingMore, setPostsLoadingMore] = useState(false);
+    // Полные тексты раскрытых постов: { [postId]: content }
+    const [expandedPosts, setExpandedPosts] = useState({});
     const [balance, setBalance] = useState(null);
     const [depositModalOpen, setDepositModalOpen] = useState(false);
     const [withdrawModalOpen, setWithdrawModalOpen] = useState(false);
@@ -34,6 +57,7 @@ export default function Home({ user, apiConnected }) {
     const [txRefSuccess, setTxRefSuccess] = useState(false);
     // Admin actions were moved to backend admin panel (/admin)
     const touchStartX = useRef(null);
+    const marketRef = useRef({});
     const touchEndX = useRef(null);
 
     // Mini app: no admin actions here (use backend admin panel)
@@ -65,43 +89,10 @@ export default function Home({ user, apiConnected }) {
         try {
             setError(null);
             
-            // Fetch 24hr ticker data for all symbols
-            const tickerPromises = BINANCE_SYMBOLS.map(async (crypto) => {
-                try {
-                    const tickerResponse = await fetch(
-                        `https://api.binance.com/api/v3/ticker/24hr?symbol=${crypto.symbol}`
-                    );
-                    if (!tickerResponse.ok) throw new Error('Ticker failed');
-                    const tickerData = await tickerResponse.json();
-                    
-                    // Fetch klines for sparkline (last 24 hours, 1 hour intervals = 24 points)
-                    const klinesResponse = await fetch(
-                        `https://api.binance.com/api/v3/klines?symbol=${crypto.symbol}&interval=1h&limit=24`
-                    );
-                    let sparklineData = [];
-                    if (klinesResponse.ok) {
-                        const klinesData = await klinesResponse.json();
-                        sparklineData = klinesData.map(k => parseFloat(k[4])); // Close price
-                    }
-                    
-                    return {
-                        id: crypto.id,
-                        name: crypto.name,
-                        symbol: crypto.symbol.replace('USDT', '').toLowerCase(),
-                        current_price: parseFloat(tickerData.lastPrice),
-                        price_change_percentage_24h: parseFloat(tickerData.priceChangePercent),
-                        market_cap: parseFloat(tickerData.quoteVolume) * parseFloat(tickerData.lastPrice), // Approximate
-                        image: crypto.image,
-                        sparkline_in_7d: { price: sparklineData }
-                    };
-                } catch (err) {
-                    console.error(`Error fetching ${crypto.symbol}:`, err);
-                    return null;
-                }
-            });
-            
-            const results = await Promise.all(tickerPromises);
-            const validResults = results.filter(r => r !== null);
+            // One request for all symbols: backend polls Binance and serves every client from its cache
+            const data = await getMarketTickers();
+            marketRef.current = Object.fromEntries((data?.items || []).map(item => [item.symbol, item]));
+            const validResults = toCryptos(marketRef.current);
             
             if (validResults.length > 0) {
                 setCryptos(validResults);
@@ -122,14 +113,37 @@ export default function Home({ user, apiConnected }) {
     const loadPosts = useCallback(async () => {
         if (!apiConnected) return;
         try {
-            const data = await getPosts();
-            setPosts(data || []);
+            const data = await getPostsFeed();
+            setPosts(data.items || []);
+            setPostsCursor(data.next_cursor || null);
         } catch (error) {
             console.error('Failed to load posts:', error);
             setPosts([]);
+            setPostsCursor(null);
         }
     }, [apiConnected]);
 
+    const loadMorePosts = async () => {
+        if (!postsCursor || postsLoadingMore) return;
+        setPostsLoadingMore(true);
+        try {
+            const data = await getPostsFeed(postsCursor);
+            setPosts(prev => [...prev, ...(data.items || [])]);
+            setPostsCursor(data.next_cursor || null);
+        } finally {
+            setPostsLoadingMore(false);
+        }
+    };
+
+    const expandPost = async (postId) => {
+        try {
+            const post = await getPost(postId);
+            setExpandedPosts(prev => ({ ...prev, [postId]: post.content }));
+        } catch (error) {
+            console.error('Failed to load post:', error);
+        }
+    };
+
     const loadBalance = useCallback(async () => {
         if (!apiConnected) return;
         try {
@@ -146,12 +160,39 @@ export default function Home({ user, apiConnected }) {
         loadPosts();
         loadBalance();
         
-        // Обновление данных криптовалют каждые 5 секунд (Binance API быстрее чем CoinGecko)
-        const cryptoInterval = setInterval(() => {
-            fetchCryptoData();
-        }, 5000);
+        // Цены приходят по SSE (/market/stream): снапшот при подключении, дальше только изменения.
+        // Если поток недоступен — опрос каждые 5 секунд (бэкенд обновляет кэш с той же частотой)
+        let cryptoInterval = null;
+        const startPolling = () => {
+            if (!cryptoInterval) cryptoInterval = setInterval(fetchCryptoData, 5000);
+        };
+        const closeStream = openMarketStream({
+            onSnapshot: (snapshot) => {
+                marketRef.current = snapshot;
+                const next = toCryptos(snapshot);
+                if (next.length > 0) setCryptos(next);
+            },
+            onDelta: (delta) => {
+                const market = { ...marketRef.current };
+                Object.entries(delta).forEach(([symbol, fields]) => {
+                    const item = { ...(market[symbol] || {}), ...fields };
+                    // Last hourly point is the live price; the series itself only comes when it rolls over
+                    if (fields.price !== undefined && !fields.sparkline && item.sparkline?.length) {
+                        item.sparkline = [...item.sparkline.slice(0, -1), fields.price];
+                    }
+                    market[symbol] = item;
+                });
+                marketRef.current = market;
+                setCryptos(toCryptos(market));
+            },
+            onUnavailable: startPolling,
+        });
+        if (!closeStream) startPolling();
         
-        return () => clearInterval(cryptoInterval);
+        return () => {
+            if (closeStream) closeStream();
+            if (cryptoInterval) clearInterval(cryptoInterval);
+        };
     }, [fetchCryptoData, loadPosts, loadBalance]);
 
     // Swipe handlers для слайдера криптовалют
@@ -649,12 +690,24 @@ export default function Home({ user, apiConnected }) {
                                     <div className="post-header">
                                         <h3 className="post-title">{post.title}</h3>
                                     </div>
-                                    <p className="post-content">{post.content}</p>
+                                    <p className="post-content">
+                                        {expandedPosts[post.id] ?? (post.truncated ? `${post.excerpt}…` : post.excerpt)}
+                                    </p>
+                                    {post.truncated && !expandedPosts[post.id] && (
+                                        <button type="button" className="post-more-btn" onClick={() => expandPost(post.id)}>
+                                            Читать полностью
+                                        </button>
+                                    )}
                                     <div className="post-date">
                                         {formatDate(post.created_at)}
                                     </div>
                                 </div>
                             ))}
+                            {postsCursor && (
+                                <button type="button" className="post-more-btn" onClick={loadMorePosts} disabled={postsLoadingMore}>
+                                    {postsLoadingMore ? 'Загрузка…' : 'Показать ещё'}
+                                </button>
+                            )}
                         </div>
                     )}
                 </section>
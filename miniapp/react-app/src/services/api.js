@@ -519,6 +519,49 @@ export async function getPosts() {
   }
 }
 
+/**
+ * Лента постов (краткие карточки, постранично).
+ * ETag/304 обрабатывает браузер: при неизменной ленте сервер отвечает 304, а fetch отдаёт тело из HTTP-кэша.
+ */
+export async function getPostsFeed(cursor = null, limit = 20) {
+  try {
+    const q = cursor ? `&cursor=${cursor}` : '';
+    return await apiRequest(`/posts/feed?limit=${limit}${q}`);
+  } catch (error) {
+    console.error('Failed to get posts feed:', error);
+    return { items: [], next_cursor: null };
+  }
+}
+
+/**
+ * Получить пост целиком (полный текст)
+ */
+export async function getPost(postId) {
+  return await apiRequest(`/posts/${postId}`);
+}
+
+/**
+ * Рыночные данные для главной: все тикеры и спарклайны одним запросом (кэш на бэкенде, ETag)
+ */
+export async function getMarketTickers() {
+  return await apiRequest('/market/tickers');
+}
+
+/**
+ * Поток рыночных данных (SSE). Возвращает функцию закрытия или null, если EventSource недоступен.
+ * onUnavailable вызывается, когда браузер перестал переподключаться (тогда нужен опрос getMarketTickers).
+ */
+export function openMarketStream({ onSnapshot, onDelta, onUnavailable }) {
+  if (typeof window === 'undefined' || !window.EventSource) return null;
+  const source = new window.EventSource(`${API_BASE_URL}/market/stream`);
+  source.addEventListener('snapshot', (e) => onSnapshot(JSON.parse(e.data)));
+  source.addEventListener('delta', (e) => onDelta(JSON.parse(e.data)));
+  source.onerror = () => {
+    if (source.readyState === window.EventSource.CLOSED && onUnavailable) onUnavailable();
+  };
+  return () => source.close();
+}
+
 /**
  * Создать пост (только для админов и разработчиков)
  */